@@ -0,0 +1,198 @@
+"""
+로깅 설정과 데이터 품질 경고 집계.
+
+각 모듈은 logging.getLogger(__name__) 으로 자신의 로거를 쓰고, 프로그램 진입점(main.main,
+invoice_service.main, transform_prices 등)에서 setup_logging()을 한 번 호출합니다.
+
+  - 레벨: 환경 변수 LOHAS_LOG_LEVEL (기본 INFO) 또는 setup_logging(level=...)
+  - 출력: 콘솔(stderr) + 사용자 데이터 폴더의 순환 로그 파일 (lohas.log)
+  - 같은 메시지가 반복되면 RateLimitFilter가 구간당 일정 개수만 내보내고 나머지는 생략 건수로 알려줍니다.
+  - 행 단위 데이터 문제(필수 컬럼 누락, 가격 형식 오류 등)는 DataQualityReport 에 모았다가
+    로드가 끝날 때 유형별 건수와 예시 LOT 를 담은 요약 한 건으로 기록합니다.
+"""
+import logging
+import logging.handlers
+import os
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+LOG_FILE = "lohas.log"
+LOG_FILE_MAX_BYTES = 1024 * 1024
+LOG_FILE_BACKUPS = 3
+LOG_FORMAT = "%(asctime)s %(levelname)-7s %(name)s: %(message)s"
+
+_configured = False
+
+
+class RateLimitFilter(logging.Filter):
+    """
+    같은 (로거, 메시지 형식) 조합을 window_seconds 동안 최대 burst 건만 통과시킵니다.
+    구간이 지나 처음 통과하는 기록에는 그동안 생략된 건수를 record.rate_limit_note 로 남기며, RateLimitFormatter 가
+    메시지 뒤에 붙입니다. (record.msg 는 바꾸지 않음: 같은 기록을 다른 핸들러도 처리하므로)
+    핸들러마다 따로 만들어 붙여야 합니다. 한 인스턴스를 여러 핸들러에 붙이면 한 기록이 여러 번 세어집니다.
+    키는 %-형식 인자를 채우기 전의 메시지이므로 로그 호출은 f-string 대신 logger.info("... %s", 값) 형식으로 씁니다.
+    구간이 지났고 생략된 기록도 없는 키는 구간마다 한 번씩 정리하여 상태가 계속 늘어나지 않게 합니다.
+    """
+
+    def __init__(self, burst: int = 5, window_seconds: float = 60.0):
+        super().__init__()
+        self.burst = burst
+        self.window = window_seconds
+        self._lock = threading.Lock()
+        self._state: Dict[Tuple[str, str], List[float]] = {}  # key -> [구간 시작, 통과 수, 생략 수]
+        self._last_sweep = time.monotonic()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        key = (record.name, str(record.msg))
+        now = time.monotonic()
+        with self._lock:
+            if now - self._last_sweep >= self.window:
+                self._sweep(now)
+            state = self._state.get(key)
+            if state is None or now - state[0] >= self.window:
+                suppressed = int(state[2]) if state is not None else 0
+                self._state[key] = [now, 1, 0]
+                # 핸들러는 차례로 기록을 처리하므로 통과할 때마다 이 핸들러의 값으로 덮어씀
+                record.rate_limit_note = f" (같은 메시지 {suppressed}건 생략됨)" if suppressed else ""
+                return True
+            if state[1] < self.burst:
+                state[1] += 1
+                record.rate_limit_note = ""
+                return True
+            state[2] += 1
+            return False
+
+    def _sweep(self, now: float):
+        """구간이 지났고 알려줄 생략 건수도 없는 키를 삭제 (그런 키는 다음 기록 때 새 구간으로 시작하므로 결과가 같음)"""
+        self._last_sweep = now
+        expired = [key for key, (start, _, suppressed) in self._state.items()
+                   if now - start >= self.window and not suppressed]
+        for key in expired:
+            del self._state[key]
+
+
+class RateLimitFormatter(logging.Formatter):
+    """RateLimitFilter 가 남긴 생략 건수를 메시지 줄 끝에 붙입니다. (예외 스택은 그 아래)"""
+
+    def formatMessage(self, record: logging.LogRecord) -> str:
+        return super().formatMessage(record) + getattr(record, "rate_limit_note", "")
+
+
+class DataQualityReport:
+    """
+    데이터 로드 중 발견한 문제를 유형별로 모으는 집계기.
+    개별 문제는 DEBUG 로만 기록하고, summarize()가 유형별 건수와 예시를 WARNING 한 건으로 남깁니다.
+    """
+
+    def __init__(self, source: str, max_samples: int = 5):
+        self.source = source
+        self.max_samples = max_samples
+        self.counts: Dict[str, int] = {}
+        self.samples: Dict[str, List[str]] = {}
+
+    def add(self, issue: str, sample: Optional[str] = None, logger: Optional[logging.Logger] = None,
+            detail: str = ""):
+        self.counts[issue] = self.counts.get(issue, 0) + 1
+        samples = self.samples.setdefault(issue, [])
+        if sample is not None and len(samples) < self.max_samples:
+            samples.append(sample)
+        if logger is not None and logger.isEnabledFor(logging.DEBUG):
+            logger.debug("%s: %s [%s] %s", self.source, issue, sample, detail)
+
+    @property
+    def total(self) -> int:
+        return sum(self.counts.values())
+
+    def __bool__(self):
+        return bool(self.counts)
+
+    def summary_lines(self) -> List[str]:
+        lines = []
+        for issue, count in sorted(self.counts.items(), key=lambda kv: -kv[1]):
+            samples = self.samples.get(issue)
+            sample_text = f" (예: {', '.join(samples)}{' ...' if count > len(samples) else ''})" if samples else ""
+            lines.append(f"  - {issue}: {count}건{sample_text}")
+        return lines
+
+    def summarize(self, logger: logging.Logger, level: int = logging.WARNING):
+        """문제가 있었으면 요약을 한 건으로 기록합니다."""
+        if not self.counts:
+            return
+        logger.log(level, "%s: 데이터 문제 %d건\n%s", self.source, self.total, "\n".join(self.summary_lines()))
+
+
+def setup_logging(level: Optional[str] = None, log_file: Optional[str] = None, console: bool = True) -> logging.Logger:
+    """
+    루트 로거에 콘솔/순환 파일 핸들러와 반복 메시지 제한 필터를 설정합니다. 여러 번 호출해도 한 번만 설정됩니다.
+    log_file 을 생략하면 사용자 데이터 폴더의 lohas.log, 빈 문자열이면 파일에 기록하지 않습니다.
+    """
+    global _configured
+    root = logging.getLogger()
+    level_name = (level or os.environ.get("LOHAS_LOG_LEVEL") or "INFO").upper()
+    root.setLevel(getattr(logging, level_name, logging.INFO))
+    if _configured:
+        return root
+    _configured = True
+
+    formatter = RateLimitFormatter(LOG_FORMAT)
+    handlers: List[logging.Handler] = []
+    if console:
+        handlers.append(logging.StreamHandler())
+    if log_file is None:
+        import storage
+        log_file = storage.get_user_data_path(LOG_FILE)
+    if log_file:
+        try:
+            handlers.append(logging.handlers.RotatingFileHandler(
+                log_file, maxBytes=LOG_FILE_MAX_BYTES, backupCount=LOG_FILE_BACKUPS, encoding='utf-8'))
+        except OSError as e:
+            logging.getLogger(__name__).warning("로그 파일을 열 수 없습니다 (%s): %s", log_file, e)
+    for handler in handlers:
+        handler.setFormatter(formatter)
+        handler.addFilter(RateLimitFilter())  # 핸들러마다 따로 세도록 각각 만듦
+        root.addHandler(handler)
+    return root
+
+
+if __name__ == '__main__':
+    setup_logging("DEBUG", log_file="")
+    log = logging.getLogger("app_logging.demo")
+    for i in range(8):
+        log.warning("반복 경고 %d", i)  # 5건만 출력
+
+    # 핸들러가 둘이어도 각각 burst 만큼 내보내고, 구간이 지나면 두 핸들러 모두 생략 건수를 붙임
+    class _ListHandler(logging.Handler):
+        def __init__(self):
+            super().__init__()
+            self.lines = []
+        def emit(self, record):
+            self.lines.append(self.format(record))
+    test_log = logging.getLogger("app_logging.rate_limit_test")
+    test_log.propagate = False
+    outputs = [_ListHandler(), _ListHandler()]
+    for handler in outputs:
+        handler.setFormatter(RateLimitFormatter("%(message)s"))
+        handler.addFilter(RateLimitFilter(burst=5, window_seconds=0.2))
+        test_log.addHandler(handler)
+    for i in range(8):
+        test_log.warning("반복 %d", i)
+    time.sleep(0.25)
+    test_log.warning("반복 %d", 8)
+    for handler in outputs:
+        assert handler.lines == [f"반복 {i}" for i in range(5)] + ["반복 8 (같은 메시지 3건 생략됨)"], handler.lines
+
+    # 매번 다른 메시지는 구간이 지나면 상태에서 정리됨 (생략 건수가 남은 키는 유지)
+    sweep_filter = outputs[0].filters[0]
+    for i in range(100):
+        test_log.warning(f"서로 다른 메시지 {i}")
+    time.sleep(0.25)
+    test_log.warning("정리 후 첫 메시지")
+    assert len(sweep_filter._state) == 1, len(sweep_filter._state)
+
+    report = DataQualityReport("demo.json")
+    for lot in ["A1", "A2", "A3", "A4", "A5", "A6"]:
+        report.add("가격 형식 오류 (A단가)", lot)
+    report.add("필수 컬럼 누락", "행 10")
+    assert report.total == 7 and report.counts["가격 형식 오류 (A단가)"] == 6
+    report.summarize(log)
@@ -0,0 +1,296 @@
+# bench_core.py - storage / 검색 / 단가 결정 / Excel 렌더링 벤치마크
+"""
+핵심 경로의 실행 시간을 측정하고, 결과를 bench_results/ 에 저장하여 커밋 간 비교할 수 있게 합니다.
+
+측정 대상:
+  - storage.load_product_master
+  - storage.load_price_profiles / storage.save_price_profiles
+  - invoice.create_invoice_excel (10 / 1,000 / 10,000 라인)
+  - catalog.ProductCatalog 구축 및 검색 (명세서 탭, 제품 마스터 조회 탭)
+  - pricing.resolve_unit_prices (명세서 탭 품목 리스트의 단가 결정 루프)
+
+데이터셋:
+  - shipped: 데이터파일/item_data.json, prices_for_companies.json
+  - synthetic-xN: 위 파일을 N배로 늘린 합성 데이터 (--scale N, 반복 지정 가능)
+  - generated-N: gen_synthetic_data.py 로 생성한 품목 N개 데이터 (--synthetic-items N, 반복 지정 가능)
+
+사용 예:
+    python bench_core.py                       # 측정 후 bench_results/<시각>_<커밋>.json 저장
+    python bench_core.py --scale 10 --quick    # 10배 합성 데이터 포함, 10,000 라인 Excel 생략
+    python bench_core.py --synthetic-items 100000 --synthetic-profiles 500 --no-shipped --quick
+    python bench_core.py --compare-last        # 측정 후 직전 결과와 비교
+    python bench_core.py --compare A.json B.json --fail-threshold 20
+"""
+import argparse
+import contextlib
+import datetime
+import glob
+import io
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from decimal import Decimal
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import gen_synthetic_data
+from app_logging import setup_logging
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+RESULTS_DIR = os.path.join(SCRIPT_DIR, "bench_results")
+SHIPPED_MASTER = os.path.join(SCRIPT_DIR, "데이터파일", "item_data.json")
+SHIPPED_PROFILES = os.path.join(SCRIPT_DIR, "prices_for_companies.json")
+MASTER_SHEET_NAME = "코딩데이터용(2024.01.04)"
+
+INVOICE_LINE_COUNTS = [10, 1000, 10000]
+SEARCH_QUERIES = ["plate", "locking 12h", "bbb", "no-such-item"]
+MIN_REPEAT_SECONDS = 0.05  # 이보다 빠른 함수는 여러 번 묶어서 측정
+
+
+@contextlib.contextmanager
+def _quiet():
+    """storage/invoice의 콘솔 출력이 측정에 섞이지 않도록 숨깁니다."""
+    with contextlib.redirect_stdout(io.StringIO()):
+        yield
+
+
+def _time_call(func: Callable[[], Any], repeat: int) -> Dict[str, Any]:
+    """func를 repeat번 측정합니다. 빠른 함수는 한 번의 측정에 여러 번(loops) 실행합니다."""
+    start = time.perf_counter()
+    func()
+    single = time.perf_counter() - start
+    loops = max(1, int(MIN_REPEAT_SECONDS / single)) if single > 0 else 1000
+
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(loops):
+            func()
+        samples.append((time.perf_counter() - start) / loops * 1000)
+    return {
+        "min_ms": round(min(samples), 4),
+        "median_ms": round(statistics.median(samples), 4),
+        "mean_ms": round(statistics.fmean(samples), 4),
+        "stdev_ms": round(statistics.stdev(samples), 4) if len(samples) > 1 else 0.0,
+        "loops": loops,
+        "repeat": repeat,
+    }
+
+
+# --- 데이터셋 ---
+
+def _write_scaled_dataset(factor: int, out_dir: str) -> Tuple[str, str]:
+    """
+    배포 데이터를 factor배로 늘린 합성 데이터셋을 만듭니다.
+    각 복제본은 LOT와 모델명에 접미사를 붙여 서로 다른 품목(SKU)이 되도록 합니다.
+    """
+    with open(SHIPPED_MASTER, 'r', encoding='utf-8') as f:
+        master = json.load(f)
+    rows = master.get(MASTER_SHEET_NAME, [])
+    scaled_rows = []
+    for copy_idx in range(factor):
+        for row in rows:
+            new_row = dict(row)
+            if copy_idx and isinstance(new_row.get("LOT"), str):
+                new_row["LOT"] = f"{new_row['LOT']}-S{copy_idx}"
+            if copy_idx and isinstance(new_row.get("모델명"), str):
+                new_row["모델명"] = f"{new_row['모델명']}-S{copy_idx}"
+            scaled_rows.append(new_row)
+    master_path = os.path.join(out_dir, f"item_data_x{factor}.json")
+    with open(master_path, 'w', encoding='utf-8') as f:
+        json.dump({MASTER_SHEET_NAME: scaled_rows}, f, ensure_ascii=False)
+
+    with open(SHIPPED_PROFILES, 'r', encoding='utf-8') as f:
+        profiles = json.load(f)
+    for profile in profiles:
+        prices = profile.get("item_prices", {})
+        scaled_prices = dict(prices)
+        for copy_idx in range(1, factor):
+            for key, value in prices.items():
+                model, _, rest = key.partition("|")
+                scaled_prices[f"{model}-S{copy_idx}|{rest}"] = value
+        profile["item_prices"] = scaled_prices
+    profiles_path = os.path.join(out_dir, f"prices_x{factor}.json")
+    with open(profiles_path, 'w', encoding='utf-8') as f:
+        json.dump(profiles, f, ensure_ascii=False, indent=4)
+    return master_path, profiles_path
+
+
+def _use_profiles_file(profiles_path: str):
+    """storage가 사용자 데이터 폴더에서 읽는 가격 프로파일 파일을 벤치마크용 파일로 교체"""
+    import storage
+    user_path = storage.get_user_data_path(storage.PRICE_PROFILES_FILE)
+    shutil.copyfile(profiles_path, user_path)
+
+
+# --- 벤치마크 ---
+
+def _bench_dataset(name: str, master_path: str, profiles_path: str, repeat: int, line_counts: List[int],
+                   output_dir: str) -> Dict[str, Dict[str, Any]]:
+    import storage
+    import pricing
+    import invoice
+    from catalog import ProductCatalog
+    from models import Company, InvoiceLine, PriceTier
+
+    results: Dict[str, Dict[str, Any]] = {}
+
+    def run(bench_name: str, func: Callable[[], Any], bench_repeat: int = repeat):
+        with _quiet():
+            results[f"{name}/{bench_name}"] = _time_call(func, bench_repeat)
+        r = results[f"{name}/{bench_name}"]
+        print(f"  {name + '/' + bench_name:<55} {r['median_ms']:>11.3f} ms  (x{r['loops']})")
+
+    _use_profiles_file(profiles_path)
+    with _quiet():
+        items = storage.load_product_master(master_path)
+        profiles = storage.load_price_profiles()
+
+    run("storage.load_product_master", lambda: storage.load_product_master(master_path))
+    run("storage.load_price_profiles", storage.load_price_profiles)
+    run("storage.save_price_profiles", lambda: storage.save_price_profiles(profiles))
+    _use_profiles_file(profiles_path)  # 저장 벤치마크가 파일을 다시 썼으므로 원상 복구
+
+    run("catalog.build", lambda: ProductCatalog(items))
+    product_catalog = ProductCatalog(items)
+    for query in SEARCH_QUERIES:
+        run(f"catalog.search_any_term[{query}]", lambda q=query: product_catalog.search_any_term(q))
+        run(f"catalog.search_phrase[{query}]", lambda q=query: product_catalog.search_phrase(q))
+    run("catalog.representative_items[all]", lambda: product_catalog.representative_items(""))
+
+    representative = product_catalog.representative_items("")
+    tier_company = Company(name="벤치마크 거래처", price_tier=PriceTier.DEALER)
+    run("pricing.resolve_unit_prices[tier]", lambda: pricing.resolve_unit_prices(representative, tier_company, None))
+    if profiles:
+        profile_company = Company(name="벤치마크 거래처", price_tier=PriceTier.DEALER,
+                                  custom_price_profile_id=profiles[0].id)
+        run("pricing.resolve_unit_prices[profile]",
+            lambda: pricing.resolve_unit_prices(representative, profile_company, profiles[0]))
+
+    if items:
+        company = Company(name="벤치마크 병원", price_tier=PriceTier.DEALER)
+        for count in line_counts:
+            lines = [InvoiceLine(item=items[i % len(items)], qty=1 + i % 5,
+                                 unit_price=items[i % len(items)].prices.get(PriceTier.DEALER.value) or Decimal("1000"))
+                     for i in range(count)]
+            excel_repeat = repeat if count <= 1000 else max(1, min(repeat, 3))
+            run(f"invoice.create_invoice_excel[{count}]",
+                lambda l=lines: invoice.create_invoice_excel(company, l, datetime.date(2025, 1, 1), output_dir=output_dir),
+                excel_repeat)
+    return results
+
+
+# --- 결과 저장/비교 ---
+
+def _git_revision() -> Dict[str, Any]:
+    try:
+        sha = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                             cwd=SCRIPT_DIR, check=True).stdout.strip()
+        dirty = bool(subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], capture_output=True,
+                                    text=True, cwd=SCRIPT_DIR).stdout.strip())
+        return {"commit": sha, "dirty": dirty}
+    except (OSError, subprocess.CalledProcessError):
+        return {"commit": "unknown", "dirty": False}
+
+
+def _save_results(results: Dict[str, Any], meta: Dict[str, Any]) -> str:
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    stamp = datetime.datetime.now().strftime("%Y%m%d-%H%M%S")
+    suffix = meta["commit"] + ("-dirty" if meta["dirty"] else "")
+    path = os.path.join(RESULTS_DIR, f"{stamp}_{suffix}.json")
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({"meta": meta, "results": results}, f, ensure_ascii=False, indent=2)
+    return path
+
+
+def compare_results(old_path: str, new_path: str, fail_threshold: Optional[float] = None) -> int:
+    """두 결과 파일의 중앙값을 비교합니다. fail_threshold(%)보다 느려진 항목이 있으면 1을 반환합니다."""
+    with open(old_path, 'r', encoding='utf-8') as f:
+        old = json.load(f)
+    with open(new_path, 'r', encoding='utf-8') as f:
+        new = json.load(f)
+    print(f"비교: {os.path.basename(old_path)} ({old['meta'].get('commit')}) -> "
+          f"{os.path.basename(new_path)} ({new['meta'].get('commit')})")
+    regressions = []
+    for name, new_stats in new["results"].items():
+        old_stats = old["results"].get(name)
+        if old_stats is None:
+            print(f"  {name:<55} {'(신규)':>12} {new_stats['median_ms']:>11.3f} ms")
+            continue
+        before, after = old_stats["median_ms"], new_stats["median_ms"]
+        change = (after - before) / before * 100 if before else 0.0
+        marker = ""
+        if fail_threshold is not None and change > fail_threshold:
+            marker = "  <-- 느려짐"
+            regressions.append(name)
+        print(f"  {name:<55} {before:>11.3f} -> {after:>11.3f} ms ({change:+6.1f}%){marker}")
+    if regressions:
+        print(f"\n{len(regressions)}개 항목이 {fail_threshold}% 이상 느려졌습니다.")
+        return 1
+    return 0
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="storage/검색/단가/Excel 벤치마크")
+    parser.add_argument("--repeat", type=int, default=5, help="항목별 측정 반복 횟수")
+    parser.add_argument("--scale", type=int, action="append", default=[],
+                        help="배포 데이터를 N배로 늘린 합성 데이터셋도 측정 (반복 지정 가능)")
+    parser.add_argument("--synthetic-items", type=int, action="append", default=[],
+                        help="gen_synthetic_data.py 로 품목 N개 데이터셋을 생성해 측정 (반복 지정 가능)")
+    parser.add_argument("--synthetic-profiles", type=int, default=33, help="생성 데이터셋의 가격 프로파일 수")
+    parser.add_argument("--seed", type=int, default=42, help="생성 데이터셋 시드")
+    parser.add_argument("--no-shipped", action="store_true", help="배포 데이터셋 측정 생략")
+    parser.add_argument("--quick", action="store_true", help="10,000 라인 Excel 생성 생략")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"), help="측정 없이 두 결과 파일 비교")
+    parser.add_argument("--compare-last", action="store_true", help="측정 후 직전 결과와 비교")
+    parser.add_argument("--fail-threshold", type=float, default=None,
+                        help="비교 시 이 비율(%%) 이상 느려진 항목이 있으면 종료 코드 1")
+    args = parser.parse_args(argv)
+    setup_logging("ERROR", log_file="")  # 데이터 품질 요약 등 로그가 측정 결과 출력에 섞이지 않도록
+
+    if args.compare:
+        return compare_results(args.compare[0], args.compare[1], args.fail_threshold)
+
+    previous = sorted(glob.glob(os.path.join(RESULTS_DIR, "*.json")))
+    line_counts = [c for c in INVOICE_LINE_COUNTS if not (args.quick and c > 1000)]
+
+    with tempfile.TemporaryDirectory(prefix="bench_core_") as work_dir:
+        # storage가 사용자 데이터 폴더(~/.LohasInvoiceTool)를 쓰므로 임시 홈 디렉토리로 격리
+        os.environ["HOME"] = os.environ["USERPROFILE"] = work_dir
+        datasets = []
+        if not args.no_shipped:
+            datasets.append(("shipped", SHIPPED_MASTER, SHIPPED_PROFILES))
+        for factor in args.scale:
+            master_path, profiles_path = _write_scaled_dataset(factor, work_dir)
+            datasets.append((f"synthetic-x{factor}", master_path, profiles_path))
+        for item_count in args.synthetic_items:
+            paths = gen_synthetic_data.generate_dataset(os.path.join(work_dir, f"generated_{item_count}"), item_count,
+                                                        args.synthetic_profiles, companies=10, seed=args.seed,
+                                                        indent=None)
+            datasets.append((f"generated-{item_count}", paths["master"], paths["profiles"]))
+
+        results: Dict[str, Any] = {}
+        for name, master_path, profiles_path in datasets:
+            print(f"[{name}]")
+            results.update(_bench_dataset(name, master_path, profiles_path, args.repeat, line_counts, work_dir))
+
+    meta = dict(_git_revision())
+    meta.update({"created_at": datetime.datetime.now().isoformat(timespec="seconds"),
+                 "python": sys.version.split()[0], "platform": platform.platform(),
+                 "repeat": args.repeat, "seed": args.seed, "datasets": [d[0] for d in datasets]})
+    path = _save_results(results, meta)
+    print(f"\n결과 저장: {path}")
+
+    if args.compare_last and previous:
+        print()
+        return compare_results(previous[-1], path, args.fail_threshold)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,254 @@
+# bench_startup.py - main.App 시작 시간 측정 및 회귀 예산 검사
+"""
+main.App()이 사용 가능한 상태가 되기까지의 시간을 단계별로 측정합니다.
+  - import main (tkinter, models, storage 등)
+  - storage.load_companies / load_price_profiles / load_product_master
+  - App._create_main_menu 및 각 탭 생성 (_create_*_tab)
+  - 각 _refresh_* 메서드의 첫 호출
+  - 첫 update_idletasks() 까지 (화면 표시 준비 완료)
+
+창은 생성 직후 withdraw() 하므로 화면에 나타나지 않습니다. 디스플레이가 없는 환경에서는
+Xvfb 아래에서 실행하세요:  xvfb-run python bench_startup.py
+
+사용 예:
+    python bench_startup.py --runs 5 --output startup_report.json --budget-ms 1500
+    python bench_startup.py --phase-budget storage.load_product_master=400 --budget-file startup_budget.json
+
+예산(budget) 파일 형식:
+    {"total_ms": 1500, "phases": {"storage.load_product_master": 400, "App._create_invoice_tab": 150}}
+
+예산을 초과하면 종료 코드 1, 측정 자체가 불가능하면(디스플레이 없음 등) 종료 코드 2를 반환합니다.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List, Optional
+
+EXIT_OK = 0
+EXIT_BUDGET_EXCEEDED = 1
+EXIT_CANNOT_RUN = 2
+
+STORAGE_LOADERS = ["load_companies", "load_price_profiles", "load_product_master"]
+APP_BUILDERS = ["_create_main_menu", "_create_invoice_tab", "_create_company_management_tab",
+                "_create_price_profile_management_tab", "_create_product_viewer_tab"]
+
+
+class PhaseTimeline:
+    """측정 구간을 시작 시각 기준 ms 단위 타임라인으로 기록"""
+
+    def __init__(self):
+        self.origin = time.perf_counter()
+        self.phases: List[Dict[str, Any]] = []
+        self._depth = 0
+
+    def wrap(self, name: str, func, first_call_only: bool = False):
+        timeline = self
+        state = {"done": False}
+
+        def wrapper(*args, **kwargs):
+            if first_call_only and state["done"]:
+                return func(*args, **kwargs)
+            state["done"] = True
+            start = time.perf_counter()
+            timeline._depth += 1
+            try:
+                return func(*args, **kwargs)
+            finally:
+                timeline._depth -= 1
+                timeline.add(name, start, time.perf_counter(), depth=timeline._depth)
+        wrapper.__wrapped__ = func
+        return wrapper
+
+    def add(self, name: str, start: float, end: float, depth: int = 0):
+        self.phases.append({
+            "name": name,
+            "start_ms": round((start - self.origin) * 1000, 3),
+            "duration_ms": round((end - start) * 1000, 3),
+            "depth": depth,
+        })
+
+
+def _run_single(show_window: bool) -> Dict[str, Any]:
+    """현재 프로세스에서 App을 한 번 생성하고 단계별 타임라인을 반환합니다."""
+    timeline = PhaseTimeline()
+
+    start = time.perf_counter()
+    import main  # 측정 대상: 시작 시 import 비용
+    timeline.add("import:main", start, time.perf_counter())
+
+    import storage
+    for loader in STORAGE_LOADERS:
+        setattr(storage, loader, timeline.wrap(f"storage.{loader}", getattr(storage, loader)))
+    for builder in APP_BUILDERS:
+        setattr(main.App, builder, timeline.wrap(f"App.{builder}", getattr(main.App, builder)))
+    for attr in dir(main.App):
+        if attr.startswith("_refresh_"):
+            setattr(main.App, attr, timeline.wrap(f"first:App.{attr}", getattr(main.App, attr), first_call_only=True))
+
+    start = time.perf_counter()
+    app = main.App()
+    timeline.add("App.__init__", start, time.perf_counter())
+    try:
+        if not show_window:
+            app.withdraw()
+        start = time.perf_counter()
+        app.update_idletasks()
+        timeline.add("first_update_idletasks", start, time.perf_counter())
+        total_ms = round((time.perf_counter() - timeline.origin) * 1000, 3)
+        return {
+            "total_ms": total_ms,
+            "counts": {
+                "companies": len(app.companies),
+                "price_profiles": len(app.price_profiles),
+                "product_master_items": len(app.product_master_items),
+            },
+            "phases": sorted(timeline.phases, key=lambda p: p["start_ms"]),
+        }
+    finally:
+        app.destroy()
+
+
+def _spawn_run(args, env: Dict[str, str]) -> Dict[str, Any]:
+    """새 인터프리터에서 한 번 측정 (import 비용을 매번 콜드 상태로 측정하기 위함)"""
+    cmd = [sys.executable, os.path.abspath(__file__), "--single"]
+    if args.show:
+        cmd.append("--show")
+    proc = subprocess.run(cmd, capture_output=True, text=True, env=env,
+                          cwd=os.path.dirname(os.path.abspath(__file__)))
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr.strip() or proc.stdout.strip() or f"exit code {proc.returncode}")
+    # App/storage가 출력하는 로그 다음의 마지막 줄이 결과 JSON
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def _aggregate(runs: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """여러 번 실행한 결과를 단계별 중앙값/최소/최대로 요약"""
+    by_phase: Dict[str, List[float]] = {}
+    order: List[str] = []
+    for run in runs:
+        for phase in run["phases"]:
+            if phase["name"] not in by_phase:
+                order.append(phase["name"])
+            by_phase.setdefault(phase["name"], []).append(phase["duration_ms"])
+    totals = [run["total_ms"] for run in runs]
+    return {
+        "total_ms": {"median": round(statistics.median(totals), 3), "min": min(totals), "max": max(totals)},
+        "phases": {
+            name: {"median": round(statistics.median(by_phase[name]), 3),
+                   "min": min(by_phase[name]), "max": max(by_phase[name])}
+            for name in order
+        },
+    }
+
+
+def _load_budget(args) -> Dict[str, Any]:
+    budget: Dict[str, Any] = {"total_ms": None, "phases": {}}
+    if args.budget_file:
+        with open(args.budget_file, 'r', encoding='utf-8') as f:
+            loaded = json.load(f)
+        budget["total_ms"] = loaded.get("total_ms")
+        budget["phases"].update(loaded.get("phases", {}))
+    if args.budget_ms is not None:
+        budget["total_ms"] = args.budget_ms
+    for spec in args.phase_budget:
+        name, _, value = spec.partition("=")
+        budget["phases"][name.strip()] = float(value)
+    return budget
+
+
+def _check_budget(summary: Dict[str, Any], budget: Dict[str, Any]) -> List[str]:
+    violations = []
+    if budget["total_ms"] is not None and summary["total_ms"]["median"] > budget["total_ms"]:
+        violations.append(f"total: {summary['total_ms']['median']:.1f} ms > 예산 {budget['total_ms']} ms")
+    for name, limit in budget["phases"].items():
+        phase = summary["phases"].get(name)
+        if phase is None:
+            violations.append(f"{name}: 측정되지 않은 단계입니다 (예산 {limit} ms)")
+        elif phase["median"] > limit:
+            violations.append(f"{name}: {phase['median']:.1f} ms > 예산 {limit} ms")
+    return violations
+
+
+def _has_display() -> bool:
+    if platform.system() in ("Windows", "Darwin"):
+        return True
+    return bool(os.environ.get("DISPLAY") or os.environ.get("WAYLAND_DISPLAY"))
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="main.App 시작 시간 단계별 측정")
+    parser.add_argument("--runs", type=int, default=3, help="측정 횟수 (각각 새 프로세스)")
+    parser.add_argument("--output", default="startup_report.json", help="JSON 리포트 경로")
+    parser.add_argument("--budget-ms", type=float, default=None, help="전체 시작 시간 예산 (중앙값 기준)")
+    parser.add_argument("--phase-budget", action="append", default=[], metavar="NAME=MS",
+                        help="단계별 예산 (예: storage.load_product_master=400), 반복 지정 가능")
+    parser.add_argument("--budget-file", default=None, help="예산 JSON 파일")
+    parser.add_argument("--isolated-home", action="store_true",
+                        help="임시 홈 디렉토리 사용 (사용자 데이터 폴더를 건드리지 않음)")
+    parser.add_argument("--show", action="store_true", help="창을 숨기지 않음")
+    parser.add_argument("--single", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.single:
+        result = _run_single(args.show)
+        print(json.dumps(result, ensure_ascii=False))
+        return EXIT_OK
+
+    if not _has_display():
+        print("오류: 디스플레이가 없습니다. Xvfb 아래에서 실행하세요 (예: xvfb-run python bench_startup.py).")
+        return EXIT_CANNOT_RUN
+
+    env = dict(os.environ)
+    temp_home = None
+    if args.isolated_home:
+        temp_home = tempfile.TemporaryDirectory(prefix="startup_bench_")
+        env["HOME"] = env["USERPROFILE"] = temp_home.name
+
+    runs = []
+    try:
+        for i in range(args.runs):
+            try:
+                runs.append(_spawn_run(args, env))
+            except RuntimeError as e:
+                print(f"오류: 시작 시간 측정 실패 (실행 {i + 1}/{args.runs}):\n{e}")
+                return EXIT_CANNOT_RUN
+            print(f"실행 {i + 1}/{args.runs}: {runs[-1]['total_ms']:.1f} ms")
+    finally:
+        if temp_home is not None:
+            temp_home.cleanup()
+
+    summary = _aggregate(runs)
+    budget = _load_budget(args)
+    violations = _check_budget(summary, budget)
+    report = {
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "runs": args.runs,
+        "summary": summary,
+        "budget": budget,
+        "violations": violations,
+        "timelines": runs,
+    }
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+
+    print(f"\n시작 시간 (중앙값): {summary['total_ms']['median']:.1f} ms  -> 리포트: {args.output}")
+    for name, stats in summary["phases"].items():
+        print(f"  {name:<50} {stats['median']:>9.1f} ms")
+    if violations:
+        print("\n예산 초과:")
+        for v in violations:
+            print(f"  - {v}")
+        return EXIT_BUDGET_EXCEEDED
+    return EXIT_OK
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,201 @@
+"""
+단가 프로파일 일괄 조정.
+
+여러 프로파일에서 필터에 맞는 품목의 직접 지정 단가에 비율(%)/금액 조정과 반올림을 한 번에 적용합니다.
+plan_bulk_edit() 로 변경 내용을 먼저 계산해 미리보기로 보여준 뒤 apply_bulk_edit() 로 반영하며,
+반영 후 저장과 화면 갱신은 호출하는 쪽에서 한 번만 합니다.
+
+- 규칙으로 계산되는 단가와 기본 프로파일에서 물려받은 단가는 조정하지 않습니다. (직접 지정한 단가만)
+- item_prices 를 공유하는 프로파일 묶음은 한 번만 계산하고, 묶음 전체가 대상이면 공유 dict 를 그대로 수정합니다.
+- 같은 단가의 조정 결과는 한 번만 계산합니다. (연간 단가 조정처럼 수만 건이어도 서로 다른 단가 수만큼만 계산)
+"""
+import operator
+from dataclasses import dataclass, field
+from decimal import Decimal, ROUND_HALF_UP
+from typing import Dict, List, Optional, Tuple
+
+import price_history
+import sku
+from catalog import split_search_terms
+from models import PriceProfile, ProfileItemKey
+
+PriceChange = Tuple[Decimal, Decimal]  # (현재 단가, 조정 단가)
+
+
+@dataclass(frozen=True)
+class BulkAdjustment:
+    """단가 조정 방법. 조정 단가 = 현재 단가 × (1 + percent/100) + amount, round_unit 단위 반올림 (0 미만이면 0)"""
+    percent: Decimal = Decimal("0")
+    amount: Decimal = Decimal("0")
+    round_unit: Decimal = Decimal("0")  # 0이면 현재 단가의 소수 자릿수에 맞춰 반올림
+
+    def apply(self, price: Decimal) -> Decimal:
+        adjusted = price * (1 + self.percent / 100) + self.amount
+        if self.round_unit > 0:
+            adjusted = (adjusted / self.round_unit).quantize(Decimal("1"), rounding=ROUND_HALF_UP) * self.round_unit
+        else:
+            adjusted = adjusted.quantize(price, rounding=ROUND_HALF_UP)
+        return max(adjusted, Decimal("0"))
+
+    def describe(self) -> str:
+        parts = []
+        if self.percent:
+            parts.append(f"{self.percent:+}%")
+        if self.amount:
+            parts.append(f"{self.amount:+,}원")
+        text = ", ".join(parts) or "변경 없음"
+        if self.round_unit > 0:
+            text += f", {self.round_unit}원 단위 반올림"
+        return text
+
+
+@dataclass(frozen=True)
+class SkuFilter:
+    """조정할 품목. text 의 검색어(공백 구분)가 모두 모델명/제품명/규격에 포함되고 현재 단가가 범위 안인 품목."""
+    text: str = ""
+    min_price: Optional[Decimal] = None
+    max_price: Optional[Decimal] = None
+
+    def matching_keys(self, keys) -> set:
+        """keys 중 검색어 조건에 맞는 품목 키 (단가 범위는 plan_bulk_edit 에서 확인)"""
+        terms = split_search_terms(self.text)
+        if not terms:
+            return set(keys)
+        registry = sku.get_registry()
+        matched = set()
+        for key in keys:
+            hay = registry.key_str(key).lower()
+            if all(term in hay for term in terms):
+                matched.add(key)
+        return matched
+
+    def price_in_range(self, price: Decimal) -> bool:
+        return ((self.min_price is None or price >= self.min_price)
+                and (self.max_price is None or price <= self.max_price))
+
+
+@dataclass
+class BulkEditGroup:
+    """item_prices 를 공유하는 대상 프로파일 묶음과 그 변경 내용"""
+    profiles: List[PriceProfile]
+    changes: Dict[ProfileItemKey, PriceChange]
+    shared_whole: bool  # 공유 중인 프로파일이 모두 대상이면 True (공유 dict 를 그대로 수정)
+
+
+@dataclass
+class BulkEditPlan:
+    adjustment: BulkAdjustment
+    sku_filter: SkuFilter
+    groups: List[BulkEditGroup] = field(default_factory=list)
+
+    def __bool__(self):
+        return any(group.changes for group in self.groups)
+
+    @property
+    def change_count(self) -> int:
+        """프로파일별 변경 건수의 합"""
+        return sum(len(group.changes) * len(group.profiles) for group in self.groups)
+
+    def summary(self) -> str:
+        profile_count = sum(len(group.profiles) for group in self.groups if group.changes)
+        return f"{profile_count}개 프로파일, {self.change_count}건 ({self.adjustment.describe()})"
+
+    def preview_rows(self, limit: Optional[int] = None) -> List[Tuple[str, ProfileItemKey, Decimal, Decimal]]:
+        """(프로파일 이름들, 품목 키, 현재 단가, 조정 단가) - 프로파일, 제품명/모델명/규격 순"""
+        registry = sku.get_registry()
+        by_product_model_spec = operator.itemgetter(1, 0, 2)
+        rows = []
+        for group in self.groups:
+            names = ", ".join(profile.name for profile in group.profiles)
+            keys = sorted(group.changes, key=lambda k: by_product_model_spec(registry.key_for(k)))
+            for key in keys:
+                rows.append((names, key, *group.changes[key]))
+                if limit is not None and len(rows) >= limit:
+                    return rows
+        return rows
+
+
+def plan_bulk_edit(profiles: List[PriceProfile], targets: List[PriceProfile], adjustment: BulkAdjustment,
+                   sku_filter: SkuFilter = SkuFilter()) -> BulkEditPlan:
+    """
+    targets 프로파일들의 직접 지정 단가 중 sku_filter 에 맞는 단가의 조정 내용을 계산합니다. (프로파일은 바꾸지 않음)
+    profiles 는 전체 프로파일 목록으로, item_prices 공유 여부를 판단하는 데 씁니다.
+    """
+    plan = BulkEditPlan(adjustment, sku_filter)
+    members: Dict[int, List[PriceProfile]] = {}
+    for profile in profiles:
+        members.setdefault(id(profile.item_prices), []).append(profile)
+    target_groups: Dict[int, List[PriceProfile]] = {}
+    for profile in targets:
+        target_groups.setdefault(id(profile.item_prices), []).append(profile)
+
+    adjusted: Dict[Decimal, Decimal] = {}  # 현재 단가 -> 조정 단가 (모든 묶음에서 공유)
+    for group_id, group_targets in target_groups.items():
+        prices = group_targets[0].item_prices
+        changes: Dict[ProfileItemKey, PriceChange] = {}
+        for key in sku_filter.matching_keys(prices.keys()):
+            price = prices[key]
+            if price is None or not sku_filter.price_in_range(price):
+                continue
+            new_price = adjusted.get(price)
+            if new_price is None:
+                new_price = adjusted[price] = adjustment.apply(price)
+            if new_price != price:
+                changes[key] = (price, new_price)
+        if changes:
+            shared_whole = len(group_targets) == len(members.get(group_id, group_targets))
+            plan.groups.append(BulkEditGroup(group_targets, changes, shared_whole))
+    return plan
+
+
+def apply_bulk_edit(plan: BulkEditPlan) -> List[Tuple[PriceProfile, ProfileItemKey, Optional[str]]]:
+    """
+    계획한 조정을 프로파일에 반영하고 (프로파일, 품목 키, 변경 전 snapshot_own_value) 목록을 반환합니다.
+    (PriceHistory.record_profile_prices 에 그대로 넘길 수 있음)
+    """
+    changes = []
+    for group in plan.groups:
+        if not group.changes:
+            continue
+        first = group.profiles[0]
+        before = {key: price_history.snapshot_own_value(first, key) for key in group.changes}
+        new_prices = {key: new for key, (_, new) in group.changes.items()}
+        if group.shared_whole:
+            first.item_prices.update(new_prices)
+        else:
+            for profile in group.profiles:
+                profile.set_prices(new_prices)
+        for profile in group.profiles:
+            changes.extend((profile, key, value) for key, value in before.items())
+    return changes
+
+
+if __name__ == '__main__':
+    sku.set_registry(sku.SkuRegistry())  # 사용자 데이터 폴더의 레지스트리를 건드리지 않음
+    plate, screw, cable = (sku.id_for(key) for key in
+                           [("M1", "Locking Plate", "5H"), ("M2", "Cortex Screw", "3.5x20"), ("M3", "Cable", "1.0")])
+    shared = {plate: Decimal("100000"), screw: Decimal("12345"), cable: None}
+    a = PriceProfile("A", item_prices=shared, shared_prices=True)
+    b = PriceProfile("B", item_prices=shared, shared_prices=True)
+    c = PriceProfile("C", item_prices={plate: Decimal("90000")})
+    everyone = [a, b, c]
+
+    # 묶음 전체 대상: 공유 dict 를 그대로 수정하고 한 번만 계산
+    plan = plan_bulk_edit(everyone, [a, b, c], BulkAdjustment(percent=Decimal("5"), round_unit=Decimal("100")))
+    assert plan.change_count == 5 and len(plan.groups) == 2, plan.summary()
+    assert plan.groups[0].changes[screw] == (Decimal("12345"), Decimal("13000"))
+    history = apply_bulk_edit(plan)
+    assert len(history) == 5 and a.item_prices is b.item_prices
+    assert a.get_price(plate) == Decimal("105000") and c.get_price(plate) == Decimal("94500")
+    assert a.get_price(cable) is None and cable in a.item_prices  # 삭제 표시는 그대로
+
+    # 일부만 대상 + 검색어 필터 + 금액 조정: 대상 프로파일만 복사해서 수정
+    plan = plan_bulk_edit(everyone, [a], BulkAdjustment(amount=Decimal("-500")), SkuFilter("plate"))
+    assert plan.preview_rows() == [("A", plate, Decimal("105000"), Decimal("104500"))]
+    apply_bulk_edit(plan)
+    assert a.get_price(plate) == Decimal("104500") and b.get_price(plate) == Decimal("105000")
+    assert a.item_prices is not b.item_prices
+
+    # 단가 범위 밖이면 제외
+    assert not plan_bulk_edit(everyone, [c], BulkAdjustment(percent=Decimal("10")), SkuFilter(max_price=Decimal("1000")))
+    print("bulk_edit 테스트 완료.")
@@ -0,0 +1,124 @@
+from typing import TYPE_CHECKING, Dict, Iterable, List, Optional, Set, Tuple
+
+from models import Item
+
+if TYPE_CHECKING:
+    from master_diff import MasterDiff
+
+# 검색 대상 필드(LOT, 모델명, 제품명, 규격)를 이어 붙일 때 쓰는 구분자.
+# 검색어에 들어갈 수 없는 문자이므로 필드 경계를 넘는 오탐이 생기지 않습니다.
+_FIELD_SEPARATOR = "\x00"
+
+# 명세서 탭 품목 리스트에서 같은 품목으로 취급하는 키 (SKU ID, 치료재료코드, UDI-DI)
+# 카탈로그를 만들 때 정수 묶음 ID로 바꿔 두므로 검색할 때는 정수만 비교합니다.
+RepresentativeKey = Tuple[int, str, Optional[int]]
+
+
+def _search_haystack(item: Item) -> str:
+    return _FIELD_SEPARATOR.join((item.lot, item.model_name, item.product_name, item.spec)).lower()
+
+
+def split_search_terms(search_text: str) -> List[str]:
+    """검색 문자열을 소문자 검색어 리스트로 분리합니다."""
+    return [term for term in search_text.lower().split() if term]
+
+
+class ProductCatalog:
+    """
+    제품 마스터 품목 리스트와 조회/검색용 인덱스.
+    검색할 때마다 품목별로 필드를 lower() 하지 않도록, 검색 문자열을 미리 만들어 둡니다.
+    """
+
+    def __init__(self, items: List[Item]):
+        self.items = items
+        self._haystacks = [_search_haystack(item) for item in items]
+        self._group_index: Dict[RepresentativeKey, int] = {}
+        self._group_ids = [self._group_id(item) for item in items]
+        self.items_by_lot: Dict[str, Item] = {}
+        # SKU ID -> 마스터 순서상 첫 번째 품목
+        self.items_by_sku: Dict[int, Item] = {}
+        self._index_lookups(items)
+
+    def _group_id(self, item: Item) -> int:
+        key = (item.sku_id, item.treatment_code, item.udi_di)
+        group_id = self._group_index.get(key)
+        if group_id is None:
+            group_id = self._group_index[key] = len(self._group_index)
+        return group_id
+
+    def _index_lookups(self, items: Iterable[Item], lots: Optional[Set[str]] = None,
+                       sku_ids: Optional[Set[int]] = None):
+        """LOT/SKU 조회 사전을 채웁니다. lots/sku_ids 를 주면 그 항목만 다시 계산합니다."""
+        for item in items:
+            if lots is None or item.lot in lots:
+                self.items_by_lot.setdefault(item.lot, item)
+            if sku_ids is None or item.sku_id in sku_ids:
+                self.items_by_sku.setdefault(item.sku_id, item)
+
+    def apply_diff(self, diff: "MasterDiff"):
+        """
+        마스터 변경분만 반영합니다. 검색 문자열은 추가/변경된 품목만 새로 만들고,
+        조회 사전은 바뀐 품목의 LOT와 품목 키만 다시 계산합니다.
+        """
+        kept = {id(item): (hay, group_id) for item, hay, group_id in zip(self.items, self._haystacks, self._group_ids)}
+        self._haystacks, self._group_ids = [], []
+        for item in diff.items:
+            hay, group_id = kept.get(id(item)) or (_search_haystack(item), self._group_id(item))
+            self._haystacks.append(hay)
+            self._group_ids.append(group_id)
+        self.items = diff.items
+        if diff.reordered:
+            self.items_by_lot.clear()
+            self.items_by_sku.clear()
+            self._index_lookups(self.items)
+            return
+        touched = diff.touched
+        lots = {item.lot for item in touched}
+        sku_ids = {item.sku_id for item in touched}
+        for lot in lots:
+            self.items_by_lot.pop(lot, None)
+        for sku_id in sku_ids:
+            self.items_by_sku.pop(sku_id, None)
+        if lots:
+            self._index_lookups(self.items, lots, sku_ids)
+
+    def __len__(self):
+        return len(self.items)
+
+    def matches_phrase(self, item: Item, search_text: str) -> bool:
+        """search_phrase() 와 같은 기준으로 한 품목이 검색 문자열에 해당하는지"""
+        return not search_text or search_text.lower() in _search_haystack(item)
+
+    def search_any_term(self, search_text: str) -> List[Item]:
+        """검색어(공백 구분) 중 하나라도 LOT/모델명/제품명/규격에 포함된 품목 (명세서 탭 검색)"""
+        terms = split_search_terms(search_text)
+        if not terms:
+            return list(self.items)
+        return [item for item, hay in zip(self.items, self._haystacks) if any(term in hay for term in terms)]
+
+    def search_phrase(self, search_text: str) -> List[Item]:
+        """검색 문자열 전체가 LOT/모델명/제품명/규격 중 하나에 포함된 품목 (제품 마스터 조회 탭 검색)"""
+        phrase = search_text.lower()
+        if not phrase:
+            return list(self.items)
+        return [item for item, hay in zip(self.items, self._haystacks) if phrase in hay]
+
+    def representative_items(self, search_text: str) -> List[Item]:
+        """
+        검색 결과를 (SKU, 치료재료코드, UDI-DI) 기준으로 묶어
+        각 묶음의 첫 번째 품목만 반환합니다. (LOT만 다른 동일 품목을 한 줄로 표시)
+        """
+        terms = split_search_terms(search_text)
+        seen: Set[int] = set()
+        representatives = []
+        for item, hay, group_id in zip(self.items, self._haystacks, self._group_ids):
+            if group_id in seen or (terms and not any(term in hay for term in terms)):
+                continue
+            seen.add(group_id)
+            representatives.append(item)
+        return representatives
+
+    def group_items(self, representative: Item) -> List[Item]:
+        """대표 품목과 같은 묶음(LOT만 다른 품목)의 모든 품목 (마스터 순서)"""
+        group_id = self._group_index.get((representative.sku_id, representative.treatment_code, representative.udi_di))
+        return [item for item, item_group in zip(self.items, self._group_ids) if item_group == group_id]
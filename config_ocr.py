@@ -1,8 +1,11 @@
 # config_ocr.py - OCR 설정 관리
 import json
+import logging
 import os
 from typing import Dict, Any, Optional
 
+logger = logging.getLogger(__name__)
+
 class OCRConfig:
     """OCR 설정 관리 클래스"""
     
@@ -36,7 +39,7 @@ class OCRConfig:
                 config.update(loaded_config)
                 return config
             except Exception as e:
-                print(f"설정 파일 로드 실패: {e}. 기본 설정을 사용합니다.")
+                logger.error(f"설정 파일 로드 실패: {e}. 기본 설정을 사용합니다.")
         
         return self.DEFAULT_CONFIG.copy()
     
@@ -46,7 +49,7 @@ class OCRConfig:
             with open(self.config_file, 'w', encoding='utf-8') as f:
                 json.dump(self.config, f, indent=4, ensure_ascii=False)
         except Exception as e:
-            print(f"설정 파일 저장 실패: {e}")
+            logger.error(f"설정 파일 저장 실패: {e}")
     
     def get(self, key: str, default: Any = None) -> Any:
         """설정값 가져오기"""
@@ -79,6 +82,6 @@ class OCRConfig:
             try:
                 import pytesseract
                 pytesseract.pytesseract.tesseract_cmd = tesseract_path
-                print(f"Tesseract 경로 설정됨: {tesseract_path}")
+                logger.info(f"Tesseract 경로 설정됨: {tesseract_path}")
             except ImportError:
-                print("pytesseract를 먼저 설치해주세요.")
\ No newline at end of file
+                logger.warning("pytesseract를 먼저 설치해주세요.")
\ No newline at end of file
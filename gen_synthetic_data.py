@@ -0,0 +1,330 @@
+# gen_synthetic_data.py - 대용량 합성 데이터셋 생성기
+"""
+실제 데이터 파일과 동일한 스키마의 합성 데이터를 생성합니다. (고객 데이터 없이 확장성 테스트용)
+
+생성 파일 (--out 디렉토리):
+  - item_data.json              제품 마스터 (시트명/한글 컬럼명/공백 포함 매입단가 키/NaN 셀/float UDI-DI)
+  - prices_for_companies.json   가격 프로파일 ([{"id", "name", "item_prices": {"모델명|제품명|규격": "123.0"}}])
+  - data.json                   거래처 목록 (storage.save_companies 형식)
+  - 업체별_금액.json             transform_prices.py 원본 형식 (--transform-source 지정 시)
+
+생성된 파일은 storage 함수로 그대로 로드됩니다:
+  - storage.load_product_master("<out>/item_data.json")
+  - prices_for_companies.json / data.json 은 사용자 데이터 폴더(~/.LohasInvoiceTool)에 복사하면
+    load_price_profiles / load_companies 가 읽습니다. (--verify 로 임시 홈에서 로드 확인)
+
+사용 예:
+    python gen_synthetic_data.py --items 100000 --profiles 5000 --companies 2000 --seed 42 --out synthetic_data
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+import uuid
+from typing import Any, Dict, List, Optional, Tuple
+
+MASTER_SHEET_NAME = "코딩데이터용(2024.01.04)"
+QUANTITY_SHEET_NAME = "수량입력 코딩데이터용(2024.01.15)"
+TAG_SHEET_NAME = "분류 및  테그"
+PURCHASE_PRICE_KEY = "매입단가                  (VAT 포함)"  # 원본 엑셀에서 넘어온 공백 포함 키
+PRICE_TIER_NAMES = ["PURCHASE", "A", "B", "DEALER", "MEDICAL"]
+
+PRODUCT_FAMILIES = [
+    ("Radius", "Locking Distal Radius Plate CA Type", "BR"),
+    ("Radius", "Locking Volar Radius Plate", "VR"),
+    ("Clavicle", "Locking Clavicle Hook Plate", "CH"),
+    ("Clavicle", "Locking Superior Clavicle Plate", "SC"),
+    ("Humerus", "Locking Proximal Humerus Plate", "PH"),
+    ("Tibia", "Locking Proximal Tibia Plate", "PT"),
+    ("Tibia", "Locking Distal Medial Tibia Plate", "DT"),
+    ("Femur", "Locking Distal Femur Plate", "DF"),
+    ("Screw", "Cortical Screw", "CS"),
+    ("Screw", "Locking Screw", "LS"),
+    ("Screw", "Cannulated Screw", "CN"),
+    ("Pin", "K-Wire", "KW"),
+]
+
+# 실제 마스터 파일의 비율 (854행 중 72행이 빈 행, 782개 품목에 694개 SKU)
+BLANK_ROW_RATIO = 0.085
+EXTRA_LOT_RATIO = 0.13
+MISSING_MEDICAL_PRICE_RATIO = 0.002
+
+
+def _nan() -> float:
+    return float("nan")
+
+
+def _round_price(value: float, unit: int = 100) -> float:
+    return float(int(round(value / unit)) * unit)
+
+
+def generate_skus(count: int, rng: random.Random) -> List[Dict[str, Any]]:
+    """(모델명, 제품명, 규격)이 서로 다른 SKU 정의와 등급별 단가를 생성합니다."""
+    skus = []
+    for i in range(count):
+        category, product_name, tag_prefix = PRODUCT_FAMILIES[i % len(PRODUCT_FAMILIES)]
+        holes = 2 + (i // len(PRODUCT_FAMILIES)) % 20
+        side = "Right" if i % 2 == 0 else "Left"
+        tag = f"{tag_prefix}-{holes}{'A' if side == 'Right' else 'B'}"
+        purchase = _round_price(rng.uniform(20000, 400000))
+        price_a = _round_price(purchase * rng.uniform(1.2, 1.4))
+        price_b = _round_price(price_a * rng.uniform(1.2, 1.4))
+        dealer = _round_price(price_b * rng.uniform(1.1, 1.2))
+        medical = _round_price(dealer * rng.uniform(1.8, 2.4), 10)
+        skus.append({
+            "category": category,
+            "tag": tag,
+            "model_name": f"{1021 + i // 10000}-{14000 + i % 10000:05d}{'A' if side == 'Right' else 'B'}",
+            "product_name": product_name,
+            "spec": f"{side}/{holes}H({tag})",
+            "treatment_code": f"C{5400000 + i:07d}",
+            "udi_di": float(8809450000000 + i * 7),
+            "prices": {"PURCHASE": purchase, "A": price_a, "B": price_b, "DEALER": dealer, "MEDICAL": medical},
+        })
+    return skus
+
+
+def _blank_master_row(quantity: Optional[float]) -> Dict[str, Any]:
+    """실제 파일 끝부분의 합계/빈 행과 같은 형태 (문자열 컬럼은 null, 숫자 컬럼은 NaN)"""
+    return {
+        "번호": None, "LOT": None, "코딩번호": _nan(), "모델명": None, "납품수량": quantity,
+        "제품명": None, "규격": None, "치료재료코드": None, PURCHASE_PRICE_KEY: _nan(),
+        "A단가": _nan(), "B단가": _nan(), "일반대리점가": _nan(), "치료재료단가": _nan(),
+        "UDI-DI(필수입력)": _nan(),
+    }
+
+
+def generate_master_rows(skus: List[Dict[str, Any]], item_count: int, rng: random.Random) -> List[Dict[str, Any]]:
+    """item_count개의 품목(LOT) 행과 빈 행을 섞어 마스터 시트 행을 생성합니다."""
+    rows: List[Dict[str, Any]] = []
+    row_number = 0
+    for i in range(item_count):
+        sku = skus[i % len(skus)]
+        row_number += 1
+        medical = _nan() if rng.random() < MISSING_MEDICAL_PRICE_RATIO else sku["prices"]["MEDICAL"]
+        rows.append({
+            "번호": row_number,
+            "LOT": f"{chr(65 + i % 26)}{chr(65 + (i // 26) % 26)}{chr(65 + (i // 676) % 26)}{i:05d}",
+            "코딩번호": float(row_number) if rng.random() < 0.1 else _nan(),
+            "모델명": sku["model_name"],
+            "납품수량": float(rng.choice([10, 20, 30, 50, 100])),
+            "제품명": sku["product_name"],
+            "규격": sku["spec"],
+            "치료재료코드": sku["treatment_code"],
+            PURCHASE_PRICE_KEY: sku["prices"]["PURCHASE"],
+            "A단가": sku["prices"]["A"],
+            "B단가": sku["prices"]["B"],
+            "일반대리점가": sku["prices"]["DEALER"],
+            "치료재료단가": medical,
+            "UDI-DI(필수입력)": sku["udi_di"],
+        })
+        if rng.random() < BLANK_ROW_RATIO:
+            rows.append(_blank_master_row(None))
+    rows.append(_blank_master_row(float(sum(r["납품수량"] for r in rows if r["납품수량"]))))  # 합계 행
+    return rows
+
+
+def generate_product_master(item_count: int, rng: random.Random) -> Tuple[Dict[str, List[Dict[str, Any]]], List[Dict[str, Any]]]:
+    """item_data.json 과 동일한 시트 구조의 제품 마스터와 SKU 목록을 반환합니다."""
+    sku_count = max(1, int(item_count / (1 + EXTRA_LOT_RATIO)))
+    skus = generate_skus(sku_count, rng)
+    master_rows = generate_master_rows(skus, item_count, rng)
+
+    quantity_rows = []
+    for row in master_rows:
+        if row["LOT"] is None:
+            continue
+        quantity_row = dict(row)
+        quantity_row["번호"] = float(row["번호"])
+        quantity_row = {k: quantity_row[k] for k in list(quantity_row)[:9]}
+        quantity_row.update({"0.1": row[PURCHASE_PRICE_KEY], "5550000.000000002": 0.0})
+        quantity_row.update({k: row[k] for k in ["A단가", "B단가", "일반대리점가", "치료재료단가", "UDI-DI(필수입력)"]})
+        quantity_rows.append(quantity_row)
+
+    tag_rows = []
+    for number, sku in enumerate(skus, start=1):
+        tag_rows.append({
+            "번호": number, "분류": sku["category"], "테그": sku["tag"], "모델명": sku["model_name"],
+            "제품명": sku["product_name"], "규격": sku["spec"], "치료재료코드": sku["treatment_code"],
+            "치료재료단가": int(sku["prices"]["MEDICAL"]), "UDI-DI(필수입력)": int(sku["udi_di"]),
+            "품목허가번호": "제허 09-978 호", "품목명(필수입력)": "골절합용판", "등급": 3, "허가번호": "제허09-978호",
+        })
+
+    return {MASTER_SHEET_NAME: master_rows, QUANTITY_SHEET_NAME: quantity_rows, TAG_SHEET_NAME: tag_rows}, skus
+
+
+def _sku_key(sku: Dict[str, Any]) -> str:
+    return f"{sku['model_name']}|{sku['product_name']}|{sku['spec']}"
+
+
+def generate_price_maps(skus: List[Dict[str, Any]], map_count: int, coverage: float,
+                        rng: random.Random) -> List[Tuple[Dict[str, str], Dict[str, str]]]:
+    """
+    서로 다른 가격표 map_count개를 생성합니다. 각 가격표는 (업체별 원본 가격, 0.0으로 채운 전체 가격) 쌍입니다.
+    실제 데이터처럼 업체 원본 가격은 SKU 일부만 덮고, 나머지는 transform_prices.py 처럼 "0.0"으로 채웁니다.
+    """
+    price_maps = []
+    for _ in range(map_count):
+        base_tier = rng.choice(["A", "B", "DEALER"])
+        discount = rng.uniform(0.85, 1.05)
+        sparse: Dict[str, str] = {}
+        for sku in skus:
+            if rng.random() < coverage:
+                sparse[_sku_key(sku)] = str(_round_price(sku["prices"][base_tier] * discount))
+        dense = {_sku_key(sku): sparse.get(_sku_key(sku), "0.0") for sku in skus}
+        price_maps.append((sparse, dense))
+    return price_maps
+
+
+def generate_profile_names(count: int) -> List[str]:
+    return [f"합성거래처{i + 1:05d}" for i in range(count)]
+
+
+def generate_price_profiles(names: List[str], price_maps: List[Tuple[Dict[str, str], Dict[str, str]]],
+                            rng: random.Random) -> List[Dict[str, Any]]:
+    """prices_for_companies.json 형식의 프로파일 목록. 실제 데이터처럼 여러 업체가 같은 가격표를 공유합니다."""
+    return [{"id": str(uuid.UUID(int=rng.getrandbits(128), version=4)), "name": name,
+             "item_prices": price_maps[i % len(price_maps)][1]}
+            for i, name in enumerate(names)]
+
+
+def generate_transform_source(names: List[str], price_maps: List[Tuple[Dict[str, str], Dict[str, str]]],
+                              group_size: int = 2) -> Dict[str, List[Dict[str, Any]]]:
+    """transform_prices.py 원본(업체별_금액.json) 형식: {"업체1/업체2": [{"모델명", "제품명", "규격", "price"}]}"""
+    source = {}
+    for start in range(0, len(names), group_size):
+        group = names[start:start + group_size]
+        sparse = price_maps[(start // group_size) % len(price_maps)][0]
+        rows = []
+        for key, price in sparse.items():
+            model_name, product_name, spec = key.split("|")
+            rows.append({"모델명": model_name, "제품명": product_name, "규격": spec, "price": float(price)})
+        source["/".join(group)] = rows
+    return source
+
+
+def generate_companies(count: int, profiles: List[Dict[str, Any]], profile_ratio: float,
+                       rng: random.Random) -> List[Dict[str, Any]]:
+    """data.json 형식 (storage._company_to_dict 와 같은 키)의 거래처 목록"""
+    companies = []
+    for i in range(count):
+        profile_id = None
+        if profiles and rng.random() < profile_ratio:
+            profile_id = profiles[i % len(profiles)]["id"]
+        companies.append({
+            "id": str(uuid.UUID(int=rng.getrandbits(128), version=4)),
+            "name": f"합성병원{i + 1:05d}",
+            "price_tier": rng.choice(PRICE_TIER_NAMES),
+            "contact": f"02-{rng.randint(100, 999)}-{rng.randint(1000, 9999)}",
+            "custom_price_profile_id": profile_id,
+        })
+    return companies
+
+
+def _write_json(path: str, data: Any, indent: Optional[int]):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=indent)  # allow_nan 기본값: NaN 셀을 원본처럼 NaN으로 기록
+
+
+def generate_dataset(out_dir: str, items: int, profiles: int, companies: int, seed: int = 42,
+                     distinct_price_maps: Optional[int] = None, coverage: float = 0.93,
+                     profile_company_ratio: float = 0.5, transform_source: bool = False,
+                     indent: Optional[int] = 2) -> Dict[str, str]:
+    """합성 데이터셋을 out_dir에 생성하고 {종류: 파일 경로}를 반환합니다. 같은 seed는 같은 파일을 만듭니다."""
+    rng = random.Random(seed)
+    os.makedirs(out_dir, exist_ok=True)
+    paths = {}
+
+    master, skus = generate_product_master(items, rng)
+    paths["master"] = os.path.join(out_dir, "item_data.json")
+    _write_json(paths["master"], master, indent)
+
+    # 실제 데이터: 프로파일 33개에 서로 다른 가격표 16개
+    map_count = distinct_price_maps or max(1, (profiles + 1) // 2)
+    price_maps = generate_price_maps(skus, min(map_count, max(profiles, 1)), coverage, rng)
+    names = generate_profile_names(profiles)
+    profile_dicts = generate_price_profiles(names, price_maps, rng)
+    paths["profiles"] = os.path.join(out_dir, "prices_for_companies.json")
+    _write_json(paths["profiles"], profile_dicts, indent)
+
+    paths["companies"] = os.path.join(out_dir, "data.json")
+    _write_json(paths["companies"], generate_companies(companies, profile_dicts, profile_company_ratio, rng), indent)
+
+    if transform_source:
+        paths["transform_source"] = os.path.join(out_dir, "업체별_금액.json")
+        _write_json(paths["transform_source"], generate_transform_source(names, price_maps), indent)
+    return paths
+
+
+def install_to_user_data_dir(paths: Dict[str, str]):
+    """생성한 프로파일/거래처 파일을 storage가 읽는 사용자 데이터 폴더로 복사합니다. (HOME 기준)"""
+    import storage
+    shutil.copyfile(paths["profiles"], storage.get_user_data_path(storage.PRICE_PROFILES_FILE))
+    shutil.copyfile(paths["companies"], storage.get_user_data_path(storage.COMPANY_DATA_FILE))
+
+
+def verify_dataset(paths: Dict[str, str]) -> Dict[str, int]:
+    """임시 홈 디렉토리에서 storage 함수로 생성 파일을 로드해 봅니다."""
+    import contextlib
+    import io
+    import storage
+
+    saved_env = {k: os.environ.get(k) for k in ("HOME", "USERPROFILE")}
+    with tempfile.TemporaryDirectory(prefix="synthetic_verify_") as home:
+        os.environ["HOME"] = os.environ["USERPROFILE"] = home
+        try:
+            install_to_user_data_dir(paths)
+            with contextlib.redirect_stdout(io.StringIO()):
+                counts = {
+                    "product_master_items": len(storage.load_product_master(paths["master"])),
+                    "price_profiles": len(storage.load_price_profiles()),
+                    "companies": len(storage.load_companies()),
+                }
+        finally:
+            for key, value in saved_env.items():
+                if value is None:
+                    os.environ.pop(key, None)
+                else:
+                    os.environ[key] = value
+    return counts
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="실제 스키마와 동일한 대용량 합성 데이터 생성")
+    parser.add_argument("--items", type=int, default=100000, help="제품 마스터 품목(LOT) 수")
+    parser.add_argument("--profiles", type=int, default=5000, help="가격 프로파일 수")
+    parser.add_argument("--companies", type=int, default=1000, help="거래처 수")
+    parser.add_argument("--distinct-price-maps", type=int, default=None,
+                        help="서로 다른 가격표 수 (기본: 프로파일 수의 절반, 나머지는 공유)")
+    parser.add_argument("--coverage", type=float, default=0.93, help="업체 원본 가격이 있는 SKU 비율")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--out", default="synthetic_data", help="출력 디렉토리")
+    parser.add_argument("--transform-source", action="store_true", help="transform_prices.py 원본 파일도 생성")
+    parser.add_argument("--compact", action="store_true", help="들여쓰기 없이 저장 (파일 크기 감소)")
+    parser.add_argument("--verify", action="store_true", help="생성 후 storage 함수로 로드 확인")
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    paths = generate_dataset(args.out, args.items, args.profiles, args.companies, seed=args.seed,
+                             distinct_price_maps=args.distinct_price_maps, coverage=args.coverage,
+                             transform_source=args.transform_source, indent=None if args.compact else 2)
+    print(f"합성 데이터 생성 완료 ({time.perf_counter() - start:.1f}초):")
+    for kind, path in paths.items():
+        print(f"  {kind:<17} {path} ({os.path.getsize(path) / 1024 / 1024:.1f} MB)")
+
+    if args.verify:
+        counts = verify_dataset(paths)
+        print(f"storage 로드 확인: {counts}")
+        if counts["product_master_items"] != args.items or counts["price_profiles"] != args.profiles \
+                or counts["companies"] != args.companies:
+            print("오류: 로드된 개수가 생성한 개수와 다릅니다.")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
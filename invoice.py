@@ -1,4 +1,5 @@
 import datetime
+import logging
 import os
 import platform
 import subprocess
@@ -11,11 +12,17 @@ from openpyxl.utils import get_column_letter
 from openpyxl.worksheet.worksheet import Worksheet
 
 from models import Company, InvoiceLine, Item, PriceTier # Item and PriceTier might be needed for testing or context
+import profiling
 
+logger = logging.getLogger(__name__)
+
+@profiling.traced("invoice.create_invoice_excel")
 def create_invoice_excel(
     company: Company,
     invoice_lines: List[InvoiceLine],
     invoice_date: Optional[datetime.date] = None, # 명세서 발행일 (선택)
+    output_dir: Optional[str] = None, # 저장 폴더 (선택, 기본: 현재 작업 디렉토리)
+    filename_suffix: str = "", # 파일 이름 뒤에 붙일 문자열 (선택, 같은 거래처/날짜 파일 구분용)
     # 추가적인 회사 정보 (공급자 정보 등)는 필요시 인자로 추가 가능
     # supplier_name: str = "Y준 메디컬",
     # supplier_details: Dict[str, str] = None, # 예: {"사업자번호": "123-45-67890", ...}
@@ -28,6 +35,8 @@ def create_invoice_excel(
         company: 공급받는자 회사 객체.
         invoice_lines: 명세서에 포함될 품목 라인 리스트.
         invoice_date: 명세서 발행일. None이면 오늘 날짜 사용.
+        output_dir: 파일을 저장할 폴더. None이면 프로그램 실행 위치(현재 작업 디렉토리).
+        filename_suffix: 'YYYYMMDD_회사명{suffix}_invoice.xlsx' 형식으로 파일 이름에 붙일 문자열.
         # supplier_name: 공급자명.
         # supplier_details: 공급자의 상세 정보 (사업자번호, 주소 등).
 
@@ -214,16 +223,16 @@ def create_invoice_excel(
         safe_company_name = "invoice"
     
     filename_date_str = current_dt.strftime('%Y%m%d')
-    filename = f"{filename_date_str}_{safe_company_name}_invoice.xlsx"
+    filename = f"{filename_date_str}_{safe_company_name}{filename_suffix}_invoice.xlsx"
     
     try:
-        # 프로그램 실행 위치에 저장
-        filepath = os.path.join(os.getcwd(), filename)
+        # 지정된 폴더가 없으면 프로그램 실행 위치에 저장
+        filepath = os.path.join(output_dir or os.getcwd(), filename)
         wb.save(filepath)
-        print(f"거래명세서가 '{filepath}'에 저장되었습니다.")
+        logger.info(f"거래명세서가 '{filepath}'에 저장되었습니다.")
         return filepath
     except Exception as e:
-        print(f"Excel 파일 저장 중 오류 발생: {e}")
+        logger.error(f"Excel 파일 저장 중 오류 발생: {e}")
         return None
 
 def open_file_explorer(filepath: str):
@@ -237,13 +246,13 @@ def open_file_explorer(filepath: str):
             # xdg-open은 보통 디렉토리를 열지만, 파일 자체를 열 수도 있음.
             # 여기서는 파일이 있는 디렉토리를 여는 것이 목적.
             subprocess.run(['xdg-open', os.path.dirname(os.path.normpath(filepath))], check=True)
-        print(f"파일 탐색기에서 '{filepath}' 위치를 열었습니다.")
+        logger.info(f"파일 탐색기에서 '{filepath}' 위치를 열었습니다.")
     except FileNotFoundError: # explorer, open, xdg-open 등이 없을 경우
-        print(f"오류: 파일 탐색기를 실행할 수 없습니다. 해당 명령어가 시스템에 설치되어 있는지 확인하세요.")
+        logger.error(f"파일 탐색기를 실행할 수 없습니다. 해당 명령어가 시스템에 설치되어 있는지 확인하세요.")
     except subprocess.CalledProcessError as e:
-        print(f"파일 탐색기 실행 중 오류 발생: {e}")
+        logger.error(f"파일 탐색기 실행 중 오류 발생: {e}")
     except Exception as e: # 기타 예외
-        print(f"파일 탐색기 열기 중 예기치 않은 오류 발생: {e}")
+        logger.error(f"파일 탐색기 열기 중 예기치 않은 오류 발생: {e}")
 
 
 if __name__ == '__main__':
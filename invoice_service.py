@@ -0,0 +1,571 @@
+# invoice_service.py - 거래명세서 작성/단가 조회용 로컬 HTTP(JSON) 서비스
+"""
+Tk GUI 없이 단가 조회와 거래명세서 작성 로직을 재사용할 수 있도록 하는 asyncio 기반 로컬 서비스.
+storage 데이터는 시작 시 한 번 로드하여 메모리에 유지하며, Excel 렌더링은 워커 풀에서 실행합니다.
+
+엔드포인트 (금액은 모두 문자열로 표현된 10진수):
+    GET  /health                       상태 확인
+    GET  /metrics                      처리량(RPS), 지연시간 백분위수 등
+    GET  /companies                    거래처 목록
+    GET  /items?q=검색어&limit=50       제품 마스터 검색 (LOT, 모델명, 제품명, 규격)
+    GET  /price?company=...&lot=...    거래처별 단가 조회 (lot 반복 지정 가능)
+    POST /invoices                     명세서 라인/합계 계산
+    POST /invoices/excel               명세서 Excel 파일 생성 (invoice.create_invoice_excel)
+    POST /reload                       storage 데이터 다시 로드
+
+명세서 요청 본문 예:
+    {"company": "<거래처 ID 또는 이름>", "date": "2025-06-16",
+     "lines": [{"lot": "BBB44", "qty": 2},
+               {"model_name": "...", "product_name": "...", "spec": "...", "qty": 1}]}
+
+실행: python invoice_service.py --port 8765 --master 데이터파일/item_data.json
+      python invoice_service.py                     # 자체 테스트 (임의 포트에서 서버를 띄워 http.client 로 요청)
+"""
+import argparse
+import asyncio
+import datetime
+import json
+import logging
+import math
+import multiprocessing
+import os
+import sys
+import time
+import uuid
+from collections import deque
+from concurrent.futures import Executor, ProcessPoolExecutor
+from decimal import Decimal
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, quote, urlsplit
+
+import pricing
+import sku
+import storage
+from models import Company, InvoiceLine, Item, PriceProfile
+from app_logging import setup_logging
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+MAX_BODY_BYTES = 1024 * 1024
+LATENCY_WINDOW = 2048     # 백분위수 계산에 사용하는 최근 요청 수
+RPS_WINDOW_SECONDS = 60.0
+
+HTTP_REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+                413: "Payload Too Large", 500: "Internal Server Error"}
+
+
+class HTTPError(Exception):
+    """요청 처리 중 클라이언트에 그대로 전달할 오류"""
+
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+def _default_product_master_path() -> str:
+    """main.App 과 같은 순서로 제품 마스터 파일을 찾습니다."""
+    bundle_dir = storage.get_bundle_dir()
+    candidates = [
+        os.path.join(bundle_dir, "데이터파일", storage.DEFAULT_PRODUCT_MASTER_FILE_BASENAME),
+        os.path.join(bundle_dir, storage.DEFAULT_PRODUCT_MASTER_FILE_BASENAME),
+        os.path.expanduser(f"~/Downloads/{storage.DEFAULT_PRODUCT_MASTER_FILE_BASENAME}"),
+    ]
+    return next((path for path in candidates if os.path.exists(path)), "")
+
+
+def _money(value: Optional[Decimal]) -> Optional[str]:
+    return str(value) if value is not None else None
+
+
+def _item_to_dict(item: Item) -> Dict[str, Any]:
+    return {
+        "lot": item.lot, "model_name": item.model_name, "product_name": item.product_name,
+        "spec": item.spec, "treatment_code": item.treatment_code, "udi_di": item.udi_di,
+        "prices": {k: str(v) for k, v in item.prices.items()},
+    }
+
+
+def _line_to_dict(line: InvoiceLine) -> Dict[str, Any]:
+    return {
+        "lot": line.lot, "model_name": line.model_name, "product_name": line.product_name,
+        "spec": line.spec, "qty": line.qty, "unit_price": _money(line.unit_price),
+        "supply_amount": _money(line.supply_amount), "vat": _money(line.vat),
+        "insurance_price": _money(line.insurance_price), "treatment_code": line.treatment_code,
+        "udi_di": line.udi_di,
+    }
+
+
+def _render_invoice_excel(company: Company, lines: List[InvoiceLine],
+                          invoice_date: datetime.date, output_dir: Optional[str]) -> Optional[str]:
+    """워커 프로세스에서 실행되는 Excel 렌더링 (모듈 수준 함수여야 pickle 가능)"""
+    import invoice
+    # 같은 거래처/날짜의 요청이 동시에 렌더링되어도 서로의 파일을 덮어쓰지 않도록 요청마다 다른 파일 이름 사용
+    return invoice.create_invoice_excel(company=company, invoice_lines=lines, invoice_date=invoice_date,
+                                        output_dir=output_dir, filename_suffix=f"_{uuid.uuid4().hex[:12]}")
+
+
+class ServiceState:
+    """서비스 메모리에 유지되는 storage 데이터와 조회용 인덱스"""
+
+    def __init__(self, companies: List[Company], price_profiles: List[PriceProfile], product_master_items: List[Item]):
+        self.companies = companies
+        self.price_profiles = price_profiles
+        self.product_master_items = product_master_items
+        self.loaded_at = time.time()
+
+        self.companies_by_id = {c.id: c for c in companies}
+        self.companies_by_name = {c.name: c for c in companies}
+        self.profiles_by_id = {p.id: p for p in price_profiles}
+        self.items_by_lot = {item.lot: item for item in product_master_items}
+        # (모델명, 제품명, 규격)이 같은 품목이 여러 LOT에 있으면 App과 같이 LOT 순으로 첫 번째 품목을 사용
+        self.items_by_sku: Dict[int, Item] = {}
+        for item in sorted(product_master_items, key=lambda i: i.lot):
+            self.items_by_sku.setdefault(item.sku_id, item)
+
+    @classmethod
+    def load(cls, product_master_path: str) -> "ServiceState":
+        """storage 함수로 모든 데이터를 로드합니다 (블로킹)."""
+        items = storage.load_product_master(product_master_path) if product_master_path else []
+        return cls(storage.load_companies(), storage.load_price_profiles(), items)
+
+    def find_company(self, ref: Optional[str]) -> Company:
+        if not ref:
+            raise HTTPError(400, "'company' (거래처 ID 또는 이름)가 필요합니다.")
+        company = self.companies_by_id.get(ref) or self.companies_by_name.get(ref)
+        if company is None:
+            raise HTTPError(404, f"거래처를 찾을 수 없습니다: {ref}")
+        return company
+
+    def find_item(self, spec: Dict[str, Any]) -> Item:
+        lot = spec.get("lot")
+        if lot:
+            item = self.items_by_lot.get(str(lot))
+            if item is None:
+                raise HTTPError(404, f"LOT '{lot}' 품목을 찾을 수 없습니다.")
+            return item
+        key = (spec.get("model_name"), spec.get("product_name"), spec.get("spec"))
+        if None in key:
+            raise HTTPError(400, "품목은 'lot' 또는 'model_name'/'product_name'/'spec'으로 지정해야 합니다.")
+        # 요청에 있는 임의 문자열로 레지스트리에 ID를 만들지 않도록 find_id 사용
+        sku_id = sku.get_registry().find_id((str(key[0]), str(key[1]), str(key[2])))
+        item = self.items_by_sku.get(sku_id) if sku_id is not None else None
+        if item is None:
+            raise HTTPError(404, f"품목을 찾을 수 없습니다: {key}")
+        return item
+
+    def price_for(self, company: Company, item: Item) -> Tuple[Optional[Decimal], str]:
+        profile = self.profiles_by_id.get(company.custom_price_profile_id) if company.custom_price_profile_id else None
+        return pricing.resolve_unit_price(item, company, profile)
+
+    def build_invoice_lines(self, company: Company, line_specs: Any) -> List[InvoiceLine]:
+        """요청 본문의 lines를 InvoiceLine 리스트로 변환합니다. 같은 LOT는 수량을 합칩니다."""
+        if not isinstance(line_specs, list) or not line_specs:
+            raise HTTPError(400, "'lines'는 비어 있지 않은 리스트여야 합니다.")
+        lines_by_lot: Dict[str, InvoiceLine] = {}
+        for spec in line_specs:
+            if not isinstance(spec, dict):
+                raise HTTPError(400, f"잘못된 라인 형식: {spec!r}")
+            item = self.find_item(spec)
+            qty = spec.get("qty", 1)
+            # 1.7 -> 1 처럼 잘리거나 true 가 1로 받아들여지지 않도록 JSON 정수만 허용
+            if not isinstance(qty, int) or isinstance(qty, bool):
+                raise HTTPError(400, f"LOT '{item.lot}'의 수량은 정수여야 합니다: {qty!r}")
+            if qty <= 0:
+                raise HTTPError(400, f"LOT '{item.lot}'의 수량은 0보다 커야 합니다.")
+            unit_price, _ = self.price_for(company, item)
+            if unit_price is None:
+                raise HTTPError(400, f"'{item.product_name}' (LOT: {item.lot})에 대한 '{company.name}'의 단가 정보가 없습니다.")
+            if item.lot in lines_by_lot:
+                lines_by_lot[item.lot].qty += qty
+            else:
+                lines_by_lot[item.lot] = InvoiceLine(item=item, qty=qty, unit_price=unit_price)
+        return list(lines_by_lot.values())
+
+
+class ServiceMetrics:
+    """요청 수, 처리량, 지연시간 백분위수 집계"""
+
+    def __init__(self, window: int = LATENCY_WINDOW):
+        self.started = time.monotonic()
+        self.total_requests = 0
+        self.total_errors = 0
+        self.routes: Dict[str, Dict[str, Any]] = {}
+        self._latencies: deque = deque(maxlen=window)          # 초 단위
+        self._recent: deque = deque()                         # 최근 요청 시각 (RPS 계산용)
+
+    def record(self, route: str, status: int, elapsed: float):
+        now = time.monotonic()
+        self.total_requests += 1
+        if status >= 400:
+            self.total_errors += 1
+        self._latencies.append(elapsed)
+        self._recent.append(now)
+        while self._recent and now - self._recent[0] > RPS_WINDOW_SECONDS:
+            self._recent.popleft()
+        stats = self.routes.setdefault(route, {"count": 0, "errors": 0, "total_ms": 0.0, "max_ms": 0.0})
+        stats["count"] += 1
+        stats["errors"] += status >= 400
+        stats["total_ms"] += elapsed * 1000
+        stats["max_ms"] = max(stats["max_ms"], elapsed * 1000)
+
+    @staticmethod
+    def _percentile(sorted_values: List[float], pct: float) -> float:
+        if not sorted_values:
+            return 0.0
+        # nearest-rank 방식
+        index = min(len(sorted_values) - 1, max(0, math.ceil(pct / 100.0 * len(sorted_values)) - 1))
+        return sorted_values[index]
+
+    def snapshot(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        uptime = max(now - self.started, 1e-9)
+        while self._recent and now - self._recent[0] > RPS_WINDOW_SECONDS:
+            self._recent.popleft()
+        latencies_ms = sorted(v * 1000 for v in self._latencies)
+        return {
+            "uptime_seconds": round(uptime, 3),
+            "requests_total": self.total_requests,
+            "errors_total": self.total_errors,
+            "rps_overall": round(self.total_requests / uptime, 3),
+            "rps_last_minute": round(len(self._recent) / min(uptime, RPS_WINDOW_SECONDS), 3),
+            "latency_ms": {
+                "samples": len(latencies_ms),
+                "p50": round(self._percentile(latencies_ms, 50), 3),
+                "p90": round(self._percentile(latencies_ms, 90), 3),
+                "p99": round(self._percentile(latencies_ms, 99), 3),
+                "max": round(latencies_ms[-1], 3) if latencies_ms else 0.0,
+            },
+            "routes": {
+                route: {"count": s["count"], "errors": s["errors"],
+                        "avg_ms": round(s["total_ms"] / s["count"], 3), "max_ms": round(s["max_ms"], 3)}
+                for route, s in sorted(self.routes.items())
+            },
+        }
+
+
+class InvoiceService:
+    """asyncio 기반의 최소 HTTP/1.1 서버. 요청/응답 본문은 JSON입니다."""
+
+    def __init__(self, state: ServiceState, product_master_path: str = "",
+                 executor: Optional[Executor] = None, output_dir: Optional[str] = None):
+        self.state = state
+        self.product_master_path = product_master_path
+        self.executor = executor       # None이면 asyncio 기본 스레드 풀 사용
+        self.output_dir = output_dir
+        self.metrics = ServiceMetrics()
+        self.server: Optional[asyncio.AbstractServer] = None
+        self.routes = {
+            ("GET", "/health"): self._handle_health,
+            ("GET", "/metrics"): self._handle_metrics,
+            ("GET", "/companies"): self._handle_companies,
+            ("GET", "/items"): self._handle_items,
+            ("GET", "/price"): self._handle_price,
+            ("POST", "/invoices"): self._handle_build_invoice,
+            ("POST", "/invoices/excel"): self._handle_render_invoice,
+            ("POST", "/reload"): self._handle_reload,
+        }
+
+    async def start(self, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT) -> Tuple[str, int]:
+        self.server = await asyncio.start_server(self._handle_connection, host, port)
+        bound_host, bound_port = self.server.sockets[0].getsockname()[:2]
+        return bound_host, bound_port
+
+    async def serve_forever(self):
+        assert self.server is not None
+        async with self.server:
+            await self.server.serve_forever()
+
+    # --- HTTP 처리 ---
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                parts = request_line.decode("latin-1").split()
+                if len(parts) != 3:
+                    await self._write_response(writer, 400, {"error": "잘못된 요청 라인"}, keep_alive=False)
+                    break
+                method, target, version = parts
+                headers: Dict[str, str] = {}
+                while True:
+                    header_line = await reader.readline()
+                    if header_line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = header_line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+
+                start = time.perf_counter()
+                try:
+                    length = int(headers.get("content-length", "0") or 0)
+                except ValueError:
+                    length = -1
+                if length < 0:
+                    await self._write_response(writer, 400, {"error": "잘못된 Content-Length"}, keep_alive=False)
+                    self.metrics.record("(bad request)", 400, time.perf_counter() - start)
+                    break
+                if length > MAX_BODY_BYTES:
+                    await self._write_response(writer, 413, {"error": "요청 본문이 너무 큽니다."}, keep_alive=False)
+                    self.metrics.record("(too large)", 413, time.perf_counter() - start)
+                    break
+                body = await reader.readexactly(length) if length else b""
+
+                status, payload, route = await self._dispatch(method, target, body)
+                keep_alive = version == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+                await self._write_response(writer, status, payload, keep_alive)
+                self.metrics.record(route, status, time.perf_counter() - start)
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def _dispatch(self, method: str, target: str, body: bytes) -> Tuple[int, Dict[str, Any], str]:
+        url = urlsplit(target)
+        route = f"{method} {url.path}"
+        handler = self.routes.get((method, url.path))
+        if handler is None:
+            if any(path == url.path for _, path in self.routes):
+                return 405, {"error": f"허용되지 않는 메서드: {method}"}, route
+            return 404, {"error": f"알 수 없는 경로: {url.path}"}, "(unknown)"
+        try:
+            query = parse_qs(url.query)
+            data = json.loads(body.decode("utf-8")) if body else {}
+            return 200, await handler(query, data), route
+        except HTTPError as e:
+            return e.status, {"error": e.message}, route
+        except (json.JSONDecodeError, UnicodeDecodeError) as e:
+            return 400, {"error": f"JSON 본문을 해석할 수 없습니다: {e}"}, route
+        except Exception as e:
+            logger.error(f"서비스 요청 처리 중 오류 발생 ({route}): {type(e).__name__}: {e}")
+            return 500, {"error": f"{type(e).__name__}: {e}"}, route
+
+    @staticmethod
+    async def _write_response(writer: asyncio.StreamWriter, status: int, payload: Dict[str, Any], keep_alive: bool):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        head = (f"HTTP/1.1 {status} {HTTP_REASONS.get(status, '')}\r\n"
+                f"Content-Type: application/json; charset=utf-8\r\n"
+                f"Content-Length: {len(body)}\r\n"
+                f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+        writer.write(head.encode("latin-1") + body)
+        await writer.drain()
+
+    # --- 엔드포인트 ---
+
+    async def _handle_health(self, query, data):
+        return {"status": "ok", "items": len(self.state.product_master_items),
+                "companies": len(self.state.companies), "price_profiles": len(self.state.price_profiles),
+                "loaded_at": datetime.datetime.fromtimestamp(self.state.loaded_at).isoformat(timespec="seconds")}
+
+    async def _handle_metrics(self, query, data):
+        return self.metrics.snapshot()
+
+    async def _handle_companies(self, query, data):
+        state = self.state
+        result = []
+        for company in sorted(state.companies, key=lambda c: c.name):
+            profile = state.profiles_by_id.get(company.custom_price_profile_id) if company.custom_price_profile_id else None
+            result.append({"id": company.id, "name": company.name, "price_tier": company.price_tier.name,
+                           "contact": company.contact, "custom_price_profile_id": company.custom_price_profile_id,
+                           "custom_price_profile_name": profile.name if profile else None})
+        return {"companies": result}
+
+    async def _handle_items(self, query, data):
+        terms = [t for t in query.get("q", [""])[0].lower().split() if t]
+        try:
+            limit = int(query.get("limit", ["50"])[0])
+        except ValueError:
+            raise HTTPError(400, "'limit'은 정수여야 합니다.")
+        if limit < 1:
+            raise HTTPError(400, "'limit'은 1 이상이어야 합니다.")
+        matches = []
+        for item in self.state.product_master_items:
+            if not terms or any(t in s.lower() for s in (item.lot, item.model_name, item.product_name, item.spec) for t in terms):
+                matches.append(_item_to_dict(item))
+                if len(matches) >= limit:
+                    break
+        return {"items": matches}
+
+    async def _handle_price(self, query, data):
+        company = self.state.find_company(query.get("company", [None])[0])
+        lots = query.get("lot", [])
+        if not lots:
+            single = {k: query.get(k, [None])[0] for k in ("model_name", "product_name", "spec")}
+            specs = [single]
+        else:
+            specs = [{"lot": lot} for lot in lots]
+        results = []
+        for spec in specs:
+            item = self.state.find_item(spec)
+            unit_price, source = self.state.price_for(company, item)
+            results.append({"lot": item.lot, "model_name": item.model_name, "product_name": item.product_name,
+                            "spec": item.spec, "unit_price": _money(unit_price), "price_source": source or None})
+        return {"company": company.name, "items": results}
+
+    def _invoice_request(self, data) -> Tuple[Company, List[InvoiceLine], datetime.date]:
+        if not isinstance(data, dict):
+            raise HTTPError(400, "요청 본문은 JSON 객체여야 합니다.")
+        company = self.state.find_company(data.get("company"))
+        lines = self.state.build_invoice_lines(company, data.get("lines"))
+        date_str = data.get("date")
+        try:
+            invoice_date = datetime.datetime.strptime(date_str, "%Y-%m-%d").date() if date_str else datetime.date.today()
+        except (TypeError, ValueError):
+            raise HTTPError(400, "명세서 날짜 형식이 잘못되었습니다. (YYYY-MM-DD)")
+        return company, lines, invoice_date
+
+    async def _handle_build_invoice(self, query, data):
+        company, lines, invoice_date = self._invoice_request(data)
+        total_supply = sum((line.supply_amount for line in lines), Decimal("0"))
+        total_vat = sum((line.vat for line in lines), Decimal("0"))
+        return {"company": company.name, "date": invoice_date.isoformat(),
+                "lines": [_line_to_dict(line) for line in lines],
+                "total_qty": sum(line.qty for line in lines), "total_supply_amount": str(total_supply),
+                "total_vat": str(total_vat), "grand_total": str(total_supply + total_vat)}
+
+    async def _handle_render_invoice(self, query, data):
+        company, lines, invoice_date = self._invoice_request(data)
+        loop = asyncio.get_running_loop()
+        filepath = await loop.run_in_executor(self.executor, _render_invoice_excel,
+                                              company, lines, invoice_date, self.output_dir)
+        if not filepath:
+            raise HTTPError(500, "거래명세서 생성에 실패했습니다.")
+        return {"path": filepath, "lines": len(lines)}
+
+    async def _handle_reload(self, query, data):
+        loop = asyncio.get_running_loop()
+        # 새 상태를 스레드에서 만든 뒤 한 번에 교체하므로 처리 중인 요청은 이전 상태를 그대로 사용합니다.
+        self.state = await loop.run_in_executor(None, ServiceState.load, self.product_master_path)
+        return await self._handle_health(query, data)
+
+
+async def _run(args):
+    master_path = args.master or _default_product_master_path()
+    if not master_path:
+        logger.warning("제품 마스터 파일을 찾을 수 없습니다. 품목 없이 시작합니다.")
+    state = ServiceState.load(master_path)
+    executor = ProcessPoolExecutor(max_workers=args.workers) if args.workers > 0 else None
+    service = InvoiceService(state, master_path, executor=executor, output_dir=args.output_dir)
+    host, port = await service.start(args.host, args.port)
+    logger.info(f"거래명세서 서비스 실행 중: http://{host}:{port} (품목 {len(state.product_master_items)}개, "
+          f"렌더링 워커 {args.workers or '스레드'})")
+    try:
+        await service.serve_forever()
+    finally:
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="거래명세서 작성/단가 조회 로컬 HTTP 서비스")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help="0이면 임의의 빈 포트 사용")
+    parser.add_argument("--master", default="", help="제품 마스터 JSON 파일 경로")
+    parser.add_argument("--workers", type=int, default=2, help="Excel 렌더링 프로세스 수 (0이면 스레드 풀)")
+    parser.add_argument("--output-dir", default=None, help="생성된 Excel 파일 저장 폴더 (기본: 현재 폴더)")
+    parser.add_argument("--log-level", default=None, help="로그 레벨 (DEBUG, INFO, WARNING...)")
+    args = parser.parse_args()
+    setup_logging(args.log_level)
+    try:
+        asyncio.run(_run(args))
+    except KeyboardInterrupt:
+        logger.info("서비스를 종료합니다.")
+
+
+def _self_test():
+    import http.client
+    import tempfile
+    import threading
+
+    sku.set_registry(sku.SkuRegistry())  # 사용자 데이터 폴더의 레지스트리를 건드리지 않음
+    items = [Item(lot="LOT-A1", model_name="M1", product_name="Locking Plate", spec="5H", treatment_code="T1",
+                  udi_di=None, prices={"price_A": Decimal("1000"), "price_B": Decimal("900")}),
+             Item(lot="LOT-B1", model_name="M2", product_name="Cortex Screw", spec="3.5x20", treatment_code="T2",
+                  udi_di=None, prices={"price_A": Decimal("250")})]
+    profile = PriceProfile(name="특별 단가", item_prices={items[0].sku_id: Decimal("800")})
+    hospital = Company(name="테스트 병원", custom_price_profile_id=profile.id)
+    dealer = Company(name="테스트 대리점")
+    state = ServiceState([hospital, dealer], [profile], items)
+
+    with tempfile.TemporaryDirectory() as output_dir:
+        service = InvoiceService(state, output_dir=output_dir)
+        loop = asyncio.new_event_loop()
+        _, port = loop.run_until_complete(service.start("127.0.0.1", 0))
+        thread = threading.Thread(target=loop.run_forever, daemon=True)
+        thread.start()
+
+        def request(method: str, path: str, body: Any = None) -> Tuple[int, Dict[str, Any]]:
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=10)
+            try:
+                payload = json.dumps(body).encode("utf-8") if body is not None else None
+                conn.request(method, path, body=payload, headers={"Content-Type": "application/json"})
+                response = conn.getresponse()
+                return response.status, json.loads(response.read().decode("utf-8"))
+            finally:
+                conn.close()
+
+        def raw_request(content_length: str) -> int:
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=10)
+            try:
+                conn.putrequest("POST", "/invoices")
+                conn.putheader("Content-Length", content_length)
+                conn.endheaders()
+                return conn.getresponse().status
+            finally:
+                conn.close()
+
+        try:
+            status, health = request("GET", "/health")
+            assert status == 200 and health["status"] == "ok" and health["items"] == 2 and health["companies"] == 2
+
+            status, prices = request("GET", f"/price?company={quote(hospital.name)}&lot=LOT-A1&lot=LOT-B1")
+            assert status == 200
+            assert [(p["unit_price"], p["price_source"]) for p in prices["items"]] == [("800", "특별 단가"), ("250", "A단가")]
+
+            invoice_body = {"company": dealer.id, "date": "2025-06-16",
+                            "lines": [{"lot": "LOT-A1", "qty": 2}, {"lot": "LOT-A1", "qty": 1},
+                                      {"model_name": "M2", "product_name": "Cortex Screw", "spec": "3.5x20", "qty": 4}]}
+            status, built = request("POST", "/invoices", invoice_body)
+            assert status == 200 and [line["qty"] for line in built["lines"]] == [3, 4]
+            assert built["total_supply_amount"] == "4000" and built["total_vat"] == "400" and built["grand_total"] == "4400"
+
+            # 같은 거래처/날짜의 렌더링 두 건은 서로 다른 파일에 저장
+            status, first = request("POST", "/invoices/excel", invoice_body)
+            status2, second = request("POST", "/invoices/excel", invoice_body)
+            assert status == status2 == 200 and first["path"] != second["path"]
+            assert all(os.path.dirname(r["path"]) == output_dir and os.path.exists(r["path"]) for r in (first, second))
+
+            for bad_qty in (1.7, "3", True, 0):
+                status, error = request("POST", "/invoices", {"company": dealer.id, "lines": [{"lot": "LOT-A1", "qty": bad_qty}]})
+                assert status == 400, (bad_qty, status, error)
+            assert request("POST", "/invoices", {"company": dealer.id, "lines": []})[0] == 400
+            assert request("POST", "/invoices", {"company": dealer.id, "date": "16/06/2025",
+                                                 "lines": [{"lot": "LOT-A1"}]})[0] == 400
+            assert request("POST", "/invoices", {"company": "없는 거래처", "lines": [{"lot": "LOT-A1"}]})[0] == 404
+            assert request("GET", "/items?limit=0")[0] == 400 and request("GET", "/items?limit=x")[0] == 400
+            assert len(request("GET", "/items?limit=1")[1]["items"]) == 1
+            assert raw_request("-5") == 400 and raw_request("abc") == 400
+            assert request("GET", "/invoices")[0] == 405 and request("GET", "/nope")[0] == 404
+
+            status, metrics = request("GET", "/metrics")
+            assert status == 200 and metrics["errors_total"] >= 10
+        finally:
+            loop.call_soon_threadsafe(loop.stop)
+            thread.join(timeout=5)
+            service.server.close()
+            loop.run_until_complete(service.server.wait_closed())
+            loop.close()
+    print("invoice_service 테스트 완료.")
+
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support()
+    if len(sys.argv) > 1:
+        main()
+    else:
+        _self_test()
@@ -0,0 +1,285 @@
+"""
+백그라운드 작업 실행기.
+
+Excel 생성, 제품 마스터 로드, 데이터 저장처럼 오래 걸리는 작업을 스레드 풀에서 실행하고, 결과는 메인 스레드에서
+widget.after() 로 결과 큐를 확인하여 완료 콜백(on_done/on_error)으로 전달합니다. 작업 함수는 Tk 위젯에 접근하면
+안 되며, 필요한 데이터는 제출 시점에 메인 스레드에서 복사(스냅샷)해서 넘겨야 합니다.
+
+작업 함수 안에서는 report_progress() 로 진행 상황을 알리고 check_cancelled() 로 취소 요청을 확인할 수 있습니다.
+같은 key 의 작업은 한 번에 하나씩 실행되며, 실행 중에 다시 제출하면 마지막 것 하나만 대기합니다. (연속 저장 합치기)
+"""
+import concurrent.futures
+import logging
+import queue
+import threading
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+RESULT_POLL_MS = 50  # 작업 결과/진행 상황 확인 주기
+DEFAULT_MAX_WORKERS = 2
+
+_current = threading.local()  # 작업 스레드에서 실행 중인 Job
+
+
+class JobCancelled(Exception):
+    """작업 함수가 취소 요청을 확인하고 중단할 때 발생합니다."""
+
+
+class Job:
+    """제출된 작업 하나. 상태(progress/message)는 메인 스레드에서만 읽습니다."""
+
+    def __init__(self, name: str, fn: Callable, args: tuple, key: Optional[str], cancellable: bool,
+                 on_done: Optional[Callable[[Any], None]], on_error: Optional[Callable[[BaseException], None]]):
+        self.name = name
+        self.fn = fn
+        self.args = args
+        self.key = key
+        self.cancellable = cancellable
+        self.on_done = on_done
+        self.on_error = on_error
+        self.progress: Optional[float] = None  # 0.0~1.0, None이면 진행률을 알 수 없음
+        self.message = ""
+        self._cancel_event = threading.Event()
+        self._future: Optional[concurrent.futures.Future] = None
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancel_event.is_set()
+
+    def __repr__(self):
+        return f"<Job {self.name!r} key={self.key!r}{' cancelled' if self.cancelled else ''}>"
+
+
+def current_job() -> Optional[Job]:
+    """현재 스레드에서 실행 중인 작업 (작업 스레드가 아니면 None)"""
+    return getattr(_current, "job", None)
+
+
+def report_progress(fraction: Optional[float] = None, message: str = ""):
+    """작업 함수 안에서 진행 상황을 알립니다. 작업 밖에서 호출하면 아무것도 하지 않습니다."""
+    job = current_job()
+    if job is not None:
+        _current.runner._results.put(("progress", job, fraction, message))
+
+
+def check_cancelled():
+    """작업 함수 안에서 취소 요청이 있었으면 JobCancelled 를 발생시킵니다."""
+    job = current_job()
+    if job is not None and job.cancelled:
+        raise JobCancelled()
+
+
+class JobRunner:
+    """
+    스레드 풀 기반 작업 실행기. submit()/cancel()/shutdown() 은 메인 스레드에서 호출해야 합니다.
+    on_change(active_jobs) 는 작업이 시작/종료되거나 진행 상황이 바뀔 때 메인 스레드에서 호출됩니다. (상태 표시줄 갱신용)
+    """
+
+    def __init__(self, widget, max_workers: int = DEFAULT_MAX_WORKERS,
+                 on_change: Optional[Callable[[List[Job]], None]] = None):
+        self.widget = widget
+        self.on_change = on_change
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="JobRunner")
+        self._results: "queue.Queue" = queue.Queue()
+        self._active: List[Job] = []  # 제출 후 아직 끝나지 않은 작업 (제출 순서)
+        self._running_by_key: Dict[str, Job] = {}
+        self._waiting_by_key: Dict[str, Job] = {}
+        self._after_id = None
+        self._closed = False
+
+    @property
+    def active_jobs(self) -> List[Job]:
+        return list(self._active)
+
+    def is_active(self, key: str) -> bool:
+        return key in self._running_by_key or key in self._waiting_by_key
+
+    def submit(self, name: str, fn: Callable, *args, key: Optional[str] = None, supersede: bool = False,
+               cancellable: bool = True, on_done: Optional[Callable[[Any], None]] = None,
+               on_error: Optional[Callable[[BaseException], None]] = None) -> Job:
+        """
+        fn(*args) 를 백그라운드에서 실행합니다.
+        key 가 같은 작업이 실행 중이면 끝난 뒤에 실행하고, 이미 대기 중인 작업은 이 작업으로 대체합니다.
+        supersede=True 이면 실행 중인 같은 key 작업에 취소도 요청합니다. (결과가 더는 필요 없는 로드 등)
+        """
+        if self._closed:
+            raise RuntimeError("JobRunner is shut down")
+        job = Job(name, fn, args, key, cancellable, on_done, on_error)
+        self._active.append(job)
+        running = self._running_by_key.get(key) if key is not None else None
+        if running is None:
+            self._start(job)
+        else:
+            replaced = self._waiting_by_key.pop(key, None)
+            if replaced is not None:
+                logger.debug("대기 중인 작업 %r 을(를) %r 로 대체합니다.", replaced, job)
+                self._active.remove(replaced)
+            self._waiting_by_key[key] = job
+            if supersede:
+                running._cancel_event.set()
+        self._notify()
+        self._schedule_drain()
+        return job
+
+    def cancel(self, job: Job):
+        """작업 취소를 요청합니다. 시작 전이면 실행하지 않고, 실행 중이면 작업 함수가 check_cancelled() 에서 중단합니다."""
+        job._cancel_event.set()
+        if job.key is not None and self._waiting_by_key.get(job.key) is job:
+            del self._waiting_by_key[job.key]
+            self._active.remove(job)
+            self._notify()
+        elif job._future is not None and job._future.cancel():
+            self._results.put(("cancelled", job, None, None))
+
+    def shutdown(self, wait: bool = True):
+        """대기 중인 작업은 버리고, wait=True 이면 실행 중인 작업이 끝날 때까지 기다립니다. (종료 시 저장 순서 보장)"""
+        self._closed = True
+        for job in list(self._waiting_by_key.values()):
+            job._cancel_event.set()
+        self._waiting_by_key.clear()
+        if self._after_id is not None:
+            try:
+                self.widget.after_cancel(self._after_id)
+            except Exception:
+                pass
+            self._after_id = None
+        self._executor.shutdown(wait=wait, cancel_futures=True)
+
+    def _start(self, job: Job):
+        if job.key is not None:
+            self._running_by_key[job.key] = job
+        job._future = self._executor.submit(self._run, job)
+
+    def _run(self, job: Job):
+        """작업 스레드에서 실행"""
+        if job.cancelled:
+            self._results.put(("cancelled", job, None, None))
+            return
+        _current.job, _current.runner = job, self
+        try:
+            result = job.fn(*job.args)
+        except JobCancelled:
+            self._results.put(("cancelled", job, None, None))
+        except BaseException as e:
+            self._results.put(("error", job, e, None))
+        else:
+            self._results.put(("done", job, result, None))
+        finally:
+            _current.job = _current.runner = None
+
+    def _schedule_drain(self):
+        if self._after_id is None and not self._closed:
+            self._after_id = self.widget.after(RESULT_POLL_MS, self._drain)
+
+    def _drain(self):
+        """메인 스레드에서 결과 큐를 비우고 완료 콜백을 호출합니다."""
+        self._after_id = None
+        changed = False
+        while True:
+            try:
+                kind, job, value, message = self._results.get_nowait()
+            except queue.Empty:
+                break
+            changed = True
+            if kind == "progress":
+                job.progress, job.message = value, message
+                continue
+            self._finish(job)
+            if kind == "done" and not job.cancelled:
+                self._callback(job, job.on_done, value)
+            elif kind == "error":
+                if job.on_error is not None:
+                    self._callback(job, job.on_error, value)
+                else:
+                    logger.error("백그라운드 작업 '%s' 실패: %s", job.name, value, exc_info=value)
+            else:
+                logger.info("백그라운드 작업 '%s' 취소됨", job.name)
+        if changed:
+            self._notify()
+        if self._active:
+            self._schedule_drain()
+
+    def _finish(self, job: Job):
+        if job in self._active:
+            self._active.remove(job)
+        if job.key is not None and self._running_by_key.get(job.key) is job:
+            del self._running_by_key[job.key]
+            waiting = self._waiting_by_key.pop(job.key, None)
+            if waiting is not None and not self._closed:
+                self._start(waiting)
+
+    @staticmethod
+    def _callback(job: Job, callback: Optional[Callable], value):
+        if callback is None:
+            return
+        try:
+            callback(value)
+        except Exception:
+            logger.exception("백그라운드 작업 '%s' 완료 처리 중 오류", job.name)
+
+    def _notify(self):
+        if self.on_change is not None:
+            try:
+                self.on_change(self.active_jobs)
+            except Exception:
+                logger.exception("작업 상태 표시 갱신 중 오류")
+
+
+if __name__ == '__main__':
+    # Tk 없이 after() 만 흉내 내어 테스트
+    import time
+
+    class _FakeWidget:
+        def __init__(self):
+            self.pending = []
+        def after(self, ms, fn):
+            self.pending.append(fn); return len(self.pending)
+        def after_cancel(self, after_id):
+            pass
+        def run_until_idle(self, runner, timeout=5.0):
+            deadline = time.monotonic() + timeout
+            while runner.active_jobs and time.monotonic() < deadline:
+                pending, self.pending = self.pending, []
+                for fn in pending: fn()
+                time.sleep(0.01)
+
+    widget = _FakeWidget()
+    results, errors, changes = [], [], []
+    runner = JobRunner(widget, on_change=lambda jobs: changes.append(len(jobs)))
+
+    gate = threading.Event()
+    def slow_write(value):
+        gate.wait(2)
+        report_progress(1.0, "완료")
+        return value
+
+    # 같은 key 로 연속 저장 -> 실행 중인 첫 번째와 마지막 하나만 실행됨
+    for i in range(5):
+        runner.submit("저장", slow_write, i, key="save", cancellable=False, on_done=results.append)
+    gate.set()
+    widget.run_until_idle(runner)
+    assert results == [0, 4], results
+
+    # 오류 전달
+    runner.submit("오류", lambda: 1 / 0, on_error=errors.append)
+    widget.run_until_idle(runner)
+    assert len(errors) == 1 and isinstance(errors[0], ZeroDivisionError)
+
+    # supersede: 실행 중인 로드는 취소되고 새 로드 결과만 전달됨
+    started = threading.Event()
+    def cancellable_load(value):
+        started.set()
+        for _ in range(200):
+            check_cancelled(); time.sleep(0.005)
+        return value
+    results.clear()
+    runner.submit("로드", cancellable_load, "old", key="load", on_done=results.append)
+    started.wait(2)
+    runner.submit("로드", cancellable_load, "new", key="load", supersede=True, on_done=results.append)
+    widget.run_until_idle(runner)
+    assert results == ["new"], results
+    assert changes and changes[-1] == 0
+
+    runner.shutdown()
+    print("jobs 테스트 완료.")
@@ -0,0 +1,55 @@
+import importlib
+import importlib.util
+import sys
+import types
+
+
+class LazyModule(types.ModuleType):
+    """
+    첫 속성 접근 시점에 실제 모듈을 import 하는 지연 로딩 모듈 프록시.
+    openpyxl, OCR 스택(cv2, numpy, PIL, easyocr/torch)처럼 import 비용이 큰 모듈이
+    프로그램 시작 시가 아니라 실제로 필요한 기능(Excel 출력, OCR)을 처음 쓸 때 로드되도록 합니다.
+    """
+
+    def __init__(self, name: str):
+        super().__init__(name)
+        self.__dict__["_lazy_module"] = None
+
+    def _load(self) -> types.ModuleType:
+        module = self.__dict__["_lazy_module"]
+        if module is None:
+            module = importlib.import_module(self.__name__)
+            self.__dict__["_lazy_module"] = module
+        return module
+
+    def __getattr__(self, attr: str):
+        return getattr(self._load(), attr)
+
+    def __dir__(self):
+        return dir(self._load())
+
+    def __repr__(self):
+        state = "loaded" if self.__dict__["_lazy_module"] is not None else "not loaded"
+        return f"<lazy module '{self.__name__}' ({state})>"
+
+
+def lazy_module(name: str) -> types.ModuleType:
+    """모듈을 지연 로딩합니다. 이미 import 된 모듈이면 그대로 반환합니다."""
+    if name in sys.modules:
+        return sys.modules[name]
+    return LazyModule(name)
+
+
+def is_loaded(module: types.ModuleType) -> bool:
+    """지연 로딩 모듈이 실제로 import 되었는지 여부"""
+    if isinstance(module, LazyModule):
+        return module.__dict__["_lazy_module"] is not None
+    return True
+
+
+def is_available(name: str) -> bool:
+    """모듈을 import 하지 않고 설치 여부만 확인합니다."""
+    try:
+        return importlib.util.find_spec(name) is not None
+    except (ImportError, ValueError):
+        return False
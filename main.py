@@ -1,15 +1,46 @@
 import sys
+import bisect
+import operator
+import logging
 import tkinter as tk
 from tkinter import ttk, messagebox, filedialog, Menu, simpledialog
 import os
 import uuid
 import datetime
+import dataclasses
 from typing import List, Optional, Dict, Any
 from decimal import Decimal, InvalidOperation
 
-from models import Company, Item, InvoiceLine, PriceTier, PriceProfile
+from models import Company, Item, InvoiceLine, MarginPolicy, PriceTier, PriceProfile, PriceRule
 import storage
-import invoice
+import sku
+import pricing
+import price_history
+import profiling
+from catalog import ProductCatalog
+import master_diff
+import bulk_edit
+import profile_io
+import profile_compare
+import margin_audit
+from master_diff import MasterDiff
+from master_watch import MasterFileWatcher
+import jobs
+from jobs import JobRunner
+from lazy_import import lazy_module
+
+# invoice는 openpyxl을 로드하므로 Excel 생성 시점까지 import를 미룹니다.
+invoice = lazy_module("invoice")
+from tree_sync import TreeviewSync, VirtualTreeview
+from stall_watchdog import StallWatchdog
+from app_logging import setup_logging
+
+logger = logging.getLogger(__name__)
+
+PROFILING_FLUSH_INTERVAL_MS = 60 * 1000 # 성능 측정 집계를 순환 파일에 기록하는 주기
+STALL_THRESHOLD_MS = int(os.environ.get("LOHAS_STALL_MS", "300")) # 이보다 오래 메인 루프가 멈추면 기록
+SHARED_POLL_INTERVAL_MS = int(os.environ.get("LOHAS_SHARED_POLL_MS", "3000")) # 공유 폴더 모드에서 다른 사용자 변경 확인 주기
+MASTER_WATCH_INTERVAL_MS = int(os.environ.get("LOHAS_MASTER_WATCH_MS", "2000")) # 제품 마스터 파일 변경 확인 주기
 
 def get_bundle_dir():
     """Return the base directory for bundled files, or the script's directory."""
@@ -28,6 +59,9 @@ class App(tk.Tk):
         self.title("거래명세서 자동 작성 툴")
         self.geometry("1100x750") # 창 크기 확장
 
+        # Excel 생성, 마스터 로드, 저장 등 오래 걸리는 작업은 백그라운드에서 실행 (완료 콜백은 메인 스레드)
+        self.jobs = JobRunner(self, on_change=self._on_jobs_changed)
+
         # 데이터 로드
         # Companies data (data.json) is not explicitly bundled by the current PyInstaller command.
         # storage.load_companies() will look for it in the CWD (or create it there if not found).
@@ -38,6 +72,10 @@ class App(tk.Tk):
         self.price_profiles: List[PriceProfile] = storage.load_price_profiles()
         
         self.product_master_items: List[Item] = []
+        self.product_catalog = ProductCatalog([]) # 검색/조회 인덱스 (마스터 로드 시 재구축)
+        self.price_history = price_history.PriceHistory.load() # 단가 변경 이력 (지난 날짜 명세서 단가 계산용)
+        self.propagation_rules = storage.load_propagation_rules() # 제품 마스터 변경 -> 단가 프로파일 반영 규칙
+        self.margin_policy = storage.load_margin_policy() # 단가 마진 점검 기준 (매입단가/치료재료단가)
 
         # Determine base directory for data files
         bundle_dir = get_bundle_dir()
@@ -53,7 +91,7 @@ class App(tk.Tk):
             else:
                 # Bundled but primary data file not found in bundle - this is an issue.
                 self.product_master_file_path: str = ""
-                print(f"경고: 번들된 애플리케이션의 제품 마스터 파일 '{bundled_product_master_path}'을(를) 찾을 수 없습니다.")
+                logger.warning(f"번들된 애플리케이션의 제품 마스터 파일 '{bundled_product_master_path}'을(를) 찾을 수 없습니다.")
         else: # Not bundled, use logic relative to script's directory (which is bundle_dir here)
             path_in_data_folder_script_dir = os.path.join(bundle_dir, "데이터파일", storage.DEFAULT_PRODUCT_MASTER_FILE_BASENAME)
             path_in_script_dir = os.path.join(bundle_dir, storage.DEFAULT_PRODUCT_MASTER_FILE_BASENAME)
@@ -73,7 +111,7 @@ class App(tk.Tk):
             else:
                 self.product_master_file_path: str = ""
 
-        self._load_product_master_data()
+        self._load_product_master_data(background=False) # 창이 뜨기 전이므로 바로 로드
 
         self.current_invoice_lines: List[InvoiceLine] = []
         self.selected_company_for_invoice: Optional[Company] = None
@@ -99,6 +137,7 @@ class App(tk.Tk):
         self._create_price_profile_management_tab()
         self._create_product_viewer_tab() 
 
+        self._create_job_status_bar()
         self.notebook.pack(expand=True, fill="both", padx=10, pady=10)
         
         self._refresh_company_listbox_invoice_tab()
@@ -106,6 +145,17 @@ class App(tk.Tk):
         
         self.protocol("WM_DELETE_WINDOW", self._on_closing)
 
+        self.stall_watchdog = StallWatchdog(self, threshold_ms=STALL_THRESHOLD_MS)
+        self.stall_watchdog.start()
+
+        if storage.get_shared_store() is not None:
+            self.after(SHARED_POLL_INTERVAL_MS, self._poll_shared_store)
+
+        # ERP에서 마스터를 다시 내보내면 백그라운드에서 읽어 바뀐 품목만 반영
+        self.master_watcher = MasterFileWatcher(self, lambda: self.product_master_file_path, lambda: self.product_master_items,
+                                                self._apply_product_master_diff, interval_ms=MASTER_WATCH_INTERVAL_MS)
+        self.master_watcher.start()
+
     def _create_main_menu(self):
         menubar = Menu(self)
         self.config(menu=menubar)
@@ -116,40 +166,292 @@ class App(tk.Tk):
         file_menu.add_separator()
         file_menu.add_command(label="종료", command=self._on_closing)
 
+        tools_menu = Menu(menubar, tearoff=0)
+        menubar.add_cascade(label="도구", menu=tools_menu)
+        self.span_profiling_var = tk.BooleanVar(value=profiling.is_enabled())
+        self.cprofile_var = tk.BooleanVar(value=False)
+        tools_menu.add_checkbutton(label="성능 측정 기록 (구간별 시간)", variable=self.span_profiling_var,
+                                   command=self._toggle_span_profiling)
+        tools_menu.add_command(label="성능 측정 Chrome 트레이스 내보내기...", command=self._export_profiling_trace)
+        tools_menu.add_separator()
+        tools_menu.add_checkbutton(label="cProfile 기록 (.prof)", variable=self.cprofile_var,
+                                   command=self._toggle_cprofile)
+        tools_menu.add_separator()
+        tools_menu.add_command(label="메모리 사용량 보고서 저장", command=self._save_memory_report)
+        tools_menu.add_command(label="UI 멈춤 통계 보기", command=self._show_stall_report)
+        tools_menu.add_separator()
+        tools_menu.add_command(label="단가 마진 점검...", command=self._run_margin_audit)
+        tools_menu.add_command(label="마진 점검 기준 설정...", command=self._edit_margin_policy)
+        self.after(PROFILING_FLUSH_INTERVAL_MS, self._flush_profiling_stats)
+
+    # --- 백그라운드 작업 상태 표시 ---
+
+    def _create_job_status_bar(self):
+        """진행 중인 백그라운드 작업이 있을 때만 창 아래쪽에 표시"""
+        self.job_status_frame = ttk.Frame(self)
+        self.job_status_var = tk.StringVar()
+        ttk.Label(self.job_status_frame, textvariable=self.job_status_var, anchor="w").pack(side="left", fill="x", expand=True, padx=(10, 5))
+        self.job_cancel_button = ttk.Button(self.job_status_frame, text="취소", width=6, command=self._cancel_jobs)
+        self.job_cancel_button.pack(side="right", padx=(5, 10))
+        self.job_progressbar = ttk.Progressbar(self.job_status_frame, length=160)
+        self.job_progressbar.pack(side="right", padx=5)
+
+    def _on_jobs_changed(self, active_jobs: List[jobs.Job]):
+        if not hasattr(self, 'job_status_frame'): return
+        if not active_jobs:
+            self.job_progressbar.stop()
+            self.job_status_frame.pack_forget()
+            return
+        job = active_jobs[0]
+        status = f"{job.name}{' - ' + job.message if job.message else ''} 중..."
+        if len(active_jobs) > 1: status += f" (외 {len(active_jobs) - 1}건)"
+        self.job_status_var.set(status)
+        if job.progress is None:
+            if str(self.job_progressbar.cget("mode")) != "indeterminate":
+                self.job_progressbar.configure(mode="indeterminate"); self.job_progressbar.start(15)
+        else:
+            self.job_progressbar.stop()
+            self.job_progressbar.configure(mode="determinate", value=job.progress * 100)
+        self.job_cancel_button.configure(state="normal" if any(j.cancellable for j in active_jobs) else "disabled")
+        if not self.job_status_frame.winfo_ismapped():
+            self.job_status_frame.pack(side="bottom", fill="x", before=self.notebook)
+
+    def _cancel_jobs(self):
+        for job in self.jobs.active_jobs:
+            if job.cancellable: self.jobs.cancel(job)
+
+    # --- 저장 및 공유 폴더 모드 동기화 ---
+
+    def _save_companies(self):
+        if storage.get_shared_store() is not None:
+            # 공유 폴더 모드는 바뀐 레코드만 쓰고 충돌 결과를 바로 알려야 하므로 메인 스레드에서 저장
+            conflicts = storage.save_companies(self.companies)
+            if conflicts: self._on_shared_save_conflict("거래처", conflicts)
+            return
+        # 저장할 내용은 지금 만들고(이후 편집과 무관), 파일 쓰기만 백그라운드에서. 연속 저장은 마지막 것만 씀
+        self.jobs.submit("거래처 저장", storage.write_companies_file, storage.companies_file_data(self.companies),
+                         key=storage.COMPANY_DATA_FILE, cancellable=False)
+
+    def _save_price_profiles(self):
+        if storage.get_shared_store() is not None:
+            conflicts = storage.save_price_profiles(self.price_profiles)
+            if conflicts: self._on_shared_save_conflict("단가 프로파일", conflicts)
+            return
+        self.jobs.submit("단가 프로파일 저장", storage.write_price_profiles_file, storage.price_profiles_file_data(self.price_profiles),
+                         key=storage.PRICE_PROFILES_FILE, cancellable=False)
+
+    def _on_shared_save_conflict(self, label: str, names: List[str]):
+        messagebox.showwarning("저장 충돌", f"다른 사용자가 먼저 수정한 {label}은(는) 저장하지 못했습니다:\n{', '.join(names)}\n\n최신 내용으로 다시 불러옵니다.", parent=self)
+        self._reload_shared_data(storage.poll_shared_changes() or [storage.COMPANIES_KIND, storage.PRICE_PROFILES_KIND])
+
+    def _poll_shared_store(self):
+        """다른 사용자가 바꾼 레코드만 반영 (바뀐 종류의 목록만 다시 구성). 공유 단가 이력도 새 줄만 읽음"""
+        try:
+            changed_kinds = storage.poll_shared_changes()
+            if changed_kinds: self._reload_shared_data(changed_kinds)
+            self.price_history.refresh()
+        except OSError as e:
+            logger.error(f"공유 폴더 변경 확인 실패: {e}")
+        self.after(SHARED_POLL_INTERVAL_MS, self._poll_shared_store)
+
+    def _reload_shared_data(self, kinds: List[str]):
+        if storage.PRICE_PROFILES_KIND in kinds:
+            self.price_profiles = storage.load_price_profiles()
+            self._refresh_price_profile_listbox()
+            self._update_company_price_tier_combo_values()
+        if storage.COMPANIES_KIND in kinds:
+            self.companies = storage.load_companies()
+        self._refresh_company_management_listbox()
+        self._refresh_company_listbox_invoice_tab()
+
+    def _toggle_span_profiling(self):
+        if self.span_profiling_var.get():
+            profiling.enable()
+        else:
+            profiling.disable()
+            path = profiling.flush()
+            if path:
+                messagebox.showinfo("성능 측정", f"측정 결과를 기록했습니다:\n{path}")
+
+    def _flush_profiling_stats(self):
+        """측정이 켜져 있으면 주기적으로 집계를 순환 파일에 기록"""
+        if profiling.is_enabled():
+            try:
+                profiling.flush()
+            except OSError as e:
+                logger.error(f"성능 측정 결과 기록 실패: {e}")
+        self.after(PROFILING_FLUSH_INTERVAL_MS, self._flush_profiling_stats)
+
+    def _export_profiling_trace(self):
+        filepath = filedialog.asksaveasfilename(
+            title="Chrome 트레이스 저장", defaultextension=".json",
+            filetypes=(("JSON files", "*.json"), ("All files", "*.*")),
+            initialfile=f"trace_{datetime.datetime.now().strftime('%Y%m%d-%H%M%S')}.json")
+        if not filepath:
+            return
+        count = profiling.export_chrome_trace(filepath)
+        messagebox.showinfo("성능 측정", f"{count}개의 구간을 저장했습니다. chrome://tracing 또는 Perfetto에서 열 수 있습니다.\n{filepath}")
+
+    def _save_memory_report(self):
+        import memory_report
+        try:
+            report = memory_report.build_app_report(self)
+            path = memory_report.write_report(report)
+        except Exception as e:
+            messagebox.showerror("메모리 보고서 오류", f"메모리 사용량 보고서를 만들지 못했습니다: {e}")
+            return
+        messagebox.showinfo("메모리 사용량", f"{memory_report.format_summary(report)}\n\n보고서 저장: {path}")
+
+    def _run_margin_audit(self):
+        """모든 프로파일/가격 등급 단가를 매입단가와 치료재료단가에 비교한 결과를 보여주고 파일로 저장"""
+        report = margin_audit.audit_prices(self.price_profiles, self.product_catalog.items_by_sku, self.margin_policy)
+        logger.info("단가 마진 점검: %s", report.summary())
+        if not report.issues:
+            messagebox.showinfo("단가 마진 점검", f"문제가 있는 단가가 없습니다.\n{report.summary()}", parent=self); return
+        preview = "\n".join(f"[{kind}] {source}: {product_name} ({model_name} / {spec}) {price:,.2f}원"
+                            for kind, source, model_name, product_name, spec, price, *_ in report.export_rows(10))
+        more = f"\n... 외 {len(report.issues) - 10:,}건" if len(report.issues) > 10 else ""
+        if not messagebox.askyesno("단가 마진 점검", f"{report.summary()}\n\n{preview}{more}\n\n전체 목록을 파일로 저장하시겠습니까?", parent=self): return
+        filepath = filedialog.asksaveasfilename(title="마진 점검 결과 저장", defaultextension=".xlsx",
+                                                filetypes=(("Excel files", "*.xlsx"), ("CSV files", "*.csv")), initialfile="단가_마진점검.xlsx")
+        if not filepath: return
+        self.jobs.submit("마진 점검 결과 저장",
+                         lambda: profile_io.write_table(filepath, report.export_headers(), report.export_rows(), sheet_title="마진 점검"),
+                         on_done=lambda count: messagebox.showinfo("저장", f"{count:,}건을 저장했습니다:\n{filepath}", parent=self),
+                         on_error=lambda e: messagebox.showerror("저장 오류", f"저장하지 못했습니다:\n{filepath}\n{e}", parent=self))
+
+    def _edit_margin_policy(self):
+        dialog = MarginPolicyDialog(self, self.margin_policy)
+        if dialog.result is None: return
+        self.margin_policy = dialog.result
+        storage.save_margin_policy(self.margin_policy)
+        logger.info("마진 점검 기준 변경: %s", self.margin_policy.describe())
+
+    def _show_stall_report(self):
+        messagebox.showinfo("UI 멈춤 통계", self.stall_watchdog.format_report())
+
+    def _toggle_cprofile(self):
+        if self.cprofile_var.get():
+            profiling.start_cprofile()
+        else:
+            path = profiling.stop_cprofile()
+            if path:
+                messagebox.showinfo("cProfile", f"프로파일을 저장했습니다:\n{path}")
+
     def _select_product_master_file(self):
         initial_dir = os.path.dirname(self.product_master_file_path) if self.product_master_file_path and os.path.exists(os.path.dirname(self.product_master_file_path)) else os.getcwd()
         initial_file = os.path.basename(self.product_master_file_path) if self.product_master_file_path else storage.DEFAULT_PRODUCT_MASTER_FILE_BASENAME
         filepath = filedialog.askopenfilename(
-            title="제품 마스터 JSON 파일 선택",
-            filetypes=(("JSON files", "*.json"), ("All files", "*.*")),
+            title="제품 마스터 파일 선택 (JSON 또는 이카운트 엑셀)",
+            filetypes=(("제품 마스터", "*.json *.xlsx *.xlsm"), ("JSON files", "*.json"), ("Excel files", "*.xlsx *.xlsm"), ("All files", "*.*")),
             initialfile=initial_file,
             initialdir=initial_dir
         )
         if filepath:
             self.product_master_file_path = filepath
             self._load_product_master_data()
-            messagebox.showinfo("성공", f"제품 마스터 파일이 '{filepath}'로 설정되었습니다.\n데이터를 새로고침합니다.")
+            messagebox.showinfo("성공", f"제품 마스터 파일이 '{filepath}'로 설정되었습니다.\n데이터를 백그라운드에서 불러옵니다.")
 
-    def _load_product_master_data(self, file_path: Optional[str] = None):
+    def _load_product_master_data(self, file_path: Optional[str] = None, background: bool = True):
         path_to_load = file_path if file_path else self.product_master_file_path
         if not path_to_load or not os.path.exists(path_to_load):
-            if path_to_load: print(f"정보: 제품 마스터 파일을 찾을 수 없습니다: {path_to_load}.")
-            else: print(f"정보: 제품 마스터 파일 경로가 설정되지 않았습니다.")
-            self.product_master_items = []
+            if path_to_load: logger.info(f"제품 마스터 파일을 찾을 수 없습니다: {path_to_load}.")
+            else: logger.info(f"제품 마스터 파일 경로가 설정되지 않았습니다.")
+            self._set_product_master([], ProductCatalog([]))
+        elif background:
+            # 다른 파일을 연달아 고르면 이전 로드는 취소하고 마지막 파일만 반영
+            self.jobs.submit("제품 마스터 불러오기", self._read_product_master, path_to_load, key="product_master", supersede=True,
+                             on_done=lambda result: self._on_product_master_read(path_to_load, result),
+                             on_error=lambda e: messagebox.showerror("오류", f"제품 마스터 파일을 읽지 못했습니다:\n{path_to_load}\n{e}"))
         else:
-            self.product_master_items = storage.load_product_master(path_to_load)
+            self._set_product_master(*self._read_product_master(path_to_load))
+
+    @staticmethod
+    def _read_product_master(path: str):
+        """파일 파싱과 검색 인덱스 구성 (작업 스레드에서 실행 가능, 위젯에 접근하지 않음)"""
+        items = storage.load_product_master(path)
+        jobs.check_cancelled()
+        jobs.report_progress(None, "검색 인덱스 구성")
+        return items, ProductCatalog(items)
+
+    def _on_product_master_read(self, path: str, result):
+        if path != self.product_master_file_path:
+            logger.debug("다른 제품 마스터 파일이 선택되어 '%s' 로드 결과를 버립니다.", path)
+            return
+        self._set_product_master(*result)
+
+    def _set_product_master(self, items: List[Item], catalog: ProductCatalog):
+        self.product_master_items = items
+        self.product_catalog = catalog
+        if self.product_master_items:
+            self.price_history.record_master_prices(self.product_master_items)
         
         if hasattr(self, 'invoice_item_listbox'): self._refresh_item_listbox_invoice_tab() 
         if hasattr(self, 'product_viewer_tree'): self._refresh_product_viewer_listbox()
 
     def _refresh_product_master_data(self):
-        self._load_product_master_data()
-        messagebox.showinfo("정보", "제품 마스터 데이터를 새로고침했습니다.")
+        # 백그라운드에서 다시 읽고, 완료되면 _apply_product_master_diff 가 결과를 알려줌
+        self.master_watcher.reload()
+
+    @profiling.traced("App._apply_product_master_diff")
+    def _apply_product_master_diff(self, diff: Optional[MasterDiff], manual: bool):
+        """다시 읽은 마스터의 변경분(추가/삭제/변경 품목)만 인덱스와 열린 화면에 반영"""
+        if diff is None:
+            messagebox.showerror("오류", f"제품 마스터 파일을 읽지 못했습니다:\n{self.product_master_file_path}\n기존 데이터를 유지합니다.")
+            return
+        if not diff:
+            if manual: messagebox.showinfo("정보", "제품 마스터에 변경된 내용이 없습니다.")
+            return
+        logger.info("제품 마스터 변경 반영: %s", diff.summary())
+        self.product_master_items = diff.items
+        self.product_catalog.apply_diff(diff)
+        items_by_sku = self.product_catalog.items_by_sku
+        touched_ids = {item.sku_id for item in diff.touched}
+        self.price_history.record_master_prices(items_by_sku[sku_id] for sku_id in touched_ids if sku_id in items_by_sku)
+
+        propagation = self._propagate_master_changes(diff.skus)
+
+        # 명세서에 담긴 품목은 새 품목 정보로 교체 (단가는 명세서 생성 시 다시 계산됨)
+        replacements = {id(old): new for old, new in diff.changed}
+        if any(id(line.item) in replacements for line in self.current_invoice_lines):
+            for line in self.current_invoice_lines:
+                line.item = replacements.get(id(line.item), line.item)
+            self._refresh_invoice_tree()
+
+        if hasattr(self, 'invoice_item_listbox'): self._refresh_item_listbox_invoice_tab()
+        if hasattr(self, 'product_viewer_tree'): self._apply_master_diff_to_product_viewer(diff)
+        if hasattr(self, 'price_profile_listbox') and self.price_profile_listbox.curselection(): self._on_price_profile_selected(None)
+        if manual:
+            message = f"제품 마스터 데이터를 새로고침했습니다.\n({diff.summary()})\n{diff.skus.summary()}"
+            if propagation: message += f"\n\n단가 프로파일 반영: {propagation.summary()}"
+            messagebox.showinfo("정보", message)
+
+    def _propagate_master_changes(self, skus: master_diff.SkuChanges) -> Optional[master_diff.PropagationResult]:
+        """새 품목/단종/등급 단가 변경을 반영 규칙에 따라 모든 단가 프로파일에 적용하고 한 번 저장"""
+        if not skus or not self.propagation_rules: return None
+        if storage.get_shared_store() is not None:
+            # 다른 사용자가 이미 반영했을 수 있으므로 최신 프로파일 기준으로 적용
+            changed_kinds = storage.poll_shared_changes()
+            if changed_kinds: self._reload_shared_data(changed_kinds)
+        result = master_diff.propagate_to_profiles(self.price_profiles, skus, self.propagation_rules)
+        if not result: return None
+        self.price_history.record_profile_prices(result.changes)
+        self._save_price_profiles()
+        logger.info("제품 마스터 변경을 단가 프로파일에 반영: %s", result.summary())
+        return result
 
     def _on_closing(self):
         if messagebox.askokcancel("종료 확인", "프로그램을 종료하시겠습니까? 변경사항이 저장됩니다."):
+            # 진행 중인 백그라운드 저장이 끝난 뒤 최종 내용을 저장 (오래된 내용이 나중에 덮어쓰지 않도록)
+            self.jobs.shutdown(wait=True)
             storage.save_companies(self.companies)
             storage.save_price_profiles(self.price_profiles)
+            if profiling.is_cprofile_running():
+                profiling.stop_cprofile()
+            if profiling.is_enabled():
+                profiling.flush()
+            self.stall_watchdog.stop()
+            self.master_watcher.stop()
             self.destroy()
 
     def _create_invoice_tab(self):
@@ -209,6 +511,7 @@ class App(tk.Tk):
         tree_scrollbar_x.pack(side="bottom", fill="x")
         self.invoice_tree.pack(side="left", fill="both", expand=True)
         self.invoice_tree.bind("<Double-1>", self._on_invoice_item_double_click_for_edit) # Renamed for clarity
+        self.invoice_tree_sync = TreeviewSync(self.invoice_tree)
 
         bottom_frame = ttk.Frame(tab)
         bottom_frame.pack(fill="x", padx=5, pady=10)
@@ -256,47 +559,30 @@ class App(tk.Tk):
         
         self._refresh_item_listbox_invoice_tab()
 
+    @profiling.traced("App._refresh_item_listbox_invoice_tab")
     def _refresh_item_listbox_invoice_tab(self, filter_text=""):
         self.invoice_item_listbox.delete(0, tk.END)
         search_term = self.invoice_item_search_var.get().lower() if filter_text == "" else filter_text.lower()
         current_company = self.selected_company_for_invoice
         current_price_profile: Optional[PriceProfile] = None
-        if current_company and current_company.custom_price_profile_id:
-            current_price_profile = next((p for p in self.price_profiles if p.id == current_company.custom_price_profile_id), None)
+        if current_company:
+            current_price_profile = pricing.find_price_profile(self.price_profiles, current_company.custom_price_profile_id)
 
-        unique_representative_items: Dict[tuple, Item] = {}
-        for item_obj in self.product_master_items:
-            passes_search = False
-            if not search_term or any(st in s.lower() for s in [item_obj.lot, item_obj.model_name, item_obj.product_name, item_obj.spec] for st in search_term.split() if st):
-                passes_search = True
-            if passes_search:
-                item_key = (item_obj.model_name, item_obj.product_name, item_obj.spec, item_obj.treatment_code, item_obj.udi_di)
-                if item_key not in unique_representative_items: unique_representative_items[item_key] = item_obj
+        # LOT만 다른 동일 품목은 한 줄로 묶어 표시
+        representative_items = self.product_catalog.representative_items(search_term)
         
         if not hasattr(self, 'invoice_tab_display_to_item_map'): self.invoice_tab_display_to_item_map: Dict[str, Item] = {}
         self.invoice_tab_display_to_item_map.clear()
         display_strings_for_listbox = []
 
-        for rep_item_obj in unique_representative_items.values():
+        # 커스텀 프로파일 단가 우선, 없으면 거래처 기본 등급 단가
+        for rep_item_obj, unit_price, price_source in pricing.resolve_unit_prices(representative_items, current_company, current_price_profile):
             display_text = f"{rep_item_obj.product_name} ({rep_item_obj.model_name} / {rep_item_obj.spec})"
-            unit_price: Optional[Decimal] = None; price_source = ""
-            if current_price_profile: # current_price_profile is the PriceProfile object
-                item_profile_key_tuple = (rep_item_obj.model_name, rep_item_obj.product_name, rep_item_obj.spec)
-                if item_profile_key_tuple in current_price_profile.item_prices:
-                    unit_price = current_price_profile.item_prices[item_profile_key_tuple]
-                    price_source = f" ({current_price_profile.name})" # Use profile name
-            if unit_price is None and current_company: # Fallback to company's standard tier if not in custom or no custom profile
-                unit_price = rep_item_obj.get_price_for_tier(current_company.price_tier)
-                if unit_price is not None: 
-                    # Only set price_source if it wasn't already set by a custom profile
-                    if not price_source: # Check if price_source is still empty
-                         price_source = f" ({str(current_company.price_tier)})"
-            
-            display_text += f" (단가: {unit_price:,.0f}{price_source})" if unit_price is not None else " (단가: N/A)"
+            display_text += f" (단가: {unit_price:,.0f} ({price_source}))" if unit_price is not None else " (단가: N/A)"
             display_strings_for_listbox.append(display_text)
             self.invoice_tab_display_to_item_map[display_text] = rep_item_obj
         
-        for text_to_display in sorted(display_strings_for_listbox): self.invoice_item_listbox.insert(tk.END, text_to_display)
+        if display_strings_for_listbox: self.invoice_item_listbox.insert(tk.END, *sorted(display_strings_for_listbox))
         if self.invoice_item_listbox.size() > 0:
             self.invoice_item_listbox.selection_set(0)
     
@@ -315,24 +601,14 @@ class App(tk.Tk):
         representative_item_obj = self.invoice_tab_display_to_item_map.get(selected_item_display_name)
         if not representative_item_obj: messagebox.showerror("오류", "선택된 품목에 대한 내부 참조를 찾을 수 없습니다."); return
         
-        candidate_items = [item for item in self.product_master_items if item.model_name == representative_item_obj.model_name and item.product_name == representative_item_obj.product_name and item.spec == representative_item_obj.spec and item.treatment_code == representative_item_obj.treatment_code and item.udi_di == representative_item_obj.udi_di]
+        candidate_items = self.product_catalog.group_items(representative_item_obj)
         if not candidate_items: messagebox.showerror("오류", "선택된 품목에 해당하는 제품 마스터 정보를 찾을 수 없습니다 (후보 없음)."); return
         selected_item_obj = sorted(candidate_items, key=lambda i: i.lot)[0]
 
         if not self.selected_company_for_invoice: messagebox.showwarning("거래처 미선택", "먼저 거래처를 선택해주세요."); return
         
-        unit_price: Optional[Decimal] = None
-        current_price_profile: Optional[PriceProfile] = None
-        if self.selected_company_for_invoice.custom_price_profile_id:
-            current_price_profile = next((p for p in self.price_profiles if p.id == self.selected_company_for_invoice.custom_price_profile_id), None)
-        
-        if current_price_profile:
-            item_profile_key_tuple = (selected_item_obj.model_name, selected_item_obj.product_name, selected_item_obj.spec)
-            if item_profile_key_tuple in current_price_profile.item_prices: 
-                unit_price = current_price_profile.item_prices[item_profile_key_tuple]
-        
-        if unit_price is None: # Fallback if not in custom profile or no custom profile assigned
-            unit_price = selected_item_obj.get_price_for_tier(self.selected_company_for_invoice.price_tier)
+        # Fallback to the company's standard tier if not in custom profile or no custom profile assigned
+        unit_price = self._invoice_unit_price(selected_item_obj, self._parse_invoice_date())
 
         if unit_price is None: 
             messagebox.showwarning("단가 정보 없음", f"선택된 품목 '{selected_item_obj.product_name}'에 대해 거래처 '{self.selected_company_for_invoice.name}'의 단가 정보를 찾을 수 없습니다.\n(커스텀 프로파일 및 기본 등급 모두 확인됨)\n품목을 추가할 수 없습니다."); return
@@ -348,6 +624,20 @@ class App(tk.Tk):
         else: self.current_invoice_lines.append(InvoiceLine(item=selected_item_obj, qty=quantity, unit_price=unit_price))
         self._refresh_invoice_tree(); self._update_invoice_total_sum()
 
+    def _parse_invoice_date(self) -> Optional[datetime.date]:
+        try: return datetime.datetime.strptime(self.invoice_date_var.get(), "%Y-%m-%d").date()
+        except ValueError: return None
+
+    def _invoice_unit_price(self, item: Item, invoice_dt: Optional[datetime.date]) -> Optional[Decimal]:
+        """명세서 날짜가 오늘 이전이면 단가 이력에서 그날 기준 단가를, 아니면 현재 단가를 사용합니다."""
+        company = self.selected_company_for_invoice
+        profile = pricing.find_price_profile(self.price_profiles, company.custom_price_profile_id) if company else None
+        if invoice_dt is not None and invoice_dt < datetime.date.today():
+            unit_price, _ = self.price_history.resolve_unit_price_as_of(item, company, profile, price_history.end_of_day(invoice_dt))
+        else:
+            unit_price, _ = pricing.resolve_unit_price(item, company, profile)
+        return unit_price
+
     def _remove_item_from_invoice(self):
         selected_tree_items_iids = self.invoice_tree.selection() 
         if not selected_tree_items_iids: messagebox.showwarning("품목 미선택", "삭제할 품목을 테이블에서 선택해주세요."); return
@@ -362,11 +652,13 @@ class App(tk.Tk):
             self.invoice_담당자_var.set(""); self.invoice_date_var.set(datetime.date.today().strftime("%Y-%m-%d"))
 
     def _refresh_invoice_tree(self):
-        for i in self.invoice_tree.get_children(): self.invoice_tree.delete(i)
+        # 전체 삭제/재삽입 대신 변경된 행만 반영 (선택 및 스크롤 위치 유지)
+        rows = []
         for line in self.current_invoice_lines:
             insurance_price_display = f"{line.insurance_price:,.0f}" if line.insurance_price is not None else ""
             values = (line.lot, line.model_name, line.product_name, line.spec, line.qty, f"{line.unit_price:,.0f}", f"{line.supply_amount:,.0f}", f"{line.vat:,.0f}", insurance_price_display, line.treatment_code, line.udi_di)
-            self.invoice_tree.insert("", tk.END, values=values, iid=line.item.lot)
+            rows.append((line.item.lot, values))
+        self.invoice_tree_sync.sync(rows)
 
     def _update_invoice_total_sum(self):
         total_supply = sum(line.supply_amount for line in self.current_invoice_lines)
@@ -379,11 +671,36 @@ class App(tk.Tk):
         if not self.current_invoice_lines: messagebox.showwarning("품목 없음", "명세서에 추가된 품목이 없습니다."); return
         try: date_str = self.invoice_date_var.get(); invoice_dt = datetime.datetime.strptime(date_str, "%Y-%m-%d").date()
         except ValueError: messagebox.showerror("날짜 오류", "명세서 날짜 형식이 잘못되었습니다. (YYYY-MM-DD)"); return
-        filepath = invoice.create_invoice_excel(company=self.selected_company_for_invoice, invoice_lines=self.current_invoice_lines, invoice_date=invoice_dt)
+        if self.jobs.is_active("invoice_excel"): messagebox.showinfo("진행 중", "거래명세서를 생성하고 있습니다. 완료 후 다시 시도해주세요."); return
+        # 품목 추가 후 날짜를 지난 날짜로 바꿨을 수 있으므로, 지난 날짜 명세서는 그날 기준 단가로 다시 맞추고 화면에도 반영
+        if invoice_dt < datetime.date.today():
+            repriced = []
+            for line in self.current_invoice_lines:
+                dated_price = self._invoice_unit_price(line.item, invoice_dt)
+                if dated_price is not None and dated_price != line.unit_price:
+                    repriced.append(f"{line.product_name} ({line.lot}): {line.unit_price:,.0f}원 → {dated_price:,.0f}원")
+                    line.unit_price = dated_price
+            if repriced:
+                self._refresh_invoice_tree(); self._update_invoice_total_sum()
+                shown = "\n".join(repriced[:15]) + (f"\n... 외 {len(repriced) - 15}건" if len(repriced) > 15 else "")
+                if not messagebox.askyesno("단가 변경", f"명세서 날짜({date_str}) 기준 단가로 {len(repriced)}개 품목의 단가를 바꿨습니다:\n{shown}\n\n이 단가로 거래명세서를 생성하시겠습니까?"): return
+        # 생성하는 동안 명세서를 계속 편집할 수 있으므로 현재 내용을 복사해서 넘김
+        submitted_lines = list(self.current_invoice_lines)
+        lines_snapshot = [dataclasses.replace(line) for line in submitted_lines]
+        company_snapshot = dataclasses.replace(self.selected_company_for_invoice)
+        # invoice(openpyxl) 모듈의 첫 로드도 작업 스레드에서 일어나도록 함수 조회를 작업 안에서 함
+        self.jobs.submit("거래명세서 엑셀 생성", lambda *args: invoice.create_invoice_excel(*args), company_snapshot, lines_snapshot, invoice_dt,
+                         key="invoice_excel", on_done=lambda filepath: self._on_excel_invoice_generated(filepath, submitted_lines, lines_snapshot),
+                         on_error=lambda e: messagebox.showerror("실패", f"거래명세서 생성에 실패했습니다.\n{e}"))
+
+    def _on_excel_invoice_generated(self, filepath: Optional[str], submitted_lines: List[InvoiceLine], lines_snapshot: List[InvoiceLine]):
         if filepath:
             msg = f"거래명세서가 성공적으로 생성되었습니다:\n{filepath}"
+            # 생성 중에 품목을 추가/삭제했거나 수량/단가를 고쳤으면(라인 객체는 그대로) 명세서를 비우지 않음
+            unchanged = ([(id(line), line.qty, line.unit_price) for line in self.current_invoice_lines]
+                         == [(id(line), snap.qty, snap.unit_price) for line, snap in zip(submitted_lines, lines_snapshot)])
             if messagebox.askyesno("성공", f"{msg}\n\n생성된 명세서 파일이 있는 폴더를 여시겠습니까?"): invoice.open_file_explorer(filepath)
-            self._clear_invoice() 
+            if unchanged: self._clear_invoice() 
         else: messagebox.showerror("실패", "거래명세서 생성에 실패했습니다.")
 
     def _on_invoice_item_double_click_for_edit(self, event):
@@ -495,7 +812,7 @@ class App(tk.Tk):
             current_reverse = self._last_sort_invoice_reverse
             data.sort(key=lambda t: convert(t[0]), reverse=current_reverse)
             for index, (val, child) in enumerate(data): self.invoice_tree.move(child, '', index)
-        except Exception as e: print(f"Treeview 정렬 중 오류: {e}")
+        except Exception as e: logger.error(f"Treeview 정렬 중 오류: {e}")
 
     def _create_company_management_tab(self):
         tab = self.company_management_tab
@@ -624,7 +941,7 @@ class App(tk.Tk):
         
         new_company = Company(name=name, contact=contact, price_tier=final_price_tier, custom_price_profile_id=final_custom_profile_id)
         self.companies.append(new_company)
-        storage.save_companies(self.companies) 
+        self._save_companies() 
         self._refresh_company_management_listbox()
         self._refresh_company_listbox_invoice_tab() 
         messagebox.showinfo("성공", f"'{name}' 회사가 추가되었습니다.")
@@ -670,7 +987,7 @@ class App(tk.Tk):
         company_to_update.contact = contact
         company_to_update.price_tier = final_price_tier
         company_to_update.custom_price_profile_id = final_custom_profile_id
-        storage.save_companies(self.companies)
+        self._save_companies()
         self._refresh_company_management_listbox()
         self._refresh_company_listbox_invoice_tab()
         messagebox.showinfo("성공", f"'{name}' 회사 정보가 수정되었습니다.")
@@ -682,7 +999,7 @@ class App(tk.Tk):
         company_to_delete = next((c for c in self.companies if c.id == selected_id), None)
         if not company_to_delete: messagebox.showerror("오류", "삭제할 회사를 찾을 수 없습니다."); return
         if messagebox.askyesno("삭제 확인", f"정말로 '{company_to_delete.name}' 회사를 삭제하시겠습니까?"):
-            self.companies.remove(company_to_delete); storage.save_companies(self.companies)
+            self.companies.remove(company_to_delete); self._save_companies()
             self._refresh_company_management_listbox(); self._refresh_company_listbox_invoice_tab()
             messagebox.showinfo("성공", f"'{company_to_delete.name}' 회사가 삭제되었습니다."); self._clear_company_fields()
 
@@ -701,17 +1018,46 @@ class App(tk.Tk):
             self.product_viewer_tree.column(col_id, width=col_widths[i], anchor='w', stretch=tk.NO)
         vsb = ttk.Scrollbar(tree_frame, orient="vertical", command=self.product_viewer_tree.yview); hsb = ttk.Scrollbar(tree_frame, orient="horizontal", command=self.product_viewer_tree.xview)
         self.product_viewer_tree.configure(yscrollcommand=vsb.set, xscrollcommand=hsb.set); vsb.pack(side="right", fill="y"); hsb.pack(side="bottom", fill="x"); self.product_viewer_tree.pack(expand=True, fill="both")
+        self.product_viewer_tree_sync = TreeviewSync(self.product_viewer_tree)
         self._refresh_product_viewer_listbox()
 
+    @staticmethod
+    def _product_viewer_values(item: Item) -> tuple:
+        return (item.lot, item.model_name, item.product_name, item.spec, item.treatment_code, item.udi_di, f"{item.prices.get(PriceTier.PURCHASE.value, ''):,.0f}", f"{item.prices.get(PriceTier.A.value, ''):,.0f}", f"{item.prices.get(PriceTier.B.value, ''):,.0f}", f"{item.prices.get(PriceTier.DEALER.value, ''):,.0f}", f"{item.prices.get(PriceTier.MEDICAL.value, ''):,.0f}")
+
+    @profiling.traced("App._refresh_product_viewer_listbox")
     def _refresh_product_viewer_listbox(self):
         if not hasattr(self, 'product_viewer_tree'): return
-        for i in self.product_viewer_tree.get_children(): self.product_viewer_tree.delete(i)
+        self.product_viewer_tree_sync.clear()
+        self.product_viewer_iids: Dict[int, str] = {} # id(Item) -> iid (마스터 변경분 반영용)
         search_term = self.product_viewer_search_var.get().lower()
-        filtered_items = [item for item in self.product_master_items if not search_term or any(search_term in s.lower() for s in [item.lot, item.model_name, item.product_name, item.spec])]
+        filtered_items = self.product_catalog.search_phrase(search_term)
         sorted_items_for_display = sorted(filtered_items, key=lambda item: item.product_name)
         for item in sorted_items_for_display:
-            values = (item.lot, item.model_name, item.product_name, item.spec, item.treatment_code, item.udi_di, f"{item.prices.get(PriceTier.PURCHASE.value, ''):,.0f}", f"{item.prices.get(PriceTier.A.value, ''):,.0f}", f"{item.prices.get(PriceTier.B.value, ''):,.0f}", f"{item.prices.get(PriceTier.DEALER.value, ''):,.0f}", f"{item.prices.get(PriceTier.MEDICAL.value, ''):,.0f}")
-            self.product_viewer_tree.insert("", tk.END, values=values, iid=str(uuid.uuid4()))
+            iid = self.product_viewer_iids[id(item)] = str(uuid.uuid4())
+            self.product_viewer_tree_sync.insert_row(tk.END, iid, self._product_viewer_values(item))
+
+    @profiling.traced("App._apply_master_diff_to_product_viewer")
+    def _apply_master_diff_to_product_viewer(self, diff: MasterDiff):
+        """전체 재구성 대신 삭제/변경/추가된 품목의 행만 갱신"""
+        search_term = self.product_viewer_search_var.get()
+        tree_sync, iids = self.product_viewer_tree_sync, self.product_viewer_iids
+        if diff.reordered: self._refresh_product_viewer_listbox(); return
+        tree_sync.delete_rows([iids.pop(id(item)) for item in diff.removed if id(item) in iids])
+        to_insert = list(diff.added)
+        for old, new in diff.changed:
+            iid = iids.pop(id(old), None)
+            if iid is None: to_insert.append(new)
+            elif self.product_catalog.matches_phrase(new, search_term):
+                iids[id(new)] = iid; tree_sync.update_row(iid, self._product_viewer_values(new))
+            else: tree_sync.delete_rows([iid])
+        to_insert = [item for item in to_insert if self.product_catalog.matches_phrase(item, search_term)]
+        if not to_insert: return
+        # 제품명 순서 위치에 끼워 넣기 (헤더 클릭으로 다른 컬럼 정렬 중이면 근사 위치)
+        names = [self.product_viewer_tree.set(iid, "product_name") for iid in self.product_viewer_tree.get_children("")]
+        for item in sorted(to_insert, key=lambda it: it.product_name, reverse=True):
+            iid = iids[id(item)] = str(uuid.uuid4())
+            tree_sync.insert_row(bisect.bisect_right(names, item.product_name), iid, self._product_viewer_values(item))
 
     def _sort_product_viewer_column(self, col):
         try:
@@ -727,7 +1073,7 @@ class App(tk.Tk):
             current_reverse = self._last_sort_viewer_reverse
             data.sort(key=lambda t: convert(t[0]), reverse=current_reverse)
             for index, (val, child) in enumerate(data): self.product_viewer_tree.move(child, '', index)
-        except Exception as e: print(f"Product Viewer Treeview 정렬 중 오류: {e}")
+        except Exception as e: logger.error(f"Product Viewer Treeview 정렬 중 오류: {e}")
 
     def _create_price_profile_management_tab(self):
         tab = self.price_profile_management_tab
@@ -738,6 +1084,8 @@ class App(tk.Tk):
         ttk.Button(profile_buttons_frame, text="새 프로파일", command=self._add_new_price_profile).pack(side="left", padx=2, pady=2)
         ttk.Button(profile_buttons_frame, text="이름 변경", command=self._rename_price_profile).pack(side="left", padx=2, pady=2)
         ttk.Button(profile_buttons_frame, text="삭제", command=self._delete_price_profile).pack(side="left", padx=2, pady=2)
+        ttk.Button(profile_buttons_frame, text="일괄 조정", command=self._bulk_edit_profile_prices).pack(side="left", padx=2, pady=2)
+        ttk.Button(profile_buttons_frame, text="비교", command=self._compare_price_profiles).pack(side="left", padx=2, pady=2)
         self.profile_edit_frame = ttk.LabelFrame(tab, text="선택된 프로파일 상세"); self.profile_edit_frame.pack(side="left", fill="both", expand=True, padx=10, pady=10)
         self._setup_profile_edit_frame_widgets()
         self._refresh_price_profile_listbox(); self._clear_price_profile_details_view()
@@ -756,12 +1104,18 @@ class App(tk.Tk):
             self.profile_item_prices_tree.column(col_id, width=item_price_widths[i], anchor='w' if i == 0 else 'e')
         
         self.profile_item_prices_tree.bind("<Double-1>", self._on_profile_price_double_click) # Add this line
+        self.profile_item_prices_tree_sync = TreeviewSync(self.profile_item_prices_tree)
 
         tree_scroll_y = ttk.Scrollbar(item_prices_frame, orient="vertical", command=self.profile_item_prices_tree.yview); self.profile_item_prices_tree.configure(yscrollcommand=tree_scroll_y.set)
         self.profile_item_prices_tree.pack(side="left", fill="both", expand=True); tree_scroll_y.pack(side="right", fill="y")
         item_buttons_frame = ttk.Frame(self.profile_edit_frame); item_buttons_frame.grid(row=2, column=0, columnspan=3, pady=5)
         ttk.Button(item_buttons_frame, text="품목 단가 추가/수정", command=self._add_or_edit_profile_item_price).pack(side="left", padx=5)
         ttk.Button(item_buttons_frame, text="품목 단가 삭제", command=self._remove_profile_item_price).pack(side="left", padx=5)
+        ttk.Button(item_buttons_frame, text="단가 규칙 설정", command=self._edit_profile_price_rule).pack(side="left", padx=5)
+        ttk.Button(item_buttons_frame, text="단가표 가져오기...", command=self._import_profile_prices).pack(side="left", padx=5)
+        ttk.Button(item_buttons_frame, text="단가표 내보내기...", command=self._export_profile_prices).pack(side="left", padx=5)
+        self.profile_rule_var = tk.StringVar()
+        ttk.Label(item_buttons_frame, textvariable=self.profile_rule_var).pack(side="left", padx=5)
 
     def _on_profile_price_double_click(self, event):
         """Handle double-click on the price profile items tree for in-place editing."""
@@ -797,12 +1151,11 @@ class App(tk.Tk):
         if not profile:
             return
 
-        item_key_tuple = tuple(item_iid.split(storage.ITEM_KEY_SEPARATOR))
-        if len(item_key_tuple) != 3 or item_key_tuple not in profile.item_prices:
+        sku_id = int(item_iid) # iid는 품목 SKU ID
+        original_price_decimal = profile.get_price(sku_id, self.product_catalog.items_by_sku.get(sku_id))
+        if original_price_decimal is None:
             return
         
-        original_price_decimal = profile.item_prices[item_key_tuple]
-        
         entry_var = tk.StringVar(value=str(original_price_decimal)) # Edit the raw decimal string
         
         entry = ttk.Entry(tree, textvariable=entry_var, width=width//7) # Approximate width
@@ -813,7 +1166,7 @@ class App(tk.Tk):
         self._profile_price_edit_entry = entry
         self._profile_price_edit_item_iid = item_iid
         self._profile_price_edit_profile = profile
-        self._profile_price_edit_key_tuple = item_key_tuple
+        self._profile_price_edit_sku_id = sku_id
 
         entry.bind("<Return>", self._save_profile_price_edit)
         entry.bind("<FocusOut>", self._save_profile_price_edit)
@@ -827,7 +1180,7 @@ class App(tk.Tk):
         new_price_str = entry.get().strip()
         item_iid = self._profile_price_edit_item_iid
         profile = self._profile_price_edit_profile
-        item_key_tuple = self._profile_price_edit_key_tuple
+        sku_id = self._profile_price_edit_sku_id
 
         entry.destroy()
         self._profile_price_edit_entry = None # Clear the reference
@@ -843,27 +1196,23 @@ class App(tk.Tk):
                 messagebox.showwarning("가격 오류", "단가는 0보다 크거나 같아야 합니다.", parent=self)
                 self._refresh_profile_item_prices_tree(profile)
                 return
+            if not self._confirm_price_margin(profile, sku_id, new_price_decimal):
+                self._refresh_profile_item_prices_tree(profile) # Refresh to show original
+                return
             
             # Update the model
-            profile.item_prices[item_key_tuple] = new_price_decimal
-            storage.save_price_profiles(self.price_profiles)
-            
-            # Update the treeview directly for the edited cell
-            # The _refresh_profile_item_prices_tree will re-sort, so direct update is better for UX
-            # However, for simplicity and to ensure sorting is maintained, we'll refresh the whole tree for now.
-            # A more advanced implementation would update the specific cell:
-            # self.profile_item_prices_tree.set(item_iid, "#2", f"{new_price_decimal:,.2f}")
-            self._refresh_profile_item_prices_tree(profile) # This re-fetches and re-sorts
+            previous_value = price_history.snapshot_own_value(profile, sku_id)
+            profile.set_price(sku_id, new_price_decimal)
+            self.price_history.record_profile_price(profile, sku_id, previous_value)
+            self._save_price_profiles()
             
-            # Reselect the edited item and ensure it's visible
-            if self.price_profile_listbox.curselection():
-                selected_profile_name_in_list = self.price_profile_listbox.get(self.price_profile_listbox.curselection()[0])
-                if selected_profile_name_in_list == profile.name:
-                    # Try to re-focus the item in the tree if it's still there after refresh
-                    if self.profile_item_prices_tree.exists(item_iid):
-                         self.profile_item_prices_tree.selection_set(item_iid)
-                         self.profile_item_prices_tree.focus(item_iid)
-                         self.profile_item_prices_tree.see(item_iid)
+            # 가격 변경은 정렬 순서(품목 키 기준)에 영향을 주지 않으므로 해당 행 하나만 갱신합니다.
+            # 선택 및 스크롤 위치는 그대로 유지됩니다.
+            if self.profile_item_prices_tree.exists(item_iid):
+                item_desc_display = self.profile_item_prices_tree.item(item_iid, "values")[0]
+                self.profile_item_prices_tree_sync.update_row(item_iid, (item_desc_display, f"{new_price_decimal:,.2f}"))
+            else:
+                self._refresh_profile_item_prices_tree(profile)
 
 
         except InvalidOperation:
@@ -895,18 +1244,13 @@ class App(tk.Tk):
             if not profile_name: messagebox.showwarning("입력 오류", "프로파일 이름은 비워둘 수 없습니다.", parent=self); return
             if any(p.name.lower() == profile_name.lower() for p in self.price_profiles): messagebox.showwarning("중복 오류", f"이미 '{profile_name}' 이름의 프로파일이 존재합니다.", parent=self); return
             
-            new_profile = PriceProfile(name=profile_name)
+            # 일반대리점가를 복사해 두는 대신 규칙으로 정의하여 마스터 단가 변경이 그대로 반영되도록 함
+            new_profile = PriceProfile(name=profile_name, rule=PriceRule(tier=PriceTier.DEALER))
             if not self.product_master_items:
                 self._load_product_master_data() 
-
-            for item_obj in self.product_master_items:
-                dealer_price = item_obj.prices.get(PriceTier.DEALER.value)
-                if dealer_price is not None:
-                    item_key_tuple = (item_obj.model_name, item_obj.product_name, item_obj.spec)
-                    new_profile.item_prices[item_key_tuple] = dealer_price
             
             self.price_profiles.append(new_profile)
-            storage.save_price_profiles(self.price_profiles)
+            self._save_price_profiles()
             self._refresh_price_profile_listbox()
             newly_added_profile_selected = False
             for i, p_name in enumerate(self.price_profile_listbox.get(0, tk.END)):
@@ -920,7 +1264,7 @@ class App(tk.Tk):
                 self.price_profile_listbox.selection_set(0) 
                 self._on_price_profile_selected(None)
 
-            messagebox.showinfo("성공", f"'{profile_name}' 프로파일이 추가되고 기본 단가로 채워졌습니다.", parent=self)
+            messagebox.showinfo("성공", f"'{profile_name}' 프로파일이 추가되었습니다.\n품목 단가는 일반대리점가 기준 규칙으로 계산됩니다. ('단가 규칙 설정'에서 변경)", parent=self)
             self._update_company_price_tier_combo_values() 
     
     def _rename_price_profile(self): # Only one instance of this method now
@@ -935,7 +1279,7 @@ class App(tk.Tk):
             if not new_name: messagebox.showwarning("입력 오류", "프로파일 이름은 비워둘 수 없습니다.", parent=self); return
             if new_name.lower() != profile_to_rename.name.lower() and any(p.name.lower() == new_name.lower() for p in self.price_profiles): messagebox.showwarning("중복 오류", f"이미 '{new_name}' 이름의 프로파일이 존재합니다.", parent=self); return
             profile_to_rename.name = new_name
-            storage.save_price_profiles(self.price_profiles)
+            self._save_price_profiles()
             self._refresh_price_profile_listbox()
             for i, p_name in enumerate(self.price_profile_listbox.get(0, tk.END)): # Reselect after refresh
                 if p_name == new_name: 
@@ -956,9 +1300,13 @@ class App(tk.Tk):
         if messagebox.askyesno("삭제 확인", f"정말로 '{profile_to_delete.name}' 프로파일을 삭제하시겠습니까?\n이 프로파일을 사용하는 모든 거래처에서 연결이 해제됩니다.", parent=self):
             for company in self.companies:
                 if company.custom_price_profile_id == profile_to_delete.id: company.custom_price_profile_id = None
-            storage.save_companies(self.companies)
+            self._save_companies()
+            # 이 프로파일을 기본으로 쓰는 프로파일은 단가를 복사해 받고 연결을 끊음
+            for profile in self.price_profiles:
+                if profile.base is profile_to_delete or profile.base_profile_id == profile_to_delete.id:
+                    profile.detach_base()
             self.price_profiles.remove(profile_to_delete)
-            storage.save_price_profiles(self.price_profiles)
+            self._save_price_profiles()
             self._refresh_price_profile_listbox()
             self._refresh_company_management_listbox()
             self._refresh_company_listbox_invoice_tab()
@@ -968,8 +1316,8 @@ class App(tk.Tk):
 
     def _clear_price_profile_details_view(self):
         if hasattr(self, 'selected_profile_name_var'): self.selected_profile_name_var.set("")
-        if hasattr(self, 'profile_item_prices_tree'):
-            for i in self.profile_item_prices_tree.get_children(): self.profile_item_prices_tree.delete(i)
+        if hasattr(self, 'profile_item_prices_tree_sync'): self.profile_item_prices_tree_sync.clear()
+        if hasattr(self, 'profile_rule_var'): self.profile_rule_var.set("")
 
     def _on_price_profile_selected(self, event):
         if not hasattr(self, 'price_profile_listbox'): return
@@ -982,23 +1330,33 @@ class App(tk.Tk):
             self._refresh_profile_item_prices_tree(profile)
         else: self._clear_price_profile_details_view()
 
+    @profiling.traced("App._refresh_profile_item_prices_tree")
     def _refresh_profile_item_prices_tree(self, profile: PriceProfile):
         if not hasattr(self, 'profile_item_prices_tree'): return
-        for i in self.profile_item_prices_tree.get_children(): self.profile_item_prices_tree.delete(i)
         
-        sorted_item_tuple_keys = sorted(profile.item_prices.keys(), key=lambda k: (k[1], k[0], k[2])) 
-
-        for item_key_tuple in sorted_item_tuple_keys:
-            price = profile.item_prices[item_key_tuple]
-            m, p, s = item_key_tuple[0], item_key_tuple[1], item_key_tuple[2]
+        # SKU ID -> 첫 번째 마스터 품목
+        master_items_by_sku = self.product_catalog.items_by_sku
+        # 기본(base) 프로파일에서 물려받은 단가와 규칙으로 계산한 단가까지 포함
+        effective_prices = pricing.profile_item_prices(profile, master_items_by_sku)
+        registry = sku.get_registry()
+        by_product_model_spec = operator.itemgetter(1, 0, 2)
+        sorted_sku_ids = sorted(effective_prices.keys(), key=lambda k: by_product_model_spec(registry.key_for(k)))
+        rule = profile.effective_rule()
+        self.profile_rule_var.set(f"규칙: {rule.describe()}" if rule is not None else "")
+
+        rows = []
+        for sku_id in sorted_sku_ids:
+            price = effective_prices[sku_id]
+            m, p, s = registry.key_for(sku_id)
             
-            master_item_ref = next((it for it in self.product_master_items if it.model_name == m and it.product_name == p and it.spec == s), None)
+            master_item_ref = master_items_by_sku.get(sku_id)
             item_desc_display = f"{p} ({m} / {s})" # Default display
             if master_item_ref: 
                 item_desc_display = f"{master_item_ref.product_name} ({master_item_ref.model_name} / {master_item_ref.spec})"
             
-            item_key_str_for_iid = storage.ITEM_KEY_SEPARATOR.join(item_key_tuple)
-            self.profile_item_prices_tree.insert("", tk.END, iid=item_key_str_for_iid, values=(item_desc_display, f"{price:,.2f}"))
+            rows.append((str(sku_id), (item_desc_display, f"{price:,.2f}")))
+        # 프로파일 전환이나 단일 편집 시에도 달라진 행만 갱신됨
+        self.profile_item_prices_tree_sync.sync(rows)
 
     def _add_or_edit_profile_item_price(self):
         selected_profile_indices = self.price_profile_listbox.curselection()
@@ -1008,81 +1366,489 @@ class App(tk.Tk):
         if not profile: messagebox.showerror("오류", "선택된 프로파일을 찾을 수 없습니다.", parent=self); return
         
         selected_item_price_iid = self.profile_item_prices_tree.focus()
-        existing_item_key_str: Optional[str] = None
+        existing_sku_id: Optional[int] = None
         initial_price_str = ""
         
-        if selected_item_price_iid: # Editing existing
-            existing_item_key_str = selected_item_price_iid # This iid is the string key "model|product|spec"
-            # Convert string key to tuple key for lookup in profile.item_prices
-            try:
-                item_key_tuple_for_lookup = tuple(existing_item_key_str.split(storage.ITEM_KEY_SEPARATOR))
-                if len(item_key_tuple_for_lookup) == 3 and item_key_tuple_for_lookup in profile.item_prices:
-                    initial_price_str = str(profile.item_prices[item_key_tuple_for_lookup])
-                else: # Should not happen if tree iid is correct
-                    print(f"Warning: Tree IID {existing_item_key_str} not found as tuple key in profile prices for editing.")
-            except Exception as e:
-                 print(f"Error converting tree IID to tuple for price lookup: {e}")
+        if selected_item_price_iid: # Editing existing (iid는 품목 SKU ID)
+            existing_sku_id = int(selected_item_price_iid)
+            existing_price = profile.get_price(existing_sku_id, self.product_catalog.items_by_sku.get(existing_sku_id))
+            if existing_price is not None:
+                initial_price_str = str(existing_price)
+            else: # Should not happen if tree iid is correct
+                logger.warning(f"SKU {existing_sku_id} not found in profile prices for editing.")
         
-        dialog = EditProfileItemPriceDialog(self, self.product_master_items, profile_name=profile.name, existing_item_key_str=existing_item_key_str, initial_price_str=initial_price_str)
+        dialog = EditProfileItemPriceDialog(self, self.product_master_items, profile_name=profile.name, existing_sku_id=existing_sku_id, initial_price_str=initial_price_str)
         if dialog.result:
-            item_key_str_from_dialog, new_price_decimal = dialog.result 
-            try:
-                item_key_tuple = tuple(item_key_str_from_dialog.split(storage.ITEM_KEY_SEPARATOR))
-                if len(item_key_tuple) != 3:
-                    raise ValueError("Item key string from dialog does not have 3 parts after split.")
-                profile.item_prices[item_key_tuple] = new_price_decimal 
-                storage.save_price_profiles(self.price_profiles)
-                self._refresh_profile_item_prices_tree(profile)
-                messagebox.showinfo("성공", "프로파일 품목 단가가 저장되었습니다.", parent=self)
-            except ValueError as e:
-                messagebox.showerror("오류", f"품목 키 형식 오류로 단가를 저장할 수 없습니다: {e}", parent=self)
+            sku_id, new_price_decimal = dialog.result 
+            if not self._confirm_price_margin(profile, sku_id, new_price_decimal): return
+            previous_value = price_history.snapshot_own_value(profile, sku_id)
+            profile.set_price(sku_id, new_price_decimal)
+            self.price_history.record_profile_price(profile, sku_id, previous_value)
+            self._save_price_profiles()
+            self._refresh_profile_item_prices_tree(profile)
+            messagebox.showinfo("성공", "프로파일 품목 단가가 저장되었습니다.", parent=self)
+
+    def _confirm_price_margin(self, profile: PriceProfile, sku_id: int, price: Decimal) -> bool:
+        """매입단가 미만/마진 부족/치료재료단가 초과 단가면 경고하고 저장 여부를 묻습니다."""
+        issues = margin_audit.check_price(self.product_catalog.items_by_sku.get(sku_id), price, self.margin_policy)
+        if not issues: return True
+        model_name, product_name, spec = sku.key_for(sku_id)
+        details = "\n".join(issue.describe() for issue in issues)
+        return messagebox.askyesno("단가 확인", f"'{profile.name}' 프로파일\n{product_name} ({model_name} / {spec}): {price:,.2f}원\n\n{details}\n\n그래도 저장하시겠습니까?",
+                                   icon="warning", parent=self)
 
     def _remove_profile_item_price(self):
         selected_profile_indices = self.price_profile_listbox.curselection()
         if not selected_profile_indices: messagebox.showwarning("프로파일 미선택", "단가를 삭제할 프로파일을 선택해주세요.", parent=self); return
-        selected_profile_name = self.price_profile_listbox.get(selected_indices[0])
+        selected_profile_name = self.price_profile_listbox.get(selected_profile_indices[0])
         profile = next((p for p in self.price_profiles if p.name == selected_profile_name), None)
         if not profile: messagebox.showerror("오류", "선택된 프로파일을 찾을 수 없습니다.", parent=self); return
         
         selected_item_price_iid = self.profile_item_prices_tree.focus()
         if not selected_item_price_iid: messagebox.showwarning("품목 미선택", "프로파일에서 삭제할 품목 단가를 선택해주세요.", parent=self); return
         
-        item_key_to_remove_str = selected_item_price_iid 
-        try:
-            item_key_to_remove_tuple = tuple(item_key_to_remove_str.split(storage.ITEM_KEY_SEPARATOR))
-            if len(item_key_to_remove_tuple) != 3:
-                 raise ValueError("Item key string does not have 3 parts after split.")
-
-            if item_key_to_remove_tuple in profile.item_prices:
-                item_values = self.profile_item_prices_tree.item(selected_item_price_iid, "values")
-                item_display_name = item_values[0] if item_values else item_key_to_remove_str
-                
-                if messagebox.askyesno("삭제 확인", f"'{profile.name}' 프로파일에서\n'{item_display_name}' 품목의 단가를 삭제하시겠습니까?", parent=self):
-                    del profile.item_prices[item_key_to_remove_tuple] 
-                    storage.save_price_profiles(self.price_profiles)
-                    self._refresh_profile_item_prices_tree(profile)
-                    messagebox.showinfo("성공", "프로파일 품목 단가가 삭제되었습니다.", parent=self)
+        sku_id = int(selected_item_price_iid) # iid는 품목 SKU ID
+        if profile.get_price(sku_id, self.product_catalog.items_by_sku.get(sku_id)) is not None:
+            item_values = self.profile_item_prices_tree.item(selected_item_price_iid, "values")
+            item_display_name = item_values[0] if item_values else sku.key_str(sku_id)
+            
+            if messagebox.askyesno("삭제 확인", f"'{profile.name}' 프로파일에서\n'{item_display_name}' 품목의 단가를 삭제하시겠습니까?", parent=self):
+                previous_value = price_history.snapshot_own_value(profile, sku_id)
+                profile.remove_price(sku_id)
+                self.price_history.record_profile_price(profile, sku_id, previous_value)
+                self._save_price_profiles()
+                self._refresh_profile_item_prices_tree(profile)
+                messagebox.showinfo("성공", "프로파일 품목 단가가 삭제되었습니다.", parent=self)
+        else:
+            messagebox.showerror("오류", "선택된 품목 단가를 프로파일에서 찾을 수 없습니다.", parent=self)
+
+    def _edit_profile_price_rule(self):
+        selected_profile_indices = self.price_profile_listbox.curselection()
+        if not selected_profile_indices: messagebox.showwarning("프로파일 미선택", "단가 규칙을 설정할 프로파일을 선택해주세요.", parent=self); return
+        selected_profile_name = self.price_profile_listbox.get(selected_profile_indices[0])
+        profile = next((p for p in self.price_profiles if p.name == selected_profile_name), None)
+        if not profile: messagebox.showerror("오류", "선택된 프로파일을 찾을 수 없습니다.", parent=self); return
+
+        dialog = PriceRuleDialog(self, profile_name=profile.name, rule=profile.rule)
+        if dialog.result is None:
+            return
+        _, new_rule = dialog.result
+        if new_rule is not None and profile.rule is not None:
+            # 제외 품목은 기존 규칙의 것을 유지
+            new_rule = dataclasses.replace(new_rule, excluded_keys=profile.rule.excluded_keys)
+        previous_rule, profile.rule = profile.rule, new_rule
+        self.price_history.record_profile_rule(profile, previous_rule)
+        self._save_price_profiles()
+        self._refresh_profile_item_prices_tree(profile)
+
+    def _selected_price_profile(self, action: str) -> Optional[PriceProfile]:
+        selected_profile_indices = self.price_profile_listbox.curselection()
+        if not selected_profile_indices: messagebox.showwarning("프로파일 미선택", f"{action} 프로파일을 선택해주세요.", parent=self); return None
+        selected_profile_name = self.price_profile_listbox.get(selected_profile_indices[0])
+        profile = next((p for p in self.price_profiles if p.name == selected_profile_name), None)
+        if not profile: messagebox.showerror("오류", "선택된 프로파일을 찾을 수 없습니다.", parent=self)
+        return profile
+
+    def _import_profile_prices(self):
+        """병원 계약 단가표(CSV/엑셀)를 백그라운드에서 읽어 품목을 찾은 뒤, 확인을 받아 한 번에 반영"""
+        profile = self._selected_price_profile("단가표를 가져올")
+        if not profile: return
+        filepath = filedialog.askopenfilename(title=f"'{profile.name}' 단가표 가져오기",
+                                              filetypes=(("단가표", "*.csv *.xlsx *.xlsm"), ("CSV files", "*.csv"), ("Excel files", "*.xlsx *.xlsm"), ("All files", "*.*")))
+        if not filepath: return
+        # 품목 인덱스는 지금 만들고, 파일 읽기와 매칭만 백그라운드에서
+        matcher = profile_io.SkuMatcher.for_profile(self.product_catalog.items_by_sku, profile)
+        self.jobs.submit("단가표 읽기", profile_io.read_price_list, filepath, matcher, key="profile_import",
+                         on_done=lambda result: self._on_price_list_read(profile, filepath, result),
+                         on_error=lambda e: messagebox.showerror("가져오기 오류", f"단가표를 읽지 못했습니다:\n{filepath}\n{e}", parent=self))
+
+    def _on_price_list_read(self, profile: PriceProfile, filepath: str, result: profile_io.ImportResult):
+        if not any(p is profile for p in self.price_profiles):
+            return # 읽는 동안 프로파일 목록이 다시 로드됨 (공유 폴더 모드)
+        if result.prices and messagebox.askyesno("단가표 가져오기", f"{os.path.basename(filepath)}: {result.summary()}\n\n'{profile.name}' 프로파일에 반영하시겠습니까?", parent=self):
+            changes = profile_io.apply_import(profile, result)
+            if changes:
+                self.price_history.record_profile_prices(changes)
+                self._save_price_profiles()
+                if self.selected_profile_name_var.get() == profile.name: self._refresh_profile_item_prices_tree(profile)
+            messagebox.showinfo("성공", f"'{profile.name}' 프로파일에 {len(changes)}건의 단가를 반영했습니다. (같은 단가 {len(result.prices) - len(changes)}건 제외)", parent=self)
+        elif not result.prices:
+            messagebox.showwarning("단가표 가져오기", f"반영할 수 있는 행이 없습니다.\n{result.summary()}", parent=self)
+        if result.unmatched and messagebox.askyesno("매칭 실패", f"품목을 찾지 못했거나 단가가 잘못된 행이 {len(result.unmatched)}개 있습니다.\n목록을 CSV로 저장하시겠습니까?", parent=self):
+            report_path = filedialog.asksaveasfilename(title="매칭 실패 행 저장", defaultextension=".csv", filetypes=(("CSV files", "*.csv"),),
+                                                       initialfile=f"{os.path.splitext(os.path.basename(filepath))[0]}_매칭실패.csv")
+            if report_path:
+                try: profile_io.write_unmatched_report(result, report_path)
+                except OSError as e: messagebox.showerror("오류", f"저장하지 못했습니다: {e}", parent=self)
+
+    def _export_profile_prices(self):
+        profile = self._selected_price_profile("단가표를 내보낼")
+        if not profile: return
+        filepath = filedialog.asksaveasfilename(title=f"'{profile.name}' 단가표 내보내기", defaultextension=".csv",
+                                                filetypes=(("CSV files", "*.csv"), ("Excel files", "*.xlsx")),
+                                                initialfile=f"{profile.name}_단가.csv")
+        if not filepath: return
+        rows = profile_io.export_rows(profile, self.product_catalog.items_by_sku) # 현재 단가를 지금 복사하고 파일 쓰기만 백그라운드에서
+        self.jobs.submit("단가표 내보내기", profile_io.write_price_list, filepath, rows,
+                         on_done=lambda count: messagebox.showinfo("내보내기", f"'{profile.name}' 단가 {count}건을 저장했습니다:\n{filepath}", parent=self),
+                         on_error=lambda e: messagebox.showerror("내보내기 오류", f"단가표를 저장하지 못했습니다:\n{filepath}\n{e}", parent=self))
+
+    def _bulk_edit_profile_prices(self):
+        """여러 프로파일의 단가를 비율/금액으로 한 번에 조정 (미리보기 후 반영, 저장과 화면 갱신은 한 번)"""
+        if not self.price_profiles: messagebox.showwarning("프로파일 없음", "조정할 단가 프로파일이 없습니다.", parent=self); return
+        selected_names = [self.price_profile_listbox.get(i) for i in self.price_profile_listbox.curselection()]
+        dialog = BulkPriceEditDialog(self, self.price_profiles, selected_names)
+        plan = dialog.result
+        if not plan: return
+        changes = bulk_edit.apply_bulk_edit(plan)
+        self.price_history.record_profile_prices(changes)
+        self._save_price_profiles()
+        selected_profile = next((p for p in self.price_profiles if p.name == self.selected_profile_name_var.get()), None)
+        if selected_profile is not None: self._refresh_profile_item_prices_tree(selected_profile)
+        logger.info("단가 일괄 조정: %s", plan.summary())
+        messagebox.showinfo("성공", f"단가를 일괄 조정했습니다.\n{plan.summary()}", parent=self)
+
+    def _compare_price_profiles(self):
+        """선택한 프로파일들과 가격 등급을 품목별로 비교하는 창"""
+        if not self.price_profiles: messagebox.showwarning("프로파일 없음", "비교할 단가 프로파일이 없습니다.", parent=self); return
+        selected_names = [self.price_profile_listbox.get(i) for i in self.price_profile_listbox.curselection()]
+        ProfileCompareDialog(self, self.price_profiles, self.product_catalog.items_by_sku, selected_names)
+
+# --- Custom Dialog for Profile Comparison ---
+class ProfileCompareDialog(simpledialog.Dialog):
+    """프로파일/가격 등급 단가 비교표. 전체 행은 profile_compare 결과로 들고, 화면에는 보이는 행만 둠 (VirtualTreeview)"""
+    COMPARE_TIERS = [PriceTier.DEALER, PriceTier.A, PriceTier.B, PriceTier.MEDICAL, PriceTier.PURCHASE, PriceTier.ETC]
+    VISIBLE_ROWS = 20
+    MODES = {"단가": profile_compare.SORT_PRICE, "기준 대비 차이(원)": profile_compare.SORT_DELTA, "기준 대비 비율": profile_compare.SORT_RATIO}
+
+    def __init__(self, parent, price_profiles: List[PriceProfile], items_by_sku: Dict[int, Item], selected_names: List[str]):
+        self.app = parent
+        self.price_profiles = price_profiles
+        self.items_by_sku = items_by_sku
+        self.selected_names = selected_names
+        # 선택 목록: 가격 등급 다음 프로파일
+        self.sources = ([profile_compare.CompareColumn.for_tier(tier) for tier in self.COMPARE_TIERS]
+                        + [profile_compare.CompareColumn.for_profile(profile) for profile in price_profiles])
+        self.source_labels = [f"[등급] {c.label}" if c.tier is not None else c.label for c in self.sources]
+        self.baseline_var = tk.StringVar(value=self.source_labels[0])
+        self.search_var = tk.StringVar()
+        self.differences_only_var = tk.BooleanVar(value=True)
+        self.mode_var = tk.StringVar(value="기준 대비 차이(원)")
+        self.summary_var = tk.StringVar(value="비교할 프로파일/등급을 선택하고 '비교'를 누르세요. (기준 열과 비교)")
+        self.result: Optional[profile_compare.ComparisonResult] = None
+        self._order: List[int] = []
+        self._sort = (profile_compare.SORT_NAME, 0, False) # (정렬 기준, 열, 내림차순)
+        super().__init__(parent, title="단가 프로파일 비교")
+
+    def body(self, master):
+        left = ttk.LabelFrame(master, text="비교 대상 (여러 개 선택 가능)"); left.grid(row=0, column=0, rowspan=2, sticky="ns", padx=10, pady=10)
+        ttk.Label(left, text="기준:").pack(anchor="w", padx=5)
+        ttk.Combobox(left, textvariable=self.baseline_var, values=self.source_labels, state="readonly", width=26).pack(fill="x", padx=5, pady=(0, 5))
+        self.source_listbox = tk.Listbox(left, selectmode="extended", exportselection=False, width=28, height=18)
+        self.source_listbox.pack(fill="both", expand=True, padx=5, pady=5)
+        for i, label in enumerate(self.source_labels):
+            self.source_listbox.insert(tk.END, label)
+            if self.sources[i].profile is not None and label in self.selected_names: self.source_listbox.selection_set(i)
+        ttk.Button(left, text="비교", command=self._compare).pack(pady=(0, 5))
+
+        options = ttk.Frame(master); options.grid(row=0, column=1, sticky="ew", padx=10, pady=(10, 0))
+        ttk.Label(options, text="검색:").pack(side="left")
+        search_entry = ttk.Entry(options, textvariable=self.search_var, width=25); search_entry.pack(side="left", padx=5)
+        search_entry.bind("<Return>", lambda e: self._apply_order())
+        ttk.Checkbutton(options, text="차이 있는 품목만", variable=self.differences_only_var, command=self._apply_order).pack(side="left", padx=5)
+        ttk.Label(options, text="표시:").pack(side="left", padx=(10, 0))
+        mode_combo = ttk.Combobox(options, textvariable=self.mode_var, values=list(self.MODES), state="readonly", width=16)
+        mode_combo.pack(side="left", padx=5); mode_combo.bind("<<ComboboxSelected>>", lambda e: self._on_mode_changed())
+        ttk.Button(options, text="내보내기...", command=self._export).pack(side="right")
+
+        table = ttk.Frame(master); table.grid(row=1, column=1, sticky="nsew", padx=10, pady=(5, 10))
+        self.compare_tree = ttk.Treeview(table, columns=("item",), show="headings", height=self.VISIBLE_ROWS, selectmode="browse")
+        self.compare_tree.heading("item", text="품목"); self.compare_tree.column("item", width=320, anchor="w")
+        compare_scroll = ttk.Scrollbar(table, orient="vertical")
+        self.compare_tree.pack(side="left", fill="both", expand=True); compare_scroll.pack(side="right", fill="y")
+        self.virtual_tree = VirtualTreeview(self.compare_tree, compare_scroll, self._format_row)
+        ttk.Label(master, textvariable=self.summary_var, justify="left").grid(row=2, column=0, columnspan=2, sticky="w", padx=10, pady=(0, 5))
+        return self.source_listbox
+
+    def buttonbox(self):
+        box = ttk.Frame(self)
+        ttk.Button(box, text="닫기", width=10, command=self.cancel).pack(side=tk.LEFT, padx=5, pady=5)
+        self.bind("<Escape>", self.cancel)
+        box.pack(pady=5)
+
+    def _compare(self):
+        baseline = self.source_labels.index(self.baseline_var.get())
+        others = [i for i in self.source_listbox.curselection() if i != baseline]
+        if not others:
+            messagebox.showwarning("대상 미선택", "기준과 비교할 프로파일/등급을 하나 이상 선택해주세요.", parent=self); return
+        columns = [self.sources[i] for i in [baseline, *others]]
+        self.result = profile_compare.compare_prices(columns, self.items_by_sku)
+
+        # 열 구성 변경: 품목, 열별 값, 최대 차이
+        self.virtual_tree.clear()
+        col_ids = ["item", *(f"c{i}" for i in range(len(columns))), "spread"]
+        self.compare_tree.configure(columns=col_ids)
+        self.compare_tree.heading("item", text="품목", command=lambda: self._sort_by("item"))
+        self.compare_tree.column("item", width=320, anchor="w")
+        for i, column in enumerate(columns):
+            col_id = f"c{i}"
+            self.compare_tree.heading(col_id, text=column.label + (" (기준)" if i == 0 else ""), command=lambda c=col_id: self._sort_by(c))
+            self.compare_tree.column(col_id, width=110, anchor="e", stretch=False)
+        self.compare_tree.heading("spread", text="최대 차이", command=lambda: self._sort_by("spread"))
+        self.compare_tree.column("spread", width=100, anchor="e", stretch=False)
+        self._sort = (profile_compare.SORT_DELTA, 1, True) if len(columns) > 1 else (profile_compare.SORT_NAME, 0, False)
+        self._apply_order()
+
+    def _sort_key_for(self, col_id: str) -> tuple:
+        if col_id == "item": return (profile_compare.SORT_NAME, 0)
+        if col_id == "spread": return (profile_compare.SORT_SPREAD, 0)
+        column = int(col_id[1:])
+        sort = self.MODES.get(self.mode_var.get(), profile_compare.SORT_PRICE)
+        return (profile_compare.SORT_PRICE if column == 0 else sort, column) # 기준 열은 차이/비율이 없음
+
+    def _sort_by(self, col_id: str):
+        sort, column = self._sort_key_for(col_id)
+        current_sort, current_column, descending = self._sort
+        # 같은 열을 다시 누르면 방향 전환, 숫자 열은 큰 값부터
+        descending = not descending if (sort, column) == (current_sort, current_column) else sort != profile_compare.SORT_NAME
+        self._sort = (sort, column, descending)
+        self._apply_order()
+
+    def _on_mode_changed(self):
+        sort, column, descending = self._sort
+        if sort in (profile_compare.SORT_PRICE, profile_compare.SORT_DELTA, profile_compare.SORT_RATIO) and column > 0:
+            self._sort = (self.MODES[self.mode_var.get()], column, descending)
+            self._apply_order()
+        else:
+            self.virtual_tree.refresh() # 정렬은 그대로, 보이는 행의 표시만 바꿈
+
+    def _apply_order(self):
+        if self.result is None: return
+        sort, column, descending = self._sort
+        self._order = self.result.rows(sort, column, descending, self.search_var.get(), self.differences_only_var.get())
+        self.virtual_tree.set_rows(self._order)
+        lines = [f"{self.result.summary()} - 표시 {len(self._order):,}행"]
+        lines += [stat.describe() for stat in self.result.column_stats()[:5]]
+        if len(self.result.columns) > 6: lines.append(f"... 외 {len(self.result.columns) - 6}개 열 (내보내기로 전체 확인)")
+        self.summary_var.set("\n".join(lines))
+
+    def _format_row(self, index: int) -> tuple:
+        prices = self.result.matrix[index]
+        sku_id = self.result.sku_ids[index]
+        model_name, product_name, spec = sku.key_for(sku_id)
+        sort = self.MODES.get(self.mode_var.get(), profile_compare.SORT_PRICE)
+        values = [f"{product_name} ({model_name} / {spec})"]
+        for column, price in enumerate(prices):
+            if column == 0 or sort == profile_compare.SORT_PRICE:
+                values.append(f"{price:,.2f}" if price is not None else "-")
+            elif sort == profile_compare.SORT_DELTA:
+                delta = profile_compare.price_delta(prices, column)
+                values.append(f"{delta:+,.2f}" if delta is not None else ("-" if price is None else "(기준 없음)"))
             else:
-                messagebox.showerror("오류", "선택된 품목 단가를 프로파일에서 찾을 수 없습니다.", parent=self)
-        except ValueError as e:
-            messagebox.showerror("오류", f"품목 키 형식 오류로 단가를 삭제할 수 없습니다: {e}", parent=self)
+                ratio = profile_compare.price_ratio(prices, column)
+                values.append(f"{ratio:.1%}" if ratio is not None else ("-" if price is None else "(기준 없음)"))
+        spread = profile_compare.price_spread(prices)
+        values.append(f"{spread:,.2f}" if spread is not None else "")
+        return str(sku_id), tuple(values)
+
+    def _export(self):
+        if self.result is None or not self._order:
+            messagebox.showwarning("내보내기", "먼저 비교를 실행해주세요.", parent=self); return
+        filepath = filedialog.asksaveasfilename(parent=self, title="비교 결과 내보내기", defaultextension=".xlsx",
+                                                filetypes=(("Excel files", "*.xlsx"), ("CSV files", "*.csv")), initialfile="단가_비교.xlsx")
+        if not filepath: return
+        result, order, app = self.result, list(self._order), self.app # 현재 정렬/필터 그대로, 행 만들기와 쓰기는 백그라운드에서
+        app.jobs.submit("단가 비교 내보내기",
+                        lambda: profile_io.write_table(filepath, result.export_headers(), result.export_rows(order), sheet_title="단가 비교"),
+                        on_done=lambda count: messagebox.showinfo("내보내기", f"{count:,}행을 저장했습니다:\n{filepath}", parent=app),
+                        on_error=lambda e: messagebox.showerror("내보내기 오류", f"저장하지 못했습니다:\n{filepath}\n{e}", parent=app))
+
+# --- Custom Dialog for Bulk Price Edit ---
+class BulkPriceEditDialog(simpledialog.Dialog):
+    """단가 일괄 조정 설정과 미리보기. result: 반영할 bulk_edit.BulkEditPlan (취소하면 None)"""
+    PREVIEW_LIMIT = 500 # 미리보기에 표시할 최대 행 수
+
+    def __init__(self, parent, price_profiles: List[PriceProfile], selected_names: List[str]):
+        self.price_profiles = price_profiles
+        self.selected_names = selected_names
+        self.filter_var = tk.StringVar()
+        self.min_price_var = tk.StringVar()
+        self.max_price_var = tk.StringVar()
+        self.percent_var = tk.StringVar(value="0")
+        self.amount_var = tk.StringVar(value="0")
+        self.round_unit_var = tk.StringVar()
+        self.summary_var = tk.StringVar(value="조정 방법을 입력하고 '미리보기'를 누르세요.")
+        self.result: Optional[bulk_edit.BulkEditPlan] = None
+        self._plan: Optional[bulk_edit.BulkEditPlan] = None
+        super().__init__(parent, title="단가 일괄 조정")
+
+    def body(self, master):
+        left = ttk.LabelFrame(master, text="대상 프로파일 (여러 개 선택 가능)"); left.grid(row=0, column=0, rowspan=2, sticky="ns", padx=10, pady=10)
+        self.profile_listbox = tk.Listbox(left, selectmode="extended", exportselection=False, width=28, height=16)
+        self.profile_listbox.pack(fill="both", expand=True, padx=5, pady=5)
+        for i, profile in enumerate(self.price_profiles):
+            self.profile_listbox.insert(tk.END, profile.name)
+            if profile.name in self.selected_names: self.profile_listbox.selection_set(i)
+        ttk.Button(left, text="모두 선택", command=lambda: self.profile_listbox.selection_set(0, tk.END)).pack(pady=(0, 5))
+
+        options = ttk.LabelFrame(master, text="조정 방법"); options.grid(row=0, column=1, sticky="ew", padx=10, pady=(10, 5))
+        fields = [("품목 검색어 (모두 포함, 비우면 전체):", self.filter_var, 30),
+                  ("현재 단가 최소 (선택):", self.min_price_var, 15), ("현재 단가 최대 (선택):", self.max_price_var, 15),
+                  ("비율 조정 % (예: 3, -2.5):", self.percent_var, 15), ("금액 조정 원 (예: 1000, -500):", self.amount_var, 15),
+                  ("반올림 단위 (예: 100, 비우면 안 함):", self.round_unit_var, 15)]
+        for row, (label, var, width) in enumerate(fields):
+            ttk.Label(options, text=label).grid(row=row, column=0, sticky="w", padx=5, pady=2)
+            ttk.Entry(options, textvariable=var, width=width).grid(row=row, column=1, sticky="w", padx=5, pady=2)
+        ttk.Button(options, text="미리보기", command=self._preview).grid(row=len(fields), column=1, sticky="e", padx=5, pady=5)
+
+        preview = ttk.LabelFrame(master, text="미리보기"); preview.grid(row=1, column=1, sticky="nsew", padx=10, pady=(5, 10))
+        cols = ("profile", "item", "old", "new")
+        self.preview_tree = ttk.Treeview(preview, columns=cols, show="headings", height=10)
+        for col, text, width, anchor in zip(cols, ["프로파일", "품목", "현재 단가", "조정 단가"], [140, 280, 90, 90], ["w", "w", "e", "e"]):
+            self.preview_tree.heading(col, text=text); self.preview_tree.column(col, width=width, anchor=anchor)
+        preview_scroll = ttk.Scrollbar(preview, orient="vertical", command=self.preview_tree.yview)
+        self.preview_tree.configure(yscrollcommand=preview_scroll.set)
+        self.preview_tree.pack(side="left", fill="both", expand=True); preview_scroll.pack(side="right", fill="y")
+        ttk.Label(master, textvariable=self.summary_var).grid(row=2, column=0, columnspan=2, sticky="w", padx=10, pady=(0, 5))
+        return self.profile_listbox
+
+    def _build_plan(self) -> Optional[bulk_edit.BulkEditPlan]:
+        """입력값으로 조정 계획 계산. 입력 오류면 경고 후 None"""
+        targets = [self.price_profiles[i] for i in self.profile_listbox.curselection()]
+        if not targets:
+            messagebox.showwarning("프로파일 미선택", "조정할 프로파일을 선택해주세요.", parent=self); return None
+        try:
+            adjustment = bulk_edit.BulkAdjustment(percent=Decimal(self.percent_var.get().strip() or "0"),
+                                                  amount=Decimal(self.amount_var.get().strip() or "0"),
+                                                  round_unit=Decimal(self.round_unit_var.get().strip() or "0"))
+            min_text, max_text = self.min_price_var.get().strip(), self.max_price_var.get().strip()
+            sku_filter = bulk_edit.SkuFilter(self.filter_var.get().strip(), Decimal(min_text) if min_text else None,
+                                             Decimal(max_text) if max_text else None)
+        except InvalidOperation:
+            messagebox.showwarning("입력 오류", "비율, 금액, 단가 범위, 반올림 단위는 숫자로 입력해주세요.", parent=self); return None
+        if adjustment.round_unit < 0 or adjustment.percent <= -100:
+            messagebox.showwarning("입력 오류", "비율은 -100%보다 커야 하고 반올림 단위는 0 이상이어야 합니다.", parent=self); return None
+        return bulk_edit.plan_bulk_edit(self.price_profiles, targets, adjustment, sku_filter)
+
+    def _preview(self):
+        plan = self._build_plan()
+        if plan is None: return
+        children = self.preview_tree.get_children("")
+        if children: self.preview_tree.delete(*children)
+        rows = plan.preview_rows(self.PREVIEW_LIMIT)
+        for names, key, old_price, new_price in rows:
+            m, p, s = sku.key_for(key)
+            self.preview_tree.insert("", tk.END, values=(names, f"{p} ({m} / {s})", f"{old_price:,.2f}", f"{new_price:,.2f}"))
+        summary = plan.summary() if plan else "조정할 단가가 없습니다."
+        if len(rows) >= self.PREVIEW_LIMIT: summary += f" - 처음 {self.PREVIEW_LIMIT}행만 표시"
+        self.summary_var.set(summary)
+
+    def validate(self):
+        plan = self._build_plan()
+        if plan is None: return False
+        if not plan:
+            messagebox.showinfo("변경 없음", "조건에 맞는 직접 지정 단가가 없거나 조정 후에도 단가가 같습니다.", parent=self); return False
+        if not messagebox.askyesno("일괄 조정 확인", f"다음과 같이 단가를 조정하시겠습니까?\n{plan.summary()}", parent=self): return False
+        self._plan = plan
+        return True
+
+    def apply(self):
+        self.result = self._plan
+
+# --- Custom Dialog for Margin Policy ---
+class MarginPolicyDialog(simpledialog.Dialog):
+    """단가 마진 점검 기준 (최소 마진율, 치료재료단가 상한 비율). result: models.MarginPolicy (취소하면 None)"""
+
+    def __init__(self, parent, policy: MarginPolicy):
+        self.min_margin_var = tk.StringVar(value=str(policy.min_margin_percent))
+        self.medical_cap_var = tk.StringVar(value=str(policy.medical_cap_percent))
+        self.result: Optional[MarginPolicy] = None
+        super().__init__(parent, title="마진 점검 기준")
+
+    def body(self, master):
+        ttk.Label(master, text="최소 마진율 % (0이면 매입단가 미만만 점검):").grid(row=0, column=0, sticky="w", padx=10, pady=(10, 2))
+        min_margin_entry = ttk.Entry(master, textvariable=self.min_margin_var, width=10)
+        min_margin_entry.grid(row=0, column=1, sticky="w", padx=10, pady=(10, 2))
+        ttk.Label(master, text="치료재료단가 대비 상한 % (0이면 점검 안 함):").grid(row=1, column=0, sticky="w", padx=10, pady=(2, 10))
+        ttk.Entry(master, textvariable=self.medical_cap_var, width=10).grid(row=1, column=1, sticky="w", padx=10, pady=(2, 10))
+        return min_margin_entry
+
+    def validate(self):
+        try:
+            min_margin = Decimal(self.min_margin_var.get().strip() or "0")
+            medical_cap = Decimal(self.medical_cap_var.get().strip() or "0")
+        except InvalidOperation:
+            messagebox.showwarning("입력 오류", "마진율과 상한 비율은 숫자로 입력해주세요.", parent=self); return False
+        policy = MarginPolicy(min_margin_percent=min_margin, medical_cap_percent=medical_cap)
+        if not policy.is_valid():
+            messagebox.showwarning("입력 오류", "최소 마진율은 0 이상 100 미만, 상한 비율은 0 이상이어야 합니다.", parent=self); return False
+        self._policy = policy
+        return True
+
+    def apply(self):
+        self.result = self._policy
+
+# --- Custom Dialog for Editing Profile Price Rule ---
+class PriceRuleDialog(simpledialog.Dialog):
+    """프로파일 단가 규칙 (가격 등급 × 배율, 반올림 단위) 설정. result: ("set", PriceRule) / ("clear", None)"""
+    RULE_TIERS = [PriceTier.DEALER, PriceTier.A, PriceTier.B, PriceTier.MEDICAL, PriceTier.PURCHASE, PriceTier.ETC]
+
+    def __init__(self, parent, profile_name: str, rule: Optional[PriceRule] = None):
+        self.use_rule_var = tk.BooleanVar(value=rule is not None)
+        self.tier_var = tk.StringVar(value=str(rule.tier if rule is not None else PriceTier.DEALER))
+        self.multiplier_var = tk.StringVar(value=str(rule.multiplier) if rule is not None else "1")
+        self.round_unit_var = tk.StringVar(value=str(rule.round_unit) if rule is not None and rule.round_unit > 0 else "")
+        self.result: Optional[tuple[str, Optional[PriceRule]]] = None
+        super().__init__(parent, title=f"'{profile_name}' 단가 규칙")
+
+    def body(self, master):
+        ttk.Checkbutton(master, text="규칙 사용 (직접 지정하지 않은 품목의 단가를 규칙으로 계산)",
+                        variable=self.use_rule_var).grid(row=0, column=0, columnspan=2, sticky="w", padx=10, pady=(10, 5))
+        ttk.Label(master, text="기준 가격 등급:").grid(row=1, column=0, sticky="w", padx=10, pady=2)
+        ttk.Combobox(master, textvariable=self.tier_var, values=[str(t) for t in self.RULE_TIERS],
+                     state="readonly", width=15).grid(row=1, column=1, sticky="w", padx=10, pady=2)
+        ttk.Label(master, text="배율 (예: 0.95):").grid(row=2, column=0, sticky="w", padx=10, pady=2)
+        multiplier_entry = ttk.Entry(master, textvariable=self.multiplier_var, width=15)
+        multiplier_entry.grid(row=2, column=1, sticky="w", padx=10, pady=2)
+        ttk.Label(master, text="반올림 단위 (예: 100, 비우면 안 함):").grid(row=3, column=0, sticky="w", padx=10, pady=(2, 10))
+        ttk.Entry(master, textvariable=self.round_unit_var, width=15).grid(row=3, column=1, sticky="w", padx=10, pady=(2, 10))
+        return multiplier_entry
+
+    def validate(self):
+        if not self.use_rule_var.get():
+            return True
+        try:
+            multiplier = Decimal(self.multiplier_var.get().strip())
+            round_unit = Decimal(self.round_unit_var.get().strip() or "0")
+        except InvalidOperation:
+            messagebox.showwarning("입력 오류", "배율과 반올림 단위는 숫자로 입력해주세요.", parent=self); return False
+        if multiplier <= 0 or round_unit < 0:
+            messagebox.showwarning("입력 오류", "배율은 0보다 커야 하고 반올림 단위는 0 이상이어야 합니다.", parent=self); return False
+        return True
+
+    def apply(self):
+        if not self.use_rule_var.get():
+            self.result = ("clear", None)
+            return
+        tier = next((t for t in self.RULE_TIERS if str(t) == self.tier_var.get()), PriceTier.DEALER)
+        self.result = ("set", PriceRule(tier=tier, multiplier=Decimal(self.multiplier_var.get().strip()),
+                                        round_unit=Decimal(self.round_unit_var.get().strip() or "0")))
 
 # --- Custom Dialog for Editing Profile Item Price ---
 class EditProfileItemPriceDialog(simpledialog.Dialog):
     def __init__(self, parent, product_master_items: List[Item], profile_name: str,
-                 existing_item_key_str: Optional[str] = None,
+                 existing_sku_id: Optional[int] = None,
                  initial_price_str: str = ""):
         self.product_master_items = product_master_items
         self.profile_name = profile_name
-        self.existing_item_key_str = existing_item_key_str # This is "model|product|spec"
+        self.existing_sku_id = existing_sku_id # 수정할 품목의 SKU ID (추가면 None)
         self.initial_price_str = initial_price_str
-        self.selected_item_key_str: Optional[str] = None # Will also be "model|product|spec"
         self.new_price_var = tk.StringVar(value=initial_price_str)
-        self.result: Optional[tuple[str, Decimal]] = None # (string_key, price)
+        self.result: Optional[tuple[int, Decimal]] = None # (sku_id, price)
         self.item_search_var = tk.StringVar()
         self.item_listbox: Optional[tk.Listbox] = None
-        # dialog_item_map: display_string -> tuple_key for master items
-        self.dialog_item_map: Dict[str, tuple[str, str, str]] = {} 
+        # dialog_item_map: display_string -> SKU ID for master items
+        self.dialog_item_map: Dict[str, int] = {} 
         super().__init__(parent, title=f"'{profile_name}' 프로파일 단가 설정")
 
     def body(self, master):
@@ -1091,16 +1857,12 @@ class EditProfileItemPriceDialog(simpledialog.Dialog):
 
         ttk.Label(top_controls_frame, text="품목:").pack(side="left", padx=(0,5))
 
-        if self.existing_item_key_str: # Editing existing item, key is "model|product|spec"
-            key_parts = self.existing_item_key_str.split(storage.ITEM_KEY_SEPARATOR)
-            item_desc = "알 수 없는 품목"
-            if len(key_parts) == 3:
-                m, p, s = key_parts[0], key_parts[1], key_parts[2]
-                # Find in master to get full product name for display
-                master_item_ref = next((it for it in self.product_master_items if it.model_name == m and it.product_name == p and it.spec == s), None)
-                item_desc = f"{master_item_ref.product_name} ({m}/{s})" if master_item_ref else f"{p} ({m}/{s})" # Fallback display
+        if self.existing_sku_id is not None: # Editing existing item
+            m, p, s = sku.key_for(self.existing_sku_id)
+            # Find in master to get full product name for display
+            master_item_ref = next((it for it in self.product_master_items if it.sku_id == self.existing_sku_id), None)
+            item_desc = f"{master_item_ref.product_name} ({m}/{s})" if master_item_ref else f"{p} ({m}/{s})" # Fallback display
             ttk.Label(top_controls_frame, text=item_desc, width=40, anchor="w").pack(side="left", fill="x", expand=True)
-            self.selected_item_key_str = self.existing_item_key_str # Store the string key
         else: # Adding new item
             search_entry = ttk.Entry(top_controls_frame, textvariable=self.item_search_var, width=30)
             search_entry.pack(side="left", fill="x", expand=True)
@@ -1121,7 +1883,7 @@ class EditProfileItemPriceDialog(simpledialog.Dialog):
         self.price_entry_widget = ttk.Entry(price_frame, textvariable=self.new_price_var, width=15)
         self.price_entry_widget.pack(side="left")
         
-        if not self.existing_item_key_str and self.item_listbox:
+        if self.existing_sku_id is None and self.item_listbox:
             return self.item_listbox 
         return self.price_entry_widget
 
@@ -1131,15 +1893,11 @@ class EditProfileItemPriceDialog(simpledialog.Dialog):
         self.dialog_item_map.clear()
         search_term = filter_text.lower()
         
-        # Use a set to store string representations of unique items (model|product|spec) to avoid duplicates in listbox
-        unique_item_keys_in_listbox = set()
+        # SKU ID (model/product/spec) set to avoid duplicates in listbox
+        unique_sku_ids_in_listbox = set()
 
         for item_obj in self.product_master_items:
-            # Key for uniqueness in this dialog's listbox (model, product, spec)
-            item_tuple_key_for_dialog = (item_obj.model_name, item_obj.product_name, item_obj.spec)
-            item_str_key_for_dialog = storage.ITEM_KEY_SEPARATOR.join(item_tuple_key_for_dialog)
-
-            if item_str_key_for_dialog in unique_item_keys_in_listbox:
+            if item_obj.sku_id in unique_sku_ids_in_listbox:
                 continue # Already added this unique item (model/product/spec combination)
 
             display_text = f"{item_obj.product_name} ({item_obj.model_name} / {item_obj.spec})"
@@ -1147,8 +1905,8 @@ class EditProfileItemPriceDialog(simpledialog.Dialog):
             
             if passes_search:
                 self.item_listbox.insert(tk.END, display_text)
-                self.dialog_item_map[display_text] = item_tuple_key_for_dialog # Map display to tuple key
-                unique_item_keys_in_listbox.add(item_str_key_for_dialog)
+                self.dialog_item_map[display_text] = item_obj.sku_id # Map display to SKU ID
+                unique_sku_ids_in_listbox.add(item_obj.sku_id)
         
         if self.item_listbox.size() > 0: self.item_listbox.selection_set(0)
 
@@ -1164,7 +1922,7 @@ class EditProfileItemPriceDialog(simpledialog.Dialog):
         box.pack(pady=5)
 
     def validate(self):
-        if not self.existing_item_key_str: # If adding new
+        if self.existing_sku_id is None: # If adding new
             if not self.item_listbox or not self.item_listbox.curselection():
                 messagebox.showwarning("품목 미선택", "프로파일에 추가할 품목을 선택해주세요.", parent=self); return False
         
@@ -1180,35 +1938,29 @@ class EditProfileItemPriceDialog(simpledialog.Dialog):
         return True
 
     def apply(self):
-        item_key_tuple_to_return: Optional[tuple[str,str,str]] = None
+        sku_id_to_return: Optional[int] = self.existing_sku_id
         
-        if not self.existing_item_key_str: # Adding new item
+        if sku_id_to_return is None: # Adding new item
             if self.item_listbox and self.item_listbox.curselection():
                 selected_display_name = self.item_listbox.get(self.item_listbox.curselection()[0])
-                item_key_tuple_to_return = self.dialog_item_map.get(selected_display_name)
-        else: # Editing existing item
-            key_parts = self.existing_item_key_str.split(storage.ITEM_KEY_SEPARATOR)
-            if len(key_parts) == 3: 
-                item_key_tuple_to_return = (key_parts[0], key_parts[1], key_parts[2])
+                sku_id_to_return = self.dialog_item_map.get(selected_display_name)
         
-        if not item_key_tuple_to_return: 
+        if sku_id_to_return is None: 
             messagebox.showerror("오류", "품목 키를 결정할 수 없습니다.", parent=self); self.result = None; return
             
-        self.selected_item_key_str = storage.ITEM_KEY_SEPARATOR.join(item_key_tuple_to_return)
-        self.result = (self.selected_item_key_str, Decimal(self.new_price_var.get().strip()))
+        self.result = (sku_id_to_return, Decimal(self.new_price_var.get().strip()))
 
 def main():
+    setup_logging()
+    if os.environ.get("LOHAS_TRACEMALLOC", "") not in ("", "0"):
+        import tracemalloc
+        tracemalloc.start() # 메모리 보고서에 상위 할당 위치를 포함하기 위함
     app = None
     try:
         app = App()
         app.update_idletasks(); app.update(); app.mainloop()
     except Exception as e:
-        print("--------------------------------------------------")
-        print(f"애플리케이션 실행 중 오류 발생: {e}")
-        print("--------------------------------------------------")
-        import traceback
-        traceback.print_exc()
-        print("--------------------------------------------------")
+        logger.exception(f"애플리케이션 실행 중 오류 발생: {e}")
         if app:
             try: app.destroy()
             except: pass
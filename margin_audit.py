@@ -0,0 +1,296 @@
+"""
+단가 마진 점검.
+
+단가 프로파일(직접 지정 + 규칙 단가)과 마스터 가격 등급 단가를 품목의 매입단가(PriceTier.PURCHASE)와
+치료재료단가(PriceTier.MEDICAL, 보험 상한가)에 비교하여 손해 판매/마진 부족/상한 초과 단가를 찾습니다.
+기준(최소 마진율, 상한 비율)은 MarginPolicy 로 정하며 margin_policy.json 에 저장됩니다.
+
+- 품목별 하한(매입단가 ÷ (1 - 최소 마진율))과 상한은 MarginLimits 에서 한 번만 계산하고, 단가 dict 전체를 하한/상한
+  dict 와 한 번에 비교합니다. item_prices 와 규칙이 같은 프로파일(업체 그룹)은 한 번만 점검합니다.
+- check_price() 는 품목 하나의 단가만 점검하므로 단가를 수정할 때 바로 경고하는 데 씁니다.
+
+사용 예:
+    python margin_audit.py                                # 저장된 기준으로 점검, 요약 출력
+    python margin_audit.py --min-margin 5 --output 마진점검.xlsx
+"""
+import argparse
+import operator
+import os
+from dataclasses import dataclass, replace
+from decimal import Decimal
+from typing import Dict, Iterable, List, Mapping, Optional
+
+import pricing
+import profile_io
+import profiling
+import sku
+from models import Item, MarginPolicy, PriceProfile, PriceTier
+
+BELOW_PURCHASE = "매입단가 미만"
+LOW_MARGIN = "마진율 부족"
+ABOVE_MEDICAL = "치료재료단가 초과"
+ISSUE_ORDER = {BELOW_PURCHASE: 0, ABOVE_MEDICAL: 1, LOW_MARGIN: 2}  # 보고서 정렬 (심각한 것부터)
+
+AUDIT_TIERS = [PriceTier.A, PriceTier.B, PriceTier.DEALER, PriceTier.ETC, PriceTier.MEDICAL]
+
+_INFINITY = Decimal("Infinity")
+_HUNDRED = Decimal("100")
+
+
+def _valid_price(value: Optional[Decimal]) -> Optional[Decimal]:
+    """점검 기준으로 쓸 수 있는 단가 (없음/NaN/0 이하는 None)"""
+    if value is None or not value.is_finite() or value <= 0:
+        return None
+    return value
+
+
+@dataclass
+class MarginIssue:
+    source: str                 # 프로파일 이름 또는 "[등급] 일반대리점가"
+    sku_id: int
+    price: Decimal
+    kind: str                   # BELOW_PURCHASE / LOW_MARGIN / ABOVE_MEDICAL
+    purchase: Optional[Decimal]
+    medical: Optional[Decimal]
+    explicit: bool = True       # 직접 지정 단가이면 True (규칙 단가/등급 단가는 False)
+
+    @property
+    def margin_percent(self) -> Optional[Decimal]:
+        """마진율 (단가 - 매입단가) / 단가 × 100"""
+        if self.purchase is None or not self.price:
+            return None
+        return (self.price - self.purchase) / self.price * _HUNDRED
+
+    def describe(self) -> str:
+        if self.kind == ABOVE_MEDICAL:
+            return f"{self.kind}: 치료재료단가 {self.medical:,.2f}원보다 높습니다."
+        margin = self.margin_percent
+        margin_text = f" (마진율 {margin:.1f}%)" if margin is not None else ""
+        return f"{self.kind}: 매입단가 {self.purchase:,.2f}원{margin_text}"
+
+
+class MarginLimits:
+    """품목별 점검 기준 단가: 하한(최소 마진 포함), 상한. 정책과 마스터가 바뀌면 새로 만듭니다."""
+
+    def __init__(self, items_by_sku: Mapping[int, Item], policy: MarginPolicy):
+        self.policy = policy
+        self.purchase: Dict[int, Decimal] = {}
+        self.medical: Dict[int, Decimal] = {}
+        self.floor: Dict[int, Decimal] = {}  # 이 단가 미만이면 마진 부족 (최소 마진율 0이면 매입단가)
+        self.cap: Dict[int, Decimal] = {}    # 이 단가 초과면 상한 초과
+        keep = 1 - policy.min_margin_percent / _HUNDRED
+        cap_rate = policy.medical_cap_percent / _HUNDRED
+        for key, item in items_by_sku.items():
+            purchase = _valid_price(item.prices.get(PriceTier.PURCHASE.value))
+            if purchase is not None:
+                self.purchase[key] = purchase
+                self.floor[key] = purchase / keep if policy.min_margin_percent > 0 else purchase
+            medical = _valid_price(item.prices.get(PriceTier.MEDICAL.value))
+            if medical is not None:
+                self.medical[key] = medical
+                if cap_rate > 0:
+                    self.cap[key] = medical * cap_rate
+
+    def check(self, source: str, prices: Mapping[int, Decimal], explicit_keys=frozenset(),
+              all_explicit: bool = False) -> List[MarginIssue]:
+        """단가 dict 전체를 하한/상한 dict 와 비교합니다. (기준이 없는 품목은 통과)"""
+        floor, cap = self.floor, self.cap
+        zero = Decimal("0")
+        issues = []
+        low = [(key, price) for key, price in prices.items() if price < floor.get(key, zero)]
+        high = [(key, price) for key, price in prices.items() if price > cap.get(key, _INFINITY)]
+        for key, price in low:
+            purchase = self.purchase[key]
+            kind = BELOW_PURCHASE if price < purchase else LOW_MARGIN
+            issues.append(MarginIssue(source, key, price, kind, purchase, self.medical.get(key),
+                                      all_explicit or key in explicit_keys))
+        for key, price in high:
+            issues.append(MarginIssue(source, key, price, ABOVE_MEDICAL, self.purchase.get(key), self.medical[key],
+                                      all_explicit or key in explicit_keys))
+        return issues
+
+
+def check_price(item: Optional[Item], price: Decimal, policy: MarginPolicy = MarginPolicy(),
+                source: str = "") -> List[MarginIssue]:
+    """품목 하나의 단가를 점검합니다. (단가 수정 시 즉시 경고용, 마스터에 없는 품목은 점검하지 않음)"""
+    if item is None:
+        return []
+    return MarginLimits({item.sku_id: item}, policy).check(source, {item.sku_id: price}, all_explicit=True)
+
+
+@dataclass
+class MarginAuditReport:
+    policy: MarginPolicy
+    issues: List[MarginIssue]
+    checked_count: int   # 점검한 단가 수 (프로파일별)
+    source_count: int
+
+    def counts(self) -> Dict[str, int]:
+        counts = {kind: 0 for kind in ISSUE_ORDER}
+        for issue in self.issues:
+            counts[issue.kind] += 1
+        return counts
+
+    def summary(self) -> str:
+        counts = ", ".join(f"{kind} {count:,}건" for kind, count in self.counts().items())
+        return f"{self.source_count}개 대상, 단가 {self.checked_count:,}건 점검 ({self.policy.describe()}): {counts}"
+
+    def export_headers(self) -> List[str]:
+        return ["구분", "대상", *profile_io.KEY_HEADERS, "단가", "매입단가", "마진율(%)", "치료재료단가", "단가 종류"]
+
+    def export_rows(self, limit: Optional[int] = None) -> List[list]:
+        registry = sku.get_registry()
+        rows = []
+        for issue in self.issues[:limit]:
+            margin = issue.margin_percent
+            rows.append([issue.kind, issue.source, *registry.key_for(issue.sku_id), issue.price, issue.purchase,
+                         round(margin, 1) if margin is not None else None, issue.medical,
+                         "직접 지정" if issue.explicit else ("등급" if issue.source.startswith("[등급]") else "규칙")])
+        return rows
+
+
+def tier_source_label(tier: PriceTier) -> str:
+    return f"[등급] {tier}"
+
+
+@profiling.traced("margin_audit.audit_prices")
+def audit_prices(profiles: Iterable[PriceProfile], items_by_sku: Mapping[int, Item], policy: MarginPolicy,
+                 tiers: Iterable[PriceTier] = AUDIT_TIERS) -> MarginAuditReport:
+    """모든 프로파일 단가와 가격 등급 단가를 점검합니다. 결과는 구분(심각한 것부터), 대상, 제품명 순"""
+    limits = MarginLimits(items_by_sku, policy)
+    issues: List[MarginIssue] = []
+    checked = 0
+    source_count = 0
+
+    # 기본 프로파일까지 모든 item_prices 와 규칙이 같은 프로파일은 한 번만 점검하고 결과를 프로파일별로 복사
+    # (자신의 dict 만 비교하면 안 됨: 중복 제거로 기본 프로파일이 다른 프로파일끼리 dict 를 공유할 수 있음)
+    groups: Dict[tuple, List[PriceProfile]] = {}
+    for profile in profiles:
+        chain_ids = tuple(id(p.item_prices) for p in profile._chain())
+        groups.setdefault((chain_ids, profile.effective_rule()), []).append(profile)
+    for members in groups.values():
+        first = members[0]
+        prices = pricing.profile_item_prices(first, items_by_sku)
+        found = limits.check(first.name, prices, explicit_keys=first.explicit_prices().keys())
+        for profile in members:
+            issues.extend(found if profile is first else (replace(issue, source=profile.name) for issue in found))
+        checked += len(prices) * len(members)
+        source_count += len(members)
+
+    for tier in tiers:
+        tier_key = tier.value
+        prices = {}
+        for key, item in items_by_sku.items():
+            price = item.prices.get(tier_key)
+            if price is not None and price.is_finite():
+                prices[key] = price
+        issues.extend(limits.check(tier_source_label(tier), prices))
+        checked += len(prices)
+        source_count += 1
+
+    registry = sku.get_registry()
+    by_product_model_spec = operator.itemgetter(1, 0, 2)
+    issues.sort(key=lambda i: (ISSUE_ORDER[i.kind], i.source, by_product_model_spec(registry.key_for(i.sku_id))))
+    return MarginAuditReport(policy, issues, checked, source_count)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    import storage
+    from app_logging import setup_logging
+
+    parser = argparse.ArgumentParser(description="단가 마진 점검 (매입단가 미만, 마진율 부족, 치료재료단가 초과)")
+    parser.add_argument("--master", help="제품 마스터 파일 (기본: 데이터파일/item_data.json)")
+    parser.add_argument("--min-margin", type=Decimal, help="최소 마진율 %% (기본: 저장된 기준)")
+    parser.add_argument("--medical-cap", type=Decimal, help="치료재료단가 대비 상한 %% (0이면 점검 안 함, 기본: 저장된 기준)")
+    parser.add_argument("--top", type=int, default=30, help="출력할 행 수")
+    parser.add_argument("--output", help="전체 결과를 저장할 .csv / .xlsx 경로")
+    args = parser.parse_args(argv)
+    setup_logging(log_file="")
+
+    saved_policy = storage.load_margin_policy()
+    policy = MarginPolicy(min_margin_percent=args.min_margin if args.min_margin is not None else saved_policy.min_margin_percent,
+                          medical_cap_percent=args.medical_cap if args.medical_cap is not None else saved_policy.medical_cap_percent)
+    if not policy.is_valid():
+        print(f"--min-margin 은 0 이상 100 미만, --medical-cap 은 0 이상이어야 합니다. 저장된 기준을 사용합니다: {saved_policy.describe()}")
+        policy = saved_policy
+    master_path = args.master or os.path.join(storage.get_bundle_dir(), "데이터파일", storage.DEFAULT_PRODUCT_MASTER_FILE_BASENAME)
+    items = storage.load_product_master(master_path) if os.path.exists(master_path) else []
+    items_by_sku: Dict[int, Item] = {}
+    for item in items:
+        items_by_sku.setdefault(item.sku_id, item)
+
+    report = audit_prices(storage.load_price_profiles(), items_by_sku, policy)
+    print(report.summary())
+    headers = report.export_headers()
+    for row in report.export_rows(args.top):
+        print("  " + " | ".join(f"{header}={value}" for header, value in zip(headers, row) if value is not None))
+    if args.output:
+        count = profile_io.write_table(args.output, headers, report.export_rows(), sheet_title="마진 점검")
+        print(f"{count:,}행을 저장했습니다: {args.output}")
+    return 1 if report.counts()[BELOW_PURCHASE] else 0
+
+
+def _self_test():
+    import time
+
+    sku.set_registry(sku.SkuRegistry())  # 사용자 데이터 폴더의 레지스트리를 건드리지 않음
+    items = [Item(f"L{i}", f"M-{i}", f"Locking Plate {i}", f"{i}H", "", None,
+                  {PriceTier.PURCHASE.value: Decimal(1000), PriceTier.DEALER.value: Decimal(1200),
+                   PriceTier.MEDICAL.value: Decimal(2000)})
+             for i in range(20000)]
+    items[3].prices[PriceTier.DEALER.value] = Decimal(900)  # 등급 단가 자체가 매입단가 미만
+    items[4].prices[PriceTier.PURCHASE.value] = Decimal("NaN")  # 매입단가 없음 -> 하한 점검 안 함
+    items_by_sku = {item.sku_id: item for item in items}
+    a, b, c = (item.sku_id for item in items[:3])
+    policy = MarginPolicy(min_margin_percent=Decimal("10"))
+
+    # 단건 점검: 하한은 1000 / 0.9 = 1111.11
+    assert [i.kind for i in check_price(items[0], Decimal("990"), policy)] == [BELOW_PURCHASE]
+    assert [i.kind for i in check_price(items[0], Decimal("1100"), policy)] == [LOW_MARGIN]
+    assert not check_price(items[0], Decimal("1112"), policy)
+    assert [i.kind for i in check_price(items[0], Decimal("2500"), policy)] == [ABOVE_MEDICAL]
+    assert not check_price(items[4], Decimal("1"), policy) and not check_price(None, Decimal("1"), policy)
+    assert check_price(items[0], Decimal("990"), policy)[0].describe() == "매입단가 미만: 매입단가 1,000.00원 (마진율 -1.0%)"
+
+    # 전체 점검: 직접 지정 단가 + 규칙 단가(일반대리점가 × 0.9 = 1080 -> 마진 부족) + 등급 단가
+    from models import PriceRule
+    shared = {a: Decimal("950"), b: Decimal("2100")}
+    group = [PriceProfile(f"병원{n}", item_prices=shared, shared_prices=True) for n in range(2)]
+    ruled = PriceProfile("대리점", item_prices={c: Decimal("1500")}, rule=PriceRule(PriceTier.DEALER, Decimal("0.9")))
+    report = audit_prices([*group, ruled], items_by_sku, policy, tiers=[PriceTier.DEALER])
+    counts = report.counts()
+    assert counts[BELOW_PURCHASE] == 2 + 1 + 1, counts  # 병원0/1 의 a, 대리점 규칙 단가 900 × 0.9, 등급 단가
+    assert counts[ABOVE_MEDICAL] == 2 and counts[LOW_MARGIN] == 20000 - 3  # 대리점 규칙 단가 1080: c(직접 지정), item3(매입단가 미만), item4(매입단가 없음) 제외
+    first = report.issues[0]
+    assert (first.kind, first.source, first.sku_id, first.explicit) == (BELOW_PURCHASE, "[등급] 일반대리점가", items[3].sku_id, False)
+    assert not next(i for i in report.issues if i.source == "대리점").explicit
+    assert report.export_headers()[2:5] == list(profile_io.KEY_HEADERS) and len(report.export_rows(5)) == 5
+
+    # 자신의 dict 는 공유하지만 기본 프로파일이 다른 프로파일 (storage.dedupe_price_profiles 결과)
+    k0, k1, k2 = a, b, c
+    base = PriceProfile("기본", item_prices={k0: Decimal("500"), k1: Decimal("500")})
+    overrides = {k2: Decimal("1200")}
+    child = PriceProfile("자식", item_prices=overrides, base_profile_id=base.id, base=base, shared_prices=True)
+    solo = PriceProfile("단독", item_prices=overrides, shared_prices=True)
+    report = audit_prices([solo, child], items_by_sku, policy, tiers=[])
+    assert sorted((i.source, i.sku_id) for i in report.issues) == sorted([("자식", k0), ("자식", k1)])
+
+    # 수십 개 프로파일 × 2만 품목
+    profiles = [PriceProfile(f"병원{n}", item_prices={item.sku_id: Decimal(1050 if i % 100 == n else 1200 + n)
+                                                  for i, item in enumerate(items[::2])}) for n in range(40)]
+    started = time.perf_counter()
+    report = audit_prices(profiles, items_by_sku, policy)
+    elapsed = time.perf_counter() - started
+    assert report.checked_count == 40 * 10000 + 2 * 20000  # 테스트 품목에는 일반대리점가/치료재료단가만 있음
+    assert report.counts() == {BELOW_PURCHASE: 1, ABOVE_MEDICAL: 0, LOW_MARGIN: 40 * 100 - 1}  # item4 는 매입단가 없음
+    assert MarginPolicy(min_margin_percent=Decimal("99.5")).is_valid()
+    assert not any(MarginPolicy(min_margin_percent=Decimal(value)).is_valid() for value in ("100", "150", "-1", "NaN"))
+    assert not MarginPolicy(medical_cap_percent=Decimal("-5")).is_valid()
+    print(f"margin_audit 테스트 완료 (40개 프로파일 × 10,000단가 + 등급 5개 점검 {elapsed * 1000:.0f}ms)")
+
+
+if __name__ == '__main__':
+    import sys
+    if len(sys.argv) > 1:
+        sys.exit(main())
+    _self_test()
@@ -0,0 +1,364 @@
+"""
+제품 마스터 변경분 계산과 단가 프로파일 반영.
+
+두 품목 리스트를 두 가지 기준으로 비교합니다.
+  - 행(LOT): LOT(같은 LOT가 여러 행이면 그 LOT 안에서의 순번)로 맞춰 보고 행 해시(모든 컬럼과 가격)를 비교해
+    추가/삭제/변경된 품목을 구합니다. 변경이 없는 품목은 새 리스트에서도 기존 Item 객체를 그대로 쓰므로,
+    인덱스와 화면은 바뀐 품목만 갱신하면 됩니다.
+  - 품목(SKU ID, 키별 마스터 순서상 첫 품목): 새 품목, 단종 품목, 가격 등급별 단가 변경.
+
+propagate_to_profiles()는 품목 기준 변경을 반영 규칙(PropagationRule)에 따라 모든 단가 프로파일에 한 번에 적용합니다.
+item_prices 를 공유하는 프로파일(storage 의 중복 제거)은 공유 dict 를 한 번만 계산/수정합니다.
+
+    python master_diff.py OLD.json NEW.json            # 변경 보고서
+    python master_diff.py OLD.json NEW.json --apply    # 저장된 단가 프로파일에 반영 규칙 적용 후 한 번 저장
+    python master_diff.py                              # 자체 테스트
+"""
+import argparse
+import sys
+from dataclasses import dataclass, field
+from decimal import ROUND_HALF_UP, Decimal
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+from models import Item, PriceProfile, PriceTier, ProfileItemKey, PropagationAction, PropagationRule
+import price_history
+
+# (LOT, 같은 LOT 안에서의 순번)
+RowKey = Tuple[str, int]
+# 가격 등급 -> (기존 단가, 새 단가)
+TierChange = Dict[PriceTier, Tuple[Optional[Decimal], Optional[Decimal]]]
+
+
+def row_keys(items: List[Item]) -> Iterator[Tuple[RowKey, Item]]:
+    seen: Dict[str, int] = {}
+    for item in items:
+        n = seen.get(item.lot, 0)
+        seen[item.lot] = n + 1
+        yield (item.lot, n), item
+
+
+def row_hash(item: Item) -> int:
+    """행 내용 해시 (한 프로세스 안에서의 비교용)"""
+    return hash((item.model_name, item.product_name, item.spec, item.treatment_code, item.udi_di,
+                 tuple(sorted(item.prices.items()))))
+
+
+def _first_by_key(items: List[Item]) -> Dict[ProfileItemKey, Item]:
+    first: Dict[ProfileItemKey, Item] = {}
+    for item in items:
+        first.setdefault(item.sku_id, item)
+    return first
+
+
+def _item_label(item: Item) -> str:
+    return f"{item.product_name} ({item.model_name} / {item.spec})"
+
+
+@dataclass
+class SkuChanges:
+    """SKU((모델명, 제품명, 규격)) 기준 변경"""
+    new_skus: Dict[ProfileItemKey, Item] = field(default_factory=dict)
+    discontinued: Dict[ProfileItemKey, Item] = field(default_factory=dict)  # 기존 품목
+    price_changes: Dict[ProfileItemKey, TierChange] = field(default_factory=dict)
+
+    def __bool__(self):
+        return bool(self.new_skus or self.discontinued or self.price_changes)
+
+    def tier_changes(self, tier: PriceTier) -> Dict[ProfileItemKey, Tuple[Optional[Decimal], Optional[Decimal]]]:
+        return {key: tiers[tier] for key, tiers in self.price_changes.items() if tier in tiers}
+
+    def summary(self) -> str:
+        return f"새 품목 {len(self.new_skus)}, 단종 {len(self.discontinued)}, 단가 변경 {len(self.price_changes)}"
+
+
+def _same_price(before: Optional[Decimal], after: Optional[Decimal]) -> bool:
+    """빈 칸(NaN)끼리는 같은 단가로 봄 (NaN != NaN)"""
+    return before == after or (before is not None and after is not None and before.is_nan() and after.is_nan())
+
+
+def diff_skus(old_items: List[Item], new_items: List[Item]) -> SkuChanges:
+    old_first, new_first = _first_by_key(old_items), _first_by_key(new_items)
+    changes = SkuChanges()
+    for key, item in new_first.items():
+        old = old_first.get(key)
+        if old is None:
+            changes.new_skus[key] = item
+        elif old is not item and old.prices != item.prices:
+            tiers = {}
+            for tier in PriceTier:
+                before, after = old.prices.get(tier.value), item.prices.get(tier.value)
+                if not _same_price(before, after):
+                    tiers[tier] = (before, after)
+            if tiers:
+                changes.price_changes[key] = tiers
+    changes.discontinued = {key: item for key, item in old_first.items() if key not in new_first}
+    return changes
+
+
+@dataclass
+class MasterDiff:
+    items: List[Item] = field(default_factory=list)  # 새 마스터 순서의 품목 (변경 없는 품목은 기존 객체)
+    added: List[Item] = field(default_factory=list)
+    removed: List[Item] = field(default_factory=list)
+    changed: List[Tuple[Item, Item]] = field(default_factory=list)  # (기존, 새)
+    reordered: bool = False  # 변경 없는 품목끼리의 순서가 바뀌었는지
+    skus: SkuChanges = field(default_factory=SkuChanges)
+
+    def __bool__(self):
+        return bool(self.added or self.removed or self.changed or self.reordered)
+
+    @property
+    def touched(self) -> List[Item]:
+        """인덱스에서 다시 계산해야 하는 품목 (삭제된 품목, 변경 전후 품목, 추가된 품목)"""
+        return self.removed + [item for pair in self.changed for item in pair] + self.added
+
+    def summary(self) -> str:
+        return f"추가 {len(self.added)}, 삭제 {len(self.removed)}, 변경 {len(self.changed)}"
+
+
+def diff_items(old_items: List[Item], new_items: List[Item]) -> MasterDiff:
+    old_by_key = dict(row_keys(old_items))
+    old_hash: Dict[RowKey, int] = {}
+    diff = MasterDiff()
+    kept_old_positions: List[int] = []
+    old_position = {key: i for i, key in enumerate(old_by_key)}
+
+    for key, new_item in row_keys(new_items):
+        old_item = old_by_key.pop(key, None)
+        if old_item is None:
+            diff.added.append(new_item)
+            diff.items.append(new_item)
+            continue
+        if key not in old_hash:
+            old_hash[key] = row_hash(old_item)
+        if old_hash[key] == row_hash(new_item):
+            diff.items.append(old_item)
+            kept_old_positions.append(old_position[key])
+        else:
+            diff.changed.append((old_item, new_item))
+            diff.items.append(new_item)
+    diff.removed = list(old_by_key.values())
+    diff.reordered = any(a > b for a, b in zip(kept_old_positions, kept_old_positions[1:]))
+    if diff:
+        diff.skus = diff_skus(old_items, diff.items)
+    return diff
+
+
+def format_report(diff: MasterDiff, max_samples: int = 10) -> str:
+    skus = diff.skus
+    lines = [f"행(LOT) 기준: {diff.summary()}", f"품목 기준: {skus.summary()}"]
+
+    def section(title: str, labels: List[str]):
+        if not labels:
+            return
+        lines.append(f"\n{title} ({len(labels)}):")
+        lines.extend(f"  - {label}" for label in labels[:max_samples])
+        if len(labels) > max_samples:
+            lines.append(f"  ... 외 {len(labels) - max_samples}개")
+
+    section("새 품목", [_item_label(item) for item in skus.new_skus.values()])
+    section("단종 품목", [_item_label(item) for item in skus.discontinued.values()])
+    new_first = _first_by_key(diff.items) if skus.price_changes else {}
+    price_labels = []
+    for key, tiers in skus.price_changes.items():
+        changes = ", ".join(f"{tier} {before if before is not None else '-'} → {after if after is not None else '-'}"
+                            for tier, (before, after) in tiers.items())
+        price_labels.append(f"{_item_label(new_first[key])}: {changes}")
+    section("단가 변경", price_labels)
+    return "\n".join(lines)
+
+
+# --- 단가 프로파일 반영 ---
+
+@dataclass
+class PropagationResult:
+    # (프로파일, 품목 키, 변경 전 price_history.snapshot_own_value) - 단가 이력 기록용
+    changes: List[Tuple[PriceProfile, ProfileItemKey, Optional[str]]] = field(default_factory=list)
+    counts: Dict[PropagationAction, int] = field(default_factory=dict)
+
+    def __bool__(self):
+        return bool(self.changes)
+
+    def summary(self) -> str:
+        return ", ".join(f"{action} {count}건" for action, count in self.counts.items() if count) or "변경 없음"
+
+
+def _round_like(price: Decimal, like: Decimal, round_unit: Decimal) -> Decimal:
+    if round_unit > 0:
+        return (price / round_unit).quantize(Decimal("1"), rounding=ROUND_HALF_UP) * round_unit
+    return price.quantize(like, rounding=ROUND_HALF_UP)
+
+
+def _rule_updates(rule: PropagationRule, skus: SkuChanges
+                  ) -> Tuple[Callable[[PriceProfile], bool], Callable[[dict], Tuple[Dict[ProfileItemKey, Decimal], List[ProfileItemKey]]]]:
+    """규칙별 (대상 프로파일 판정, item_prices -> (지정할 단가, 제거할 키)) 함수"""
+    if rule.action == PropagationAction.ADD_NEW:
+        price_rule = rule.price_rule()
+        new_prices = {}
+        for key, item in skus.new_skus.items():
+            price = price_rule.price_for(item)
+            if price is not None:
+                new_prices[key] = price
+
+        # 기본 프로파일을 따르는 프로파일은 기본 프로파일에서 물려받고, 규칙 프로파일은 규칙으로 계산되므로 제외
+        def eligible(profile: PriceProfile) -> bool:
+            return profile.base is None and not profile.base_profile_id and profile.effective_rule() is None
+
+        def updates(prices: dict):
+            return {key: price for key, price in new_prices.items() if key not in prices}, []
+        return eligible, updates
+
+    if rule.action == PropagationAction.REMOVE_DISCONTINUED:
+        def updates(prices: dict):
+            return {}, [key for key in skus.discontinued if key in prices]
+        return (lambda profile: True), updates
+
+    tier_changes = {key: (before, after) for key, (before, after) in skus.tier_changes(rule.tier).items()
+                    if before is not None and after is not None
+                    and before.is_finite() and before > 0 and after.is_finite()}
+
+    def updates(prices: dict):
+        scaled = {}
+        for key, (before, after) in tier_changes.items():
+            price = prices.get(key)
+            if price is not None:
+                scaled[key] = _round_like(price * after / before, price, rule.round_unit)
+        return scaled, []
+    return (lambda profile: True), updates
+
+
+def propagate_to_profiles(profiles: List[PriceProfile], skus: SkuChanges,
+                          rules: List[PropagationRule]) -> PropagationResult:
+    """
+    품목 기준 변경을 반영 규칙 순서대로 모든 프로파일에 적용합니다.
+    item_prices 를 공유하는 프로파일이 모두 대상이면 공유 dict 를 그대로 수정해 공유를 유지합니다.
+    """
+    result = PropagationResult()
+    if not skus:
+        return result
+    groups: Dict[int, List[PriceProfile]] = {}
+    for profile in profiles:
+        groups.setdefault(id(profile.item_prices), []).append(profile)
+
+    for rule in rules:
+        eligible, updates = _rule_updates(rule, skus)
+        count = 0
+        for group in list(groups.values()):
+            targets = [profile for profile in group if eligible(profile)]
+            if not targets:
+                continue
+            prices = group[0].item_prices
+            to_set, to_drop = updates(prices)
+            if not (to_set or to_drop):
+                continue
+            before = {key: price_history.snapshot_own_value(group[0], key) for key in [*to_set, *to_drop]}
+            if len(targets) == len(group):
+                prices.update(to_set)
+                for key in to_drop:
+                    del prices[key]
+            else:
+                for profile in targets:
+                    profile.set_prices(to_set)
+                    profile.drop_prices(to_drop)
+                    groups[id(profile.item_prices)] = [profile]
+                groups[id(prices)] = [profile for profile in group if profile not in targets]
+            for profile in targets:
+                result.changes.extend((profile, key, value) for key, value in before.items())
+            count += len(before) * len(targets)
+        result.counts[rule.action] = result.counts.get(rule.action, 0) + count
+    return result
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    import storage
+    from app_logging import setup_logging
+
+    parser = argparse.ArgumentParser(description="두 제품 마스터 파일의 변경 보고서 / 단가 프로파일 반영")
+    parser.add_argument("old", help="이전 제품 마스터 JSON")
+    parser.add_argument("new", help="새 제품 마스터 JSON")
+    parser.add_argument("--apply", action="store_true",
+                        help=f"반영 규칙({storage.PROPAGATION_RULES_FILE})을 저장된 단가 프로파일에 적용하고 저장")
+    parser.add_argument("--samples", type=int, default=10, help="항목별 예시 개수")
+    args = parser.parse_args(argv)
+    setup_logging(log_file="")
+
+    diff = diff_items(storage.load_product_master(args.old), storage.load_product_master(args.new))
+    print(format_report(diff, args.samples))
+    if args.apply:
+        rules = storage.load_propagation_rules()
+        print("\n반영 규칙: " + ("; ".join(rule.describe() for rule in rules) or "없음"))
+        profiles = storage.load_price_profiles()
+        result = propagate_to_profiles(profiles, diff.skus, rules)
+        if result:
+            price_history.PriceHistory.load().record_profile_prices(result.changes)
+            conflicts = storage.save_price_profiles(profiles)
+            if conflicts:
+                print(f"저장 충돌 (다른 사용자가 먼저 수정): {', '.join(conflicts)}")
+                return 1
+        print(f"단가 프로파일 반영: {result.summary()}")
+    return 0
+
+
+def _self_test():
+    import sku
+    sku.set_registry(sku.SkuRegistry())  # 사용자 데이터 폴더의 레지스트리를 건드리지 않음
+    B, C, D = (sku.id_for(("M", name, "S")) for name in "BCD")
+    def make(lot, name, price):
+        return Item(lot=lot, model_name="M", product_name=name, spec="S", treatment_code="", udi_di=None,
+                    prices={PriceTier.A.value: Decimal(price), PriceTier.DEALER.value: Decimal(price)})
+
+    a, b, c, b2 = make("L1", "A", "100"), make("L2", "B", "200"), make("L3", "C", "300"), make("L2", "B", "200")
+    old = [a, b, c, b2]
+    new = [make("L1", "A", "100"), make("L2", "B", "250"), make("L4", "D", "400"), make("L2", "B", "200")]
+    diff = diff_items(old, new)
+    assert diff.items[0] is a and diff.items[3] is b2  # 변경 없는 품목은 기존 객체 재사용
+    assert [o.lot for o, _ in diff.changed] == ["L2"] and diff.changed[0][0] is b
+    assert [i.lot for i in diff.added] == ["L4"] and diff.removed == [c]
+    assert not diff.reordered
+    assert not diff_items(old, list(old)) and diff_items(old, [c, a, b, b2]).reordered
+
+    skus = diff.skus
+    assert list(skus.new_skus) == [D] and list(skus.discontinued) == [C]
+    assert skus.price_changes[B][PriceTier.DEALER] == (Decimal("200"), Decimal("250"))
+
+    # 두 프로파일이 item_prices 를 공유, 하나는 기본 프로파일을 따르는 자식, 하나는 규칙 프로파일
+    shared = {B: Decimal("180"), C: Decimal("290")}
+    p1 = PriceProfile(name="P1", item_prices=shared, shared_prices=True)
+    p2 = PriceProfile(name="P2", item_prices=shared, shared_prices=True)
+    child = PriceProfile(name="child", base_profile_id=p1.id, base=p1)
+    ruled = PriceProfile(name="ruled", rule=PropagationRule(PropagationAction.ADD_NEW).price_rule())
+    rules = [PropagationRule(PropagationAction.ADD_NEW, PriceTier.DEALER, Decimal("0.9"), Decimal("10")),
+             PropagationRule(PropagationAction.REMOVE_DISCONTINUED),
+             PropagationRule(PropagationAction.FOLLOW_TIER_CHANGE, PriceTier.DEALER)]
+    result = propagate_to_profiles([p1, p2, child, ruled], skus, rules)
+    assert p1.item_prices is p2.item_prices  # 공유 유지
+    assert p1.item_prices == {B: Decimal("225"), D: Decimal("360")}
+    assert child.item_prices == {} and child.get_price(D) == Decimal("360")
+    assert ruled.item_prices == {}
+    assert result.counts == {PropagationAction.ADD_NEW: 2, PropagationAction.REMOVE_DISCONTINUED: 2,
+                             PropagationAction.FOLLOW_TIER_CHANGE: 2}
+
+    # 빈 칸(NaN) 단가: NaN -> NaN 은 변경 아님, 숫자 -> NaN 은 프로파일 단가를 바꾸지 않음
+    nan = Decimal("NaN")
+    blank_old = [make("L1", "A", "100"), make("L2", "B", "200")]
+    blank_old[0].prices[PriceTier.B.value] = nan
+    blank_new = [make("L1", "A", "110"), make("L2", "B", "200")]
+    blank_new[0].prices[PriceTier.B.value] = Decimal("NaN")
+    blank_new[1].prices[PriceTier.DEALER.value] = Decimal("NaN")
+    A = sku.id_for(("M", "A", "S"))
+    blank_skus = diff_items(blank_old, blank_new).skus
+    assert PriceTier.B not in blank_skus.price_changes[A]
+    assert blank_skus.price_changes[B] == {PriceTier.DEALER: (Decimal("200"), blank_new[1].prices[PriceTier.DEALER.value])}
+    blank_profile = PriceProfile(name="blank", item_prices={A: Decimal("90"), B: Decimal("180")})
+    propagate_to_profiles([blank_profile], blank_skus, [PropagationRule(PropagationAction.FOLLOW_TIER_CHANGE, PriceTier.DEALER)])
+    assert blank_profile.item_prices == {A: Decimal("99"), B: Decimal("180")}
+
+    print(format_report(diff))
+    print(f"반영: {result.summary()}")
+    print("master_diff 테스트 완료.")
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1:
+        sys.exit(main())
+    _self_test()
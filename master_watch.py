@@ -0,0 +1,132 @@
+"""
+제품 마스터 파일 변경 감시.
+
+메인 스레드에서 widget.after()로 주기적으로 파일의 수정 시각과 크기를 확인합니다. 바뀐 값이 다음 확인 때까지
+그대로이면(ERP가 파일을 다 쓴 뒤) 백그라운드 스레드에서 파일을 읽고 현재 품목과의 변경분(master_diff)을 계산한 다음,
+결과를 메인 스레드로 넘겨 on_diff(diff, manual) 를 호출합니다. 파싱과 비교가 메인 루프를 붙잡지 않습니다.
+"""
+import logging
+import os
+import queue
+import threading
+from typing import Callable, List, Optional, Tuple
+
+import storage
+from master_diff import MasterDiff, diff_items
+from models import Item
+
+logger = logging.getLogger(__name__)
+
+RESULT_POLL_MS = 50  # 백그라운드 로드 결과 확인 주기
+
+FileSignature = Tuple[int, int]  # (st_mtime_ns, st_size)
+
+
+def file_signature(path: str) -> Optional[FileSignature]:
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+
+class MasterFileWatcher:
+    """
+    제품 마스터 파일 감시기. start()/reload()는 메인 스레드에서 호출해야 합니다.
+    get_path/get_items 는 현재 마스터 경로와 현재 품목 리스트를 돌려주는 함수입니다.
+    on_diff 의 diff 가 None 이면 reload() 요청에서 파일을 읽지 못한 경우입니다.
+    경로가 바뀌면(파일 선택 등으로 앱이 직접 다시 로드한 경우) 그 시점의 파일 상태를 기준으로 삼습니다.
+    """
+
+    def __init__(self, widget, get_path: Callable[[], str], get_items: Callable[[], List[Item]],
+                 on_diff: Callable[[Optional[MasterDiff], bool], None], interval_ms: int = 2000):
+        self.widget = widget
+        self.get_path = get_path
+        self.get_items = get_items
+        self.on_diff = on_diff
+        self.interval_ms = interval_ms
+
+        self._path = get_path()
+        self._loaded_signature = file_signature(self._path) if self._path else None
+        self._pending_signature: Optional[FileSignature] = None
+        self._results: "queue.Queue" = queue.Queue()
+        self._loading = False
+        self._manual_requested = False
+        self._after_id = None
+        self._stopped = False
+
+    def start(self):
+        if self._after_id is None and not self._stopped:
+            self._after_id = self.widget.after(self.interval_ms, self._poll)
+
+    def stop(self):
+        self._stopped = True
+        if self._after_id is not None:
+            try:
+                self.widget.after_cancel(self._after_id)
+            except Exception:
+                pass
+            self._after_id = None
+
+    def reload(self):
+        """지금 바로 다시 읽습니다 (메뉴의 새로고침). 완료되면 manual=True 로 on_diff 가 호출됩니다."""
+        self._manual_requested = True
+        self._path = self.get_path()
+        if not self._loading:
+            self._start_load(file_signature(self._path) if self._path else None)
+
+    def _poll(self):
+        self._after_id = None
+        if self._stopped:
+            return
+        path = self.get_path()
+        signature = file_signature(path) if path else None
+        if path != self._path:
+            self._path, self._loaded_signature, self._pending_signature = path, signature, None
+        elif signature is not None and signature != self._loaded_signature and not self._loading:
+            if signature == self._pending_signature:
+                self._start_load(signature)
+            else:
+                # 아직 쓰는 중일 수 있으므로 다음 확인 때까지 그대로인지 봅니다.
+                self._pending_signature = signature
+        self._after_id = self.widget.after(self.interval_ms, self._poll)
+
+    def _start_load(self, signature: Optional[FileSignature]):
+        self._loading = True
+        self._pending_signature = None
+        base_items = self.get_items()
+        thread = threading.Thread(target=self._load, args=(self._path, signature, base_items),
+                                  name="MasterFileWatcher", daemon=True)
+        thread.start()
+        self.widget.after(RESULT_POLL_MS, self._check_result)
+
+    def _load(self, path: str, signature: Optional[FileSignature], base_items: List[Item]):
+        try:
+            new_items = storage.load_product_master(path) if path else []
+            if not new_items and base_items:
+                # 형식 오류/읽기 실패로 빈 목록이 오면 기존 품목을 모두 지우지 않고 다음 변경을 기다립니다.
+                self._results.put((path, signature, base_items, None))
+                return
+            self._results.put((path, signature, base_items, diff_items(base_items, new_items)))
+        except Exception as e:
+            logger.error("제품 마스터 백그라운드 로드 실패 (%s): %s", path, e)
+            self._results.put((path, signature, base_items, None))
+
+    def _check_result(self):
+        try:
+            path, signature, base_items, diff = self._results.get_nowait()
+        except queue.Empty:
+            self.widget.after(RESULT_POLL_MS, self._check_result)
+            return
+        self._loading = False
+        manual, self._manual_requested = self._manual_requested, False
+        if path != self.get_path() or base_items is not self.get_items():
+            # 로드하는 사이 앱이 다른 파일을 직접 불러왔으면 결과를 버립니다. (다음 확인에서 다시 비교)
+            logger.debug("제품 마스터 변경분이 현재 상태와 맞지 않아 버립니다: %s", path)
+            return
+        self._loaded_signature = signature
+        if diff is None:
+            logger.warning("제품 마스터 '%s'을(를) 읽지 못해 기존 품목을 유지합니다.", path)
+            if not manual:
+                return
+        self.on_diff(diff, manual)
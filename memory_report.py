@@ -0,0 +1,328 @@
+# memory_report.py - 메모리 사용량 진단 보고서
+"""
+로드된 데이터 구조별 메모리 사용량을 보고서(JSON)로 남깁니다. 릴리스 간 메모리 증가를 추적하기 위한 도구입니다.
+
+측정 방법:
+  - deep size: 객체 그래프를 따라가며 sys.getsizeof 합계. 여러 구조가 공유하는 객체(예: 검색 인덱스가 가리키는
+    Item)는 먼저 측정한 구조에만 계산하고, 뒤 구조에는 자신이 추가로 붙잡고 있는 메모리만 계산합니다.
+  - tracemalloc: CLI 모드에서는 단계별(거래처 → 가격 프로파일 → 제품 마스터 → 검색 인덱스 → OCR) 할당량과
+    최종 상위 할당 위치를 기록합니다. GUI에서는 LOHAS_TRACEMALLOC=1 로 시작했을 때만 상위 할당 위치가 포함됩니다.
+  - torch 텐서(EasyOCR 모델)는 파이썬 힙 밖에 있으므로 파라미터/버퍼 크기를 따로 합산합니다.
+  - 프로세스 RSS (Tk 위젯, 네이티브 라이브러리 포함 전체)
+
+사용 예:
+    python memory_report.py                                  # 기본 제품 마스터 + 사용자 데이터 폴더
+    python memory_report.py --master synthetic_data/item_data.json --data-dir synthetic_data --with-ocr
+GUI: 도구 > 메모리 사용량 보고서 저장
+"""
+import argparse
+import contextlib
+import datetime
+import io
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Any, Dict, List, Optional, Tuple
+
+REPORTS_DIR_NAME = "memory_reports"
+TOP_ALLOCATIONS = 15
+
+
+# --- deep size ---
+
+def _torch_tensor_bytes(obj: Any) -> int:
+    """torch.nn.Module 이면 파라미터/버퍼의 텐서 메모리 합계 (파이썬 힙 밖)"""
+    if type(obj).__module__.startswith("torch") and hasattr(obj, "parameters") and hasattr(obj, "buffers"):
+        try:
+            tensors = list(obj.parameters()) + list(obj.buffers())
+            return sum(t.numel() * t.element_size() for t in tensors)
+        except Exception:
+            return 0
+    return 0
+
+
+def deep_sizeof(obj: Any, seen: Optional[set] = None) -> Tuple[int, int, int]:
+    """
+    obj 가 붙잡고 있는 객체들의 sys.getsizeof 합계를 구합니다.
+    seen 에 이미 있는 객체는 건너뛰므로, 같은 seen 을 넘기면 공유 객체가 한 번만 계산됩니다.
+
+    Returns:
+        (파이썬 객체 바이트, 객체 수, 네이티브 텐서 바이트)
+    """
+    if seen is None:
+        seen = set()
+    total = count = native = 0
+    stack = [obj]
+    while stack:
+        current = stack.pop()
+        obj_id = id(current)
+        if obj_id in seen:
+            continue
+        seen.add(obj_id)
+        # 모듈/클래스/함수는 데이터가 아니므로 따라가지 않음
+        if isinstance(current, (type, type(sys), type(deep_sizeof))):
+            continue
+        total += sys.getsizeof(current)
+        count += 1
+        native += _torch_tensor_bytes(current)
+
+        if isinstance(current, dict):
+            stack.extend(current.keys())
+            stack.extend(current.values())
+        elif isinstance(current, (list, tuple, set, frozenset)):
+            stack.extend(current)
+        elif isinstance(current, (str, bytes, int, float, bool)) or current is None:
+            continue
+        else:
+            if hasattr(current, "__dict__"):
+                stack.append(current.__dict__)
+            for slot in getattr(type(current), "__slots__", ()):
+                if hasattr(current, slot):
+                    stack.append(getattr(current, slot))
+    return total, count, native
+
+
+def measure_structures(structures: List[Tuple[str, Any]]) -> List[Dict[str, Any]]:
+    """구조 목록을 순서대로 측정합니다. 앞에서 계산된 공유 객체는 뒤 구조에 다시 계산하지 않습니다."""
+    seen: set = set()
+    results = []
+    for name, obj in structures:
+        size, count, native = deep_sizeof(obj, seen)
+        entry = {"name": name, "python_bytes": size, "objects": count}
+        if hasattr(obj, "__len__"):
+            entry["length"] = len(obj)
+        if native:
+            entry["native_tensor_bytes"] = native
+        results.append(entry)
+    return results
+
+
+# --- 프로세스 메모리 ---
+
+def process_rss_bytes() -> Optional[int]:
+    """현재 프로세스의 RSS (바이트). 알 수 없으면 None."""
+    try:
+        if sys.platform.startswith("linux"):
+            with open("/proc/self/statm", "r") as f:
+                return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+        if sys.platform == "win32":
+            import ctypes
+            from ctypes import wintypes
+
+            class PROCESS_MEMORY_COUNTERS(ctypes.Structure):
+                _fields_ = [("cb", wintypes.DWORD), ("PageFaultCount", wintypes.DWORD),
+                            ("PeakWorkingSetSize", ctypes.c_size_t), ("WorkingSetSize", ctypes.c_size_t),
+                            ("QuotaPeakPagedPoolUsage", ctypes.c_size_t), ("QuotaPagedPoolUsage", ctypes.c_size_t),
+                            ("QuotaPeakNonPagedPoolUsage", ctypes.c_size_t), ("QuotaNonPagedPoolUsage", ctypes.c_size_t),
+                            ("PagefileUsage", ctypes.c_size_t), ("PeakPagefileUsage", ctypes.c_size_t)]
+            counters = PROCESS_MEMORY_COUNTERS()
+            counters.cb = ctypes.sizeof(counters)
+            handle = ctypes.windll.kernel32.GetCurrentProcess()
+            if ctypes.windll.psapi.GetProcessMemoryInfo(handle, ctypes.byref(counters), counters.cb):
+                return int(counters.WorkingSetSize)
+            return None
+        import resource  # macOS: 최대 RSS (바이트)
+        return int(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
+    except Exception:
+        return None
+
+
+def _top_allocations(limit: int) -> List[Dict[str, Any]]:
+    if not tracemalloc.is_tracing():
+        return []
+    stats = tracemalloc.take_snapshot().filter_traces((
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap*>"),
+    )).statistics("lineno")
+    return [{"location": f"{s.traceback[0].filename}:{s.traceback[0].lineno}", "bytes": s.size, "blocks": s.count}
+            for s in stats[:limit]]
+
+
+def _ocr_structures(ocr_processor: Any) -> List[Tuple[str, Any]]:
+    if ocr_processor is None:
+        return []
+    structures = [("ocr.product_search_terms", getattr(ocr_processor, "product_search_terms", {}))]
+    reader = getattr(ocr_processor, "_easyocr_reader", None)
+    if reader is not None:
+        structures.append(("ocr.easyocr_reader", reader))
+    return structures
+
+
+# --- GUI(App) 보고서 ---
+
+def _widget_contents(app: Any) -> List[Dict[str, Any]]:
+    """App의 Treeview/Listbox 행 수와 표시 문자열 크기 (Tk 쪽 메모리는 RSS에만 반영되므로 추정치)"""
+    import tkinter as tk
+    from tkinter import ttk
+    widgets = []
+    for attr, widget in sorted(vars(app).items()):
+        if isinstance(widget, ttk.Treeview):
+            rows = widget.get_children("")
+            text_bytes = sum(len(str(v)) for iid in rows for v in widget.item(iid, "values"))
+            widgets.append({"widget": attr, "rows": len(rows), "text_chars": text_bytes})
+        elif isinstance(widget, tk.Listbox):
+            entries = widget.get(0, tk.END)
+            widgets.append({"widget": attr, "rows": len(entries), "text_chars": sum(len(str(e)) for e in entries)})
+    return widgets
+
+
+def build_app_report(app: Any) -> Dict[str, Any]:
+    """실행 중인 App의 구조별 메모리 보고서"""
+    structures = [
+        ("product_master_items", app.product_master_items),
+        ("price_profiles", app.price_profiles),
+        ("companies", app.companies),
+        ("product_catalog", app.product_catalog),
+        ("current_invoice_lines", app.current_invoice_lines),
+    ]
+    for attr, value in sorted(vars(app).items()):
+        if attr.endswith("_tree_sync"):
+            structures.append((f"{attr}._values", value._values))
+    structures.extend(_ocr_structures(getattr(app, "ocr_processor", None)))
+
+    return {
+        "kind": "app",
+        "structures": measure_structures(structures),
+        "widgets": _widget_contents(app),
+        "process_rss_bytes": process_rss_bytes(),
+        "tracemalloc": {"tracing": tracemalloc.is_tracing(),
+                        "current_bytes": tracemalloc.get_traced_memory()[0] if tracemalloc.is_tracing() else None,
+                        "top": _top_allocations(TOP_ALLOCATIONS)},
+    }
+
+
+# --- CLI(데이터셋) 보고서 ---
+
+@contextlib.contextmanager
+def _user_data_from(data_dir: Optional[str]):
+    """data_dir 의 data.json / prices_for_companies.json 을 임시 홈의 사용자 데이터 폴더에서 읽도록 합니다."""
+    if not data_dir:
+        yield
+        return
+    import storage
+    saved_env = {k: os.environ.get(k) for k in ("HOME", "USERPROFILE")}
+    with tempfile.TemporaryDirectory(prefix="memory_report_") as home:
+        os.environ["HOME"] = os.environ["USERPROFILE"] = home
+        try:
+            for filename in (storage.COMPANY_DATA_FILE, storage.PRICE_PROFILES_FILE):
+                src = os.path.join(data_dir, filename)
+                if os.path.exists(src):
+                    shutil.copyfile(src, storage.get_user_data_path(filename))
+            yield
+        finally:
+            for key, value in saved_env.items():
+                if value is None:
+                    os.environ.pop(key, None)
+                else:
+                    os.environ[key] = value
+
+
+def build_dataset_report(master_path: str, data_dir: Optional[str] = None, with_ocr: bool = False) -> Dict[str, Any]:
+    """데이터를 단계별로 로드하면서 tracemalloc 할당량과 구조별 deep size 를 측정합니다."""
+    import storage
+    from catalog import ProductCatalog
+
+    steps: List[Dict[str, Any]] = []
+    loaded: Dict[str, Any] = {}
+    rss_start = process_rss_bytes()
+    tracemalloc.start()
+
+    def step(name: str, func):
+        before = tracemalloc.get_traced_memory()[0]
+        rss_before = process_rss_bytes()
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            loaded[name] = func()
+        after = tracemalloc.get_traced_memory()[0]
+        rss_after = process_rss_bytes()
+        steps.append({"step": name, "traced_bytes": after - before, "seconds": round(time.perf_counter() - start, 3),
+                      "rss_delta_bytes": (rss_after - rss_before) if rss_before and rss_after else None})
+
+    try:
+        with _user_data_from(data_dir):
+            step("companies", storage.load_companies)
+            step("price_profiles", storage.load_price_profiles)
+        step("product_master_items", lambda: storage.load_product_master(master_path))
+        step("product_catalog", lambda: ProductCatalog(loaded["product_master_items"]))
+        if with_ocr:
+            def load_ocr():
+                from receipt_ocr import ReceiptOCRProcessor
+                processor = ReceiptOCRProcessor(loaded["product_master_items"])
+                processor.easyocr_reader  # 모델 로딩 강제
+                return processor
+            step("ocr_processor", load_ocr)
+        top = _top_allocations(TOP_ALLOCATIONS)
+    finally:
+        tracemalloc.stop()
+
+    structures = [(name, loaded[name]) for name in
+                  ("product_master_items", "price_profiles", "companies", "product_catalog")]
+    structures.extend(_ocr_structures(loaded.get("ocr_processor")))
+    return {
+        "kind": "dataset",
+        "master_path": os.path.abspath(master_path),
+        "data_dir": os.path.abspath(data_dir) if data_dir else None,
+        "steps": steps,
+        "structures": measure_structures(structures),
+        "process_rss_bytes": process_rss_bytes(),
+        "process_rss_start_bytes": rss_start,
+        "tracemalloc": {"tracing": True, "top": top},
+    }
+
+
+def write_report(report: Dict[str, Any], path: Optional[str] = None) -> str:
+    """보고서를 JSON 파일로 저장합니다. 경로를 생략하면 사용자 데이터 폴더의 memory_reports/ 에 저장합니다."""
+    report = dict(report)
+    report.update({"created_at": datetime.datetime.now().isoformat(timespec="seconds"),
+                   "python": sys.version.split()[0], "platform": platform.platform()})
+    if path is None:
+        import storage
+        reports_dir = storage.get_user_data_path(REPORTS_DIR_NAME)
+        os.makedirs(reports_dir, exist_ok=True)
+        path = os.path.join(reports_dir, f"memory_{datetime.datetime.now().strftime('%Y%m%d-%H%M%S')}.json")
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    return path
+
+
+def format_summary(report: Dict[str, Any]) -> str:
+    """보고서의 구조별 크기를 사람이 읽기 쉬운 문자열로"""
+    lines = []
+    for entry in report["structures"]:
+        line = f"{entry['name']:<40} {entry['python_bytes'] / 1024 / 1024:>8.2f} MB"
+        if entry.get("native_tensor_bytes"):
+            line += f" (+ 텐서 {entry['native_tensor_bytes'] / 1024 / 1024:.1f} MB)"
+        lines.append(line)
+    if report.get("process_rss_bytes"):
+        lines.append(f"{'프로세스 RSS':<40} {report['process_rss_bytes'] / 1024 / 1024:>8.2f} MB")
+    return "\n".join(lines)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    import storage
+    parser = argparse.ArgumentParser(description="데이터 구조별 메모리 사용량 보고서")
+    parser.add_argument("--master", default=os.path.join(storage.get_bundle_dir(), "데이터파일",
+                                                         storage.DEFAULT_PRODUCT_MASTER_FILE_BASENAME),
+                        help="제품 마스터 JSON 경로")
+    parser.add_argument("--data-dir", default=None,
+                        help="data.json / prices_for_companies.json 이 있는 폴더 (생략 시 사용자 데이터 폴더)")
+    parser.add_argument("--with-ocr", action="store_true", help="OCR 처리기와 EasyOCR 모델도 로드하여 측정")
+    parser.add_argument("--output", default=None, help="보고서 경로 (생략 시 사용자 데이터 폴더/memory_reports)")
+    args = parser.parse_args(argv)
+
+    report = build_dataset_report(args.master, args.data_dir, args.with_ocr)
+    path = write_report(report, args.output)
+    for s in report["steps"]:
+        print(f"{'load:' + s['step']:<40} {s['traced_bytes'] / 1024 / 1024:>8.2f} MB  ({s['seconds']:.2f}s)")
+    print(format_summary(report))
+    print(f"\n보고서 저장: {path}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
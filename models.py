@@ -2,7 +2,11 @@ import uuid
 import enum
 from decimal import Decimal, ROUND_HALF_UP
 from dataclasses import dataclass, field
-from typing import Optional, Dict, List
+from typing import Optional, Dict, FrozenSet, List
+
+import sku
+
+ProfileItemKey = int  # 품목 (모델명, 제품명, 규격) 의 SKU ID (sku.SkuRegistry)
 
 class PriceTier(enum.Enum):
     """가격 등급을 나타내는 열거형"""
@@ -48,19 +52,210 @@ class Company:
             tier_display = "커스텀" # 실제 프로파일 이름은 UI에서 조회하여 표시
         return f"{self.name} (단가: {tier_display})"
 
+@dataclass(frozen=True)
+class PriceRule:
+    """
+    가격 등급 단가로 프로파일 단가를 계산하는 규칙. 예: 일반대리점가 × 0.95, 100원 단위 반올림, 일부 품목 제외.
+    품목 단가는 조회할 때 계산하며, 같은 기준 단가의 계산 결과는 캐시합니다.
+    (캐시 키가 기준 단가이므로 마스터를 다시 로드해 단가가 바뀌면 자동으로 새로 계산되고, 규칙을 바꾸면 새 객체가 됩니다.)
+    """
+    tier: PriceTier = PriceTier.DEALER
+    multiplier: Decimal = Decimal("1")
+    round_unit: Decimal = Decimal("0")  # 0이면 반올림하지 않음
+    excluded_keys: FrozenSet[ProfileItemKey] = frozenset()  # 규칙을 적용하지 않는 품목 (거래처 가격 등급 단가 사용)
+    _cache: Dict[Decimal, Decimal] = field(default_factory=dict, init=False, repr=False, compare=False, hash=False)
+
+    def apply(self, base_price: Decimal) -> Decimal:
+        """기준 단가에 배율과 반올림을 적용"""
+        price = self._cache.get(base_price)
+        if price is None:
+            price = base_price * self.multiplier
+            if self.round_unit > 0:
+                price = (price / self.round_unit).quantize(Decimal("1"), rounding=ROUND_HALF_UP) * self.round_unit
+            self._cache[base_price] = price
+        return price
+
+    def price_for(self, item: "Item") -> Optional[Decimal]:
+        """품목의 규칙 단가. 제외 품목이거나 기준 등급 단가가 없으면 None."""
+        if item.sku_id in self.excluded_keys:
+            return None
+        base_price = item.prices.get(self.tier.value)
+        if base_price is None or base_price.is_nan():
+            return None
+        return self.apply(base_price)
+
+    def describe(self) -> str:
+        text = f"{self.tier} × {self.multiplier}"
+        if self.round_unit > 0:
+            text += f", {self.round_unit}원 단위 반올림"
+        if self.excluded_keys:
+            text += f", 제외 {len(self.excluded_keys)}개 품목"
+        return text
+
+class PropagationAction(enum.Enum):
+    """제품 마스터 변경을 단가 프로파일에 반영하는 방식"""
+    ADD_NEW = "add_new"                          # 새 품목을 가격 등급 단가(× 배율)로 추가
+    REMOVE_DISCONTINUED = "remove_discontinued"  # 마스터에서 사라진 품목의 단가 삭제
+    FOLLOW_TIER_CHANGE = "follow_tier_change"    # 가격 등급 단가가 바뀐 품목의 지정 단가를 같은 비율로 조정
+
+    def __str__(self):
+        if self == PropagationAction.ADD_NEW:
+            return "새 품목 추가"
+        elif self == PropagationAction.REMOVE_DISCONTINUED:
+            return "단종 품목 삭제"
+        return "등급 단가 변동 반영"
+
+@dataclass(frozen=True)
+class PropagationRule:
+    """
+    제품 마스터 변경분을 모든 단가 프로파일에 일괄 반영하는 규칙. 예: 새 품목을 일반대리점가로 추가.
+    tier 는 ADD_NEW 의 기준 단가와 FOLLOW_TIER_CHANGE 의 감시 등급이며, round_unit 은 계산한 단가의 반올림 단위입니다.
+    """
+    action: PropagationAction
+    tier: PriceTier = PriceTier.DEALER
+    multiplier: Decimal = Decimal("1")
+    round_unit: Decimal = Decimal("0")
+
+    def price_rule(self) -> PriceRule:
+        """ADD_NEW 단가 계산에 쓰는 같은 배율/반올림의 PriceRule"""
+        return PriceRule(tier=self.tier, multiplier=self.multiplier, round_unit=self.round_unit)
+
+    def describe(self) -> str:
+        if self.action == PropagationAction.ADD_NEW:
+            return f"{self.action}: {self.price_rule().describe()}"
+        if self.action == PropagationAction.FOLLOW_TIER_CHANGE:
+            return f"{self.action}: {self.tier}"
+        return str(self.action)
+
+@dataclass(frozen=True)
+class MarginPolicy:
+    """
+    단가 마진 점검 기준. 매입단가 미만은 항상 문제로 보고, 마진율((단가 - 매입단가) / 단가)이 min_margin_percent 미만이면
+    마진 부족, 치료재료단가(보험 상한가)의 medical_cap_percent% 를 넘으면 상한 초과로 봅니다.
+    """
+    min_margin_percent: Decimal = Decimal("0")     # 0이면 매입단가 미만만 점검
+    medical_cap_percent: Decimal = Decimal("100")  # 0이면 상한 점검 안 함
+
+    def is_valid(self) -> bool:
+        """최소 마진율은 0 이상 100 미만 (100이면 하한을 계산할 수 없음), 상한 비율은 0 이상"""
+        return (self.min_margin_percent.is_finite() and self.medical_cap_percent.is_finite()
+                and 0 <= self.min_margin_percent < 100 and self.medical_cap_percent >= 0)
+
+    def describe(self) -> str:
+        text = f"최소 마진율 {self.min_margin_percent}%" if self.min_margin_percent > 0 else "매입단가 미만"
+        if self.medical_cap_percent > 0:
+            text += f", 치료재료단가의 {self.medical_cap_percent}% 초과"
+        return text
+
 @dataclass
 class PriceProfile:
-    """사용자 정의 단가 프로파일을 나타내는 데이터 클래스"""
+    """
+    사용자 정의 단가 프로파일을 나타내는 데이터 클래스.
+
+    base_profile_id 가 있으면 이 프로파일의 item_prices 는 기본(base) 프로파일에 대한 덮어쓰기(override)만
+    담고, 없는 품목은 기본 프로파일에서 찾습니다. 값이 None 인 항목은 기본 프로파일의 단가를 가리는 삭제 표시입니다.
+    가격 조회/변경은 get_price / set_price / remove_price 를 사용하세요. item_prices 는 다른 프로파일과
+    같은 dict 를 공유할 수 있으며(storage 의 중복 제거), 변경 시점에 복사됩니다(copy-on-write).
+
+    rule 이 있으면 item_prices(기본 프로파일 포함)에 없는 품목은 규칙으로 계산합니다. 규칙 단가는 품목(Item)이
+    있어야 계산되므로 get_price 에 item 을 넘기거나 pricing 모듈의 함수를 사용하세요.
+    """
     name: str
     id: str = field(default_factory=lambda: str(uuid.uuid4()))
-    # Key: Tuple (model_name, product_name, spec) to uniquely identify an item type.
-    # Value: Decimal price for that item in this profile.
-    # JSON 저장을 위해 튜플 키를 문자열로 변환해야 할 수 있음 (예: "model|product|spec").
-    item_prices: Dict[str, Decimal] = field(default_factory=dict) # 키는 "모델명|제품명|규격" 형태의 문자열
+    # Key: 품목 (model_name, product_name, spec) 의 SKU ID (Item.sku_id).
+    # Value: Decimal price for that item in this profile (None: 기본 프로파일 단가 삭제 표시).
+    # JSON 저장 시에는 "모델명|제품명|규격" 문자열 키로 변환됩니다.
+    item_prices: Dict[ProfileItemKey, Optional[Decimal]] = field(default_factory=dict)
+    base_profile_id: Optional[str] = None
+    rule: Optional[PriceRule] = None
+    # 로드 후 storage.link_price_profiles 가 연결하는 기본 프로파일 객체
+    base: Optional["PriceProfile"] = field(default=None, repr=False, compare=False)
+    # item_prices 를 다른 프로파일과 공유 중이면 True (변경 전에 복사)
+    shared_prices: bool = field(default=False, repr=False, compare=False)
 
     def __str__(self):
         return self.name
 
+    def _chain(self) -> List["PriceProfile"]:
+        """자신부터 최상위 기본 프로파일까지 (순환 참조는 끊음)"""
+        chain, seen = [], set()
+        profile: Optional[PriceProfile] = self
+        while profile is not None and id(profile) not in seen:
+            seen.add(id(profile))
+            chain.append(profile)
+            profile = profile.base
+        return chain
+
+    def get_price(self, key: ProfileItemKey, item: Optional["Item"] = None) -> Optional[Decimal]:
+        """
+        품목 단가. 자신에게 없으면 기본 프로파일에서 찾고, 그래도 없으면 item 이 주어진 경우 규칙으로 계산합니다.
+        어디에도 없거나 삭제 표시된 품목이면 None.
+        """
+        for profile in self._chain():
+            if key in profile.item_prices:
+                return profile.item_prices[key]
+        rule = self.effective_rule()
+        if rule is not None and item is not None:
+            return rule.price_for(item)
+        return None
+
+    def effective_rule(self) -> Optional[PriceRule]:
+        """자신 또는 가장 가까운 기본 프로파일의 규칙"""
+        return next((profile.rule for profile in self._chain() if profile.rule is not None), None)
+
+    def explicit_prices(self) -> Dict[ProfileItemKey, Optional[Decimal]]:
+        """기본 프로파일을 반영한 직접 지정 단가 (삭제 표시 None 포함, 규칙 단가 제외)"""
+        merged: Dict[ProfileItemKey, Optional[Decimal]] = {}
+        for profile in reversed(self._chain()):
+            merged.update(profile.item_prices)
+        return merged
+
+    def effective_prices(self) -> Dict[ProfileItemKey, Decimal]:
+        """기본 프로파일을 반영한 직접 지정 단가 (삭제 표시 제외, 규칙 단가 제외)"""
+        return {key: price for key, price in self.explicit_prices().items() if price is not None}
+
+    def _own_prices_for_write(self) -> Dict[ProfileItemKey, Optional[Decimal]]:
+        if self.shared_prices:
+            self.item_prices = dict(self.item_prices)
+            self.shared_prices = False
+        return self.item_prices
+
+    def set_price(self, key: ProfileItemKey, price: Decimal):
+        self._own_prices_for_write()[key] = price
+
+    def set_prices(self, prices: Dict[ProfileItemKey, Decimal]):
+        """여러 품목 단가를 한 번에 지정 (복사는 한 번만)"""
+        if prices:
+            self._own_prices_for_write().update(prices)
+
+    def drop_prices(self, keys) -> List[ProfileItemKey]:
+        """자신에게 직접 지정된 품목(삭제 표시 포함)을 삭제 표시 없이 제거하고, 제거한 키를 반환합니다."""
+        present = [key for key in keys if key in self.item_prices]
+        if present:
+            prices = self._own_prices_for_write()
+            for key in present:
+                del prices[key]
+        return present
+
+    def remove_price(self, key: ProfileItemKey):
+        """품목 단가 삭제. 기본 프로파일이나 규칙에 단가가 있으면 삭제 표시를 남겨 가립니다."""
+        prices = self._own_prices_for_write()
+        if (self.base is not None and self.base.get_price(key) is not None) or self.effective_rule() is not None:
+            prices[key] = None
+        else:
+            prices.pop(key, None)
+
+    def detach_base(self):
+        """기본 프로파일의 단가를 자신에게 복사하고 연결을 끊습니다. (기본 프로파일 삭제 전)"""
+        if self.base is None and self.base_profile_id is None:
+            return
+        self.rule = self.effective_rule()
+        # 규칙이 있으면 규칙 단가를 가리는 삭제 표시도 유지
+        self.item_prices = self.explicit_prices() if self.rule is not None else self.effective_prices()
+        self.shared_prices = False
+        self.base = None
+        self.base_profile_id = None
+
 @dataclass
 class Item:
     """
@@ -74,6 +269,14 @@ class Item:
     treatment_code: str  # 치료재료코드
     udi_di: Optional[int]  # UDI-DI(필수입력)
     prices: Dict[str, Decimal] = field(default_factory=dict)  # 예: {'purchase_price': Decimal('100.00'), 'price_A': Decimal('120.00')}
+    # (모델명, 제품명, 규격) 의 SKU ID. 마스터 로드 시 sku.assign_items 가 채우고, 없으면 처음 조회할 때 부여
+    _sku_id: Optional[int] = field(default=None, init=False, repr=False, compare=False)
+
+    @property
+    def sku_id(self) -> int:
+        if self._sku_id is None:
+            self._sku_id = sku.id_for((self.model_name, self.product_name, self.spec))
+        return self._sku_id
 
     def get_price_for_tier(self, tier: PriceTier) -> Optional[Decimal]:
         """지정된 가격 등급에 해당하는 단가를 반환합니다."""
@@ -125,6 +328,10 @@ class InvoiceLine:
     @property
     def udi_di(self) -> Optional[int]:
         return self.item.udi_di
+
+    @property
+    def sku_id(self) -> int:
+        return self.item.sku_id
     
     @property
     def insurance_price(self) -> Optional[Decimal]:
@@ -0,0 +1,400 @@
+"""
+단가 변경 이력 (추가 전용 로그)과 시점 조회 인덱스.
+
+프로파일 단가를 수정하거나 제품 마스터의 가격 등급 단가가 바뀌면 바뀐 항목 하나만
+사용자 데이터 폴더의 price_history.jsonl 에 한 줄씩 추가합니다. (전체 파일 스냅샷을 남기지 않음)
+공유 폴더 모드(storage.get_shared_store())에서는 모든 사용자가 공유 폴더의 price_history.jsonl 하나를 쓰며,
+추가는 공유 저장소 잠금(store.lock)을 잡고 하고, 다른 사용자가 추가한 줄은 refresh()로 읽어 옵니다.
+
+    {"t": "2025-06-16T10:20:00", "s": "profile:<프로파일 ID>", "k": "모델명|제품명|규격", "v": "123000"}
+
+  - s (scope): "profile:<ID>" (프로파일에 직접 지정한 단가) 또는 "tier:<가격 등급 값>" (마스터 단가)
+  - k: 품목 키. 프로파일 단가 규칙은 RULE_KEY 로 기록하고 v 에 규칙 dict 를 담습니다.
+  - v: 단가 문자열, null(프로파일에 직접 지정한 단가 없음), "-"(삭제 표시, 기본 프로파일/규칙 단가를 가림)
+  - t 가 null 인 줄은 처음 기록할 때 남기는 이전 값(기준값)으로, 그 이전 모든 시점에 유효합니다.
+
+로드 시 (scope, 품목 키)별로 시각 순 정렬된 배열을 만들어 두므로 "D 시점의 단가"는 bisect 로 O(log n)에 찾습니다.
+이력이 없는 항목은 현재 값이 과거에도 같았던 것으로 봅니다. 거래처의 가격 등급/프로파일 연결 변경은 기록하지 않습니다.
+"""
+import bisect
+import datetime
+import json
+import logging
+import math
+import os
+from decimal import Decimal, InvalidOperation
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from models import Company, Item, PriceProfile, PriceRule, PriceTier, ProfileItemKey
+import pricing
+import profiling
+import sku
+import storage
+
+logger = logging.getLogger(__name__)
+
+HISTORY_FILE = "price_history.jsonl"
+RULE_KEY = "#rule"
+REMOVED = "-"  # 삭제 표시 (PriceProfile.item_prices 의 None)
+# 마스터 단가 이력을 남기는 가격 등급
+TRACKED_TIERS = [PriceTier.PURCHASE, PriceTier.A, PriceTier.B, PriceTier.DEALER, PriceTier.MEDICAL, PriceTier.ETC]
+
+_MISSING = object()
+_BEGINNING = -math.inf
+
+SeriesKey = Tuple[str, str]
+
+
+def profile_scope(profile: PriceProfile) -> str:
+    return f"profile:{profile.id}"
+
+
+def tier_scope(tier: PriceTier) -> str:
+    return f"tier:{tier.value}"
+
+
+def _item_key_str(key: ProfileItemKey) -> str:
+    """로그에는 SKU ID 대신 "모델명|제품명|규격" 으로 기록 (ID는 실행 환경마다 다를 수 있음)"""
+    return sku.key_str(key)
+
+
+def _price_to_value(price: Any) -> Optional[str]:
+    """프로파일 직접 지정 단가 -> 로그 값 (없음: None)"""
+    return str(price) if price is not None else None
+
+
+def _own_value(profile: PriceProfile, key: ProfileItemKey) -> Optional[str]:
+    """프로파일 자신(기본 프로파일 제외)에 직접 지정된 값의 로그 표현"""
+    if key not in profile.item_prices:
+        return None
+    price = profile.item_prices[key]
+    return REMOVED if price is None else str(price)
+
+
+def _rule_to_value(rule: Optional[PriceRule]) -> Optional[Dict[str, Any]]:
+    return storage.price_rule_to_dict(rule) if rule is not None else None
+
+
+class PriceHistory:
+    """단가 변경 로그와 (scope, 품목 키)별 시점 조회 인덱스"""
+
+    def __init__(self, path: Optional[str] = None, lock_path: Optional[str] = None):
+        self.path = path
+        self.lock_path = lock_path  # 여러 사용자가 같은 파일에 추가할 때 잡는 잠금 파일 (공유 폴더 모드)
+        # (scope, 품목 키) -> (시각 목록(오름차순), 값 목록)
+        self._index: Dict[SeriesKey, Tuple[List[float], List[Any]]] = {}
+        self._offset = 0     # 읽어 들인 파일 위치 (바이트)
+        self._line_no = 0
+
+    @classmethod
+    @profiling.traced("price_history.load")
+    def load(cls, path: Optional[str] = None) -> "PriceHistory":
+        """로그 파일을 읽어 인덱스를 만듭니다. 파일이 없으면 빈 이력. path 가 없으면 default_location()."""
+        history = cls(path) if path else cls(*default_location())
+        history.refresh()
+        return history
+
+    def refresh(self) -> int:
+        """마지막으로 읽은 위치 이후에 (다른 사용자가) 추가한 줄을 인덱스에 반영하고 읽은 줄 수를 반환합니다."""
+        if not self.path:
+            return 0
+        try:
+            with open(self.path, 'rb') as f:
+                f.seek(self._offset)
+                data = f.read()
+        except FileNotFoundError:
+            return 0
+        except OSError as e:
+            logger.error("단가 이력을 읽을 수 없습니다 (%s): %s", self.path, e)
+            return 0
+        # 다른 사용자가 쓰는 중인 마지막 줄(줄바꿈 전)은 다음에 읽음
+        end = data.rfind(b"\n") + 1
+        self._offset += end
+        count = 0
+        for line in data[:end].decode('utf-8', errors='replace').splitlines():
+            self._line_no += 1
+            if not line.strip():
+                continue
+            try:
+                entry = json.loads(line)
+                timestamp = (_BEGINNING if entry["t"] is None
+                             else datetime.datetime.fromisoformat(entry["t"]).timestamp())
+                self._insert((entry["s"], entry["k"]), timestamp, entry.get("v"))
+                count += 1
+            except (ValueError, KeyError, TypeError) as e:
+                logger.warning("단가 이력 %d행을 건너뜁니다 (%s): %s", self._line_no, self.path, e)
+        return count
+
+    def __len__(self):
+        return sum(len(times) for times, _ in self._index.values())
+
+    def _insert(self, series_key: SeriesKey, timestamp: float, value: Any):
+        times, values = self._index.setdefault(series_key, ([], []))
+        if not times or timestamp >= times[-1]:
+            times.append(timestamp)
+            values.append(value)
+        else:  # 시계가 뒤로 간 경우 등
+            position = bisect.bisect_right(times, timestamp)
+            times.insert(position, timestamp)
+            values.insert(position, value)
+
+    def has_series(self, scope: str, key: str) -> bool:
+        return (scope, key) in self._index
+
+    def value_as_of(self, scope: str, key: str, when: datetime.datetime) -> Any:
+        """when 시점에 유효한 로그 값. 이력이 없거나 첫 기록 이전이면 _MISSING."""
+        series = self._index.get((scope, key))
+        if series is None:
+            return _MISSING
+        times, values = series
+        position = bisect.bisect_right(times, when.timestamp())
+        return values[position - 1] if position else _MISSING
+
+    def latest(self, scope: str, key: str) -> Any:
+        series = self._index.get((scope, key))
+        return series[1][-1] if series else _MISSING
+
+    # --- 기록 ---
+
+    def _append(self, entries: List[Tuple[str, str, Any]], when: Optional[datetime.datetime] = None,
+                baselines: Optional[List[Tuple[str, str, Any]]] = None):
+        """baselines(처음 기록되는 항목의 이전 값)와 변경 항목을 로그와 인덱스에 추가"""
+        when = when or datetime.datetime.now()
+        baselines = baselines or []
+        if self.lock_path is None or not self.path:
+            self._append_locked(entries, when, baselines)
+            return
+        from shared_store import FileLock, LockTimeout
+        try:
+            with FileLock(self.lock_path):
+                # 잠금 안에서는 다른 사용자가 추가하지 않으므로 그 사이 추가된 줄을 먼저 읽고,
+                # 다른 사용자가 이미 기준값을 남긴 항목은 기준값을 다시 남기지 않음
+                self.refresh()
+                baselines = [(scope, key, value) for scope, key, value in baselines if not self.has_series(scope, key)]
+                self._append_locked(entries, when, baselines)
+        except LockTimeout as e:
+            logger.error("단가 이력 저장 실패: %s", e)
+            self._append_locked(entries, when, baselines, write=False)
+
+    def _append_locked(self, entries: List[Tuple[str, str, Any]], when: datetime.datetime,
+                       baselines: List[Tuple[str, str, Any]], write: bool = True):
+        stamp = when.isoformat(timespec="seconds")
+        lines = []
+        for scope, key, value in baselines:
+            self._insert((scope, key), _BEGINNING, value)
+            lines.append(json.dumps({"t": None, "s": scope, "k": key, "v": value}, ensure_ascii=False, separators=(",", ":")))
+        for scope, key, value in entries:
+            self._insert((scope, key), when.timestamp(), value)
+            lines.append(json.dumps({"t": stamp, "s": scope, "k": key, "v": value}, ensure_ascii=False, separators=(",", ":")))
+        if not lines or not self.path or not write:
+            return
+        try:
+            with open(self.path, 'ab') as f:
+                f.write(("\n".join(lines) + "\n").encode('utf-8'))
+                # 내가 추가한 줄은 이미 인덱스에 있으므로 refresh()가 다시 읽지 않게 함
+                self._offset = f.tell()
+        except OSError as e:
+            logger.error("단가 이력 저장 실패 (%s): %s", self.path, e)
+
+    def record_change(self, scope: str, key: str, old_value: Any, new_value: Any,
+                      when: Optional[datetime.datetime] = None):
+        """한 항목의 변경을 기록합니다. 처음 기록하는 항목이면 이전 값을 기준값으로 함께 남깁니다."""
+        if old_value == new_value:
+            return
+        baselines = [] if self.has_series(scope, key) else [(scope, key, old_value)]
+        self._append([(scope, key, new_value)], when, baselines)
+
+    def record_profile_price(self, profile: PriceProfile, key: ProfileItemKey, old_own_value: Optional[str],
+                             when: Optional[datetime.datetime] = None):
+        """
+        프로파일 단가 변경 후 호출합니다. old_own_value 는 변경 전 snapshot_own_value() 결과.
+            before = price_history.snapshot_own_value(profile, key)
+            profile.set_price(key, price)
+            history.record_profile_price(profile, key, before)
+        """
+        self.record_change(profile_scope(profile), _item_key_str(key), old_own_value, _own_value(profile, key), when)
+
+    def record_profile_prices(self, changes: Iterable[Tuple[PriceProfile, ProfileItemKey, Optional[str]]],
+                              when: Optional[datetime.datetime] = None) -> int:
+        """여러 프로파일 단가 변경을 한 번에 기록합니다. changes: (프로파일, 품목 키, 변경 전 snapshot_own_value)"""
+        entries, baselines = [], []
+        for profile, key, old_own_value in changes:
+            scope, key_str, new_value = profile_scope(profile), _item_key_str(key), _own_value(profile, key)
+            if old_own_value == new_value:
+                continue
+            if not self.has_series(scope, key_str):
+                baselines.append((scope, key_str, old_own_value))
+            entries.append((scope, key_str, new_value))
+        self._append(entries, when, baselines)
+        return len(entries)
+
+    def record_profile_rule(self, profile: PriceProfile, old_rule: Optional[PriceRule],
+                            when: Optional[datetime.datetime] = None):
+        self.record_change(profile_scope(profile), RULE_KEY, _rule_to_value(old_rule), _rule_to_value(profile.rule), when)
+
+    @profiling.traced("price_history.record_master_prices")
+    def record_master_prices(self, items: Iterable[Item], when: Optional[datetime.datetime] = None) -> int:
+        """
+        제품 마스터 로드 후 호출합니다. 품목 키별(마스터 순서상 첫 품목) 가격 등급 단가를 마지막 기록과 비교해
+        바뀐 항목만 추가하고, 처음 보는 항목은 기준값으로 남깁니다. 추가한 변경 수를 반환합니다.
+        """
+        first_by_key: Dict[ProfileItemKey, Item] = {}
+        for item in items:
+            first_by_key.setdefault(pricing.item_profile_key(item), item)
+        changes, baselines = [], []
+        for key, item in first_by_key.items():
+            key_str = _item_key_str(key)
+            for tier in TRACKED_TIERS:
+                scope = tier_scope(tier)
+                value = _price_to_value(item.prices.get(tier.value))
+                latest = self.latest(scope, key_str)
+                if latest is _MISSING:
+                    baselines.append((scope, key_str, value))
+                elif latest != value:
+                    changes.append((scope, key_str, value))
+        self._append(changes, when, baselines)
+        return len(changes)
+
+    # --- 시점 조회 ---
+
+    def tier_price_as_of(self, item: Item, tier: PriceTier, when: datetime.datetime) -> Optional[Decimal]:
+        value = self.value_as_of(tier_scope(tier), _item_key_str(pricing.item_profile_key(item)), when)
+        if value is _MISSING:
+            return item.prices.get(tier.value)
+        return _parse_price(value)
+
+    def _explicit_as_of(self, profile: PriceProfile, key: ProfileItemKey, when: datetime.datetime) -> Any:
+        """프로파일(기본 프로파일 포함)에 직접 지정된 단가. Decimal / None(삭제 표시) / _MISSING(지정 없음)"""
+        key_str = _item_key_str(key)
+        for layer in profile._chain():
+            value = self.value_as_of(profile_scope(layer), key_str, when)
+            if value is _MISSING:
+                if key in layer.item_prices:
+                    return layer.item_prices[key]
+                continue
+            if value is None:
+                continue
+            return None if value == REMOVED else _parse_price(value)
+        return _MISSING
+
+    def _rule_as_of(self, profile: PriceProfile, when: datetime.datetime) -> Optional[PriceRule]:
+        for layer in profile._chain():
+            value = self.value_as_of(profile_scope(layer), RULE_KEY, when)
+            if value is _MISSING:
+                if layer.rule is not None:
+                    return layer.rule
+                continue
+            if value is not None:
+                try:
+                    return storage.dict_to_price_rule(value)
+                except (KeyError, ValueError, TypeError, InvalidOperation):
+                    return None
+        return None
+
+    @profiling.traced("price_history.resolve_unit_price_as_of")
+    def resolve_unit_price_as_of(self, item: Item, company: Optional[Company], price_profile: Optional[PriceProfile],
+                                 when: datetime.datetime) -> Tuple[Optional[Decimal], str]:
+        """pricing.resolve_unit_price 와 같은 규칙으로, when 시점의 프로파일/규칙/가격 등급 단가를 사용합니다."""
+        if price_profile is not None:
+            explicit = self._explicit_as_of(price_profile, pricing.item_profile_key(item), when)
+            if explicit is not _MISSING:
+                if explicit is not None:
+                    return explicit, price_profile.name
+            else:
+                rule = self._rule_as_of(price_profile, when)
+                if rule is not None and pricing.item_profile_key(item) not in rule.excluded_keys:
+                    base_price = self.tier_price_as_of(item, rule.tier, when)
+                    if base_price is not None and not base_price.is_nan():
+                        return rule.apply(base_price), price_profile.name
+        if company is not None:
+            unit_price = self.tier_price_as_of(item, company.price_tier, when)
+            if unit_price is not None:
+                return unit_price, str(company.price_tier)
+        return None, ""
+
+
+def _parse_price(value: Any) -> Optional[Decimal]:
+    if value is None:
+        return None
+    try:
+        return Decimal(value)
+    except (InvalidOperation, TypeError):
+        return None
+
+
+def default_location() -> Tuple[str, Optional[str]]:
+    """(이력 파일 경로, 잠금 파일 경로). 공유 폴더 모드이면 공유 폴더의 파일과 공유 저장소 잠금, 아니면 사용자 데이터 폴더."""
+    store = storage.get_shared_store()
+    if store is None:
+        return storage.get_user_data_path(HISTORY_FILE), None
+    from shared_store import LOCK_FILE
+    return os.path.join(store.root, HISTORY_FILE), os.path.join(store.root, LOCK_FILE)
+
+
+def snapshot_own_value(profile: PriceProfile, key: ProfileItemKey) -> Optional[str]:
+    """변경 전 프로파일 자신의 직접 지정 값 (PriceHistory.record_profile_price 에 넘김)"""
+    return _own_value(profile, key)
+
+
+def end_of_day(date: datetime.date) -> datetime.datetime:
+    """명세서 날짜의 단가는 그날 마지막 시점 기준"""
+    return datetime.datetime.combine(date, datetime.time.max)
+
+
+if __name__ == '__main__':
+    import tempfile
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, HISTORY_FILE)
+        history = PriceHistory(path)
+        item = Item(lot="L1", model_name="M", product_name="P", spec="S", treatment_code="", udi_di=None,
+                    prices={PriceTier.A.value: Decimal("100"), PriceTier.DEALER.value: Decimal("80")})
+        key = pricing.item_profile_key(item)
+        company = Company(name="테스트", price_tier=PriceTier.A)
+        profile = PriceProfile(name="VIP")
+        t0 = datetime.datetime(2025, 1, 1)
+        t1 = datetime.datetime(2025, 2, 1)
+        t2 = datetime.datetime(2025, 3, 1)
+
+        history.record_master_prices([item], t0)
+        before = snapshot_own_value(profile, key)
+        profile.set_price(key, Decimal("90"))
+        history.record_profile_price(profile, key, before, t1)
+        item.prices[PriceTier.A.value] = Decimal("110")
+        assert history.record_master_prices([item], t2) == 1
+
+        reloaded = PriceHistory.load(path)
+        assert reloaded.resolve_unit_price_as_of(item, company, profile, datetime.datetime(2025, 1, 15)) == (Decimal("100"), "A단가")
+        assert reloaded.resolve_unit_price_as_of(item, company, profile, datetime.datetime(2025, 2, 15)) == (Decimal("90"), "VIP")
+        assert reloaded.resolve_unit_price_as_of(item, company, None, datetime.datetime(2025, 2, 15))[0] == Decimal("100")
+        assert reloaded.resolve_unit_price_as_of(item, company, None, t2)[0] == Decimal("110")
+
+        old_rule = profile.rule
+        profile.rule = PriceRule(tier=PriceTier.DEALER, multiplier=Decimal("0.5"))
+        reloaded.record_profile_rule(profile, old_rule, t2)
+        before = snapshot_own_value(profile, key)
+        profile.remove_price(key)
+        reloaded.record_profile_price(profile, key, before, t2)
+        assert reloaded.resolve_unit_price_as_of(item, company, profile, t2) == (Decimal("110"), "A단가")
+        assert reloaded.resolve_unit_price_as_of(item, company, profile, datetime.datetime(2025, 2, 15))[0] == Decimal("90")
+
+        # 공유 폴더 모드: 두 사용자가 공유 폴더의 한 파일에 잠금을 잡고 추가하고, 서로의 변경을 refresh()로 읽음
+        shared_dir = os.path.join(tmp, "shared")
+        storage.set_shared_dir(shared_dir)
+        try:
+            shared_path, lock_path = default_location()
+            assert os.path.dirname(shared_path) == shared_dir and lock_path is not None
+            clerk_a, clerk_b = PriceHistory.load(), PriceHistory.load()
+            shared_profile = PriceProfile(name="공유")
+            for clerk, price, when in ((clerk_a, "95", t1), (clerk_b, "85", t2)):
+                before = snapshot_own_value(shared_profile, key)
+                shared_profile.set_price(key, Decimal(price))
+                clerk.record_profile_price(shared_profile, key, before, when)
+            assert len(clerk_b) == 3  # B는 추가 전에 A의 기준값/변경을 읽고 기준값을 다시 남기지 않음
+            assert clerk_a.refresh() == 1 and clerk_a.refresh() == 0
+            for clerk in (clerk_a, clerk_b, PriceHistory.load()):
+                assert clerk.resolve_unit_price_as_of(item, company, shared_profile, datetime.datetime(2025, 2, 15))[0] == Decimal("95")
+                assert clerk.resolve_unit_price_as_of(item, company, shared_profile, t2)[0] == Decimal("85")
+        finally:
+            storage.set_shared_dir(None)
+        print(f"단가 이력 자체 테스트 통과 (기록 {len(reloaded)}건)")
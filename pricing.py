@@ -0,0 +1,82 @@
+from decimal import Decimal
+from typing import Dict, Iterable, List, Mapping, Optional, Tuple
+
+from models import Company, Item, PriceProfile
+import profiling
+
+
+def item_profile_key(item: Item) -> int:
+    """PriceProfile.item_prices 에서 사용하는 품목 키 ((모델명, 제품명, 규격) 의 SKU ID)"""
+    return item.sku_id
+
+
+def find_price_profile(price_profiles: Iterable[PriceProfile], profile_id: Optional[str]) -> Optional[PriceProfile]:
+    """ID로 가격 프로파일을 찾습니다. 없으면 None."""
+    if not profile_id:
+        return None
+    return next((p for p in price_profiles if p.id == profile_id), None)
+
+
+@profiling.traced("pricing.resolve_unit_price")
+def resolve_unit_price(item: Item, company: Optional[Company],
+                       price_profile: Optional[PriceProfile] = None) -> Tuple[Optional[Decimal], str]:
+    """
+    거래처에 적용될 품목 단가를 결정합니다.
+    커스텀 프로파일에 해당 품목 가격이 있으면 그 값을, 없으면 거래처 기본 가격 등급의 단가를 사용합니다.
+    (희소 프로파일은 업체가 가진 가격만 저장하므로 나머지 품목은 모두 가격 등급 단가로 대체됩니다.)
+    기본(base) 프로파일이 연결된 프로파일은 자신에게 없는 품목을 기본 프로파일에서 찾습니다.
+    단가 규칙(PriceRule)이 있는 프로파일은 직접 지정 단가가 없는 품목을 규칙으로 계산합니다.
+
+    Returns:
+        (단가, 단가 출처 표시 문자열). 단가를 찾지 못하면 (None, "").
+    """
+    if price_profile is not None:
+        profile_price = price_profile.get_price(item_profile_key(item), item)
+        if profile_price is not None:
+            return profile_price, price_profile.name
+    if company is not None:
+        unit_price = item.get_price_for_tier(company.price_tier)
+        if unit_price is not None:
+            return unit_price, str(company.price_tier)
+    return None, ""
+
+
+@profiling.traced("pricing.resolve_unit_prices")
+def resolve_unit_prices(items: Iterable[Item], company: Optional[Company],
+                        price_profile: Optional[PriceProfile] = None) -> List[Tuple[Item, Optional[Decimal], str]]:
+    """여러 품목의 단가를 한 번에 결정합니다. (품목, 단가, 단가 출처) 리스트를 반환합니다."""
+    # 직접 지정 단가(삭제 표시 None 포함)와 규칙은 호출당 한 번만 구함
+    profile_prices = price_profile.explicit_prices() if price_profile is not None else {}
+    rule = price_profile.effective_rule() if price_profile is not None else None
+    profile_name = price_profile.name if price_profile is not None else ""
+    tier_value = company.price_tier.value if company is not None else None
+    tier_label = str(company.price_tier) if company is not None else ""
+
+    results = []
+    for item in items:
+        key = item.sku_id
+        if key in profile_prices:
+            unit_price = profile_prices[key]
+        else:
+            unit_price = rule.price_for(item) if rule is not None else None
+        if unit_price is not None:
+            results.append((item, unit_price, profile_name))
+            continue
+        unit_price = item.prices.get(tier_value) if tier_value is not None else None
+        results.append((item, unit_price, tier_label if unit_price is not None else ""))
+    return results
+
+
+def profile_item_prices(price_profile: PriceProfile,
+                        items_by_sku: Mapping[int, Item]) -> Dict[int, Decimal]:
+    """프로파일 상세 화면용 품목별 단가: 직접 지정 단가 + 규칙으로 계산한 마스터 품목 단가"""
+    explicit = price_profile.explicit_prices()
+    prices = {key: price for key, price in explicit.items() if price is not None}
+    rule = price_profile.effective_rule()
+    if rule is not None:
+        for key, item in items_by_sku.items():
+            if key not in explicit:
+                rule_price = rule.price_for(item)
+                if rule_price is not None:
+                    prices[key] = rule_price
+    return prices
@@ -0,0 +1,326 @@
+"""
+단가 프로파일/가격 등급 비교.
+
+여러 프로파일(직접 지정 + 규칙 단가)과 마스터 가격 등급(일반대리점가 등)을 품목(SKU) 축으로 맞춰
+한 표로 만듭니다. 첫 번째 열이 기준이며, 나머지 열은 기준 대비 차이(원)와 비율로 정렬/비교할 수 있습니다.
+
+- 열마다 {SKU ID: 단가} dict 를 한 번 만들고, 전체 SKU 축에 대해 열 단위로 map(dict.get)/zip 하여 행렬을 만듭니다.
+  (행마다 파이썬 루프를 돌지 않으므로 수십 개 프로파일 × 수만 품목도 수십 ms)
+- 차이/비율은 정렬하거나 화면에 보이는 행, 내보내는 행에 대해서만 계산합니다.
+- 같은 item_prices 와 규칙을 쓰는 프로파일(업체 그룹)의 단가는 한 번만 계산합니다.
+
+사용 예:
+    python profile_compare.py "병원A" "병원B" --tier DEALER --sort delta --top 20
+    python profile_compare.py "병원A" "병원B" --output 비교.xlsx
+"""
+import argparse
+import operator
+import os
+from dataclasses import dataclass
+from decimal import Decimal
+from typing import Dict, List, Mapping, Optional, Sequence, Tuple
+
+import pricing
+import profile_io
+import profiling
+import sku
+from catalog import split_search_terms
+from models import Item, PriceProfile, PriceTier
+
+SORT_NAME = "name"      # 제품명/모델명/규격
+SORT_PRICE = "price"    # 열의 단가
+SORT_DELTA = "delta"    # 열 단가 - 기준 단가
+SORT_RATIO = "ratio"    # 열 단가 / 기준 단가
+SORT_SPREAD = "spread"  # 행의 최고 단가 - 최저 단가
+
+PriceRow = Tuple[Optional[Decimal], ...]  # 열 순서대로의 단가 (없으면 None)
+
+
+@dataclass
+class CompareColumn:
+    """비교할 단가 열: 단가 프로파일(직접 지정 + 규칙 단가) 또는 마스터 가격 등급"""
+    label: str
+    profile: Optional[PriceProfile] = None
+    tier: Optional[PriceTier] = None
+
+    @classmethod
+    def for_profile(cls, profile: PriceProfile) -> "CompareColumn":
+        return cls(profile.name, profile=profile)
+
+    @classmethod
+    def for_tier(cls, tier: PriceTier) -> "CompareColumn":
+        return cls(str(tier), tier=tier)
+
+    def prices(self, items_by_sku: Mapping[int, Item]) -> Dict[int, Decimal]:
+        if self.profile is not None:
+            return pricing.profile_item_prices(self.profile, items_by_sku)
+        tier_key = self.tier.value
+        return {key: item.prices[tier_key] for key, item in items_by_sku.items() if item.prices.get(tier_key) is not None}
+
+
+@dataclass
+class ColumnStats:
+    """기준 열 대비 한 열의 요약"""
+    label: str
+    compared: int = 0  # 기준과 이 열 모두 단가가 있는 품목 수
+    higher: int = 0
+    lower: int = 0
+    same: int = 0
+    missing: int = 0   # 기준에는 있고 이 열에는 없는 품목 수
+    extra: int = 0     # 이 열에만 있는 품목 수
+
+    def describe(self) -> str:
+        return (f"{self.label}: 비교 {self.compared:,}건 (높음 {self.higher:,} / 낮음 {self.lower:,} / 같음 {self.same:,}),"
+                f" 없음 {self.missing:,}, 추가 {self.extra:,}")
+
+
+def price_delta(prices: PriceRow, column: int) -> Optional[Decimal]:
+    price, base = prices[column], prices[0]
+    if price is None or base is None:
+        return None
+    return price - base
+
+
+def price_ratio(prices: PriceRow, column: int) -> Optional[float]:
+    """열 단가 / 기준 단가 (기준이 0이면 None). 표시와 정렬용이므로 float"""
+    price, base = prices[column], prices[0]
+    if price is None or not base:
+        return None
+    return float(price) / float(base)
+
+
+def price_spread(prices: PriceRow) -> Optional[Decimal]:
+    present = [price for price in prices if price is not None]
+    if len(present) < 2:
+        return None
+    return max(present) - min(present)
+
+
+class ComparisonResult:
+    """SKU 축으로 맞춘 단가 행렬. rows() 는 조건에 맞는 행 번호를 정렬해서 돌려줍니다."""
+
+    def __init__(self, columns: List[CompareColumn], sku_ids: List[int], matrix: List[PriceRow]):
+        self.columns = columns
+        self.sku_ids = sku_ids  # 제품명/모델명/규격 순
+        self.matrix = matrix
+
+    def __len__(self):
+        return len(self.sku_ids)
+
+    def rows(self, sort: str = SORT_NAME, column: int = 1, descending: bool = False,
+             text: str = "", differences_only: bool = False) -> List[int]:
+        """
+        검색어(공백 구분, 모두 포함)와 차이 여부로 거른 행 번호를 정렬해서 반환합니다.
+        differences_only 이면 모든 열의 단가가 같은 행은 뺍니다. (한 열이라도 단가가 없으면 차이로 봄)
+        정렬 값이 없는 행(단가 없음)은 정렬 방향과 관계없이 맨 뒤에 둡니다.
+        """
+        matrix = self.matrix
+        indices = range(len(matrix))
+        if differences_only:
+            indices = [i for i in indices if len(set(matrix[i])) > 1]
+        terms = split_search_terms(text)
+        if terms:
+            registry = sku.get_registry()
+            sku_ids = self.sku_ids
+            matched = []
+            for i in indices:
+                hay = registry.key_str(sku_ids[i]).lower()
+                if all(term in hay for term in terms):
+                    matched.append(i)
+            indices = matched
+        if sort == SORT_NAME:
+            return list(reversed(indices)) if descending else list(indices)
+
+        if sort == SORT_PRICE:
+            values = [(i, matrix[i][column]) for i in indices]
+        elif sort == SORT_DELTA:
+            values = [(i, price_delta(matrix[i], column)) for i in indices]
+        elif sort == SORT_RATIO:
+            values = [(i, price_ratio(matrix[i], column)) for i in indices]
+        elif sort == SORT_SPREAD:
+            values = [(i, price_spread(matrix[i])) for i in indices]
+        else:
+            raise ValueError(f"알 수 없는 정렬 기준: {sort}")
+        present = [pair for pair in values if pair[1] is not None]
+        present.sort(key=operator.itemgetter(1), reverse=descending)  # 안정 정렬: 같은 값은 이름 순 유지
+        return [i for i, _ in present] + [i for i, value in values if value is None]
+
+    def column_stats(self) -> List[ColumnStats]:
+        """기준 열 대비 나머지 열의 높음/낮음/같음/없음 건수"""
+        stats = []
+        base_prices = [prices[0] for prices in self.matrix]
+        for column in range(1, len(self.columns)):
+            stat = ColumnStats(self.columns[column].label)
+            for base, price in zip(base_prices, (prices[column] for prices in self.matrix)):
+                if price is None:
+                    if base is not None:
+                        stat.missing += 1
+                elif base is None:
+                    stat.extra += 1
+                else:
+                    stat.compared += 1
+                    if price > base:
+                        stat.higher += 1
+                    elif price < base:
+                        stat.lower += 1
+                    else:
+                        stat.same += 1
+            stats.append(stat)
+        return stats
+
+    def summary(self) -> str:
+        return f"품목 {len(self):,}개, 기준: {self.columns[0].label}"
+
+    def export_headers(self) -> List[str]:
+        labels = [column.label for column in self.columns]
+        return [*profile_io.KEY_HEADERS, *labels,
+                *(f"차이({label})" for label in labels[1:]), *(f"비율({label})" for label in labels[1:])]
+
+    def export_rows(self, indices: Sequence[int]) -> List[list]:
+        """내보낼 행 (모델명, 제품명, 규격, 열별 단가, 기준 대비 차이, 기준 대비 비율). 작업 스레드로 넘길 스냅샷"""
+        registry = sku.get_registry()
+        others = range(1, len(self.columns))
+        rows = []
+        for i in indices:
+            prices = self.matrix[i]
+            ratios = [price_ratio(prices, column) for column in others]
+            rows.append([*registry.key_for(self.sku_ids[i]), *prices,
+                         *(price_delta(prices, column) for column in others),
+                         *(round(ratio, 4) if ratio is not None else None for ratio in ratios)])
+        return rows
+
+
+@profiling.traced("profile_compare.compare_prices")
+def compare_prices(columns: List[CompareColumn], items_by_sku: Mapping[int, Item]) -> ComparisonResult:
+    """
+    열들의 단가를 SKU 축으로 맞춥니다. SKU 축은 어느 한 열에라도 단가가 있는 품목 전체입니다.
+    (프로파일에만 있고 마스터에는 없는 품목도 포함)
+    """
+    if not columns:
+        raise ValueError("비교할 열이 없습니다.")
+    cache: Dict[tuple, Dict[int, Decimal]] = {}
+    column_prices = []
+    for column in columns:
+        if column.profile is not None:
+            # 업체 그룹처럼 기본 프로파일까지 모든 item_prices 를 공유하고 규칙도 같은 프로파일은 단가가 같음
+            # (자신의 dict 만 같으면 안 됨: 중복 제거로 기본 프로파일이 다른 프로파일끼리 dict 를 공유할 수 있음)
+            chain_ids = tuple(id(profile.item_prices) for profile in column.profile._chain())
+            cache_key = (chain_ids, column.profile.effective_rule())
+        else:
+            cache_key = (column.tier,)
+        prices = cache.get(cache_key)
+        if prices is None:
+            prices = cache[cache_key] = column.prices(items_by_sku)
+        column_prices.append(prices)
+
+    registry = sku.get_registry()
+    axis = set().union(*column_prices)
+    by_product_model_spec = operator.itemgetter(1, 0, 2)
+    sku_ids = sorted(axis, key=lambda key: by_product_model_spec(registry.key_for(key)))
+    # 열 단위로 map(dict.get) 하고 zip 으로 행을 만듦 (루프는 C 에서)
+    matrix = list(zip(*(map(prices.get, sku_ids) for prices in column_prices)))
+    return ComparisonResult(list(columns), sku_ids, matrix)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    import storage
+    from app_logging import setup_logging
+
+    parser = argparse.ArgumentParser(description="단가 프로파일/가격 등급 비교")
+    parser.add_argument("profiles", nargs="+", help="비교할 프로파일 이름 또는 ID (첫 번째가 기준, --tier 를 주면 등급이 기준)")
+    parser.add_argument("--tier", action="append", default=[], choices=[tier.name for tier in PriceTier],
+                        help="비교할 마스터 가격 등급 (여러 번 지정 가능, 첫 번째가 기준)")
+    parser.add_argument("--master", help="제품 마스터 파일 (기본: 데이터파일/item_data.json)")
+    parser.add_argument("--sort", default=SORT_DELTA, choices=[SORT_NAME, SORT_PRICE, SORT_DELTA, SORT_RATIO, SORT_SPREAD])
+    parser.add_argument("--column", type=int, default=1, help="정렬할 열 번호 (기준이 0)")
+    parser.add_argument("--ascending", action="store_true", help="오름차순 (기본: 내림차순)")
+    parser.add_argument("--all", action="store_true", help="단가가 모두 같은 품목도 포함")
+    parser.add_argument("--top", type=int, default=30, help="출력할 행 수")
+    parser.add_argument("--output", help="전체 결과를 저장할 .csv / .xlsx 경로")
+    args = parser.parse_args(argv)
+    setup_logging(log_file="")
+
+    master_path = args.master or os.path.join(storage.get_bundle_dir(), "데이터파일", storage.DEFAULT_PRODUCT_MASTER_FILE_BASENAME)
+    items = storage.load_product_master(master_path) if os.path.exists(master_path) else []
+    items_by_sku: Dict[int, Item] = {}
+    for item in items:
+        items_by_sku.setdefault(item.sku_id, item)
+    profiles = storage.load_price_profiles()
+    columns = [CompareColumn.for_tier(PriceTier[name]) for name in args.tier]
+    for name in args.profiles:
+        profile = profile_io._find_profile(profiles, name)
+        if profile is None:
+            print(f"프로파일을 찾을 수 없습니다: {name}")
+            return 1
+        columns.append(CompareColumn.for_profile(profile))
+    if len(columns) < 2:
+        print("비교할 열이 두 개 이상 필요합니다.")
+        return 1
+
+    result = compare_prices(columns, items_by_sku)
+    indices = result.rows(args.sort, args.column, descending=not args.ascending, differences_only=not args.all)
+    print(result.summary())
+    for stat in result.column_stats():
+        print("  " + stat.describe())
+    headers = result.export_headers()
+    for row in result.export_rows(indices[:args.top]):
+        print("  " + " | ".join(f"{header}={value}" for header, value in zip(headers, row) if value is not None))
+    if args.output:
+        count = profile_io.write_table(args.output, headers, result.export_rows(indices), sheet_title="단가 비교")
+        print(f"{count:,}행을 저장했습니다: {args.output}")
+    return 0
+
+
+def _self_test():
+    import time
+
+    sku.set_registry(sku.SkuRegistry())  # 사용자 데이터 폴더의 레지스트리를 건드리지 않음
+    items = [Item(f"L{i}", f"M-{i}", f"Locking Plate {i}", f"{i}H", "", None, {PriceTier.DEALER.value: Decimal(1000 + i)})
+             for i in range(20000)]
+    items_by_sku = {item.sku_id: item for item in items}
+    a_id, b_id, c_id = items[0].sku_id, items[1].sku_id, items[2].sku_id
+    hospital_a = PriceProfile("병원A", item_prices={a_id: Decimal("900"), b_id: Decimal("1500")})
+    hospital_b = PriceProfile("병원B", item_prices={a_id: Decimal("1100"), c_id: Decimal("1002")})
+
+    result = compare_prices([CompareColumn.for_tier(PriceTier.DEALER), CompareColumn.for_profile(hospital_a),
+                             CompareColumn.for_profile(hospital_b)], items_by_sku)
+    assert len(result) == 20000 and result.matrix[0] == (Decimal("1000"), Decimal("900"), Decimal("1100"))
+    differing = result.rows(SORT_DELTA, column=1, descending=True, differences_only=True)
+    assert len(differing) == 20000  # 프로파일에 없는 품목도 차이(없음)로 봄
+    assert differing[:2] == [1, 0]  # +499, -100 순, 나머지(단가 없음)는 뒤
+    row_c = result.sku_ids.index(c_id)  # 이름 순이라 "Locking Plate 2" 는 "...19999" 뒤
+    assert result.rows(SORT_RATIO, column=2, text="plate 2")[0] == row_c  # 병원B 단가가 있는 유일한 "plate 2*" 품목
+    assert result.rows(SORT_SPREAD, descending=True)[0] == 1
+    stats = result.column_stats()
+    assert (stats[0].higher, stats[0].lower, stats[0].missing) == (1, 1, 19998)
+    assert (stats[1].higher, stats[1].same) == (1, 1)
+    headers, rows = result.export_headers(), result.export_rows(differing[:1])
+    assert headers[3:] == ["일반대리점가", "병원A", "병원B", "차이(병원A)", "차이(병원B)", "비율(병원A)", "비율(병원B)"]
+    assert rows[0][-4:] == [Decimal("499"), None, round(1500 / 1001, 4), None]
+
+    # 자신의 dict 는 공유하지만 기본 프로파일이 다른 프로파일 (storage.dedupe_price_profiles 결과)
+    k0, k1, k2 = a_id, b_id, c_id
+    base = PriceProfile("기본", item_prices={k0: Decimal("500"), k1: Decimal("500")})
+    overrides = {k2: Decimal("1200")}
+    child = PriceProfile("자식", item_prices=overrides, base_profile_id=base.id, base=base, shared_prices=True)
+    solo = PriceProfile("단독", item_prices=overrides, shared_prices=True)
+    result = compare_prices([CompareColumn.for_profile(solo), CompareColumn.for_profile(child)], items_by_sku)
+    assert {result.sku_ids[i]: prices for i, prices in enumerate(result.matrix)} == {
+        k0: (None, Decimal("500")), k1: (None, Decimal("500")), k2: (Decimal("1200"), Decimal("1200"))}
+
+    # 수십 개 프로파일 (업체 그룹처럼 단가 공유 포함) × 2만 품목
+    shared = {item.sku_id: Decimal(900 + i % 300) for i, item in enumerate(items[::2])}
+    profiles = [PriceProfile(f"병원{n}", item_prices=shared if n % 2 else dict(shared), shared_prices=bool(n % 2)) for n in range(40)]
+    started = time.perf_counter()
+    result = compare_prices([CompareColumn.for_tier(PriceTier.DEALER)] + [CompareColumn.for_profile(p) for p in profiles], items_by_sku)
+    order = result.rows(SORT_DELTA, column=5, descending=True, differences_only=True)
+    elapsed = time.perf_counter() - started
+    assert len(order) == 20000 and len(result.matrix[0]) == 41
+    print(f"profile_compare 테스트 완료 (40개 프로파일 × 20,000품목 비교+정렬 {elapsed * 1000:.0f}ms)")
+
+
+if __name__ == '__main__':
+    import sys
+    if len(sys.argv) > 1:
+        sys.exit(main())
+    _self_test()
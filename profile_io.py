@@ -0,0 +1,391 @@
+"""
+단가 프로파일 가져오기/내보내기 (CSV, 엑셀).
+
+병원에서 받은 계약 단가표(모델명, 제품명, 규격, 단가 컬럼)를 한 행씩 읽어 품목을 찾고, 단가를 프로파일에 한 번에
+반영합니다. 품목은 (모델명, 제품명, 규격) 해시 인덱스로 찾고, 없으면 공백/대소문자/전각 문자 차이를 무시한
+정규화 키로 다시 찾습니다. 찾지 못한 행은 사유와 함께 보고합니다.
+
+헤더 행은 파일 앞부분에서 찾으므로 위쪽에 제목/안내 행이 있어도 됩니다. 단가 컬럼 이름은 PRICE_HEADERS 중 하나.
+
+사용 예:
+    python profile_io.py import "병원A" 단가표.xlsx           # 결과만 보고
+    python profile_io.py import "병원A" 단가표.csv --apply    # 프로파일에 반영하고 저장
+    python profile_io.py export "병원A" 병원A_단가.csv
+"""
+import argparse
+import codecs
+import csv
+import logging
+import os
+import unicodedata
+from dataclasses import dataclass, field
+from decimal import Decimal, InvalidOperation
+from typing import Any, Dict, Iterable, Iterator, List, Mapping, Optional, Tuple
+
+import price_history
+import pricing
+import profiling
+import sku
+from models import Item, PriceProfile, ProfileItemKey
+
+logger = logging.getLogger(__name__)
+
+KEY_HEADERS = ("모델명", "제품명", "규격")
+PRICE_HEADERS = ("단가", "사용자 지정 단가", "계약단가", "가격", "price")
+EXPORT_HEADERS = [*KEY_HEADERS, "단가"]
+XLSX_EXTENSIONS = (".xlsx", ".xlsm")
+CSV_ENCODINGS = ("utf-8-sig", "cp949")  # 엑셀에서 CSV로 저장하면 cp949 인 경우가 많음
+HEADER_SCAN_ROWS = 20
+
+Row = Tuple[int, List[Any]]  # (파일 행 번호, 셀 값)
+
+
+def normalize_key_part(value: Any) -> str:
+    """정규화 키: 전각/반각(NFKC), 대소문자, 공백(위치와 개수 모두)을 무시"""
+    return "".join(unicodedata.normalize("NFKC", str(value)).split()).casefold()
+
+
+def _cell_text(value: Any) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)  # 엑셀 숫자 규격 (예: 12.0)
+    return str(value).strip()
+
+
+def parse_price(value: Any) -> Optional[Decimal]:
+    """셀 값을 단가로. 숫자, "1,234", "₩1,234원" 형식을 허용하고 빈 값/형식 오류/음수는 None."""
+    if value is None or isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float, Decimal)):
+        text = str(value)
+    else:
+        text = str(value).strip().replace(",", "").replace("₩", "").replace("원", "").strip()
+    if not text:
+        return None
+    try:
+        price = Decimal(text)
+    except InvalidOperation:
+        return None
+    if not price.is_finite() or price < 0:
+        return None
+    return price
+
+
+# --- 품목 찾기 ---
+
+class SkuMatcher:
+    """(모델명, 제품명, 규격) -> SKU ID. 정확히 일치하는 키가 없으면 정규화 키로 찾습니다."""
+
+    def __init__(self, sku_ids: Iterable[int]):
+        registry = sku.get_registry()
+        self._exact: Dict[Tuple[str, str, str], int] = {}
+        self._normalized: Dict[Tuple[str, str, str], Optional[int]] = {}  # None: 정규화하면 같은 품목이 여럿
+        for sku_id in sku_ids:
+            key = registry.key_for(sku_id)
+            self._exact[key] = sku_id
+            normalized = (normalize_key_part(key[0]), normalize_key_part(key[1]), normalize_key_part(key[2]))
+            self._normalized[normalized] = None if normalized in self._normalized else sku_id
+
+    @classmethod
+    def for_profile(cls, items_by_sku: Mapping[int, Item], profile: Optional[PriceProfile] = None) -> "SkuMatcher":
+        """제품 마스터 품목 + (단종되었어도) 프로파일에 이미 단가가 있는 품목"""
+        sku_ids = set(items_by_sku)
+        if profile is not None:
+            sku_ids.update(profile.explicit_prices())
+        return cls(sku_ids)
+
+    def match(self, model_name: str, product_name: str, spec: str) -> Tuple[Optional[int], str]:
+        """(SKU ID, 방식) - 방식은 "exact" / "normalized", 못 찾으면 (None, 사유)"""
+        sku_id = self._exact.get((model_name, product_name, spec))
+        if sku_id is not None:
+            return sku_id, "exact"
+        normalized = (normalize_key_part(model_name), normalize_key_part(product_name), normalize_key_part(spec))
+        if normalized not in self._normalized:
+            return None, "품목 없음"
+        sku_id = self._normalized[normalized]
+        if sku_id is None:
+            return None, "공백/대소문자만 다른 품목이 여러 개"
+        return sku_id, "normalized"
+
+
+# --- 파일 읽기 (스트리밍) ---
+
+def detect_csv_encoding(path: str) -> str:
+    """CSV_ENCODINGS 중 파일 전체를 오류 없이 읽을 수 있는 첫 인코딩 (조각 단위로 읽어 메모리에 올리지 않음)"""
+    for encoding in CSV_ENCODINGS:
+        decoder = codecs.getincrementaldecoder(encoding)()
+        try:
+            with open(path, 'rb') as f:
+                for chunk in iter(lambda: f.read(1 << 16), b""):
+                    decoder.decode(chunk)
+            decoder.decode(b"", final=True)
+            return encoding
+        except UnicodeDecodeError:
+            continue
+    raise ValueError(f"CSV 파일 인코딩을 알 수 없습니다 ({', '.join(CSV_ENCODINGS)} 아님): {path}")
+
+
+def _iter_csv_rows(path: str) -> Iterator[Row]:
+    with open(path, 'r', encoding=detect_csv_encoding(path), newline='') as f:
+        yield from enumerate(csv.reader(f), start=1)
+
+
+def _iter_xlsx_rows(path: str) -> Iterator[Row]:
+    from openpyxl import load_workbook  # import 비용이 커서 엑셀 파일을 읽을 때만 로드
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        worksheet = workbook.worksheets[0]
+        for row_number, row in enumerate(worksheet.iter_rows(values_only=True), start=1):
+            yield row_number, list(row)
+    finally:
+        workbook.close()
+
+
+def iter_file_rows(path: str) -> Iterator[Row]:
+    """CSV/엑셀(첫 시트) 파일의 행을 하나씩 (행 번호, 셀 값 리스트) 로 내보냅니다."""
+    if os.path.splitext(path)[1].lower() in XLSX_EXTENSIONS:
+        return _iter_xlsx_rows(path)
+    return _iter_csv_rows(path)
+
+
+def _find_columns(header: List[Any]) -> Optional[Tuple[int, int, int, int]]:
+    """헤더 행이면 (모델명, 제품명, 규격, 단가) 컬럼 위치"""
+    names = [" ".join(_cell_text(value).split()).lower() for value in header]
+    try:
+        key_columns = [names.index(name) for name in KEY_HEADERS]
+    except ValueError:
+        return None
+    price_column = next((names.index(name.lower()) for name in PRICE_HEADERS if name.lower() in names), None)
+    if price_column is None:
+        return None
+    return key_columns[0], key_columns[1], key_columns[2], price_column
+
+
+@dataclass
+class UnmatchedRow:
+    row_number: int
+    model_name: str
+    product_name: str
+    spec: str
+    price_text: str
+    reason: str
+
+
+@dataclass
+class ImportResult:
+    prices: Dict[ProfileItemKey, Decimal] = field(default_factory=dict)  # 같은 품목이 여러 행이면 마지막 행
+    row_count: int = 0  # 헤더 이후 빈 행을 제외한 데이터 행 수
+    normalized_count: int = 0  # 정규화 키로 찾은 행 수
+    unmatched: List[UnmatchedRow] = field(default_factory=list)
+
+    def summary(self) -> str:
+        text = f"{self.row_count}행 중 {self.row_count - len(self.unmatched)}행 매칭 ({len(self.prices)}개 품목)"
+        if self.normalized_count:
+            text += f", 공백/대소문자 차이 무시 {self.normalized_count}행"
+        if self.unmatched:
+            text += f", 매칭 실패 {len(self.unmatched)}행"
+        return text
+
+
+@profiling.traced("profile_io.read_price_list")
+def read_price_list(path: str, matcher: SkuMatcher) -> ImportResult:
+    """
+    단가표 파일을 한 행씩 읽어 품목별 단가를 모읍니다. (프로파일은 바꾸지 않음)
+    헤더를 찾지 못하면 ValueError.
+    """
+    result = ImportResult()
+    rows = iter_file_rows(path)
+    columns = None
+    for row_number, row in rows:
+        columns = _find_columns(row)
+        if columns is not None or row_number >= HEADER_SCAN_ROWS:
+            break
+    if columns is None:
+        raise ValueError(f"헤더 행을 찾을 수 없습니다. 필요한 컬럼: {', '.join(KEY_HEADERS)}, 단가 ({'/'.join(PRICE_HEADERS)})")
+    model_col, product_col, spec_col, price_col = columns
+    width = max(columns) + 1
+    for row_number, row in rows:
+        if len(row) < width:
+            row = list(row) + [None] * (width - len(row))
+        model_name, product_name, spec = _cell_text(row[model_col]), _cell_text(row[product_col]), _cell_text(row[spec_col])
+        raw_price = row[price_col]
+        if not (model_name or product_name or spec or _cell_text(raw_price)):
+            continue  # 빈 행
+        result.row_count += 1
+        price = parse_price(raw_price)
+        if price is None:
+            result.unmatched.append(UnmatchedRow(row_number, model_name, product_name, spec, _cell_text(raw_price), "단가 형식 오류"))
+            continue
+        sku_id, how = matcher.match(model_name, product_name, spec)
+        if sku_id is None:
+            result.unmatched.append(UnmatchedRow(row_number, model_name, product_name, spec, _cell_text(raw_price), how))
+            continue
+        if how == "normalized":
+            result.normalized_count += 1
+        result.prices[sku_id] = price
+    logger.info("단가표 '%s': %s", os.path.basename(path), result.summary())
+    return result
+
+
+def apply_import(profile: PriceProfile, result: ImportResult) -> List[Tuple[PriceProfile, ProfileItemKey, Optional[str]]]:
+    """
+    읽은 단가를 프로파일에 한 번에 반영(upsert)하고 (프로파일, 품목 키, 변경 전 snapshot_own_value) 목록을 반환합니다.
+    현재 단가(기본 프로파일/규칙 포함)와 같은 품목은 건너뜁니다.
+    """
+    explicit = profile.explicit_prices()
+    to_set = {key: price for key, price in result.prices.items() if explicit.get(key) != price}
+    before = [(profile, key, price_history.snapshot_own_value(profile, key)) for key in to_set]
+    profile.set_prices(to_set)
+    return before
+
+
+def write_unmatched_report(result: ImportResult, path: str):
+    with open(path, 'w', encoding='utf-8-sig', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(["행", *KEY_HEADERS, "단가", "사유"])
+        for row in result.unmatched:
+            writer.writerow([row.row_number, row.model_name, row.product_name, row.spec, row.price_text, row.reason])
+
+
+# --- 내보내기 (스트리밍) ---
+
+def export_rows(profile: PriceProfile, items_by_sku: Mapping[int, Item]) -> List[Tuple[str, str, str, Decimal]]:
+    """내보낼 (모델명, 제품명, 규격, 단가) - 프로파일 화면과 같은 단가(직접 지정 + 규칙), 제품명/모델명/규격 순"""
+    registry = sku.get_registry()
+    rows = [(*registry.key_for(key), price) for key, price in pricing.profile_item_prices(profile, items_by_sku).items()]
+    rows.sort(key=lambda row: (row[1], row[0], row[2]))
+    return rows  # type: ignore[return-value]
+
+
+def write_table(path: str, headers: List[str], rows: Iterable[Iterable[Any]], sheet_title: str = "Sheet") -> int:
+    """확장자에 따라 CSV(utf-8-sig) 또는 엑셀로 한 행씩 씁니다. 쓴 행 수(머리글 제외)를 반환합니다. (작업 스레드에서 실행 가능)"""
+    count = 0
+    if os.path.splitext(path)[1].lower() in XLSX_EXTENSIONS:
+        from openpyxl import Workbook
+        workbook = Workbook(write_only=True)
+        worksheet = workbook.create_sheet(sheet_title)
+        worksheet.append(headers)
+        for row in rows:
+            worksheet.append(list(row))
+            count += 1
+        workbook.save(path)
+        return count
+    with open(path, 'w', encoding='utf-8-sig', newline='') as f:  # BOM: 엑셀에서 바로 열어도 한글이 깨지지 않음
+        writer = csv.writer(f)
+        writer.writerow(headers)
+        for row in rows:
+            writer.writerow(row)  # Decimal 은 str() 그대로, None 은 빈 칸
+            count += 1
+    return count
+
+
+@profiling.traced("profile_io.write_price_list")
+def write_price_list(path: str, rows: Iterable[Tuple[str, str, str, Decimal]]) -> int:
+    """단가표를 CSV 또는 엑셀로 씁니다. 쓴 행 수를 반환합니다."""
+    return write_table(path, EXPORT_HEADERS, rows, sheet_title="단가")
+
+
+def _find_profile(profiles: List[PriceProfile], name_or_id: str) -> Optional[PriceProfile]:
+    return next((p for p in profiles if p.name == name_or_id), None) or pricing.find_price_profile(profiles, name_or_id)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    import storage
+    from app_logging import setup_logging
+
+    parser = argparse.ArgumentParser(description="단가 프로파일 CSV/엑셀 가져오기/내보내기")
+    parser.add_argument("--master", help="제품 마스터 파일 (기본: 데이터파일/item_data.json)")
+    sub = parser.add_subparsers(dest="command", required=True)
+    import_parser = sub.add_parser("import", help="단가표를 읽어 프로파일에 반영")
+    import_parser.add_argument("profile", help="프로파일 이름 또는 ID")
+    import_parser.add_argument("file", help="CSV/엑셀 단가표")
+    import_parser.add_argument("--apply", action="store_true", help="프로파일에 반영하고 저장 (없으면 결과만 보고)")
+    import_parser.add_argument("--unmatched", help="매칭하지 못한 행을 저장할 CSV 경로")
+    export_parser = sub.add_parser("export", help="프로파일 단가를 CSV/엑셀로 저장")
+    export_parser.add_argument("profile", help="프로파일 이름 또는 ID")
+    export_parser.add_argument("file", help="저장할 .csv / .xlsx 경로")
+    args = parser.parse_args(argv)
+    setup_logging(log_file="")
+
+    master_path = args.master or os.path.join(storage.get_bundle_dir(), "데이터파일", storage.DEFAULT_PRODUCT_MASTER_FILE_BASENAME)
+    items = storage.load_product_master(master_path) if os.path.exists(master_path) else []
+    items_by_sku: Dict[int, Item] = {}
+    for item in items:
+        items_by_sku.setdefault(item.sku_id, item)
+    profiles = storage.load_price_profiles()
+    profile = _find_profile(profiles, args.profile)
+    if profile is None:
+        print(f"프로파일을 찾을 수 없습니다: {args.profile}")
+        return 1
+
+    if args.command == "export":
+        count = write_price_list(args.file, export_rows(profile, items_by_sku))
+        print(f"'{profile.name}' 단가 {count}건을 저장했습니다: {args.file}")
+        return 0
+
+    result = read_price_list(args.file, SkuMatcher.for_profile(items_by_sku, profile))
+    print(result.summary())
+    for row in result.unmatched[:20]:
+        print(f"  {row.row_number}행: {row.model_name} / {row.product_name} / {row.spec} ({row.price_text}) - {row.reason}")
+    if args.unmatched and result.unmatched:
+        write_unmatched_report(result, args.unmatched)
+    if args.apply:
+        changes = apply_import(profile, result)
+        if changes:
+            price_history.PriceHistory.load().record_profile_prices(changes)
+            conflicts = storage.save_price_profiles(profiles)
+            if conflicts:
+                print(f"저장 충돌 (다른 사용자가 먼저 수정): {', '.join(conflicts)}")
+                return 1
+        print(f"'{profile.name}'에 {len(changes)}건 반영")
+    return 0
+
+
+def _self_test():
+    import tempfile
+    import time
+
+    sku.set_registry(sku.SkuRegistry())  # 사용자 데이터 폴더의 레지스트리를 건드리지 않음
+    items = [Item(f"L{i}", f"M-{i}", f"Locking Plate {i}", f"{i}H", "", None, {"price_dealer": Decimal(1000 + i)})
+             for i in range(10000)]
+    items_by_sku = {item.sku_id: item for item in items}
+    profile = PriceProfile("병원A", item_prices={items[0].sku_id: Decimal("500")})
+
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path = os.path.join(tmp, "prices.csv")
+        with open(csv_path, 'w', encoding='cp949', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(["병원A 계약 단가표"])  # 제목 행
+            writer.writerow(["모델명", "제품명", "규격", "계약단가"])
+            for i in range(10000):
+                product_name = f"locking  plate {i}" if i == 1 else f"Locking Plate {i}"  # 공백/대소문자 차이
+                writer.writerow([f"M-{i}", product_name, f"{i}H", f"{2000 + i:,}"])
+            writer.writerow(["X-1", "없는 품목", "1", "100"])
+            writer.writerow(["M-2", "Locking Plate 2", "2H", "문의"])
+            writer.writerow([])
+
+        started = time.perf_counter()
+        result = read_price_list(csv_path, SkuMatcher.for_profile(items_by_sku, profile))
+        elapsed = time.perf_counter() - started
+        assert result.row_count == 10002 and len(result.prices) == 10000 and result.normalized_count == 1
+        assert [row.reason for row in result.unmatched] == ["품목 없음", "단가 형식 오류"]
+        assert result.prices[items[1].sku_id] == Decimal("2001")
+
+        changes = apply_import(profile, result)
+        assert len(changes) == 10000 and profile.get_price(items[0].sku_id) == Decimal("2000")
+        assert not apply_import(profile, result)  # 같은 단가는 다시 반영하지 않음
+
+        for name in ("out.csv", "out.xlsx"):
+            out_path = os.path.join(tmp, name)
+            assert write_price_list(out_path, export_rows(profile, items_by_sku)) == 10000
+            again = read_price_list(out_path, SkuMatcher.for_profile(items_by_sku, profile))
+            assert again.prices == result.prices and not again.unmatched, name
+    print(f"profile_io 테스트 완료 (10,000행 CSV 읽기 {elapsed * 1000:.0f}ms)")
+
+
+if __name__ == '__main__':
+    import sys
+    if len(sys.argv) > 1:
+        sys.exit(main())
+    _self_test()
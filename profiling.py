@@ -0,0 +1,248 @@
+"""
+가벼운 성능 측정 계층 (span).
+
+    with profiling.span("storage.load_product_master"):
+        ...
+
+    @profiling.traced("pricing.resolve_unit_prices")
+    def resolve_unit_prices(...): ...
+
+측정이 꺼져 있으면 span()은 공유 no-op 객체를, traced 함수는 전역 플래그 확인 후 원본 함수를 그대로 호출하므로
+추가 비용이 거의 없습니다. 측정이 켜지면 구간별 합계(횟수/합계/최소/최대)와 최근 구간 이벤트를 메모리에 모으고,
+flush()로 사용자 데이터 폴더의 순환(rolling) 파일에 집계를 기록하거나 export_chrome_trace()로
+chrome://tracing / Perfetto 에서 열 수 있는 트레이스 파일을 만듭니다.
+
+환경 변수 LOHAS_PROFILE=1 로 프로그램 시작 시부터 측정을 켤 수 있습니다.
+"""
+import cProfile
+import datetime
+import functools
+import json
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+STATS_FILE = "profiling_stats.jsonl"
+STATS_FILE_MAX_BYTES = 1024 * 1024
+STATS_FILE_BACKUPS = 3
+MAX_EVENTS = 50000
+
+_enabled = os.environ.get("LOHAS_PROFILE", "") not in ("", "0")
+_lock = threading.Lock()
+_stats: Dict[str, List[float]] = {}  # 이름 -> [횟수, 합계(ns), 최소(ns), 최대(ns)]
+_events: Deque[Tuple[str, int, int, int]] = deque(maxlen=MAX_EVENTS)  # (이름, 시작 ns, 소요 ns, 스레드 ID)
+_origin_ns = time.perf_counter_ns()
+_cprofile: Optional[cProfile.Profile] = None
+
+
+def is_enabled() -> bool:
+    return _enabled
+
+
+def enable():
+    global _enabled
+    _enabled = True
+
+
+def disable():
+    global _enabled
+    _enabled = False
+
+
+def reset():
+    """모은 집계와 이벤트를 비웁니다."""
+    with _lock:
+        _stats.clear()
+        _events.clear()
+
+
+def _record(name: str, start_ns: int, end_ns: int):
+    duration = end_ns - start_ns
+    with _lock:
+        entry = _stats.get(name)
+        if entry is None:
+            _stats[name] = [1, duration, duration, duration]
+        else:
+            entry[0] += 1
+            entry[1] += duration
+            if duration < entry[2]:
+                entry[2] = duration
+            if duration > entry[3]:
+                entry[3] = duration
+        _events.append((name, start_ns, duration, threading.get_ident()))
+
+
+class _Span:
+    __slots__ = ("name", "_start")
+
+    def __init__(self, name: str):
+        self.name = name
+        self._start = 0
+
+    def __enter__(self):
+        self._start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        _record(self.name, self._start, time.perf_counter_ns())
+        return False
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+def span(name: str):
+    """측정 구간 컨텍스트 매니저. 측정이 꺼져 있으면 아무 일도 하지 않습니다."""
+    return _Span(name) if _enabled else _NOOP_SPAN
+
+
+def traced(name: Optional[str] = None) -> Callable[[Callable], Callable]:
+    """함수 전체를 측정 구간으로 기록하는 데코레이터. 이름을 생략하면 '모듈.함수명'을 사용합니다."""
+    def decorator(func: Callable) -> Callable:
+        span_name = name or f"{func.__module__}.{func.__qualname__}"
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return func(*args, **kwargs)
+            start = time.perf_counter_ns()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                _record(span_name, start, time.perf_counter_ns())
+        return wrapper
+    return decorator
+
+
+def summary() -> Dict[str, Dict[str, Any]]:
+    """구간별 집계 (ms 단위), 합계가 큰 순서"""
+    with _lock:
+        items = [(name, list(entry)) for name, entry in _stats.items()]
+    items.sort(key=lambda kv: kv[1][1], reverse=True)
+    return {
+        name: {
+            "count": int(count),
+            "total_ms": round(total / 1e6, 3),
+            "mean_ms": round(total / count / 1e6, 3),
+            "min_ms": round(min_ns / 1e6, 3),
+            "max_ms": round(max_ns / 1e6, 3),
+        }
+        for name, (count, total, min_ns, max_ns) in items
+    }
+
+
+def _rotate(path: str, max_bytes: int, backups: int):
+    if not os.path.exists(path) or os.path.getsize(path) < max_bytes:
+        return
+    for i in range(backups - 1, 0, -1):
+        src = f"{path}.{i}"
+        if os.path.exists(src):
+            os.replace(src, f"{path}.{i + 1}")
+    os.replace(path, f"{path}.1")
+
+
+def default_stats_path() -> str:
+    import storage
+    return storage.get_user_data_path(STATS_FILE)
+
+
+def flush(path: Optional[str] = None, reset_after: bool = True) -> Optional[str]:
+    """
+    현재 집계를 JSON 한 줄로 순환 파일(profiling_stats.jsonl)에 추가합니다.
+    파일이 STATS_FILE_MAX_BYTES 를 넘으면 .1, .2 ... 로 밀어내고 새 파일에 씁니다.
+    기록할 내용이 없으면 None.
+    """
+    stats = summary()
+    if not stats:
+        return None
+    path = path or default_stats_path()
+    _rotate(path, STATS_FILE_MAX_BYTES, STATS_FILE_BACKUPS)
+    record = {"time": datetime.datetime.now().isoformat(timespec="seconds"), "pid": os.getpid(), "spans": stats}
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write(json.dumps(record, ensure_ascii=False) + "\n")
+    if reset_after:
+        reset()
+    return path
+
+
+def export_chrome_trace(path: str) -> int:
+    """최근 구간 이벤트를 Chrome Trace Event 형식(JSON)으로 저장하고 이벤트 수를 반환합니다."""
+    with _lock:
+        events = list(_events)
+    pid = os.getpid()
+    trace = [{"name": name, "cat": name.split(".", 1)[0], "ph": "X",
+              "ts": (start - _origin_ns) / 1000, "dur": duration / 1000, "pid": pid, "tid": tid}
+             for name, start, duration, tid in events]
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({"traceEvents": trace, "displayTimeUnit": "ms"}, f, ensure_ascii=False)
+    return len(trace)
+
+
+# --- cProfile 캡처 ---
+
+def is_cprofile_running() -> bool:
+    return _cprofile is not None
+
+
+def start_cprofile():
+    """cProfile 기록을 시작합니다. (호출한 스레드 기준, GUI에서는 메인 스레드)"""
+    global _cprofile
+    if _cprofile is not None:
+        return
+    _cprofile = cProfile.Profile()
+    _cprofile.enable()
+
+
+def stop_cprofile(path: Optional[str] = None) -> Optional[str]:
+    """cProfile 기록을 멈추고 .prof 파일로 저장합니다. (snakeviz, pstats 로 확인)"""
+    global _cprofile
+    if _cprofile is None:
+        return None
+    profiler, _cprofile = _cprofile, None
+    profiler.disable()
+    if path is None:
+        import storage
+        stamp = datetime.datetime.now().strftime("%Y%m%d-%H%M%S")
+        path = storage.get_user_data_path(f"cprofile_{stamp}.prof")
+    profiler.dump_stats(path)
+    return path
+
+
+if __name__ == '__main__':
+    import tempfile
+
+    @traced("demo.work")
+    def _work(n):
+        with span("demo.inner"):
+            return sum(range(n))
+
+    _work(1000)
+    assert summary() == {}, "측정이 꺼져 있으면 기록하지 않아야 합니다"
+
+    enable()
+    for _ in range(3):
+        _work(10000)
+    stats = summary()
+    assert stats["demo.work"]["count"] == 3 and stats["demo.inner"]["count"] == 3
+    print(json.dumps(stats, ensure_ascii=False, indent=2))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        print("trace events:", export_chrome_trace(os.path.join(tmp, "trace.json")))
+        stats_path = os.path.join(tmp, STATS_FILE)
+        flush(stats_path)
+        assert summary() == {}
+        with open(stats_path, encoding='utf-8') as f:
+            assert len(f.readlines()) == 1
+    print("profiling 자체 테스트 통과")
@@ -1,75 +1,71 @@
 # receipt_ocr.py
-import cv2
-import numpy as np
+from __future__ import annotations  # np.ndarray 등 타입 힌트가 import 시점에 평가되지 않도록
+
 from typing import List, Tuple, Optional, Dict, Any
+import logging
 import re
 import difflib
 from decimal import Decimal
-from PIL import Image, ImageEnhance
 import io
 import base64
-# receipt_ocr.py 파일 상단에 추가
+
 from config_ocr import OCRConfig
+import profiling
+from lazy_import import lazy_module, is_available
+
+logger = logging.getLogger(__name__)
+
+# OCR 스택(cv2, numpy, PIL, easyocr/torch)은 import 비용이 매우 크므로
+# 실제로 영수증을 처리하는 시점까지 로딩을 미룹니다.
+cv2 = lazy_module("cv2")
+np = lazy_module("numpy")
+Image = lazy_module("PIL.Image")
+ImageEnhance = lazy_module("PIL.ImageEnhance")
+easyocr = lazy_module("easyocr")
+pytesseract = lazy_module("pytesseract")
+
+EASYOCR_AVAILABLE = is_available("easyocr")
+if not EASYOCR_AVAILABLE:
+    logger.warning("EasyOCR not available. Install with: pip install easyocr")
+
+PYTESSERACT_AVAILABLE = is_available("pytesseract")
+if not PYTESSERACT_AVAILABLE:
+    logger.warning("Pytesseract not available. Install with: pip install pytesseract")
+
+from models import Item, InvoiceLine
+from difflib import SequenceMatcher
 
 class ReceiptOCRProcessor:
+    """영수증 이미지에서 텍스트를 추출하고 품목을 매칭하는 클래스"""
+    
     def __init__(self, product_master_items: List[Item], config_file: str = "ocr_config.json"):
         self.product_master_items = product_master_items
         self.config = OCRConfig(config_file)
-        self.easyocr_reader = None
+        self._easyocr_reader = None
+        self._easyocr_init_failed = False
         
         # Tesseract 경로 설정
         tesseract_cmd = self.config.get("tesseract_cmd")
         if tesseract_cmd and PYTESSERACT_AVAILABLE:
-            import pytesseract
             pytesseract.pytesseract.tesseract_cmd = tesseract_cmd
         
-        # OCR 엔진 초기화
-        if EASYOCR_AVAILABLE:
-            try:
-                gpu_enabled = self.config.get("easyocr_gpu", False)
-                self.easyocr_reader = easyocr.Reader(['ko', 'en'], gpu=gpu_enabled)
-                print(f"EasyOCR 초기화 완료 (GPU: {gpu_enabled})")
-            except Exception as e:
-                print(f"EasyOCR 초기화 실패: {e}")
-                self.easyocr_reader = None
+        # EasyOCR 모델(torch) 로딩은 첫 텍스트 추출 시점으로 미룹니다 (easyocr_reader 참고).
         
+        # 제품 검색을 위한 인덱스 생성
         self._build_product_search_index()
-try:
-    import easyocr
-    EASYOCR_AVAILABLE = True
-except ImportError:
-    EASYOCR_AVAILABLE = False
-    print("Warning: EasyOCR not available. Install with: pip install easyocr")
-
-try:
-    import pytesseract
-    PYTESSERACT_AVAILABLE = True
-except ImportError:
-    PYTESSERACT_AVAILABLE = False
-    print("Warning: Pytesseract not available. Install with: pip install pytesseract")
 
-from models import Item, InvoiceLine
-from difflib import SequenceMatcher
-
-class ReceiptOCRProcessor:
-    """영수증 이미지에서 텍스트를 추출하고 품목을 매칭하는 클래스"""
-    
-    def __init__(self, product_master_items: List[Item]):
-        self.product_master_items = product_master_items
-        self.easyocr_reader = None
-        
-        # OCR 엔진 초기화
-        if EASYOCR_AVAILABLE:
+    @property
+    def easyocr_reader(self):
+        """EasyOCR Reader. 처음 접근할 때 초기화됩니다 (한국어, 영어 지원)."""
+        if self._easyocr_reader is None and EASYOCR_AVAILABLE and not self._easyocr_init_failed:
             try:
-                # 한국어와 영어 지원
-                self.easyocr_reader = easyocr.Reader(['ko', 'en'], gpu=False)
-                print("EasyOCR 초기화 완료 (한국어, 영어)")
+                gpu_enabled = self.config.get("easyocr_gpu", False)
+                self._easyocr_reader = easyocr.Reader(['ko', 'en'], gpu=gpu_enabled)
+                logger.info(f"EasyOCR 초기화 완료 (GPU: {gpu_enabled})")
             except Exception as e:
-                print(f"EasyOCR 초기화 실패: {e}")
-                self.easyocr_reader = None
-        
-        # 제품 검색을 위한 인덱스 생성
-        self._build_product_search_index()
+                logger.error(f"EasyOCR 초기화 실패: {e}")
+                self._easyocr_init_failed = True
+        return self._easyocr_reader
     
     def _build_product_search_index(self):
         """제품 검색을 위한 인덱스 구축"""
@@ -99,6 +95,7 @@ class ReceiptOCRProcessor:
                         self.product_search_terms[term_lower] = []
                     self.product_search_terms[term_lower].append(item)
     
+    @profiling.traced("ocr.preprocess_image")
     def preprocess_image(self, image: np.ndarray) -> np.ndarray:
         """이미지 전처리 (OCR 정확도 향상을 위해)"""
         # PIL Image로 변환하여 향상 적용
@@ -141,6 +138,7 @@ class ReceiptOCRProcessor:
         
         return processed
     
+    @profiling.traced("ocr.extract_text_easyocr")
     def extract_text_easyocr(self, image: np.ndarray) -> List[Dict[str, Any]]:
         """EasyOCR을 사용한 텍스트 추출"""
         if not self.easyocr_reader:
@@ -169,9 +167,10 @@ class ReceiptOCRProcessor:
             
             return extracted_data
         except Exception as e:
-            print(f"EasyOCR 텍스트 추출 실패: {e}")
+            logger.error(f"EasyOCR 텍스트 추출 실패: {e}")
             return []
     
+    @profiling.traced("ocr.extract_text_tesseract")
     def extract_text_tesseract(self, image: np.ndarray) -> List[Dict[str, Any]]:
         """Tesseract를 사용한 텍스트 추출"""
         if not PYTESSERACT_AVAILABLE:
@@ -205,9 +204,10 @@ class ReceiptOCRProcessor:
             
             return extracted_data
         except Exception as e:
-            print(f"Tesseract 텍스트 추출 실패: {e}")
+            logger.error(f"Tesseract 텍스트 추출 실패: {e}")
             return []
     
+    @profiling.traced("ocr.extract_all_text")
     def extract_all_text(self, image_path: str) -> List[Dict[str, Any]]:
         """모든 사용 가능한 OCR 엔진으로 텍스트 추출"""
         # 이미지 로드
@@ -237,6 +237,7 @@ class ReceiptOCRProcessor:
         
         return all_results
     
+    @profiling.traced("ocr.parse_receipt_items")
     def parse_receipt_items(self, ocr_results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
         """OCR 결과에서 품목명과 수량 추출"""
         parsed_items = []
@@ -317,6 +318,7 @@ class ReceiptOCRProcessor:
         
         return None
     
+    @profiling.traced("ocr.match_products")
     def match_products(self, parsed_items: List[Dict[str, Any]]) -> List[Tuple[Item, int, float]]:
         """추출된 품목명을 제품 마스터와 매칭"""
         matched_products = []
@@ -369,26 +371,27 @@ class ReceiptOCRProcessor:
         
         return best_match
     
+    @profiling.traced("ocr.process_receipt_image")
     def process_receipt_image(self, image_path: str) -> Tuple[List[Tuple[Item, int, float]], List[Dict[str, Any]]]:
         """영수증 이미지를 처리하여 매칭된 제품 목록 반환"""
         try:
             # 1. OCR로 텍스트 추출
-            print(f"영수증 이미지 처리 시작: {image_path}")
+            logger.info(f"영수증 이미지 처리 시작: {image_path}")
             ocr_results = self.extract_all_text(image_path)
-            print(f"OCR 결과: {len(ocr_results)}개 텍스트 추출됨")
+            logger.info(f"OCR 결과: {len(ocr_results)}개 텍스트 추출됨")
             
             # 2. 품목과 수량 파싱
             parsed_items = self.parse_receipt_items(ocr_results)
-            print(f"파싱된 품목: {len(parsed_items)}개")
+            logger.info(f"파싱된 품목: {len(parsed_items)}개")
             
             # 3. 제품 마스터와 매칭
             matched_products = self.match_products(parsed_items)
-            print(f"매칭된 제품: {len(matched_products)}개")
+            logger.info(f"매칭된 제품: {len(matched_products)}개")
             
             return matched_products, ocr_results
             
         except Exception as e:
-            print(f"영수증 처리 중 오류 발생: {e}")
+            logger.error(f"영수증 처리 중 오류 발생: {e}")
             return [], []
 
 # 사용 예제 및 테스트
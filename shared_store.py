@@ -0,0 +1,325 @@
+"""
+여러 사용자가 같은 공유 폴더(네트워크 드라이브 등)를 쓰는 다중 작성자 저장소.
+
+폴더 구조:
+    <공유 폴더>/
+        store.lock            쓰기 시에만 잡는 프로세스 간 잠금 (fcntl.flock / msvcrt.locking)
+        journal.jsonl         변경 로그 (추가 전용). 한 줄에 레코드 하나의 변경: {"kind", "id", "version", "deleted", ...}
+        checkpoint.json       journal 의 특정 위치까지 반영한 전체 레코드 (시작 시 이것 + 이후 journal 만 읽음)
+        <kind>/<id>.json      레코드 하나 {"version", "deleted", "data"} (임시 파일에 쓴 뒤 교체)
+
+  - 읽기는 잠금을 잡지 않습니다. 레코드 파일은 원자적으로 교체되므로 읽는 쪽은 항상 이전 또는 새 버전 전체를 봅니다.
+  - 쓰기는 잠금을 잡고 레코드의 현재 버전이 기대 버전과 같을 때만 버전을 올려 씁니다(낙관적 동시성 제어).
+    다르면 그 사이 다른 사용자가 바꾼 것이므로 쓰지 않고 충돌로 돌려줍니다.
+  - 다른 인스턴스의 변경은 poll()이 journal 의 새 줄만 읽고, 바뀐 레코드 파일만 다시 읽어 반영합니다.
+
+한 컴퓨터에서 여러 프로세스로 동작을 확인하려면: python shared_store.py --processes 4 --increments 50
+"""
+import argparse
+import json
+import logging
+import os
+import socket
+import tempfile
+import time
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+LOCK_FILE = "store.lock"
+JOURNAL_FILE = "journal.jsonl"
+CHECKPOINT_FILE = "checkpoint.json"
+CHECKPOINT_EVERY = 200  # journal 에 이만큼 쌓이면 쓰는 쪽이 checkpoint 갱신
+LOCK_TIMEOUT_SECONDS = 10.0
+
+RecordKey = Tuple[str, str]  # (kind, id)
+
+
+class LockTimeout(Exception):
+    pass
+
+
+class FileLock:
+    """프로세스 간 배타 잠금. with 문으로 사용합니다."""
+
+    def __init__(self, path: str, timeout: float = LOCK_TIMEOUT_SECONDS, poll_seconds: float = 0.02):
+        self.path = path
+        self.timeout = timeout
+        self.poll_seconds = poll_seconds
+        self._file = None
+
+    def acquire(self):
+        self._file = open(self.path, 'a+b')
+        deadline = time.monotonic() + self.timeout
+        while True:
+            try:
+                if os.name == 'nt':
+                    import msvcrt
+                    self._file.seek(0)
+                    msvcrt.locking(self._file.fileno(), msvcrt.LK_NBLCK, 1)
+                else:
+                    import fcntl
+                    fcntl.flock(self._file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+                return
+            except OSError:
+                if time.monotonic() >= deadline:
+                    self._file.close()
+                    self._file = None
+                    raise LockTimeout(f"공유 저장소 잠금을 {self.timeout}초 안에 얻지 못했습니다: {self.path}")
+                time.sleep(self.poll_seconds)
+
+    def release(self):
+        if self._file is None:
+            return
+        try:
+            if os.name == 'nt':
+                import msvcrt
+                self._file.seek(0)
+                msvcrt.locking(self._file.fileno(), msvcrt.LK_UNLCK, 1)
+            else:
+                import fcntl
+                fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+        finally:
+            self._file.close()
+            self._file = None
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.release()
+        return False
+
+
+def _safe_name(record_id: str) -> str:
+    return "".join(ch if ch.isalnum() or ch in "-_." else "_" for ch in record_id)
+
+
+def _read_json(path: str) -> Optional[Any]:
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def _write_json_atomic(path: str, data: Any):
+    directory = os.path.dirname(path)
+    fd, tmp_path = tempfile.mkstemp(prefix=".tmp-", dir=directory)
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+class SharedStore:
+    """
+    공유 폴더의 레코드 저장소. 레코드는 (kind, id) 로 구분하고 data 는 JSON 으로 저장 가능한 dict 입니다.
+    메모리에는 마지막으로 본 레코드(버전, 삭제 여부, data)를 캐시합니다.
+    """
+
+    def __init__(self, root: str, client_name: Optional[str] = None):
+        self.root = root
+        self.client_name = client_name or f"{socket.gethostname()}:{os.getpid()}"
+        self._records: Dict[RecordKey, Dict[str, Any]] = {}
+        self._journal_offset = 0
+        self._entries_since_checkpoint = 0
+        self._unreported: Set[RecordKey] = set()  # 쓰기 중 따라잡았지만 아직 poll()로 알리지 않은 변경
+        os.makedirs(root, exist_ok=True)
+
+    @property
+    def journal_path(self) -> str:
+        return os.path.join(self.root, JOURNAL_FILE)
+
+    def _record_path(self, kind: str, record_id: str) -> str:
+        return os.path.join(self.root, kind, _safe_name(record_id) + ".json")
+
+    def _lock(self) -> FileLock:
+        return FileLock(os.path.join(self.root, LOCK_FILE))
+
+    # --- 읽기 ---
+
+    def open(self) -> "SharedStore":
+        """checkpoint 와 그 이후 journal 을 읽어 캐시를 채웁니다."""
+        checkpoint = _read_json(os.path.join(self.root, CHECKPOINT_FILE))
+        if isinstance(checkpoint, dict):
+            self._journal_offset = checkpoint.get("journal_offset", 0)
+            for kind, records in checkpoint.get("records", {}).items():
+                for record_id, record in records.items():
+                    self._records[(kind, record_id)] = record
+        self._catch_up()
+        self._unreported.clear()
+        return self
+
+    def poll(self) -> Set[RecordKey]:
+        """다른 인스턴스가 journal 에 남긴 새 변경을 반영하고, 지난 poll 이후 바뀐 레코드 키를 반환합니다."""
+        self._catch_up()
+        changed, self._unreported = self._unreported, set()
+        return changed
+
+    def _catch_up(self):
+        try:
+            with open(self.journal_path, 'rb') as f:
+                f.seek(self._journal_offset)
+                chunk = f.read()
+        except FileNotFoundError:
+            return
+        # 쓰는 중인 마지막 줄(개행 없음)은 다음 poll 에서 읽음
+        complete = chunk[:chunk.rfind(b"\n") + 1]
+        if not complete:
+            return
+        self._journal_offset += len(complete)
+
+        latest_versions: Dict[RecordKey, int] = {}
+        for line in complete.splitlines():
+            try:
+                entry = json.loads(line)
+                key = (entry["kind"], entry["id"])
+                latest_versions[key] = max(latest_versions.get(key, 0), int(entry["version"]))
+            except (ValueError, KeyError, TypeError):
+                logger.warning("공유 저장소 journal 의 잘못된 줄을 건너뜁니다: %r", line[:80])
+        self._entries_since_checkpoint += complete.count(b"\n")
+
+        for key, version in latest_versions.items():
+            cached = self._records.get(key)
+            if cached is not None and cached.get("version", 0) >= version:
+                continue
+            record = _read_json(self._record_path(*key))
+            if record is None:
+                continue
+            self._records[key] = record
+            self._unreported.add(key)
+
+    def records(self, kind: str) -> Dict[str, Dict[str, Any]]:
+        """삭제되지 않은 레코드의 {id: data}"""
+        return {record_id: record["data"] for (k, record_id), record in self._records.items()
+                if k == kind and not record.get("deleted")}
+
+    def version(self, kind: str, record_id: str) -> int:
+        record = self._records.get((kind, record_id))
+        return record.get("version", 0) if record else 0
+
+    # --- 쓰기 ---
+
+    def write_batch(self, kind: str, changes: List[Tuple[str, Optional[Dict[str, Any]], int]]
+                    ) -> Tuple[List[str], List[str]]:
+        """
+        여러 레코드를 한 번의 잠금으로 씁니다. changes: (id, data 또는 삭제면 None, 기대 버전) 목록.
+        기대 버전은 호출하는 쪽이 마지막으로 읽은 버전이며, 새 레코드는 0 입니다.
+        Returns:
+            (쓴 id 목록, 버전이 달라 쓰지 않은 충돌 id 목록)
+        """
+        if not changes:
+            return [], []
+        with self._lock():
+            return self._write_locked(kind, changes)
+
+    def _write_locked(self, kind: str, changes: List[Tuple[str, Optional[Dict[str, Any]], int]]
+                      ) -> Tuple[List[str], List[str]]:
+        os.makedirs(os.path.join(self.root, kind), exist_ok=True)
+        written, conflicts = [], []
+        journal_lines = []
+        for record_id, data, expected_version in changes:
+            path = self._record_path(kind, record_id)
+            current = _read_json(path)
+            current_version = current.get("version", 0) if current else 0
+            if current_version != expected_version:
+                conflicts.append(record_id)
+                if current is not None:
+                    self._records[(kind, record_id)] = current
+                    self._unreported.add((kind, record_id))
+                continue
+            record = {"version": current_version + 1, "deleted": data is None,
+                      "data": data if data is not None else {}}
+            _write_json_atomic(path, record)
+            self._records[(kind, record_id)] = record
+            written.append(record_id)
+            journal_lines.append(json.dumps({
+                "kind": kind, "id": record_id, "version": record["version"], "deleted": data is None,
+                "by": self.client_name, "time": time.time(),
+            }, ensure_ascii=False))
+        if journal_lines:
+            with open(self.journal_path, 'a', encoding='utf-8') as f:
+                f.write("\n".join(journal_lines) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            # 다른 인스턴스의 변경까지 따라잡은 뒤 필요하면 checkpoint 갱신
+            self._catch_up()
+            if self._entries_since_checkpoint >= CHECKPOINT_EVERY:
+                self._write_checkpoint()
+        return written, conflicts
+
+    def put(self, kind: str, record_id: str, data: Dict[str, Any], expected_version: int) -> bool:
+        written, _ = self.write_batch(kind, [(record_id, data, expected_version)])
+        return bool(written)
+
+    def delete(self, kind: str, record_id: str, expected_version: int) -> bool:
+        written, _ = self.write_batch(kind, [(record_id, None, expected_version)])
+        return bool(written)
+
+    def seed(self, kind: str, records: Dict[str, Dict[str, Any]]) -> bool:
+        """해당 kind 레코드가 하나도 없을 때만 초기 레코드를 씁니다. (여러 사용자가 동시에 처음 실행해도 한 번만)"""
+        with self._lock():
+            self._catch_up()
+            kind_dir = os.path.join(self.root, kind)
+            if any(k == kind for k, _ in self._records) or (os.path.isdir(kind_dir) and os.listdir(kind_dir)):
+                return False
+            written, _ = self._write_locked(kind, [(record_id, data, 0) for record_id, data in records.items()])
+        return bool(written)
+
+    def _write_checkpoint(self):
+        """잠금을 잡은 상태에서 호출. 현재 캐시(=journal_offset 까지 반영)를 checkpoint 로 저장합니다."""
+        by_kind: Dict[str, Dict[str, Any]] = {}
+        for (kind, record_id), record in self._records.items():
+            by_kind.setdefault(kind, {})[record_id] = record
+        _write_json_atomic(os.path.join(self.root, CHECKPOINT_FILE),
+                           {"journal_offset": self._journal_offset, "records": by_kind})
+        self._entries_since_checkpoint = 0
+
+
+def _increment_worker(args: Tuple[str, int, int]) -> int:
+    """자체 테스트용: 같은 레코드의 카운터를 낙관적 재시도로 increments 번 올립니다. 충돌 횟수를 반환합니다."""
+    root, increments, worker_no = args
+    store = SharedStore(root, client_name=f"worker-{worker_no}").open()
+    conflicts = 0
+    for _ in range(increments):
+        while True:
+            store.poll()
+            current = store.records("counters").get("shared", {"value": 0})
+            if store.put("counters", "shared", {"value": current["value"] + 1},
+                         store.version("counters", "shared")):
+                break
+            conflicts += 1
+    return conflicts
+
+
+if __name__ == '__main__':
+    from concurrent.futures import ProcessPoolExecutor
+
+    parser = argparse.ArgumentParser(description="공유 저장소 다중 프로세스 자체 테스트")
+    parser.add_argument("--processes", type=int, default=4)
+    parser.add_argument("--increments", type=int, default=50)
+    parser.add_argument("--root", default=None, help="공유 폴더 (기본: 임시 폴더)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        root = args.root or tmp
+        SharedStore(root).open().seed("counters", {"shared": {"value": 0}})
+        started = time.perf_counter()
+        with ProcessPoolExecutor(max_workers=args.processes) as pool:
+            conflict_counts = list(pool.map(_increment_worker,
+                                            [(root, args.increments, i) for i in range(args.processes)]))
+        elapsed = time.perf_counter() - started
+
+        reader = SharedStore(root).open()
+        value = reader.records("counters")["shared"]["value"]
+        expected = args.processes * args.increments
+        print(f"최종 값 {value} / 기대 {expected}, 충돌 후 재시도 {sum(conflict_counts)}회, {elapsed:.2f}s")
+        assert value == expected, "동시 쓰기에서 갱신이 유실되었습니다"
+        assert os.path.exists(os.path.join(root, CHECKPOINT_FILE)) or expected < CHECKPOINT_EVERY
+        print("공유 저장소 자체 테스트 통과")
@@ -0,0 +1,173 @@
+"""
+품목(SKU) 정수 ID 레지스트리.
+
+품목은 (모델명, 제품명, 규격)으로 구분하지만, 프로파일 단가/조회 인덱스/명세서 품목 묶음에서는 긴 문자열 튜플 대신
+정수 ID를 키로 씁니다. ID는 처음 보는 품목에 차례로 부여하고 사용자 데이터 폴더의 sku_registry.json 에 저장하므로
+실행 간에 유지됩니다. 파일(단가 프로파일, 단가 이력, 공유 폴더 레코드)에는 지금처럼 "모델명|제품명|규격" 문자열로
+기록하고, 읽고 쓸 때만 변환합니다.
+"""
+import json
+import logging
+import os
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+REGISTRY_FILE = "sku_registry.json"
+KEY_SEPARATOR = "|"  # "모델명|제품명|규격"
+
+SkuKey = Tuple[str, str, str]  # (모델명, 제품명, 규격)
+
+
+def parse_key_str(key_str: str) -> SkuKey:
+    """ "모델명|제품명|규격" -> 튜플. 형식이 다르면 ValueError."""
+    parts = tuple(key_str.split(KEY_SEPARATOR))
+    if len(parts) != 3:
+        raise ValueError(f"malformed item key '{key_str}'")
+    return parts  # type: ignore[return-value]
+
+
+class SkuRegistry:
+    """(모델명, 제품명, 규격) <-> 정수 ID. ID는 0부터 부여 순서대로이며 한 번 부여하면 바뀌지 않습니다."""
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        self._ids: Dict[SkuKey, int] = {}
+        self._keys: List[SkuKey] = []
+        self._key_strs: List[str] = []  # ID -> "모델명|제품명|규격" (저장 시 변환용)
+        self._ids_by_str: Dict[str, int] = {}
+        self._dirty = False
+        self._lock = threading.Lock()  # 마스터 백그라운드 로드와 메인 스레드가 동시에 ID를 부여할 수 있음
+
+    @classmethod
+    def load(cls, path: str) -> "SkuRegistry":
+        registry = cls(path)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            for key_str in data.get("skus", []):
+                registry._add(parse_key_str(key_str))
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError, AttributeError) as e:
+            # 파일 ID는 메모리 안에서만 쓰이므로 새로 부여해도 저장된 데이터에는 영향 없음
+            logger.warning("SKU 레지스트리를 읽을 수 없어 새로 만듭니다 (%s): %s", path, e)
+            registry._ids.clear()
+            registry._keys.clear()
+            registry._key_strs.clear()
+            registry._ids_by_str.clear()
+            registry._dirty = True
+        return registry
+
+    def __len__(self):
+        return len(self._keys)
+
+    def _add(self, key: SkuKey) -> int:
+        sku_id = len(self._keys)
+        key_str = KEY_SEPARATOR.join(key)
+        self._ids[key] = sku_id
+        self._keys.append(key)
+        self._key_strs.append(key_str)
+        self._ids_by_str[key_str] = sku_id
+        return sku_id
+
+    def id_for(self, key: SkuKey) -> int:
+        """품목 ID. 처음 보는 품목이면 새로 부여합니다."""
+        sku_id = self._ids.get(key)
+        if sku_id is None:
+            with self._lock:
+                sku_id = self._ids.get(key)
+                if sku_id is None:
+                    sku_id = self._add((key[0], key[1], key[2]))
+                    self._dirty = True
+        return sku_id
+
+    def find_id(self, key: SkuKey) -> Optional[int]:
+        """부여된 ID (없으면 None, 새로 부여하지 않음)"""
+        return self._ids.get(key)
+
+    def id_for_str(self, key_str: str) -> int:
+        """ "모델명|제품명|규격" 의 ID (처음 보면 부여). 형식이 다르면 ValueError."""
+        sku_id = self._ids_by_str.get(key_str)
+        return sku_id if sku_id is not None else self.id_for(parse_key_str(key_str))
+
+    def key_for(self, sku_id: int) -> SkuKey:
+        return self._keys[sku_id]
+
+    def key_str(self, sku_id: int) -> str:
+        return self._key_strs[sku_id]
+
+    def save(self):
+        """새로 부여한 ID가 있으면 저장합니다."""
+        if not self._dirty or not self.path:
+            return
+        with self._lock:
+            data = {"version": 1, "skus": list(self._key_strs)}
+            self._dirty = False
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False, separators=(",", ":"))
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            self._dirty = True
+            logger.error("SKU 레지스트리 저장 실패 (%s): %s", self.path, e)
+
+
+_registry: Optional[SkuRegistry] = None
+_registry_lock = threading.Lock()
+
+
+def get_registry() -> SkuRegistry:
+    """프로세스 공용 레지스트리 (처음 호출할 때 사용자 데이터 폴더에서 로드)"""
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                import storage
+                _registry = SkuRegistry.load(storage.get_user_data_path(REGISTRY_FILE))
+    return _registry
+
+
+def set_registry(registry: Optional[SkuRegistry]):
+    """레지스트리 교체 (None: 다음 get_registry() 에서 다시 로드). 도구/테스트용."""
+    global _registry
+    _registry = registry
+
+
+def id_for(key: SkuKey) -> int:
+    return get_registry().id_for(key)
+
+
+def key_for(sku_id: int) -> SkuKey:
+    return get_registry().key_for(sku_id)
+
+
+def key_str(sku_id: int) -> str:
+    return get_registry().key_str(sku_id)
+
+
+def assign_items(items: Iterable) -> None:
+    """제품 마스터 로드 직후 모든 품목에 ID를 부여하고, 새 ID가 있으면 레지스트리를 저장합니다."""
+    registry = get_registry()
+    for item in items:
+        item._sku_id = registry.id_for((item.model_name, item.product_name, item.spec))
+    registry.save()
+
+
+if __name__ == '__main__':
+    import tempfile
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, REGISTRY_FILE)
+        registry = SkuRegistry.load(path)
+        a = registry.id_for(("M1", "P1", "S1"))
+        b = registry.id_for(("M2", "P2", "S2"))
+        assert registry.id_for(("M1", "P1", "S1")) == a and a != b
+        assert registry.key_str(b) == "M2|P2|S2" and registry.id_for_str("M2|P2|S2") == b
+        registry.save()
+        reloaded = SkuRegistry.load(path)
+        assert reloaded.find_id(("M2", "P2", "S2")) == b and reloaded.find_id(("X", "Y", "Z")) is None
+        assert reloaded.id_for(("M3", "P3", "S3")) == 2
+        print(f"SKU 레지스트리 테스트 완료 ({len(reloaded)}개)")
@@ -0,0 +1,171 @@
+"""
+Tk 메인 루프 멈춤(stall) 감시.
+
+메인 스레드는 App.after()로 주기적으로 heartbeat 시각을 갱신하고, 감시 스레드는 heartbeat가
+threshold_ms 이상 끊기면 sys._current_frames()로 메인 스레드의 스택을 잡아 어떤 이벤트 핸들러
+(예: _save_profile_price_edit, _refresh_product_viewer_listbox)가 메인 루프를 붙잡고 있는지 기록합니다.
+멈춤이 끝나면 지속 시간, 핸들러, 스택을 출력하고 사용자 데이터 폴더의 stalls.jsonl 에 추가하며,
+지속 시간 히스토그램을 유지합니다.
+"""
+import collections
+import datetime
+import json
+import logging
+import os
+import sys
+import threading
+import time
+import traceback
+from typing import Any, Deque, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+STALL_LOG_FILE = "stalls.jsonl"
+# 히스토그램 구간 상한 (ms). 마지막 구간은 그 이상 전부.
+HISTOGRAM_BOUNDS_MS = [250, 500, 1000, 2000, 5000, 10000]
+
+
+def _histogram_label(index: int) -> str:
+    if index == 0:
+        return f"<{HISTOGRAM_BOUNDS_MS[0]}ms"
+    if index == len(HISTOGRAM_BOUNDS_MS):
+        return f">={HISTOGRAM_BOUNDS_MS[-1]}ms"
+    return f"{HISTOGRAM_BOUNDS_MS[index - 1]}-{HISTOGRAM_BOUNDS_MS[index]}ms"
+
+
+def find_handler(stack: List[traceback.FrameSummary], app_file: str) -> Optional[str]:
+    """
+    메인 스레드 스택에서 Tk가 호출한 애플리케이션 핸들러를 찾습니다.
+    tkinter 프레임 다음에 처음 나오는 app_file 의 프레임이 이벤트 핸들러이고,
+    없으면 가장 안쪽의 app_file 프레임을 사용합니다.
+    """
+    app_file = os.path.normcase(os.path.abspath(app_file))
+    inside_tk = False
+    innermost = None
+    for frame in stack:
+        filename = os.path.normcase(os.path.abspath(frame.filename))
+        if f"{os.sep}tkinter{os.sep}" in filename:
+            inside_tk = True
+        elif filename == app_file:
+            innermost = frame
+            if inside_tk:
+                return f"{frame.name} ({os.path.basename(frame.filename)}:{frame.lineno})"
+    if innermost is not None:
+        return f"{innermost.name} ({os.path.basename(innermost.filename)}:{innermost.lineno})"
+    return None
+
+
+class StallWatchdog:
+    """Tk 메인 루프 멈춤 감시기. start()는 메인 스레드에서 호출해야 합니다."""
+
+    def __init__(self, widget, threshold_ms: int = 300, heartbeat_ms: int = 100,
+                 app_file: Optional[str] = None, log_path: Optional[str] = None, max_events: int = 200):
+        self.widget = widget
+        self.threshold = threshold_ms / 1000
+        self.heartbeat_ms = heartbeat_ms
+        self.app_file = app_file or sys.modules[type(widget).__module__].__file__
+        self.log_path = log_path
+        self.events: Deque[Dict[str, Any]] = collections.deque(maxlen=max_events)
+        self.histogram = [0] * (len(HISTOGRAM_BOUNDS_MS) + 1)
+
+        self._main_thread_id: Optional[int] = None
+        self._last_beat = time.monotonic()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._after_id = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._main_thread_id = threading.get_ident()
+        self._last_beat = time.monotonic()
+        self._after_id = self.widget.after(self.heartbeat_ms, self._beat)
+        self._thread = threading.Thread(target=self._watch, name="StallWatchdog", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._after_id is not None:
+            try:
+                self.widget.after_cancel(self._after_id)
+            except Exception:
+                pass
+            self._after_id = None
+
+    def _beat(self):
+        self._last_beat = time.monotonic()
+        self._after_id = self.widget.after(self.heartbeat_ms, self._beat)
+
+    def _capture_main_stack(self) -> List[traceback.FrameSummary]:
+        frame = sys._current_frames().get(self._main_thread_id)
+        return traceback.extract_stack(frame) if frame is not None else []
+
+    def _watch(self):
+        poll = min(self.heartbeat_ms / 1000 / 2, self.threshold / 3)
+        # heartbeat 간격만큼은 정상적인 대기이므로 멈춤 판단 시 더해 줌
+        limit = self.threshold + self.heartbeat_ms / 1000
+        while not self._stop.wait(poll):
+            stalled_since = self._last_beat
+            if time.monotonic() - stalled_since < limit:
+                continue
+
+            # 멈춤 진행 중: heartbeat가 돌아올 때까지 스택을 샘플링하여 가장 많이 잡힌 핸들러를 기록
+            handler_counts: collections.Counter = collections.Counter()
+            first_stack = self._capture_main_stack()
+            handler_counts[find_handler(first_stack, self.app_file)] += 1
+            while not self._stop.wait(poll) and self._last_beat == stalled_since:
+                handler_counts[find_handler(self._capture_main_stack(), self.app_file)] += 1
+            if self._stop.is_set():
+                return
+            duration_ms = (self._last_beat - stalled_since) * 1000 - self.heartbeat_ms
+            self._record(duration_ms, handler_counts.most_common(1)[0][0], first_stack)
+
+    def _record(self, duration_ms: float, handler: Optional[str], stack: List[traceback.FrameSummary]):
+        bucket = next((i for i, bound in enumerate(HISTOGRAM_BOUNDS_MS) if duration_ms < bound),
+                      len(HISTOGRAM_BOUNDS_MS))
+        event = {
+            "time": datetime.datetime.now().isoformat(timespec="seconds"),
+            "duration_ms": round(duration_ms, 1),
+            "handler": handler,
+            "stack": traceback.format_list(stack),
+        }
+        with self._lock:
+            self.histogram[bucket] += 1
+            self.events.append(event)
+        logger.warning("UI가 %.0fms 동안 멈췄습니다 (핸들러: %s)", duration_ms, handler or '알 수 없음')
+        self._append_log(event)
+
+    def _append_log(self, event: Dict[str, Any]):
+        path = self.log_path
+        if path is None:
+            import storage
+            path = storage.get_user_data_path(STALL_LOG_FILE)
+        try:
+            with open(path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(event, ensure_ascii=False) + "\n")
+        except OSError as e:
+            logger.error("UI 멈춤 기록 저장 실패 (%s): %s", path, e)
+
+    def report(self) -> Dict[str, Any]:
+        """히스토그램과 핸들러별 멈춤 횟수/합계"""
+        with self._lock:
+            events = list(self.events)
+            histogram = {_histogram_label(i): count for i, count in enumerate(self.histogram)}
+        by_handler: Dict[str, Dict[str, float]] = {}
+        for event in events:
+            entry = by_handler.setdefault(event["handler"] or "알 수 없음", {"count": 0, "total_ms": 0.0, "max_ms": 0.0})
+            entry["count"] += 1
+            entry["total_ms"] += event["duration_ms"]
+            entry["max_ms"] = max(entry["max_ms"], event["duration_ms"])
+        return {"histogram": histogram, "by_handler": by_handler, "stalls": sum(histogram.values())}
+
+    def format_report(self) -> str:
+        report = self.report()
+        lines = [f"멈춤 {report['stalls']}회 (기준 {self.threshold * 1000:.0f}ms)", "", "지속 시간 분포:"]
+        lines += [f"  {label:>12}: {count}" for label, count in report["histogram"].items()]
+        if report["by_handler"]:
+            lines += ["", "핸들러별 (최근 기록 기준):"]
+            for handler, stats in sorted(report["by_handler"].items(), key=lambda kv: -kv[1]["total_ms"]):
+                lines.append(f"  {handler}: {stats['count']}회, 합계 {stats['total_ms']:.0f}ms, 최대 {stats['max_ms']:.0f}ms")
+        return "\n".join(lines)
@@ -1,14 +1,25 @@
+import hashlib
 import json
+import logging
 import os
 import sys # Added sys
 import shutil # Added shutil
+import threading
+import pickle
 from decimal import Decimal, InvalidOperation
-from typing import List, Dict, Any, Optional, Tuple # Added Tuple
-from models import Company, Item, PriceTier, PriceProfile # Added PriceProfile
+from typing import List, Dict, Any, Iterable, Iterator, Optional, Tuple # Added Tuple
+from models import Company, Item, MarginPolicy, PriceTier, PriceProfile, PriceRule, PropagationAction, PropagationRule # Added PriceProfile
+import profiling
+import sku
+from app_logging import DataQualityReport
+
+logger = logging.getLogger(__name__)
 
 COMPANY_DATA_FILE = "data.json"
 PRICE_PROFILES_FILE = "prices_for_companies.json" # Use company-specific prices file
-ITEM_KEY_SEPARATOR = "|" # For converting tuple keys to string
+PROPAGATION_RULES_FILE = "master_propagation_rules.json" # 제품 마스터 변경 -> 단가 프로파일 반영 규칙
+MARGIN_POLICY_FILE = "margin_policy.json" # 단가 마진 점검 기준
+ITEM_KEY_SEPARATOR = sku.KEY_SEPARATOR # For converting SKU keys to "모델명|제품명|규격" strings
 # The actual default path for product master will be handled by the main application,
 # possibly pointing to a bundled file or a user-configurable path.
 # For now, this constant can represent a typical name.
@@ -30,7 +41,7 @@ def get_user_data_path(filename: str) -> str:
         try:
             os.makedirs(user_data_dir)
         except OSError as e:
-            print(f"Error creating user data directory '{user_data_dir}': {e}")
+            logger.error("Error creating user data directory '%s': %s", user_data_dir, e)
             # Fallback to CWD if user dir creation fails, though not ideal
             return os.path.join(os.getcwd(), filename) 
     return os.path.join(user_data_dir, filename)
@@ -53,7 +64,7 @@ def _dict_to_company(data: Dict[str, Any]) -> Company:
         price_tier_name = data.get("price_tier", PriceTier.A.name) # 기본값 A
         price_tier = PriceTier[price_tier_name]
     except KeyError:
-        print(f"Warning: Invalid price_tier name '{data.get('price_tier')}' for company '{data.get('name', 'N/A')}'. Defaulting to {PriceTier.A.name}.")
+        logger.warning("Invalid price_tier name '%s' for company '%s'. Defaulting to %s.", data.get('price_tier'), data.get('name', 'N/A'), PriceTier.A.name)
         price_tier = PriceTier.A
         
     return Company(
@@ -71,7 +82,7 @@ def get_initial_companies() -> List[Company]:
         Company(name="샘플 대리점 (일반가)", price_tier=PriceTier.DEALER, contact="031-456-0002"),
     ]
 
-def load_companies() -> List[Company]:
+def _load_companies_from_files() -> List[Company]:
     """
     Loads company data. Tries user data dir, then bundled file (if exists),
     then creates initial data.
@@ -91,21 +102,21 @@ def load_companies() -> List[Company]:
                     shutil.copy2(bundled_file_path, user_file_path)
                     path_to_load_from = user_file_path
                 except Exception as e_copy:
-                    print(f"Error copying bundled company data to user dir: {e_copy}. Will try to load directly from bundle.")
+                    logger.error("Error copying bundled company data to user dir: %s. Will try to load directly from bundle.", e_copy)
                     path_to_load_from = bundled_file_path
         
         if not path_to_load_from: # Still no path, means not in user dir and not (found or copied) from bundle
-            print(f"'{user_file_path}' 및 번들에서 회사 데이터를 찾을 수 없어 초기 데이터로 생성합니다.")
+            logger.info("'%s' 및 번들에서 회사 데이터를 찾을 수 없어 초기 데이터로 생성합니다.", user_file_path)
             initial_companies = get_initial_companies()
-            save_companies(initial_companies) 
+            _save_companies_file(initial_companies) 
             return initial_companies
 
     if not path_to_load_from:
         # This case should ideally not be reached if the logic above is sound.
         # If it is, it means something went wrong determining a path, so create defaults.
-        print(f"회사 데이터 파일을 로드할 경로를 결정하지 못했습니다. 초기 데이터로 생성합니다.")
+        logger.info("회사 데이터 파일을 로드할 경로를 결정하지 못했습니다. 초기 데이터로 생성합니다.")
         initial_companies = get_initial_companies()
-        save_companies(initial_companies)
+        _save_companies_file(initial_companies)
         return initial_companies
 
     try:
@@ -118,94 +129,290 @@ def load_companies() -> List[Company]:
         elif isinstance(data, dict) and "companies" in data:
             companies_data_list = data.get("companies")
         else:
-            print(f"Warning: '{path_to_load_from}' has an unexpected format. Attempting to reset.")
+            logger.warning("'%s' has an unexpected format. Attempting to reset.", path_to_load_from)
             raise ValueError("Malformed company data: unknown format.")
 
         if not isinstance(companies_data_list, list):
-            print(f"Warning: Company data in '{path_to_load_from}' is not a list. Will attempt to reset to initial data.")
+            logger.warning("Company data in '%s' is not a list. Will attempt to reset to initial data.", path_to_load_from)
             raise ValueError("Malformed company data: not a list.")
 
         parsed_companies = []
         for c_data in companies_data_list:
             if not isinstance(c_data, dict):
-                print(f"Warning: Skipping non-dictionary company entry in '{path_to_load_from}': {c_data}")
+                logger.warning("Skipping non-dictionary company entry in '%s': %s", path_to_load_from, c_data)
                 continue
             try:
                 if "name" not in c_data:
-                    print(f"Warning: Skipping company entry with missing 'name' in '{path_to_load_from}': {c_data}")
+                    logger.warning("Skipping company entry with missing 'name' in '%s': %s", path_to_load_from, c_data)
                     continue
                 parsed_companies.append(_dict_to_company(c_data))
             except KeyError as ke:
-                print(f"Warning: Skipping company entry with missing key in '{path_to_load_from}': {c_data}. Error: {ke}")
+                logger.warning("Skipping company entry with missing key in '%s': %s. Error: %s", path_to_load_from, c_data, ke)
                 continue
         return parsed_companies
             
     except Exception as e:
-        print(f"'{path_to_load_from}' 로드 또는 파싱 중 오류 발생 ({type(e).__name__}: {e}). 초기 데이터로 대체합니다.")
+        logger.error("'%s' 로드 또는 파싱 중 오류 발생 (%s: %s). 초기 데이터로 대체합니다.", path_to_load_from, type(e).__name__, e)
         initial_companies = get_initial_companies()
         try:
-            save_companies(initial_companies)
-            print(f"'{COMPANY_DATA_FILE}'이(가) 초기 데이터로 성공적으로 재작성되었습니다 (위치: {user_file_path}).")
+            _save_companies_file(initial_companies)
+            logger.info("'%s'이(가) 초기 데이터로 성공적으로 재작성되었습니다 (위치: %s).", COMPANY_DATA_FILE, user_file_path)
             return initial_companies
         except Exception as e_fallback:
-            print(f"초기 데이터로 대체하는 중 심각한 오류 발생: {e_fallback}. 빈 리스트를 반환합니다.")
+            logger.error("초기 데이터로 대체하는 중 심각한 오류 발생: %s. 빈 리스트를 반환합니다.", e_fallback)
             return []
 
 
-def save_companies(companies: List[Company]):
+@profiling.traced("storage.load_companies")
+def load_companies() -> List[Company]:
+    """공유 폴더 모드이면 공유 저장소에서, 아니면 사용자 데이터 폴더의 data.json 에서 회사 목록을 로드합니다."""
+    store = get_shared_store()
+    if store is None:
+        return _load_companies_from_files()
+    if not store.records(COMPANIES_KIND):
+        # 공유 폴더를 처음 쓰는 경우 이 PC의 데이터로 채움 (먼저 채운 사용자가 있으면 그대로 사용)
+        store.seed(COMPANIES_KIND, {c.id: _company_to_dict(c) for c in _load_companies_from_files()})
+    companies = []
+    for record_id, data in _shared_snapshot(store, COMPANIES_KIND).items():
+        try:
+            companies.append(_dict_to_company(data))
+        except (KeyError, TypeError) as e:
+            logger.warning("공유 저장소의 회사 레코드 '%s'를 건너뜁니다: %s", record_id, e)
+    return companies
+
+@profiling.traced("storage.save_companies")
+def save_companies(companies: List[Company]) -> Optional[List[str]]:
     """
-    회사 데이터를 사용자별 데이터 디렉토리의 COMPANY_DATA_FILE (data.json) 파일에 저장합니다.
-    최상위가 리스트인 단순한 형태로 저장합니다.
+    회사 데이터를 저장합니다. 공유 폴더 모드에서는 바뀐 레코드만 쓰고,
+    다른 사용자가 먼저 수정하여 저장하지 못한 회사 이름 목록을 반환합니다. (일반 모드는 None)
     """
-    user_file_path = get_user_data_path(COMPANY_DATA_FILE)
-    data_to_save = [_company_to_dict(c) for c in companies]
+    store = get_shared_store()
+    if store is not None:
+        return _save_shared(store, COMPANIES_KIND, {c.id: _company_to_dict(c) for c in companies})
+    _save_companies_file(companies)
+    return None
+
+def _write_data_file(filename: str, data_to_save: Any, label: str):
+    """
+    사용자 데이터 폴더의 filename 에 JSON으로 저장합니다. 임시 파일에 쓴 뒤 교체하므로
+    백그라운드 저장 중 종료되어도 기존 파일이 깨지지 않습니다.
+    """
+    user_file_path = get_user_data_path(filename)
+    tmp_path = f"{user_file_path}.{os.getpid()}.{threading.get_ident()}.tmp"
     try:
         os.makedirs(os.path.dirname(user_file_path), exist_ok=True)
-        with open(user_file_path, 'w', encoding='utf-8') as f:
+        with open(tmp_path, 'w', encoding='utf-8') as f:
             json.dump(data_to_save, f, ensure_ascii=False, indent=4)
-        print(f"회사 데이터가 '{user_file_path}'에 성공적으로 저장되었습니다.")
+        os.replace(tmp_path, user_file_path)
+        logger.debug("%s 데이터가 '%s'에 성공적으로 저장되었습니다.", label, user_file_path)
     except IOError as e:
-        print(f"'{user_file_path}' 저장 중 오류 발생: {e}")
+        logger.error("'%s' 저장 중 오류 발생: %s", user_file_path, e)
     except Exception as e_general:
-        print(f"회사 데이터 저장 중 일반 오류 발생 ({user_file_path}): {e_general}")
+        logger.error("%s 데이터 저장 중 일반 오류 발생 (%s): %s", label, user_file_path, e_general)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+def companies_file_data(companies: List[Company]) -> List[Dict[str, Any]]:
+    """data.json 에 저장할 내용 (메인 스레드에서 만든 뒤 write_companies_file 로 백그라운드 저장 가능)"""
+    return [_company_to_dict(c) for c in companies]
+
+def write_companies_file(data_to_save: List[Dict[str, Any]]):
+    _write_data_file(COMPANY_DATA_FILE, data_to_save, "회사")
+
+def _save_companies_file(companies: List[Company]):
+    """
+    회사 데이터를 사용자별 데이터 디렉토리의 COMPANY_DATA_FILE (data.json) 파일에 저장합니다.
+    최상위가 리스트인 단순한 형태로 저장합니다.
+    """
+    write_companies_file(companies_file_data(companies))
 
 # --- Price Profile Data Persistence (price_profiles.json) ---
 
-def _price_profile_to_dict(profile: PriceProfile) -> Dict[str, Any]:
-    """PriceProfile 객체를 JSON 직렬화를 위한 dict로 변환"""
-    # Convert tuple keys in item_prices to string keys
-    string_key_item_prices = {
-        ITEM_KEY_SEPARATOR.join(k): str(v) for k, v in profile.item_prices.items()
-    }
-    return {
+def price_rule_to_dict(rule: PriceRule) -> Dict[str, Any]:
+    """PriceRule 을 저장용 dict로 변환 (price_profiles.json, 단가 이력에서 사용)"""
+    data: Dict[str, Any] = {"tier": rule.tier.name, "multiplier": str(rule.multiplier)}
+    if rule.round_unit > 0:
+        data["round_unit"] = str(rule.round_unit)
+    if rule.excluded_keys:
+        registry = sku.get_registry()
+        data["excluded"] = sorted(registry.key_str(k) for k in rule.excluded_keys)
+    return data
+
+def dict_to_price_rule(data: Dict[str, Any]) -> PriceRule:
+    """dict를 PriceRule 로 변환. 형식이 잘못되면 KeyError / ValueError / InvalidOperation."""
+    registry = sku.get_registry()
+    excluded = [registry.id_for_str(str_key) for str_key in data.get("excluded", [])]
+    return PriceRule(
+        tier=PriceTier[data.get("tier", PriceTier.DEALER.name)],
+        multiplier=Decimal(str(data.get("multiplier", "1"))),
+        round_unit=Decimal(str(data.get("round_unit", "0"))),
+        excluded_keys=frozenset(excluded),
+    )
+
+def _price_profile_to_dict(profile: PriceProfile, prices_from: Optional[str] = None) -> Dict[str, Any]:
+    """
+    PriceProfile 객체를 JSON 직렬화를 위한 dict로 변환.
+    prices_from: 앞서 저장한 프로파일과 item_prices 가 같으면 그 ID만 기록 (파일 내 중복 제거)
+    """
+    data: Dict[str, Any] = {
         "id": profile.id,
         "name": profile.name,
-        "item_prices": string_key_item_prices
     }
+    if profile.base_profile_id:
+        data["base_profile_id"] = profile.base_profile_id
+    if profile.rule is not None:
+        data["rule"] = price_rule_to_dict(profile.rule)
+    if prices_from is not None:
+        data["prices_from"] = prices_from
+        return data
+    # Convert SKU id keys in item_prices to string keys (None: 기본 프로파일 단가 삭제 표시 -> null)
+    key_str = sku.get_registry().key_str
+    data["item_prices"] = {
+        key_str(k): (str(v) if v is not None else None) for k, v in profile.item_prices.items()
+    }
+    return data
 
-def _dict_to_price_profile(data: Dict[str, Any]) -> PriceProfile:
-    """dict를 PriceProfile 객체로 변환"""
-    # Convert string keys back to tuple keys and Decimal values
-    parsed_item_prices: Dict[tuple[str, str, str], Decimal] = {}
+def _dict_to_price_profile(data: Dict[str, Any], quality: Optional[DataQualityReport] = None,
+                           decimal_cache: Optional[Dict[str, Decimal]] = None) -> PriceProfile:
+    """
+    dict를 PriceProfile 객체로 변환. quality 가 주어지면 잘못된 항목을 개별 경고 대신 집계합니다.
+    item_prices 에 없는 품목은 거래처 기본 가격 등급 단가로 대체되므로(pricing.resolve_unit_price),
+    희소(sparse) 형식 파일도 그대로 로드됩니다.
+    decimal_cache: 같은 가격 문자열을 Decimal 하나로 공유 (프로파일 간 가격 값 중복이 많음)
+    base_profile_id / prices_from 연결은 load_price_profiles 에서 전체 로드 후 처리합니다.
+    """
+    if decimal_cache is None:
+        decimal_cache = {}
+    # Convert string keys to SKU ids and Decimal values
+    parsed_item_prices: Dict[int, Optional[Decimal]] = {}
     raw_item_prices = data.get("item_prices", {})
+    registry = sku.get_registry()
     if isinstance(raw_item_prices, dict):
         for str_key, str_val in raw_item_prices.items():
             try:
-                key_parts = tuple(str_key.split(ITEM_KEY_SEPARATOR))
-                if len(key_parts) == 3: # Expecting (model_name, product_name, spec)
-                    parsed_item_prices[key_parts] = Decimal(str_val)
+                sku_id = registry.id_for_str(str_key) # Expecting "model_name|product_name|spec"
+            except ValueError:
+                if quality is not None:
+                    quality.add("가격 키 형식 오류", f"{data.get('name', 'N/A')}: {str_key}", logger)
                 else:
-                    print(f"Warning: Skipping malformed item price key '{str_key}' in profile '{data.get('name', 'N/A')}'.")
-            except (InvalidOperation, ValueError) as e:
-                print(f"Warning: Skipping invalid price value '{str_val}' for key '{str_key}' in profile '{data.get('name', 'N/A')}'. Error: {e}")
+                    logger.warning("Skipping malformed item price key '%s' in profile '%s'.", str_key, data.get('name', 'N/A'))
+                continue
+            try:
+                if str_val is None:
+                    parsed_item_prices[sku_id] = None
+                    continue
+                price = decimal_cache.get(str_val)
+                if price is None:
+                    price = decimal_cache[str_val] = Decimal(str_val)
+                parsed_item_prices[sku_id] = price
+            except (InvalidOperation, ValueError, TypeError) as e:
+                if quality is not None:
+                    quality.add("가격 값 형식 오류", f"{data.get('name', 'N/A')}: {str_key}={str_val!r}", logger)
+                else:
+                    logger.warning("Skipping invalid price value '%s' for key '%s' in profile '%s'. Error: %s",
+                                   str_val, str_key, data.get('name', 'N/A'), e)
+
+    rule = None
+    if isinstance(data.get("rule"), dict):
+        try:
+            rule = dict_to_price_rule(data["rule"])
+        except (KeyError, ValueError, TypeError, InvalidOperation) as e:
+            if quality is not None:
+                quality.add("단가 규칙 형식 오류 (규칙 무시)", data.get('name', 'N/A'), logger, f"{type(e).__name__}: {e}")
+            else:
+                logger.warning("Ignoring invalid price rule in profile '%s': %s", data.get('name', 'N/A'), e)
     
     return PriceProfile(
         id=data.get("id", ""),
         name=data["name"],
-        item_prices=parsed_item_prices
+        item_prices=parsed_item_prices,
+        base_profile_id=data.get("base_profile_id") or None,
+        rule=rule,
     )
 
+def _prices_content_key(profile: PriceProfile) -> frozenset:
+    return frozenset((k, str(v) if v is not None else None) for k, v in profile.item_prices.items())
+
+def dedupe_price_profiles(profiles: List[PriceProfile]) -> int:
+    """
+    item_prices 내용이 같은 프로파일들이 dict 하나를 공유하도록 합니다. (변경 시 PriceProfile 이 복사)
+    공유하게 된 프로파일 수를 반환합니다.
+    """
+    owners: Dict[frozenset, PriceProfile] = {}
+    shared = 0
+    for profile in profiles:
+        if not profile.item_prices:
+            continue
+        content_key = _prices_content_key(profile)
+        owner = owners.setdefault(content_key, profile)
+        if owner is profile or owner.item_prices is profile.item_prices:
+            continue
+        profile.item_prices = owner.item_prices
+        owner.shared_prices = profile.shared_prices = True
+        shared += 1
+    return shared
+
+def link_price_profiles(profiles: List[PriceProfile], quality: Optional[DataQualityReport] = None):
+    """base_profile_id 를 기본 프로파일 객체(PriceProfile.base)로 연결합니다. 없는 ID는 연결을 끊습니다."""
+    by_id = {p.id: p for p in profiles}
+    for profile in profiles:
+        if not profile.base_profile_id:
+            profile.base = None
+            continue
+        base = by_id.get(profile.base_profile_id)
+        if base is None or base is profile:
+            if quality is not None:
+                quality.add("기본 프로파일 없음 (연결 해제)", profile.name, logger)
+            else:
+                logger.warning("Base profile '%s' of '%s' not found.", profile.base_profile_id, profile.name)
+            profile.base_profile_id = None
+            profile.base = None
+        else:
+            profile.base = base
+
+def _build_price_profiles(data: List[Any], source: str) -> List[PriceProfile]:
+    """프로파일 dict 목록을 PriceProfile 로 변환하고 단가 공유(prices_from, 중복 제거)와 기본 프로파일을 연결합니다."""
+    profiles = []
+    quality = DataQualityReport(source)
+    decimal_cache: Dict[str, Decimal] = {}
+    prices_from: Dict[int, str] = {}  # 프로파일 위치 -> item_prices 를 가져올 프로파일 ID
+    for p_data in data:
+        if not isinstance(p_data, dict) or "name" not in p_data:
+            quality.add("프로파일 형식 오류 (건너뜀)", str(p_data)[:40], logger)
+            continue
+        try:
+            profiles.append(_dict_to_price_profile(p_data, quality, decimal_cache))
+            if p_data.get("prices_from"):
+                prices_from[len(profiles) - 1] = p_data["prices_from"]
+        except Exception as e:
+            quality.add("프로파일 처리 오류 (건너뜀)", p_data.get('name', 'N/A'), logger, f"{type(e).__name__}: {e}")
+
+    by_id = {p.id: p for p in profiles}
+    for index, source_id in prices_from.items():
+        source_profile = by_id.get(source_id)
+        if source_profile is None or source_profile is profiles[index]:
+            quality.add("단가 공유 대상 프로파일 없음", profiles[index].name, logger)
+            continue
+        profiles[index].item_prices = source_profile.item_prices
+        profiles[index].shared_prices = source_profile.shared_prices = True
+    dedupe_price_profiles(profiles)
+    link_price_profiles(profiles, quality)
+    quality.summarize(logger)
+    sku.get_registry().save() # 마스터에 없는 품목 키에 새로 부여한 ID
+    return profiles
+
+@profiling.traced("storage.load_price_profiles")
 def load_price_profiles() -> List[PriceProfile]:
+    """공유 폴더 모드이면 공유 저장소에서, 아니면 로컬 파일에서 가격 프로파일을 로드합니다."""
+    store = get_shared_store()
+    if store is None:
+        return _load_price_profiles_from_files()
+    if not store.records(PRICE_PROFILES_KIND):
+        store.seed(PRICE_PROFILES_KIND, {p.id: _price_profile_to_dict(p) for p in _load_price_profiles_from_files()})
+    return _build_price_profiles(list(_shared_snapshot(store, PRICE_PROFILES_KIND).values()), store.root)
+
+def _load_price_profiles_from_files() -> List[PriceProfile]:
     """
     Loads price profiles.
     1. Tries user-specific data directory.
@@ -219,30 +426,30 @@ def load_price_profiles() -> List[PriceProfile]:
 
     if os.path.exists(user_file_path):
         path_to_load_from = user_file_path
-        print(f"Loading price profiles from user path: {user_file_path}")
+        logger.debug("Loading price profiles from user path: %s", user_file_path)
     else:
         # If not in user_data_path, try to find it in the source/bundle directory
         source_dir = get_bundle_dir() # sys._MEIPASS if frozen, else script's directory
         source_file_path = os.path.join(source_dir, PRICE_PROFILES_FILE)
 
         if os.path.exists(source_file_path):
-            print(f"Found '{PRICE_PROFILES_FILE}' at source/bundle path: {source_file_path}")
+            logger.info("Found '%s' at source/bundle path: %s", PRICE_PROFILES_FILE, source_file_path)
             # Attempt to copy to user data directory for future use
             try:
                 os.makedirs(os.path.dirname(user_file_path), exist_ok=True)
                 shutil.copy2(source_file_path, user_file_path)
                 path_to_load_from = user_file_path # Load from the new copy
-                print(f"Copied '{PRICE_PROFILES_FILE}' to user path: {user_file_path} and loading from there.")
+                logger.info("Copied '%s' to user path: %s and loading from there.", PRICE_PROFILES_FILE, user_file_path)
             except Exception as e_copy:
-                print(f"Error copying '{PRICE_PROFILES_FILE}' from '{source_file_path}' to '{user_file_path}': {e_copy}. Will load directly from source/bundle path.")
+                logger.error("Error copying '%s' from '%s' to '%s': %s. Will load directly from source/bundle path.", PRICE_PROFILES_FILE, source_file_path, user_file_path, e_copy)
                 path_to_load_from = source_file_path # Fallback to loading directly
         else:
             # File not found in user_data_path AND not in source/bundle_dir.
-            print(f"'{PRICE_PROFILES_FILE}' not found in user data path ('{user_file_path}') or source/bundle path ('{source_file_path}').")
+            logger.info("'%s' not found in user data path ('%s') or source/bundle path ('%s').", PRICE_PROFILES_FILE, user_file_path, source_file_path)
             # For price profiles, if the primary file is missing, we don't create a default one.
             
     if not path_to_load_from:
-        print(f"No price profiles file to load. Returning empty list.")
+        logger.info("No price profiles file to load. Returning empty list.")
         return []
 
     try:
@@ -250,36 +457,201 @@ def load_price_profiles() -> List[PriceProfile]:
             data = json.load(f)
         
         if not isinstance(data, list):
-            print(f"Warning: Data in '{path_to_load_from}' is not a list. Returning empty list.")
+            logger.warning("Data in '%s' is not a list. Returning empty list.", path_to_load_from)
             return []
 
-        profiles = []
-        for p_data in data:
-            if not isinstance(p_data, dict) or "name" not in p_data:
-                print(f"Warning: Skipping invalid profile entry in '{path_to_load_from}': {p_data}")
-                continue
-            try:
-                profiles.append(_dict_to_price_profile(p_data))
-            except Exception as e:
-                print(f"Warning: Error parsing profile entry '{p_data.get('name', 'N/A')}' in '{path_to_load_from}'. Error: {e}")
-        return profiles
+        return _build_price_profiles(data, path_to_load_from)
     except Exception as e:
-        print(f"Error loading or parsing '{path_to_load_from}' ({type(e).__name__}: {e}). Returning empty list.")
+        logger.error("Error loading or parsing '%s' (%s: %s). Returning empty list.", path_to_load_from, type(e).__name__, e)
         return []
 
-def save_price_profiles(profiles: List[PriceProfile]):
-    """Saves price profiles to the user-specific data directory."""
-    user_file_path = get_user_data_path(PRICE_PROFILES_FILE)
-    data_to_save = [_price_profile_to_dict(p) for p in profiles]
+@profiling.traced("storage.save_price_profiles")
+def save_price_profiles(profiles: List[PriceProfile]) -> Optional[List[str]]:
+    """
+    Saves price profiles to the user-specific data directory.
+    공유 폴더 모드에서는 바뀐 프로파일만 쓰고, 충돌로 저장하지 못한 프로파일 이름 목록을 반환합니다. (일반 모드는 None)
+    """
+    store = get_shared_store()
+    if store is not None:
+        # 공유 저장소는 레코드 단위로 저장하므로 prices_from 없이 각 프로파일을 독립적으로 기록
+        return _save_shared(store, PRICE_PROFILES_KIND, {p.id: _price_profile_to_dict(p) for p in profiles})
+    write_price_profiles_file(price_profiles_file_data(profiles))
+    return None
+
+def price_profiles_file_data(profiles: List[PriceProfile]) -> List[Dict[str, Any]]:
+    """prices_for_companies.json 에 저장할 내용 (메인 스레드에서 만든 뒤 write_price_profiles_file 로 백그라운드 저장 가능)"""
+    # item_prices 가 같은 프로파일은 처음 저장한 프로파일의 ID만 기록 (파일 크기가 실제 차이만큼만 늘도록)
+    first_by_content: Dict[frozenset, str] = {}
+    content_keys: Dict[int, frozenset] = {}  # 공유 중인 dict 는 내용 키를 한 번만 계산
+    data_to_save = []
+    for p in profiles:
+        prices_from = None
+        if p.item_prices:
+            content_key = content_keys.get(id(p.item_prices))
+            if content_key is None:
+                content_key = content_keys[id(p.item_prices)] = _prices_content_key(p)
+            owner_id = first_by_content.setdefault(content_key, p.id)
+            if owner_id != p.id:
+                prices_from = owner_id
+        data_to_save.append(_price_profile_to_dict(p, prices_from))
+    return data_to_save
+
+@profiling.traced("storage.write_price_profiles_file")
+def write_price_profiles_file(data_to_save: List[Dict[str, Any]]):
+    _write_data_file(PRICE_PROFILES_FILE, data_to_save, "가격 프로파일")
+
+# --- 제품 마스터 변경 반영 규칙 (master_propagation_rules.json) ---
+
+DEFAULT_PROPAGATION_RULES = [PropagationRule(PropagationAction.ADD_NEW, PriceTier.DEALER)]
+
+def _propagation_rule_to_dict(rule: PropagationRule) -> Dict[str, Any]:
+    data: Dict[str, Any] = {"action": rule.action.value, "tier": rule.tier.name, "multiplier": str(rule.multiplier)}
+    if rule.round_unit > 0:
+        data["round_unit"] = str(rule.round_unit)
+    return data
+
+def _dict_to_propagation_rule(data: Dict[str, Any]) -> PropagationRule:
+    """dict를 PropagationRule 로 변환. 형식이 잘못되면 KeyError / ValueError / InvalidOperation."""
+    return PropagationRule(
+        action=PropagationAction(data["action"]),
+        tier=PriceTier[data.get("tier", PriceTier.DEALER.name)],
+        multiplier=Decimal(str(data.get("multiplier", "1"))),
+        round_unit=Decimal(str(data.get("round_unit", "0"))),
+    )
+
+def load_propagation_rules() -> List[PropagationRule]:
+    """반영 규칙을 읽습니다. 파일이 없으면 기본 규칙(새 품목을 일반대리점가로 추가), 빈 리스트면 반영하지 않음."""
+    user_file_path = get_user_data_path(PROPAGATION_RULES_FILE)
+    try:
+        with open(user_file_path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    except FileNotFoundError:
+        return list(DEFAULT_PROPAGATION_RULES)
+    except (OSError, json.JSONDecodeError) as e:
+        logger.error("반영 규칙 파일 '%s'을(를) 읽을 수 없어 기본 규칙을 사용합니다: %s", user_file_path, e)
+        return list(DEFAULT_PROPAGATION_RULES)
+    rules = []
+    for rule_data in data if isinstance(data, list) else []:
+        try:
+            rules.append(_dict_to_propagation_rule(rule_data))
+        except (KeyError, ValueError, TypeError, InvalidOperation) as e:
+            logger.warning("반영 규칙 항목을 건너뜁니다 (%s): %r (%s)", user_file_path, rule_data, e)
+    return rules
+
+def save_propagation_rules(rules: List[PropagationRule]):
+    user_file_path = get_user_data_path(PROPAGATION_RULES_FILE)
     try:
         os.makedirs(os.path.dirname(user_file_path), exist_ok=True)
         with open(user_file_path, 'w', encoding='utf-8') as f:
-            json.dump(data_to_save, f, ensure_ascii=False, indent=4)
-        print(f"가격 프로파일 데이터가 '{user_file_path}'에 성공적으로 저장되었습니다.")
-    except IOError as e:
-        print(f"'{user_file_path}' 저장 중 오류 발생: {e}")
-    except Exception as e_general: # Catch other potential errors like makedirs failing
-        print(f"가격 프로파일 저장 중 일반 오류 발생 ({user_file_path}): {e_general}")
+            json.dump([_propagation_rule_to_dict(r) for r in rules], f, ensure_ascii=False, indent=4)
+    except OSError as e:
+        logger.error("'%s' 저장 중 오류 발생: %s", user_file_path, e)
+
+# --- 단가 마진 점검 기준 (margin_policy.json) ---
+
+def load_margin_policy() -> MarginPolicy:
+    """마진 점검 기준을 읽습니다. 파일이 없거나 형식이 잘못되면 기본값 (매입단가 미만, 치료재료단가 초과)"""
+    user_file_path = get_user_data_path(MARGIN_POLICY_FILE)
+    try:
+        with open(user_file_path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        policy = MarginPolicy(min_margin_percent=Decimal(str(data.get("min_margin_percent", "0"))),
+                              medical_cap_percent=Decimal(str(data.get("medical_cap_percent", "100"))))
+    except FileNotFoundError:
+        return MarginPolicy()
+    except (OSError, json.JSONDecodeError, AttributeError, InvalidOperation) as e:
+        logger.error("마진 점검 기준 파일 '%s'을(를) 읽을 수 없어 기본값을 사용합니다: %s", user_file_path, e)
+        return MarginPolicy()
+    if not policy.is_valid():
+        logger.error("마진 점검 기준 파일 '%s'의 값이 범위를 벗어나 기본값을 사용합니다: %s", user_file_path, policy)
+        return MarginPolicy()
+    return policy
+
+def save_margin_policy(policy: MarginPolicy):
+    user_file_path = get_user_data_path(MARGIN_POLICY_FILE)
+    try:
+        os.makedirs(os.path.dirname(user_file_path), exist_ok=True)
+        with open(user_file_path, 'w', encoding='utf-8') as f:
+            json.dump({"min_margin_percent": str(policy.min_margin_percent),
+                       "medical_cap_percent": str(policy.medical_cap_percent)}, f, ensure_ascii=False, indent=4)
+    except OSError as e:
+        logger.error("'%s' 저장 중 오류 발생: %s", user_file_path, e)
+
+# --- Shared multi-user store (공유 폴더 모드) ---
+# 환경 변수 LOHAS_SHARED_DIR (또는 set_shared_dir) 로 공유 폴더를 지정하면 회사/가격 프로파일을
+# shared_store.SharedStore 에 레코드 단위로 저장합니다. 제품 마스터는 원래대로 읽기 전용 파일입니다.
+
+SHARED_DIR_ENV = "LOHAS_SHARED_DIR"
+COMPANIES_KIND = "companies"
+PRICE_PROFILES_KIND = "price_profiles"
+
+_shared_dir_override: Optional[str] = None
+_shared_store = None
+# 앱에 넘겨준 레코드: kind -> {id: (버전, data)}. 저장 시 이것과 비교하여 바뀐 레코드만 기대 버전과 함께 씀
+_shared_app_view: Dict[str, Dict[str, Tuple[int, Dict[str, Any]]]] = {}
+
+def set_shared_dir(path: Optional[str]):
+    """공유 폴더를 지정합니다 (None: 환경 변수 설정을 따름)."""
+    global _shared_dir_override, _shared_store
+    _shared_dir_override = path
+    _shared_store = None
+    _shared_app_view.clear()
+
+def get_shared_store():
+    """공유 폴더 모드이면 열린 SharedStore, 아니면 None"""
+    global _shared_store
+    root = _shared_dir_override or os.environ.get(SHARED_DIR_ENV)
+    if not root:
+        return None
+    if _shared_store is None or _shared_store.root != root:
+        from shared_store import SharedStore
+        _shared_store = SharedStore(root).open()
+        _shared_app_view.clear()
+    return _shared_store
+
+def _shared_snapshot(store, kind: str) -> Dict[str, Dict[str, Any]]:
+    """현재 레코드를 앱에 넘겨준 것으로 기록하고 {id: data} 반환"""
+    records = store.records(kind)
+    _shared_app_view[kind] = {record_id: (store.version(kind, record_id), data) for record_id, data in records.items()}
+    return records
+
+def _save_shared(store, kind: str, current: Dict[str, Dict[str, Any]]) -> List[str]:
+    from shared_store import LockTimeout
+    view = _shared_app_view.setdefault(kind, {})
+    changes = []
+    for record_id, data in current.items():
+        known = view.get(record_id)
+        if known is None or known[1] != data:
+            changes.append((record_id, data, known[0] if known else 0))
+    for record_id, (version, _) in view.items():
+        if record_id not in current:
+            changes.append((record_id, None, version))
+
+    def name_of(record_id: str) -> str:
+        data = current.get(record_id) or view.get(record_id, (0, {}))[1]
+        return data.get("name", record_id)
+
+    try:
+        written, conflicts = store.write_batch(kind, changes)
+    except (LockTimeout, OSError) as e:
+        logger.error("공유 저장소 저장 실패 (%s): %s", store.root, e)
+        return [name_of(record_id) for record_id, _, _ in changes]
+    for record_id in written:
+        if record_id in current:
+            view[record_id] = (store.version(kind, record_id), current[record_id])
+        else:
+            view.pop(record_id, None)
+    conflict_names = [name_of(record_id) for record_id in conflicts]
+    if conflict_names:
+        logger.warning("다른 사용자가 먼저 수정하여 저장하지 못했습니다 (%s): %s", kind, ", ".join(conflict_names))
+    return conflict_names
+
+def poll_shared_changes() -> List[str]:
+    """공유 폴더 모드에서 다른 사용자가 바꾼 레코드가 있는 종류(COMPANIES_KIND 등) 목록. 바뀐 레코드만 다시 읽습니다."""
+    store = get_shared_store()
+    if store is None:
+        return []
+    return sorted({kind for kind, _ in store.poll()})
 
 # --- Product Master Data Loading (External JSON) ---
 
@@ -296,112 +668,265 @@ JSON_PRICE_KEY_TO_MODEL_PRICE_KEY = {
 REQUIRED_ITEM_COLUMNS = ["LOT", "모델명", "제품명", "규격", "치료재료코드", "UDI-DI(필수입력)"]
 
 
+MASTER_SHEET_NAME = "코딩데이터용(2024.01.04)"
+XLSX_MASTER_EXTENSIONS = (".xlsx", ".xlsm")
+# .xlsx 파싱 결과 캐시 (사용자 데이터 폴더/master_cache/<파일 sha256>.pickle)
+MASTER_CACHE_DIR_NAME = "master_cache"
+MASTER_CACHE_VERSION = 2 # Item 구조나 파싱 규칙이 바뀌면 올림
+MASTER_CACHE_KEEP = 3 # 최근 캐시 파일 유지 개수
+
+
+def _normalize_header(name: Any) -> str:
+    """엑셀 헤더의 줄바꿈/연속 공백 차이를 무시하기 위한 정규화"""
+    return " ".join(str(name).split())
+
+
+def _parse_master_rows(rows: Iterable[Tuple[int, Any]], quality: DataQualityReport) -> List[Item]:
+    """(행 번호, 컬럼명 -> 값 dict) 를 Item 으로 변환. 행 단위 문제는 quality 에 모읍니다."""
+    all_items: List[Item] = []
+    for row_number, item_data_dict in rows:
+        if not isinstance(item_data_dict, dict):
+            quality.add("딕셔너리가 아닌 행 (건너뜀)", f"{row_number}행", logger, str(item_data_dict))
+            continue
+        
+        # 필수 컬럼 존재 여부 확인 - This check should be outside the above if, and before the try block.
+        missing_cols = [col for col in REQUIRED_ITEM_COLUMNS if col not in item_data_dict or item_data_dict[col] is None]
+        if missing_cols:
+            # LOT 자체가 없으면 행 번호로 표시
+            row_label = f"LOT {item_data_dict['LOT']}" if 'LOT' not in missing_cols else f"{row_number}행"
+            is_blank_row = all(item_data_dict.get(col) is None for col in ("LOT", "모델명", "제품명", "규격"))
+            issue = "빈 행 (건너뜀)" if is_blank_row else "필수 컬럼 누락 (건너뜀)"
+            quality.add(issue, row_label, logger, str(missing_cols))
+            continue
+
+        try:
+            prices: Dict[str, Decimal] = {}
+            for json_key, model_key in JSON_PRICE_KEY_TO_MODEL_PRICE_KEY.items():
+                raw_price = item_data_dict.get(json_key)
+                if raw_price is not None: # null이나 누락이 아닐 경우
+                    try:
+                        prices[model_key] = Decimal(str(raw_price)) # 문자열로 변환 후 Decimal로
+                    except InvalidOperation:
+                        quality.add(f"가격 형식 오류 ({json_key.split()[0]}, 가격 제외)", str(item_data_dict.get('LOT')),
+                                    logger, repr(raw_price))
+                # else: 가격이 null이거나 누락된 경우, 해당 가격은 포함되지 않음
+            
+            raw_udi_di = str(item_data_dict.get("UDI-DI(필수입력)", "")).strip()
+            parsed_udi_di: Optional[int] = None
+            if raw_udi_di:
+                try:
+                    # Attempt to convert to float first to catch "123.0" then to int
+                    parsed_udi_di = int(float(raw_udi_di))
+                except ValueError:
+                    quality.add("UDI-DI 형식 오류 (비워 둠)", str(item_data_dict.get('LOT')), logger, raw_udi_di)
+
+            item_obj = Item(
+                lot=str(item_data_dict["LOT"]),
+                model_name=str(item_data_dict["모델명"]),
+                product_name=str(item_data_dict["제품명"]).lstrip(','),
+                spec=str(item_data_dict["규격"]),
+                treatment_code=str(item_data_dict["치료재료코드"]),
+                udi_di=parsed_udi_di,
+                prices=prices
+            )
+            all_items.append(item_obj)
+        except KeyError as ke:
+            quality.add("필수 키 오류 (건너뜀)", str(item_data_dict.get('LOT')), logger, str(ke))
+        except Exception as e_item: # 개별 아이템 파싱 오류
+            quality.add("처리 오류 (건너뜀)", str(item_data_dict.get('LOT')), logger, f"{type(e_item).__name__}: {e_item}")
+    return all_items
+
+
+@profiling.traced("storage.load_product_master")
 def load_product_master(json_file_path: str) -> List[Item]:
     """
-    지정된 경로의 제품 마스터 JSON 파일에서 모든 시트의 품목 데이터를 로드하여
-    단일 Item 리스트로 반환합니다.
+    지정된 경로의 제품 마스터 파일에서 대상 시트의 품목 데이터를 로드하여 단일 Item 리스트로 반환합니다.
+    .xlsx/.xlsm 이면 이카운트 엑셀 내보내기 파일을 직접 읽고, 그 외에는 시트별 JSON 파일로 읽습니다.
     """
     if not os.path.exists(json_file_path):
-        print(f"오류: 제품 마스터 파일 '{json_file_path}'을(를) 찾을 수 없습니다.")
+        logger.error("제품 마스터 파일 '%s'을(를) 찾을 수 없습니다.", json_file_path)
         return []
+    if os.path.splitext(json_file_path)[1].lower() in XLSX_MASTER_EXTENSIONS:
+        return _load_product_master_xlsx(json_file_path)
 
-    all_items: List[Item] = []
     try:
         with open(json_file_path, 'r', encoding='utf-8') as f:
             data_by_sheet = json.load(f) # 최상위는 시트명을 키로 하는 딕셔너리
 
         if not isinstance(data_by_sheet, dict):
-            print(f"오류: '{json_file_path}'의 최상위 구조가 딕셔너리(시트별)가 아닙니다.")
+            logger.error("'%s'의 최상위 구조가 딕셔너리(시트별)가 아닙니다.", json_file_path)
             return []
 
         # Process only the specified sheet
-        target_sheet_name = "코딩데이터용(2024.01.04)"
+        target_sheet_name = MASTER_SHEET_NAME
         sheet_items_data = data_by_sheet.get(target_sheet_name)
 
         if not isinstance(sheet_items_data, list):
-            print(f"Warning: 시트 '{target_sheet_name}'의 데이터가 리스트 형태가 아니거나 찾을 수 없습니다. 건너뜁니다.")
+            logger.warning("시트 '%s'의 데이터가 리스트 형태가 아니거나 찾을 수 없습니다. 건너뜁니다.", target_sheet_name)
             if sheet_items_data is None:
-                print(f"오류: 대상 시트 '{target_sheet_name}'을(를) 파일 '{json_file_path}'에서 찾을 수 없습니다.")
-                print(f"정보: 파일 '{json_file_path}'에서 사용 가능한 시트 이름: {list(data_by_sheet.keys())}")
+                logger.error("대상 시트 '%s'을(를) 파일 '%s'에서 찾을 수 없습니다.", target_sheet_name, json_file_path)
+                logger.info("파일 '%s'에서 사용 가능한 시트 이름: %s", json_file_path, list(data_by_sheet.keys()))
                 return []
             else: # It exists but is not a list
-                print(f"Warning: 시트 '{target_sheet_name}'의 데이터가 리스트 형태가 아닙니다. 실제 타입: {type(sheet_items_data)}")
+                logger.warning("시트 '%s'의 데이터가 리스트 형태가 아닙니다. 실제 타입: %s", target_sheet_name, type(sheet_items_data))
                 return []
         
         if not sheet_items_data: # Check if the list is empty
-            print(f"정보: 대상 시트 '{target_sheet_name}'은(는) 비어 있습니다 (0개 항목).")
+            logger.info("대상 시트 '%s'은(는) 비어 있습니다 (0개 항목).", target_sheet_name)
             # No further processing needed if the sheet is empty
         else:
-            print(f"정보: 대상 시트 '{target_sheet_name}'에서 {len(sheet_items_data)}개의 원시 항목을 찾았습니다. 상세 처리 시작...")
+            logger.debug("대상 시트 '%s'에서 %d개의 원시 항목을 찾았습니다. 상세 처리 시작...", target_sheet_name, len(sheet_items_data))
 
-        for item_data_dict in sheet_items_data:
-            if not isinstance(item_data_dict, dict):
-                print(f"Warning: 시트 '{target_sheet_name}'에 딕셔너리가 아닌 품목 데이터가 있습니다. 건너뜁니다: {item_data_dict}")
-                continue
-            
-            # 필수 컬럼 존재 여부 확인 - This check should be outside the above if, and before the try block.
-            missing_cols = [col for col in REQUIRED_ITEM_COLUMNS if col not in item_data_dict or item_data_dict[col] is None]
-            if missing_cols:
-                lot_info = item_data_dict.get('LOT', 'N/A') # Try to get LOT for better logging, even if it might be one of the missing ones.
-                # If LOT itself is missing, it will appear in missing_cols.
-                # Construct a more informative log for the item being skipped.
-                item_identifier_for_log = f"LOT '{lot_info}'" if 'LOT' not in missing_cols else f"항목 '{item_data_dict}'"
-                print(f"Warning: {item_identifier_for_log} 품목 데이터에 필수 컬럼이 누락되었습니다: {missing_cols}. 건너뜁니다.")
-                continue
-
-            try:
-                prices: Dict[str, Decimal] = {}
-                for json_key, model_key in JSON_PRICE_KEY_TO_MODEL_PRICE_KEY.items():
-                    raw_price = item_data_dict.get(json_key)
-                    if raw_price is not None: # null이나 누락이 아닐 경우
-                        try:
-                            prices[model_key] = Decimal(str(raw_price)) # 문자열로 변환 후 Decimal로
-                        except InvalidOperation:
-                            lot_info = item_data_dict.get('LOT', 'N/A')
-                            print(f"Warning: LOT '{lot_info}' 품목의 '{json_key}' 가격 형식이 잘못되었습니다: '{raw_price}'. 이 가격은 제외됩니다.")
-                    # else: 가격이 null이거나 누락된 경우, 해당 가격은 포함되지 않음
-                
-                raw_udi_di = str(item_data_dict.get("UDI-DI(필수입력)", "")).strip()
-                parsed_udi_di: Optional[int] = None
-                if raw_udi_di:
-                    try:
-                        # Attempt to convert to float first to catch "123.0" then to int
-                        parsed_udi_di = int(float(raw_udi_di))
-                    except ValueError:
-                        lot_info = item_data_dict.get('LOT', 'N/A')
-                        print(f"Warning: LOT '{lot_info}' 품목의 UDI-DI '{raw_udi_di}'는 유효한 정수가 아닙니다. UDI-DI를 비워둡니다.")
-
-                item_obj = Item(
-                    lot=str(item_data_dict["LOT"]),
-                    model_name=str(item_data_dict["모델명"]),
-                    product_name=str(item_data_dict["제품명"]).lstrip(','),
-                    spec=str(item_data_dict["규격"]),
-                    treatment_code=str(item_data_dict["치료재료코드"]),
-                    udi_di=parsed_udi_di,
-                    prices=prices
-                )
-                all_items.append(item_obj)
-            except KeyError as ke:
-                lot_info = item_data_dict.get('LOT', 'N/A')
-                print(f"Warning: LOT '{lot_info}' 품목 데이터 처리 중 필수 키 오류: {ke}. 건너뜁니다.")
-            except Exception as e_item: # 개별 아이템 파싱 오류
-                lot_info = item_data_dict.get('LOT', 'N/A')
-                print(f"Warning: LOT '{lot_info}' 품목 데이터 처리 중 오류 발생 ({type(e_item).__name__}: {e_item}). 건너뜁니다.")
-        
-        print(f"제품 마스터에서 총 {len(all_items)}개의 품목을 로드했습니다.")
+        # 행 단위 문제는 행마다 출력하지 않고 모아서 로드가 끝날 때 요약합니다.
+        quality = DataQualityReport(os.path.basename(json_file_path))
+        all_items = _parse_master_rows(enumerate(sheet_items_data, start=1), quality)
+        sku.assign_items(all_items)
+        quality.summarize(logger)
+        logger.info("제품 마스터에서 총 %d개의 품목을 로드했습니다.", len(all_items))
         return all_items
 
     except FileNotFoundError:
-        print(f"오류: 제품 마스터 파일 '{json_file_path}'을(를) 찾을 수 없습니다.")
+        logger.error("제품 마스터 파일 '%s'을(를) 찾을 수 없습니다.", json_file_path)
         return []
     except json.JSONDecodeError:
-        print(f"오류: 제품 마스터 파일 '{json_file_path}'이(가) 유효한 JSON 형식이 아닙니다.")
+        logger.error("제품 마스터 파일 '%s'이(가) 유효한 JSON 형식이 아닙니다.", json_file_path)
         return []
     except Exception as e:
-        print(f"제품 마스터 파일 '{json_file_path}' 로드 중 예기치 않은 오류 발생: {e}")
+        logger.error("제품 마스터 파일 '%s' 로드 중 예기치 않은 오류 발생: %s", json_file_path, e)
         return []
 
 
+# --- .xlsx 제품 마스터 (openpyxl 읽기 전용 스트리밍 + 파싱 캐시) ---
+
+def _file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _master_cache_path(file_digest: str) -> str:
+    return os.path.join(get_user_data_path(MASTER_CACHE_DIR_NAME), f"{file_digest}.pickle")
+
+
+def _read_master_cache(file_digest: str) -> Optional[List[Item]]:
+    try:
+        with open(_master_cache_path(file_digest), 'rb') as f:
+            version, items = pickle.load(f)
+    except FileNotFoundError:
+        return None
+    except Exception as e: # 손상되었거나 이전 버전 형식
+        logger.warning("제품 마스터 캐시를 사용할 수 없습니다 (%s): %s", file_digest[:12], e)
+        return None
+    return items if version == MASTER_CACHE_VERSION else None
+
+
+def _write_master_cache(file_digest: str, items: List[Item]):
+    cache_path = _master_cache_path(file_digest)
+    tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+    try:
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        with open(tmp_path, 'wb') as f:
+            pickle.dump((MASTER_CACHE_VERSION, items), f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, cache_path)
+        # 오래된 캐시 정리 (최근 MASTER_CACHE_KEEP 개만 유지)
+        cache_dir = os.path.dirname(cache_path)
+        entries = [os.path.join(cache_dir, name) for name in os.listdir(cache_dir) if name.endswith(".pickle")]
+        for old_path in sorted(entries, key=os.path.getmtime, reverse=True)[MASTER_CACHE_KEEP:]:
+            os.remove(old_path)
+    except OSError as e:
+        logger.warning("제품 마스터 캐시 저장 실패 (%s): %s", cache_path, e)
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def _excel_value(value: Any) -> Any:
+    """엑셀의 정수 값이 float 로 읽힌 경우(예: LOT 12345.0) 정수로"""
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+
+def _iter_xlsx_master_rows(worksheet, header_scan_rows: int = 20) -> Iterator[Tuple[int, Dict[str, Any]]]:
+    """
+    필수 컬럼이 모두 있는 행을 헤더로 찾은 뒤, 이후 행을 (엑셀 행 번호, 컬럼명 -> 값) 으로 하나씩 내보냅니다.
+    헤더는 JSON 마스터의 컬럼명으로 맞추므로(가격 컬럼의 공백/줄바꿈 차이 무시) _parse_master_rows 를 그대로 씁니다.
+    """
+    json_name_by_normalized = {_normalize_header(name): name for name in JSON_PRICE_KEY_TO_MODEL_PRICE_KEY}
+    rows = worksheet.iter_rows(values_only=True)
+    header: Optional[List[Optional[str]]] = None
+    row_number = 0
+    for row_number, row in enumerate(rows, start=1):
+        names = [_normalize_header(v) if v is not None else None for v in row]
+        if all(col in names for col in REQUIRED_ITEM_COLUMNS):
+            header = [json_name_by_normalized.get(name, name) if name else None for name in names]
+            break
+        if row_number >= header_scan_rows:
+            break
+    if header is None:
+        raise KeyError(f"필수 컬럼 헤더를 찾을 수 없습니다: {REQUIRED_ITEM_COLUMNS}")
+    for row_number, row in enumerate(rows, start=row_number + 1):
+        if all(v is None for v in row): # 서식만 있는 빈 행
+            continue
+        yield row_number, {name: _excel_value(v) for name, v in zip(header, row) if name is not None}
+
+
+def _has_master_header(worksheet) -> bool:
+    try:
+        next(iter(_iter_xlsx_master_rows(worksheet)), None)
+        return True
+    except KeyError:
+        return False
+
+
+def _load_product_master_xlsx(xlsx_file_path: str) -> List[Item]:
+    """
+    이카운트 엑셀 내보내기 파일을 읽기 전용 스트리밍으로 한 행씩 파싱합니다 (메모리에 시트 전체를 올리지 않음).
+    결과는 파일 sha256 을 키로 캐시하므로 같은 파일을 다시 읽으면 파싱을 건너뜁니다.
+    """
+    try:
+        file_digest = _file_sha256(xlsx_file_path)
+    except OSError as e:
+        logger.error("제품 마스터 파일 '%s'을(를) 읽을 수 없습니다: %s", xlsx_file_path, e)
+        return []
+    cached = _read_master_cache(file_digest)
+    if cached is not None:
+        sku.assign_items(cached)
+        logger.info("제품 마스터 캐시에서 총 %d개의 품목을 로드했습니다. (%s)", len(cached), os.path.basename(xlsx_file_path))
+        return cached
+
+    from openpyxl import load_workbook # import 비용이 커서 엑셀 마스터를 읽을 때만 로드
+    try:
+        workbook = load_workbook(xlsx_file_path, read_only=True, data_only=True)
+    except Exception as e:
+        logger.error("제품 마스터 엑셀 파일 '%s'을(를) 열 수 없습니다: %s", xlsx_file_path, e)
+        return []
+    try:
+        if MASTER_SHEET_NAME in workbook.sheetnames:
+            worksheet = workbook[MASTER_SHEET_NAME]
+        else:
+            # 내보내기마다 시트 이름(날짜)이 다를 수 있으므로 필수 컬럼 헤더가 있는 첫 시트 사용
+            worksheet = next((ws for ws in workbook.worksheets if _has_master_header(ws)), None)
+            if worksheet is None:
+                logger.error("'%s'에서 제품 마스터 시트를 찾을 수 없습니다. 시트: %s", xlsx_file_path, workbook.sheetnames)
+                return []
+            logger.info("시트 '%s'이(가) 없어 '%s' 시트를 읽습니다.", MASTER_SHEET_NAME, worksheet.title)
+        quality = DataQualityReport(os.path.basename(xlsx_file_path))
+        all_items = _parse_master_rows(_iter_xlsx_master_rows(worksheet), quality)
+    except Exception as e:
+        logger.error("제품 마스터 엑셀 파일 '%s' 로드 중 오류 발생: %s", xlsx_file_path, e)
+        return []
+    finally:
+        workbook.close()
+    sku.assign_items(all_items)
+    quality.summarize(logger)
+    logger.info("제품 마스터에서 총 %d개의 품목을 로드했습니다.", len(all_items))
+    if all_items:
+        _write_master_cache(file_digest, all_items)
+    return all_items
+
+
 if __name__ == '__main__':
     # --- 회사 데이터 테스트 ---
     print("--- 회사 데이터 테스트 ---")
@@ -434,7 +959,7 @@ if __name__ == '__main__':
     # 테스트용 더미 JSON 파일 생성
     dummy_master_file = "dummy_product_master.json"
     dummy_data = {
-        "Sheet1": [
+        MASTER_SHEET_NAME: [ # 대상 시트만 읽음
             {
                 "LOT": "DUMMY_LOT_001", "모델명": "D-MOD-01", "제품명": "더미 제품 A", "규격": "Large",
                 "치료재료코드": "D0000001", "UDI-DI(필수입력)": "1234567890123", # 정수형 UDI
@@ -445,9 +970,7 @@ if __name__ == '__main__':
                 "LOT": "DUMMY_LOT_002", "모델명": "D-MOD-02", "제품명": "더미 제품 B", "규격": "Small",
                 "치료재료코드": "D0000002", "UDI-DI(필수입력)": "9876543210987.0", # 정수 변환 가능한 실수형 UDI
                 "A단가": 220.0, "치료재료단가": None # 치료재료단가가 null인 경우
-            }
-        ],
-        "Sheet2": [
+            },
             {
                 "LOT": "DUMMY_LOT_003", "모델명": "D-MOD-03", "제품명": "더미 제품 C", "규격": "Medium",
                 "치료재료코드": "D0000003", "UDI-DI(필수입력)": "INVALID_UDI", # 잘못된 UDI
@@ -458,6 +981,9 @@ if __name__ == '__main__':
                 "규격": "Tiny", "치료재료코드": "D0000004", "UDI-DI(필수입력)": "111222333",
                 "A단가": 420.0
             }
+        ],
+        "Sheet2": [ # 대상 시트가 아니므로 무시됨
+            {"LOT": "DUMMY_LOT_005", "모델명": "D-MOD-05", "제품명": "더미 제품 E", "규격": "S", "A단가": 500.0}
         ]
     }
     with open(dummy_master_file, 'w', encoding='utf-8') as f:
@@ -465,7 +991,7 @@ if __name__ == '__main__':
 
     loaded_items = load_product_master(dummy_master_file)
     print(f"\n로드된 제품 마스터 품목 수: {len(loaded_items)}")
-    assert len(loaded_items) == 2 # DUMMY_LOT_001, DUMMY_LOT_002 (003은 가격오류, 004는 필수컬럼 누락으로 제외)
+    assert len(loaded_items) == 3 # DUMMY_LOT_001~003 (003은 잘못된 A단가만 제외, 004는 필수컬럼 누락으로 제외)
     
     for item in loaded_items:
         print(f"  - LOT: {item.lot}, 제품명: {item.product_name}, 모델명: {item.model_name}")
@@ -476,6 +1002,8 @@ if __name__ == '__main__':
         if item.lot == "DUMMY_LOT_002":
             assert PriceTier.MEDICAL.value not in item.prices # null이었으므로 제외됨
             assert item.prices[PriceTier.A.value] == Decimal("220.0")
+        if item.lot == "DUMMY_LOT_003":
+            assert PriceTier.A.value not in item.prices and item.prices[PriceTier.B.value] == Decimal("310.0")
 
     # 존재하지 않는 파일 테스트
     print("\n존재하지 않는 파일 로드 시도:")
@@ -504,11 +1032,11 @@ if __name__ == '__main__':
 
     # 새 프로파일 생성 및 아이템 가격 추가
     profile1 = PriceProfile(name="VIP 고객 단가")
-    item_key1 = ("D-MOD-01", "더미 제품 A", "Large") # (model_name, product_name, spec)
+    item_key1 = sku.id_for(("D-MOD-01", "더미 제품 A", "Large")) # (model_name, product_name, spec)의 SKU ID
     profile1.item_prices[item_key1] = Decimal("115.0") # VIP 가격
     
     profile2 = PriceProfile(name="여름 할인 프로모션")
-    item_key2 = ("D-MOD-02", "더미 제품 B", "Small")
+    item_key2 = sku.id_for(("D-MOD-02", "더미 제품 B", "Small"))
     profile2.item_prices[item_key2] = Decimal("200.0")
     profile2.item_prices[item_key1] = Decimal("118.0") # 여름 할인에도 더미 제품 A 포함
 
@@ -523,7 +1051,7 @@ if __name__ == '__main__':
     for rp in reloaded_profiles:
         print(f"  - 프로파일명: {rp.name} (ID: {rp.id})")
         for item_k, price_v in rp.item_prices.items():
-            print(f"    - 품목키: {item_k}, 가격: {price_v}")
+            print(f"    - 품목키: {sku.key_str(item_k)}, 가격: {price_v}")
         if rp.name == "VIP 고객 단가":
             assert rp.item_prices[item_key1] == Decimal("115.0")
         if rp.name == "여름 할인 프로모션":
@@ -1,111 +1,288 @@
+import argparse
+import hashlib
 import json
+import logging
 import uuid
 import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional, Sequence, Tuple
 
-def transform_data():
+logger = logging.getLogger(__name__)
+
+# 밀집(dense) 출력에서 업체 가격이 없는 품목에 채워 넣는 값.
+# 희소(sparse) 출력은 이 값을 쓰지 않고 키 자체를 생략하며, 없는 키는 거래처 기본 가격 등급 단가로 대체됩니다.
+PLACEHOLDER_PRICE = "0.0"
+
+# 이전 실행의 그룹별 원본 해시를 저장하는 파일 (출력 파일 옆, <출력 파일>.state.json)
+STATE_FILE_SUFFIX = ".state.json"
+STATE_VERSION = 2  # 2: 같은 그룹의 두 번째 이후 업체는 첫 업체 프로파일을 base_profile_id 로 참조
+
+ProductKey = Tuple[str, str, str]
+
+_worker_product_keys: List[str] = []  # 워커 프로세스에서 밀집 출력 채움에 쓰는 전체 품목 키 (정렬됨)
+
+
+def _default_paths() -> Tuple[str, str]:
     current_script_directory = os.path.dirname(os.path.abspath(__file__))
     source_file_path = os.path.join(current_script_directory, '..', '..', '..', 'Downloads', '업체별_금액.json')
     output_file_path = os.path.join(current_script_directory, 'price_profiles.json')
+    return source_file_path, output_file_path
+
+
+def _product_key(item: Any) -> Optional[ProductKey]:
+    """원본 행에서 (모델명, 제품명, 규격) 키. 하나라도 비어 있으면 None."""
+    if not isinstance(item, dict):
+        return None
+    model_name, product_name, spec = item.get("모델명"), item.get("제품명"), item.get("규격")
+    if model_name is None or product_name is None or spec is None:
+        return None
+    key = (str(model_name).strip(), str(product_name).strip(), str(spec).strip())
+    return key if all(key) else None
+
+
+def collect_product_keys(source_data: Dict[str, Any]) -> List[str]:
+    """원본 전체의 품목 키 ("모델명|제품명|규격"), 실행마다 같은 순서가 되도록 정렬"""
+    all_unique_products = set()
+    for items_list in source_data.values():
+        for item in items_list or []:
+            key = _product_key(item)
+            if key is not None:
+                all_unique_products.add("|".join(key))
+    return sorted(all_unique_products)
+
+
+def group_prices(items_list: Optional[Sequence[Any]]) -> Dict[str, str]:
+    """한 업체 그룹의 원본 행에서 유효한(0보다 큰) 가격만 {"모델명|제품명|규격": "123.0"} 으로"""
+    company_specific_prices: Dict[str, str] = {}
+    for item in items_list or []:
+        key = _product_key(item)
+        price_val = item.get("price") if key is not None else None
+        if price_val is None:
+            continue
+        try:
+            price_float = float(price_val)
+        except (ValueError, TypeError):
+            continue
+        if price_float > 0.0: # Only store valid, non-zero prices
+            company_specific_prices["|".join(key)] = f"{price_float:.1f}"
+    return company_specific_prices
 
+
+def group_company_names(group_key: str) -> List[str]:
+    """"업체1/업체2" 형태의 그룹 키를 업체명 목록으로"""
+    return [name.strip() for name in group_key.split('/') if name.strip()]
+
+
+def group_hash(items_list: Optional[Sequence[Any]]) -> str:
+    """그룹 원본 행의 내용 해시"""
+    canonical = json.dumps(items_list, ensure_ascii=False, separators=(',', ':'), default=str)
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+
+def _file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _file_stat(path: str) -> Optional[List[int]]:
     try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return [st.st_size, st.st_mtime_ns]
+
+
+def _init_worker(product_keys: List[str]):
+    global _worker_product_keys
+    _worker_product_keys = product_keys
+
+
+def _build_group_item_prices(items_list: Optional[Sequence[Any]], sparse: bool,
+                             product_keys: Optional[List[str]] = None) -> Dict[str, str]:
+    """그룹 하나의 item_prices. 워커 프로세스에서는 product_keys 대신 초기화 시 받은 전체 품목 키를 사용합니다."""
+    company_specific_prices = group_prices(items_list)
+    if sparse:
+        return company_specific_prices
+    keys = product_keys if product_keys is not None else _worker_product_keys
+    # Use specific price if available, otherwise default to "0.0"
+    return {key: company_specific_prices.get(key, PLACEHOLDER_PRICE) for key in keys}
+
+
+def _load_json(path: str, default: Any) -> Any:
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return default
+    except (json.JSONDecodeError, OSError) as e:
+        logger.warning("Could not read %s (%s); it will be rebuilt.", path, e)
+        return default
+
+
+def _write_json_atomic(path: str, data: Any, indent: Optional[int] = 4):
+    """임시 파일에 쓴 뒤 교체하여, 중간에 실패해도 기존 파일이 깨지지 않도록 합니다."""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=indent, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def transform_data(source_file_path: Optional[str] = None, output_file_path: Optional[str] = None,
+                   sparse: bool = False, workers: Optional[int] = None, full: bool = False) -> Optional[Dict[str, int]]:
+    """
+    업체별 금액 원본을 가격 프로파일 파일로 변환합니다.
+    sparse=False: 모든 업체 프로파일에 전체 품목을 넣고 가격이 없는 품목은 "0.0"으로 채움 (기존 방식)
+    sparse=True: 업체가 실제로 가진 가격만 저장
+
+    증분 변환: 업체 그룹별 원본 해시를 출력 파일 옆 상태 파일에 저장해 두고, 해시가 바뀐 그룹만 다시 만듭니다.
+    (밀집 출력은 전체 품목 목록이 바뀌면 모든 그룹을 다시 만듭니다.) 프로파일 ID는 업체명 기준으로 이전 출력의
+    ID를 그대로 유지하며, 다시 만들 그룹이 여러 개면 워커 프로세스에서 병렬로 처리합니다.
+    full=True 이면 해시와 무관하게 모든 그룹을 다시 만듭니다. (ID는 유지)
+
+    Returns:
+        {"groups", "rebuilt_groups", "profiles"} 통계. 원본을 읽지 못하면 None.
+    """
+    default_source, default_output = _default_paths()
+    source_file_path = source_file_path or default_source
+    output_file_path = output_file_path or default_output
+    state_file_path = output_file_path + STATE_FILE_SUFFIX
+    output_format = "sparse" if sparse else "dense"
+    state = _load_json(state_file_path, {})
+
+    try:
+        # 원본 파일과 출력 파일이 모두 지난 실행 그대로이면 원본을 파싱하지 않고 끝냄
+        source_sha256 = _file_sha256(source_file_path)
+        if (not full and state.get("version") == STATE_VERSION and state.get("format") == output_format
+                and state.get("source_sha256") == source_sha256
+                and state.get("output_stat") == _file_stat(output_file_path)):
+            logger.info("Source unchanged; %s is up to date.", output_file_path)
+            return {"groups": len(state.get("groups", {})), "rebuilt_groups": 0, "profiles": state.get("profiles", 0)}
         with open(source_file_path, 'r', encoding='utf-8') as f:
             source_data = json.load(f)
     except FileNotFoundError:
-        print(f"Error: Source file not found at {source_file_path}")
-        return
+        logger.error("Source file not found at %s", source_file_path)
+        return None
     except json.JSONDecodeError as e:
-        print(f"Error: Could not decode JSON from {source_file_path}. Details: {e}")
-        return
+        logger.error("Could not decode JSON from %s. Details: %s", source_file_path, e)
+        return None
     except Exception as e:
-        print(f"An unexpected error occurred while reading the source file: {e}")
-        return
+        logger.error("An unexpected error occurred while reading the source file: %s", e)
+        return None
 
-    all_unique_products = set() # Stores tuples of (model, product, spec)
+    # Step 1: 그룹별 해시와 (밀집 출력이면) 전체 품목 목록
+    group_hashes = {group_key: group_hash(items_list) for group_key, items_list in source_data.items()}
+    product_keys = [] if sparse else collect_product_keys(source_data)
+    products_hash = hashlib.sha256("\n".join(product_keys).encode('utf-8')).hexdigest()
 
-    # Step 1: Collect all unique product definitions
-    for _, items_list in source_data.items():
-        if items_list is None:
-            continue
-        for item in items_list:
-            if not isinstance(item, dict):
-                continue
-            
-            model_name = item.get("모델명")
-            product_name = item.get("제품명")
-            spec = item.get("규격")
-
-            if model_name is not None and product_name is not None and spec is not None:
-                model_name_stripped = str(model_name).strip()
-                product_name_stripped = str(product_name).strip()
-                spec_stripped = str(spec).strip()
-                
-                if model_name_stripped and product_name_stripped and spec_stripped:
-                    all_unique_products.add((model_name_stripped, product_name_stripped, spec_stripped))
+    # Step 2: 이전 실행 결과와 비교하여 다시 만들 그룹 결정
+    previous_profiles = _load_json(output_file_path, [])
+    previous_by_name = {p["name"]: p for p in previous_profiles if isinstance(p, dict) and "name" in p}
+    state_usable = (not full and state.get("version") == STATE_VERSION and state.get("format") == output_format
+                    and (sparse or state.get("products_hash") == products_hash))
+    previous_hashes = state.get("groups", {}) if state_usable else {}
 
-    new_profiles = []
+    def group_reusable(group_key: str) -> bool:
+        return (previous_hashes.get(group_key) == group_hashes[group_key]
+                and all(name in previous_by_name for name in group_company_names(group_key)))
 
-    # Step 2: Process each company
-    for company_group_key, items_list_for_group in source_data.items():
-        company_names_in_group = company_group_key.split('/')
-        
-        for company_name_raw in company_names_in_group:
-            company_name = company_name_raw.strip()
-            if not company_name:
-                continue
+    changed_groups = [key for key in source_data if not group_reusable(key)]
+
+    # Step 3: 바뀐 그룹의 item_prices 생성 (여러 개면 병렬)
+    rebuilt: Dict[str, Dict[str, str]] = {}
+    if len(changed_groups) > 1 and (workers is None or workers > 1):
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(product_keys,)) as pool:
+            results = pool.map(_build_group_item_prices, [source_data[key] for key in changed_groups],
+                               [sparse] * len(changed_groups), chunksize=max(1, len(changed_groups) // 32))
+            rebuilt = dict(zip(changed_groups, results))
+    else:
+        for key in changed_groups:
+            rebuilt[key] = _build_group_item_prices(source_data[key], sparse, product_keys)
 
+    # Step 4: 원본 순서대로 프로파일 조립. 바뀌지 않은 그룹의 프로파일은 이전 출력 그대로 사용.
+    # "업체1/업체2" 그룹은 첫 업체만 단가를 갖고, 나머지는 첫 업체 프로파일을 기본(base)으로 참조 (덮어쓰기 없음)
+    new_profiles = []
+    for group_key in source_data:
+        group_base_id = None
+        for company_name in group_company_names(group_key):
+            if group_key not in rebuilt:
+                new_profiles.append(previous_by_name[company_name])
+                continue
+            previous = previous_by_name.get(company_name)
             profile = {
-                "id": str(uuid.uuid4()),
+                "id": previous["id"] if previous and previous.get("id") else str(uuid.uuid4()),
                 "name": company_name,
-                "item_prices": {}
             }
+            if group_base_id is None:
+                group_base_id = profile["id"]
+                profile["item_prices"] = rebuilt[group_key]
+            else:
+                profile["base_profile_id"] = group_base_id
+                profile["item_prices"] = {}
+            new_profiles.append(profile)
 
-            # Store this company's specific prices from the source
-            company_specific_prices = {}
-            if items_list_for_group is not None:
-                for item in items_list_for_group:
-                    if not isinstance(item, dict):
-                        continue
-
-                    model_name = item.get("모델명")
-                    product_name = item.get("제품명")
-                    spec = item.get("규격")
-                    price_val = item.get("price")
-
-                    if model_name is not None and product_name is not None and spec is not None and price_val is not None:
-                        model_name_stripped = str(model_name).strip()
-                        product_name_stripped = str(product_name).strip()
-                        spec_stripped = str(spec).strip()
-
-                        if model_name_stripped and product_name_stripped and spec_stripped:
-                            try:
-                                price_float = float(price_val)
-                                if price_float > 0.0: # Only store valid, non-zero prices
-                                    composite_key = f"{model_name_stripped}|{product_name_stripped}|{spec_stripped}"
-                                    company_specific_prices[composite_key] = f"{price_float:.1f}"
-                            except (ValueError, TypeError):
-                                continue
-            
-            # Populate item_prices for the profile using all_unique_products
-            for prod_model, prod_name, prod_spec in all_unique_products:
-                composite_key = f"{prod_model}|{prod_name}|{prod_spec}"
-                # Use specific price if available, otherwise default to "0.0"
-                price_to_set = company_specific_prices.get(composite_key, "0.0")
-                profile["item_prices"][composite_key] = price_to_set
-            
-            if profile["item_prices"]: # Should always be true now if all_unique_products is not empty
-                new_profiles.append(profile)
-            elif not all_unique_products and not profile["item_prices"]: # Handle case of no products at all
-                 new_profiles.append(profile)
-
-
+    stats = {"groups": len(source_data), "rebuilt_groups": len(changed_groups), "profiles": len(new_profiles)}
+    unchanged_output = not changed_groups and len(new_profiles) == len(previous_profiles)
     try:
-        with open(output_file_path, 'w', encoding='utf-8') as f:
-            json.dump(new_profiles, f, indent=4, ensure_ascii=False)
-        print(f"Successfully transformed data and saved to {output_file_path} (with 0.0 for unknown prices).")
+        if not unchanged_output:
+            _write_json_atomic(output_file_path, new_profiles)
+        _write_json_atomic(state_file_path, {"version": STATE_VERSION, "format": output_format,
+                                             "source_sha256": source_sha256, "products_hash": products_hash,
+                                             "output_stat": _file_stat(output_file_path), "profiles": len(new_profiles),
+                                             "groups": group_hashes}, indent=None)
     except IOError:
-        print(f"Error: Could not write to output file {output_file_path}")
+        logger.error("Could not write to output file %s", output_file_path)
+        return None
     except Exception as e:
-        print(f"An unexpected error occurred while writing the output file: {e}")
+        logger.error("An unexpected error occurred while writing the output file: %s", e)
+        return None
+
+    fill_note = "sparse, unknown prices fall back to the company price tier" if sparse else "with 0.0 for unknown prices"
+    logger.info("Transformed %s/%s changed groups (%s profiles) -> %s (%s).",
+                stats['rebuilt_groups'], stats['groups'], stats['profiles'], output_file_path, fill_note)
+    return stats
+
+
+def sparsify_profiles(profiles: List[Dict[str, Any]]) -> int:
+    """밀집 형식 프로파일 목록에서 "0.0" 채움 항목을 제거합니다. 제거한 항목 수를 반환합니다."""
+    removed = 0
+    for profile in profiles:
+        item_prices = profile.get("item_prices")
+        if not item_prices:
+            continue
+        kept = {key: value for key, value in item_prices.items() if value != PLACEHOLDER_PRICE}
+        removed += len(item_prices) - len(kept)
+        profile["item_prices"] = kept
+    return removed
+
+
+def sparsify_file(input_path: str, output_path: Optional[str] = None) -> int:
+    """기존 밀집 형식 가격 프로파일 파일을 희소 형식으로 변환합니다. output_path 를 생략하면 덮어씁니다."""
+    with open(input_path, 'r', encoding='utf-8') as f:
+        profiles = json.load(f)
+    removed = sparsify_profiles(profiles)
+    with open(output_path or input_path, 'w', encoding='utf-8') as f:
+        json.dump(profiles, f, indent=4, ensure_ascii=False)
+    logger.info("Removed %s placeholder prices from %s -> %s", removed, input_path, output_path or input_path)
+    return removed
+
 
 if __name__ == "__main__":
-    transform_data()
+    from app_logging import setup_logging
+    setup_logging(log_file="")
+    parser = argparse.ArgumentParser(description="업체별 금액 원본을 가격 프로파일 파일로 변환 (바뀐 업체 그룹만 증분 변환)")
+    parser.add_argument("--source", default=None, help="업체별 금액 원본 JSON (기본: ~/Downloads/업체별_금액.json 기준 경로)")
+    parser.add_argument("--output", default=None, help="출력 프로파일 JSON (기본: price_profiles.json), --sparsify 결과 경로")
+    parser.add_argument("--sparse", action="store_true",
+                        help="업체가 가진 가격만 저장 (없는 품목은 거래처 기본 가격 등급 단가 사용)")
+    parser.add_argument("--workers", type=int, default=None, help="병렬 워커 프로세스 수 (1이면 단일 프로세스)")
+    parser.add_argument("--full", action="store_true", help="바뀌지 않은 그룹도 모두 다시 변환 (프로파일 ID는 유지)")
+    parser.add_argument("--sparsify", metavar="PROFILES_JSON", default=None,
+                        help="기존 밀집 형식 프로파일 파일에서 0.0 채움 항목 제거")
+    args = parser.parse_args()
+    if args.sparsify:
+        sparsify_file(args.sparsify, args.output)
+    else:
+        transform_data(args.source, args.output, sparse=args.sparse, workers=args.workers, full=args.full)
@@ -0,0 +1,300 @@
+import bisect
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Sequence, Tuple
+
+# (iid, values) 형태의 한 행
+Row = Tuple[str, tuple]
+
+
+@dataclass
+class SyncStats:
+    """한 번의 동기화에서 Treeview에 실제로 수행된 연산 수"""
+    inserted: int = 0
+    deleted: int = 0
+    updated: int = 0
+    moved: int = 0
+
+    @property
+    def structural(self) -> bool:
+        """행의 추가/삭제/이동이 있었는지 여부 (스크롤 위치 복원 필요 여부)"""
+        return bool(self.inserted or self.deleted or self.moved)
+
+
+def _stable_iids(current_order: Sequence[str], new_index: Dict[str, int]) -> set:
+    """
+    현재 화면 순서에서 새 순서와 상대 순서가 일치하는 가장 긴 부분열(LIS)을 구합니다.
+    이 부분열에 속한 행은 움직이지 않고, 나머지 행만 이동 대상이 됩니다.
+    """
+    kept = [iid for iid in current_order if iid in new_index]
+    positions = [new_index[iid] for iid in kept]
+
+    tails: List[int] = []       # 길이 k+1 인 증가 부분열의 마지막 값
+    tail_owner: List[int] = []  # tails[k] 에 해당하는 kept 인덱스
+    prev: List[int] = [-1] * len(kept)
+    for i, pos in enumerate(positions):
+        k = bisect.bisect_left(tails, pos)
+        if k == len(tails):
+            tails.append(pos); tail_owner.append(i)
+        else:
+            tails[k] = pos; tail_owner[k] = i
+        prev[i] = tail_owner[k - 1] if k > 0 else -1
+
+    stable = set()
+    i = tail_owner[-1] if tail_owner else -1
+    while i != -1:
+        stable.add(kept[i])
+        i = prev[i]
+    return stable
+
+
+def diff_rows(current_order: Sequence[str], current_values: Dict[str, tuple], new_rows: Sequence[Row]):
+    """
+    현재 표시 상태와 새 모델 상태를 비교하여 최소한의 연산 목록을 계산합니다.
+
+    Returns:
+        (deletes, updates, placements)
+        - deletes: 삭제할 iid 리스트
+        - updates: 값만 바뀐 (iid, values) 리스트
+        - placements: 새 순서 기준 (index, iid, values, is_new) 리스트.
+          is_new가 False이면 기존 행의 이동을 의미합니다.
+    """
+    new_index = {iid: i for i, (iid, _) in enumerate(new_rows)}
+    deletes = [iid for iid in current_order if iid not in new_index]
+    on_screen = set(current_order)
+    stable = _stable_iids(current_order, new_index)
+
+    updates = []
+    placements = []
+    for index, (iid, values) in enumerate(new_rows):
+        if iid not in on_screen:
+            placements.append((index, iid, values, True))
+            continue
+        if current_values.get(iid) != values:
+            updates.append((iid, values))
+        if iid not in stable:
+            placements.append((index, iid, values, False))
+    return deletes, updates, placements
+
+
+class TreeviewSync:
+    """
+    ttk.Treeview 의 행을 모델 상태와 맞춰주는 조정(reconciliation) 계층.
+    전체 삭제 후 재삽입 대신, 필요한 insert/delete/item(values=)/move 만 수행하므로
+    선택 상태와 스크롤 위치가 유지됩니다.
+    """
+
+    def __init__(self, tree):
+        self.tree = tree
+        # 마지막으로 화면에 반영한 값. Tk에서 다시 읽어오는 비용을 피하기 위해 보관합니다.
+        self._values: Dict[str, tuple] = {}
+
+    def sync(self, new_rows: Sequence[Row]) -> SyncStats:
+        """새 행 목록(순서 포함)에 맞게 Treeview를 갱신합니다."""
+        tree = self.tree
+        stats = SyncStats()
+        # 순서는 화면에서 직접 읽어옵니다 (헤더 클릭 정렬 등 외부에서 이동했을 수 있음).
+        current_order = list(tree.get_children(""))
+        if len(self._values) > len(current_order):
+            # 외부에서 삭제된 행(예: 전체 초기화)의 캐시 정리
+            on_screen = set(current_order)
+            self._values = {iid: v for iid, v in self._values.items() if iid in on_screen}
+
+        deletes, updates, placements = diff_rows(current_order, self._values, new_rows)
+        if not (deletes or updates or placements):
+            return stats
+
+        selection = tree.selection()
+        focus = tree.focus()
+        y_top = tree.yview()[0]
+
+        if deletes:
+            tree.delete(*deletes)
+            for iid in deletes:
+                self._values.pop(iid, None)
+            stats.deleted = len(deletes)
+
+        for iid, values in updates:
+            tree.item(iid, values=values)
+            self._values[iid] = values
+        stats.updated = len(updates)
+
+        # 이동할 행을 먼저 떼어내면, 남은 행은 새 순서와 상대 순서가 같으므로
+        # 새 순서대로 index 위치에 끼워 넣기만 하면 됩니다.
+        moving = [iid for _, iid, _, is_new in placements if not is_new]
+        if moving:
+            tree.detach(*moving)
+        for index, iid, values, is_new in placements:
+            if is_new:
+                tree.insert("", index, iid=iid, values=values)
+                self._values[iid] = values
+                stats.inserted += 1
+            else:
+                tree.move(iid, "", index)
+                stats.moved += 1
+
+        if stats.structural:
+            tree.yview_moveto(y_top)
+        if selection:
+            still_there = [iid for iid in selection if tree.exists(iid)]
+            if tuple(still_there) != tuple(tree.selection()):
+                tree.selection_set(still_there)
+        if focus and tree.exists(focus):
+            tree.focus(focus)
+        return stats
+
+    def update_row(self, iid: str, values: tuple) -> bool:
+        """단일 행의 값만 갱신합니다. 값이 같거나 행이 없으면 아무것도 하지 않습니다."""
+        if not self.tree.exists(iid) or self._values.get(iid) == values:
+            return False
+        self.tree.item(iid, values=values)
+        self._values[iid] = values
+        return True
+
+    def insert_row(self, index, iid: str, values: tuple):
+        """단일 행을 index 위치에 추가합니다."""
+        self.tree.insert("", index, iid=iid, values=values)
+        self._values[iid] = values
+
+    def delete_rows(self, iids: Sequence[str]) -> int:
+        """화면에 있는 행만 삭제하고 삭제한 수를 반환합니다."""
+        existing = [iid for iid in iids if self.tree.exists(iid)]
+        if existing:
+            self.tree.delete(*existing)
+        for iid in iids:
+            self._values.pop(iid, None)
+        return len(existing)
+
+    def clear(self):
+        """모든 행을 삭제합니다."""
+        children = self.tree.get_children("")
+        if children:
+            self.tree.delete(*children)
+        self._values.clear()
+
+
+class VirtualTreeview:
+    """
+    수만 행 목록의 보이는 부분만 Treeview 에 두는 가상 스크롤.
+    전체 행은 모델 쪽 목록(정렬/필터 결과)으로만 들고 있고, 화면에 보이는 page_size 행만 format_row 로 (iid, values)
+    를 만들어 TreeviewSync 로 반영합니다. 스크롤바와 마우스 휠은 Treeview 대신 offset 을 움직입니다.
+    """
+
+    def __init__(self, tree, scrollbar, format_row: Callable[[Any], Row]):
+        self.tree = tree
+        self.scrollbar = scrollbar
+        self.format_row = format_row
+        self.offset = 0
+        self._rows: Sequence[Any] = []
+        self._sync = TreeviewSync(tree)
+        scrollbar.configure(command=self.yview)
+        for sequence in ("<MouseWheel>", "<Button-4>", "<Button-5>"):
+            tree.bind(sequence, self._on_mousewheel)
+
+    @property
+    def page_size(self) -> int:
+        return max(int(self.tree.cget("height")), 1)
+
+    def set_rows(self, rows: Sequence[Any], keep_offset: bool = False):
+        """표시할 전체 행을 바꿉니다. (정렬/필터 변경 시 keep_offset=False 로 맨 위부터)"""
+        self._rows = rows
+        if not keep_offset:
+            self.offset = 0
+        self.refresh()
+
+    def refresh(self):
+        total = len(self._rows)
+        page = self.page_size
+        self.offset = max(0, min(self.offset, total - page))
+        self._sync.sync([self.format_row(row) for row in self._rows[self.offset:self.offset + page]])
+        if total:
+            self.scrollbar.set(self.offset / total, min(self.offset + page, total) / total)
+        else:
+            self.scrollbar.set(0.0, 1.0)
+
+    def clear(self):
+        """모든 행을 지웁니다. (Treeview 열 구성을 바꾸기 전에 호출)"""
+        self._rows = []
+        self.offset = 0
+        self._sync.clear()
+        self.scrollbar.set(0.0, 1.0)
+
+    def scroll(self, rows: int):
+        self.offset += rows
+        self.refresh()
+
+    def yview(self, *args):
+        """Scrollbar command: ("moveto", fraction) / ("scroll", n, "units"|"pages")"""
+        if not args:
+            return
+        if args[0] == "moveto":
+            self.offset = int(float(args[1]) * len(self._rows))
+            self.refresh()
+        elif args[0] == "scroll":
+            step = self.page_size if args[2] == "pages" else 1
+            self.scroll(int(args[1]) * step)
+
+    def _on_mousewheel(self, event):
+        if getattr(event, "num", None) == 4 or getattr(event, "delta", 0) > 0:
+            self.scroll(-3)
+        else:
+            self.scroll(3)
+        return "break"
+
+
+if __name__ == '__main__':
+    # Tk 없이 diff 계산만 테스트
+    old_order = ["a", "b", "c", "d"]
+    old_values = {"a": (1,), "b": (2,), "c": (3,), "d": (4,)}
+
+    # 값 하나만 바뀐 경우 -> 한 행 업데이트
+    deletes, updates, placements = diff_rows(old_order, old_values, [("a", (1,)), ("b", (20,)), ("c", (3,)), ("d", (4,))])
+    assert deletes == [] and updates == [("b", (20,))] and placements == []
+
+    # 삭제 + 삽입
+    deletes, updates, placements = diff_rows(old_order, old_values, [("a", (1,)), ("c", (3,)), ("e", (5,)), ("d", (4,))])
+    assert deletes == ["b"] and updates == [] and placements == [(2, "e", (5,), True)]
+
+    # 순서 변경 -> 최소 이동 (d를 맨 앞으로 옮기면 나머지는 그대로)
+    deletes, updates, placements = diff_rows(old_order, old_values, [("d", (4,)), ("a", (1,)), ("b", (2,)), ("c", (3,))])
+    assert deletes == [] and updates == [] and [p[1] for p in placements] == ["d"]
+
+    # 역순 -> n-1 이동
+    deletes, updates, placements = diff_rows(old_order, old_values, [(k, old_values[k]) for k in reversed(old_order)])
+    assert len(placements) == 3
+
+    # 가상 스크롤: 한 행 내리면 한 행 삭제 + 한 행 추가만
+    class _FakeTree:
+        def __init__(self, height):
+            self.height, self.order, self.values = height, [], {}
+        def cget(self, option): return self.height
+        def bind(self, sequence, fn): pass
+        def get_children(self, parent): return tuple(self.order)
+        def selection(self): return ()
+        def focus(self, iid=None): return ""
+        def yview(self): return (0.0, 1.0)
+        def yview_moveto(self, fraction): pass
+        def exists(self, iid): return iid in self.values
+        def item(self, iid, values): self.values[iid] = values
+        def delete(self, *iids):
+            for iid in iids: self.order.remove(iid); del self.values[iid]
+        def detach(self, *iids):
+            for iid in iids: self.order.remove(iid)
+        def move(self, iid, parent, index): self.order.insert(index, iid)
+        def insert(self, parent, index, iid, values): self.order.insert(index, iid); self.values[iid] = values
+
+    class _FakeScrollbar:
+        def configure(self, command): self.command = command
+        def set(self, lo, hi): self.range = (lo, hi)
+
+    tree, scrollbar = _FakeTree(10), _FakeScrollbar()
+    virtual = VirtualTreeview(tree, scrollbar, lambda n: (str(n), (n,)))
+    virtual.set_rows(range(100000))
+    assert tree.order == [str(n) for n in range(10)] and scrollbar.range == (0.0, 0.0001)
+    stats = virtual._sync.sync([virtual.format_row(n) for n in range(1, 11)])
+    assert (stats.inserted, stats.deleted, stats.moved) == (1, 1, 0)
+    scrollbar.command("moveto", "1.0")
+    assert tree.order[-1] == "99999" and virtual.offset == 99990
+    virtual.set_rows(range(5))
+    assert tree.order == ["0", "1", "2", "3", "4"] and scrollbar.range == (0.0, 1.0)
+
+    print("tree_sync diff 테스트 완료.")